@@ -9,6 +9,7 @@ from .extensions import db, migrate, csrf, security as security_ext
 
 # Мои модули
 from .handlers.error import register_error_handlers
+from .handlers.commands import register_commands
 from .models.models import User, Role
 from .utils.mail_helpers import CustomMailUtil, ExtendedRegisterForm
 from .before_request_handlers import load_current_profile, one_time_sync_tasks
@@ -63,6 +64,7 @@ def create_app():
     init_security_signals(app)
     
     register_error_handlers(app)
+    register_commands(app)
     
     
     app.before_request(load_current_profile)
@@ -74,8 +76,9 @@ def create_app():
     app.context_processor(inject_user_settings)
     app.context_processor(inject_user_rank)
     app.context_processor(inject_current_profile_data)
-    # Для inject_app_info — нужно передать версию
-    app.context_processor(inject_app_info("0.10.8.5"))
+    # Для inject_app_info — нужно передать версию (она же входит в ETag страниц протокола)
+    app.config.setdefault("APP_VERSION", "0.10.8.5")
+    app.context_processor(inject_app_info(app.config["APP_VERSION"]))
     
    
     # Register Blueprints
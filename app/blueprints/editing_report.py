@@ -2,11 +2,13 @@
 
 from flask import Blueprint, render_template, request, current_app, jsonify, session
 from flask_security import current_user
-from app.models.models import db, User, Report, Paragraph, HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, TailSentenceGroup, BodySentenceGroup, ReportShare
-from app.utils.common import get_max_index, normalize_paragraph_indices
+from collections import namedtuple
+from app.models.models import db, User, Report, Paragraph, HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, TailSentenceGroup, BodySentenceGroup, ReportShare, SentenceDuplicateCluster
+from app.utils.common import get_max_index
 from flask_security.decorators import auth_required
-from app.utils.decorators import require_role_rank
+from app.utils.decorators import require_role_rank, report_etag
 from app.utils.logger import logger
+from app.utils.unit_of_work import commit_session, unit_of_work
 from app.utils.ai_processing import gramma_correction_ai
 from app.utils.db_processing import get_categories_setup_from_appconfig
 
@@ -15,11 +17,311 @@ editing_report_bp = Blueprint('editing_report', __name__)
 
 # Functions
 
+# Операции редактирования шаблона. Каждая операция — пара функций: prepare проверяет данные запроса 
+# без изменений в базе (и делает внешние вызовы вроде проверки грамматики), apply применяет их.
+# Отдельные маршруты вызывают обе функции подряд, /apply_ops сначала проверяет все операции пачки,
+# потом применяет их в одной транзакции.
+
+SENTENCE_CLASSES = {"head": HeadSentence, "body": BodySentence, "tail": TailSentence}
+
+# Максимум операций в одном запросе /apply_ops
+APPLY_OPS_LIMIT = 200
+
+
+class EditOperationError(ValueError):
+    """Ошибка проверки операции редактирования. status_code — HTTP статус ответа."""
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+EditOperation = namedtuple("EditOperation", ["prepare", "apply", "success_message", "error_message"])
+
+
+def prepare_update_sentence_text(data):
+    sentence_type = data.get("sentence_type")
+    if sentence_type not in SENTENCE_CLASSES:
+        logger.error("(Обновление текста предложения /update_sentence_text) ❌ Некорректный тип предложения")
+        raise EditOperationError("Некорректный тип предложения.")
+
+    sentence_text = data.get("sentence_text")
+    ai_gramma_check = data.get("ai_gramma_check", False)
+    logger.info(f"(Обновление текста предложения /update_sentence_text)(тип предложения {sentence_type}) Получены данные для обновления текста предложения: {data}. Проверка грамматики: {ai_gramma_check}. Использовать дубликат: {data.get('use_dublicate', False)}")
+    if ai_gramma_check:
+        logger.info(f"(Обновление текста предложения /update_sentence_text) Проверка грамматики через ИИ")
+        try:
+            language = session.get("lang", "ru")
+            assistant_id = current_app.config.get("OPENAI_ASSISTANT_GRAMMA_CORRECTOR_RU")
+            sentence_text = gramma_correction_ai(sentence_text, language, assistant_id)
+        except Exception as e:
+            logger.error(f"(Обновление текста предложения /update_sentence_text) ❌ Ошибка при проверке грамматики через ИИ: {str(e)} текс остается прежним")
+    return {
+        "sentence_class": SENTENCE_CLASSES[sentence_type],
+        "sentence_id": data.get("sentence_id"),
+        "group_id": data.get("group_id"),
+        "related_id": data.get("related_id"),
+        "sentence_text": sentence_text,
+        "use_dublicate": data.get("use_dublicate", False),
+    }
+
+
+def apply_update_sentence_text(params):
+    params["sentence_class"].edit_sentence(sentence_id=params["sentence_id"],
+                                           group_id=params["group_id"],
+                                           related_id=params["related_id"],
+                                           new_text=params["sentence_text"],
+                                           use_dublicate=params["use_dublicate"],
+                                           )
+    logger.info(f"(Обновление текста предложения /update_sentence_text) ✅ Текст предложения успешно обновлен")
+    return {}
+
+
+def prepare_update_sentence_weight(data):
+    sentence_id = data.get("sentence_id")
+    sentence_weight = data.get("sentence_weight")
+    group_id = data.get("group_id")
+    sentence_type = data.get("sentence_type")
+    if not sentence_id or not sentence_weight or not group_id or not sentence_type:
+        logger.error(f"(Обновление веса предложения) ❌ Не указаны необходимые данные для обновления веса предложения")
+        raise EditOperationError("Не указаны необходимые данные для обновления веса предложения")
+    if sentence_type not in ["body", "tail"]:
+        logger.error(f"(Обновление веса предложения) ❌ Неподходящий тип предложения")
+        raise EditOperationError("Неподходящий тип предложения")
+    logger.info(f"(Обновление веса предложения) Получены данные для обновления веса предложения: {data}")
+    return {
+        "sentence_class": SENTENCE_CLASSES[sentence_type],
+        "sentence_id": sentence_id,
+        "group_id": group_id,
+        "sentence_weight": sentence_weight,
+    }
+
+
+def apply_update_sentence_weight(params):
+    params["sentence_class"].set_sentence_index_or_weight(params["sentence_id"], params["group_id"], new_weight=params["sentence_weight"])
+    logger.info(f"(Обновление веса предложения) ✅ Вес предложения успешно обновлен")
+    return {}
+
+
+def prepare_unlink_sentence(data):
+    logger.info(f"(Отвязка предложения) Получены данные для отвязки предложения: {data}")
+    sentence_type = data.get("sentence_type")
+    if not data.get("sentence_id") or not data.get("related_id"):
+        logger.error(f"(Отвязка предложения) ❌ Не указаны необходимые данные для отвязки предложения от группы")
+        raise EditOperationError("Не указаны необходимые данные для отвязки предложения от группы")
+    if sentence_type not in SENTENCE_CLASSES:
+        logger.error(f"(Отвязка предложения) ❌ Неизвестный тип предложения")
+        raise EditOperationError("Неизвестный тип предложения")
+    return {
+        "sentence_type": sentence_type,
+        "sentence_class": SENTENCE_CLASSES[sentence_type],
+        "sentence_id": data.get("sentence_id"),
+        "related_id": data.get("related_id"),
+        "group_id": data.get("group_id"),
+        "sentence_index": data.get("sentence_index"),
+    }
+
+
+def apply_unlink_sentence(params):
+    sentence_type = params["sentence_type"]
+    sentence_class = params["sentence_class"]
+    sentence = sentence_class.get_by_id(params["sentence_id"])
+    if not sentence:
+        logger.error(f"(Отвязка предложения) ❌ Предложение не найдено")
+        raise EditOperationError("Предложение не найдено", 404)
+
+    new_sentence_data = {
+        "user_id": current_user.id,
+        "report_global_modality_id": sentence.report_global_modality_id,
+        "sentence": sentence.sentence,
+        "related_id": params["related_id"],
+        "sentence_index": params["sentence_index"] if sentence_type == "head" else None,
+        "tags": sentence.tags,
+        "comment": sentence.comment,
+        "sentence_weight": None if sentence_type == "head" else params["sentence_index"],
+        "unique": True,
+    }
+    new_sentence, new_group = sentence_class.create(**new_sentence_data)
+    if sentence_type == "head":
+        new_sentence.body_sentence_group_id = sentence.body_sentence_group_id
+        HeadSentence.touch_reports(new_sentence.id)
+        commit_session()
+    # Так как данное предложение имеет другие связи, то метод не удалит его а только отвяжет от текущей группы
+    sentence_class.delete_sentence(sentence.id, params["group_id"])
+    logger.info(f"(Отвязка предложения) ✅ Успешно отвязано предложение с id={sentence.id} от группы")
+    return {"sentence_id": new_sentence.id, "group_id": new_group.id}
+
+
+def prepare_delete_sentence(data):
+    logger.info(f"Получены данные для удаления предложения: {data}")
+    sentence_type = data.get("sentence_type")
+    if not data.get("sentence_id") or not data.get("related_id") or not sentence_type:
+        logger.error(f"(Удаление предложения) ❌ Отсутствуют необходимые данные для удаления предложения")
+        raise EditOperationError("Отсутствуют необходимые данные для удаления предложения")
+    if sentence_type not in SENTENCE_CLASSES:
+        logger.error(f"(Удаление предложения) ❌ Неизвестный тип предложения")
+        raise EditOperationError("Неизвестный тип предложения")
+    return {
+        "sentence_type": sentence_type,
+        "sentence_id": data.get("sentence_id"),
+        "related_id": data.get("related_id"),
+    }
+
+
+def apply_delete_sentence(params):
+    sentence_type = params["sentence_type"]
+    # Группа body предложения — у главного предложения, head и tail — у параграфа
+    if sentence_type == "body":
+        parent = HeadSentence.get_by_id(params["related_id"])
+        group_id = parent.body_sentence_group_id if parent else None
+    else:
+        parent = Paragraph.get_by_id(params["related_id"])
+        group_id = getattr(parent, f"{sentence_type}_sentence_group_id", None) if parent else None
+    if not parent:
+        logger.error(f"(Удаление предложения) ❌ Родительская сущность ID={params['related_id']} не найдена")
+        raise EditOperationError("Родительская сущность не найдена", 404)
+    logger.info(f"(Удаление предложения) Предложение является {sentence_type} и его группа предложений = {group_id}")
+
+    try:
+        SENTENCE_CLASSES[sentence_type].delete_sentence(params["sentence_id"], group_id)
+    except ValueError as e:
+        logger.error(f"(Удаление предложения) ❌ Ошибка при удалении предложения: {str(e)}")
+        raise EditOperationError(str(e), 404)
+    logger.info(f"(Удаление предложения) ✅ Предложение успешно удалено")
+    return {}
+
+
+def prepare_update_head_sentence_order(data):
+    updated_order = data.get("updated_order")
+    paragraph_id = data.get("paragraph_id")
+    if not updated_order or not paragraph_id:
+        logger.error("(Обновление порядка главных предложений) ❌ Нет данных для обновления")
+        raise EditOperationError("Нет данных для обновления")
+    try:
+        positions = {int(item["sentence_id"]): int(item["new_index"]) for item in updated_order}
+        paragraph_id = int(paragraph_id)
+    except (KeyError, TypeError, ValueError):
+        logger.error("(Обновление порядка главных предложений) ❌ Некорректные данные порядка")
+        raise EditOperationError("Некорректные данные порядка")
+    return {"paragraph_id": paragraph_id, "positions": positions}
+
+
+def apply_update_head_sentence_order(params):
+    paragraph = Paragraph.get_by_id(params["paragraph_id"])
+    if not paragraph or paragraph.paragraph_to_report.profile_id != session.get("profile_id"):
+        logger.error("(Обновление порядка главных предложений) ❌ Параграф не найден или не соответствует профилю")
+        raise EditOperationError("Параграф не найден или не соответствует профилю", 403)
+
+    group_id = paragraph.head_sentence_group_id
+    if not group_id:
+        logger.error("(Обновление порядка главных предложений) ❌ Группа главных предложений не найдена")
+        raise EditOperationError("Группа главных предложений не найдена", 404)
+
+    new_order = HeadSentence.reorder_in_group(group_id, params["positions"])
+    logger.info("(Обновление порядка главных предложений) ✅ Порядок главных предложений успешно обновлен")
+    return {"head_sentences": new_order}
+
+
+def prepare_add_new_sentence(data):
+    if not data:
+        logger.error("(Создание нового предложения) ❌ Отсутствуют данные для создания нового предложения")
+        raise EditOperationError("Отсутствуют данные для создания нового предложения")
+    logger.info(f"(Создание нового предложения) Получены данные для создания нового предложения: {data}. Использовать дубликат: {data.get('use_dublicate', True)}")
+    sentence_type = data.get("sentence_type")
+    if sentence_type not in SENTENCE_CLASSES:
+        logger.error(f"(Создание нового предложения) ❌ Неизвестный тип предложения")
+        raise EditOperationError("Неизвестный тип предложения")
+    if not data.get("report_id") or not data.get("related_id"):
+        logger.error(f"(Создание нового предложения) ❌ Отсутствуют необходимые данные для создания предложения")
+        raise EditOperationError("Отсутствуют необходимые данные для создания предложения")
+    return {
+        "sentence_type": sentence_type,
+        "report_id": int(data.get("report_id")),
+        "related_id": data.get("related_id"),
+        "sentence_index": data.get("sentence_index"),
+        "sentence_id": data.get("sentence_id"),
+        "unique": data.get("unique", False),
+    }
+
+
+def apply_add_new_sentence(params):
+    sentence_type = params["sentence_type"]
+    class_type = SENTENCE_CLASSES[sentence_type]
+    report = Report.get_by_id(params["report_id"])
+    report_global_modality_id = report.global_category_id if report else None
+    if not report_global_modality_id:
+        logger.error(f"(Создание нового предложения) ❌ Отсутствуют необходимые данные для создания предложения")
+        raise EditOperationError("Отсутствуют необходимые данные для создания предложения")
+
+    sentence_data = {
+        "user_id": current_user.id,
+        "report_global_modality_id": report_global_modality_id,
+        "sentence": "Введите текст предложения",
+        "related_id": params["related_id"],
+        "sentence_index": params["sentence_index"],
+        "unique": params["unique"],
+    }
+    sentence = None
+    if params["sentence_id"]:
+        sentence = class_type.get_by_id(params["sentence_id"])
+        if not sentence:
+            logger.error(f"(Создание нового предложения) ❌ Предложение не найдено")
+            raise EditOperationError("Предложение не найдено", 404)
+        sentence_data["sentence"] = sentence.sentence
+
+    logger.info(f"(Создание нового предложения) Получены все необходимые данные для создания предложения {sentence_data}. Начато создание нового предложения")
+    new_sentence, new_sentence_group = class_type.create(**sentence_data)
+    if sentence and sentence_type == "head":
+        new_sentence.body_sentence_group_id = sentence.body_sentence_group_id
+        HeadSentence.touch_reports(new_sentence.id)
+        commit_session()
+        logger.info(f"(Создание нового предложения) ✅ Успешно добавлено новое предложение с id={new_sentence.id} из буфера обмена")
+    logger.info(f"(Создание нового предложения) ✅ Успешно создано новое {sentence_type} предложение с id={new_sentence.id}")
+    return {"sentence_id": new_sentence.id, "group_id": new_sentence_group.id}
+
+
+EDIT_OPERATIONS = {
+    "update_sentence_text": EditOperation(prepare_update_sentence_text, apply_update_sentence_text,
+                                          "Текст предложения успешно обновлен.", "Ошибка обновления текста"),
+    "update_sentence_weight": EditOperation(prepare_update_sentence_weight, apply_update_sentence_weight,
+                                            "Вес предложения успешно обновлен.", "Ошибка при обновлении веса предложения"),
+    "unlink_sentence": EditOperation(prepare_unlink_sentence, apply_unlink_sentence,
+                                     "Предложение успешно отвязано от группы", "Ошибка при создании нового предложения"),
+    "delete_sentence": EditOperation(prepare_delete_sentence, apply_delete_sentence,
+                                     "Предложение удалено", "Ошибка при удалении предложения"),
+    "update_head_sentence_order": EditOperation(prepare_update_head_sentence_order, apply_update_head_sentence_order,
+                                                "Порядок обновлен", "Ошибка сохранения"),
+    "add_new_sentence": EditOperation(prepare_add_new_sentence, apply_add_new_sentence,
+                                      "Новое предложение успешно создано", "Ошибка при создании нового предложения"),
+}
+
+
+def get_accessible_cluster(cluster_id):
+    """Кластер почти одинаковых предложений, если он принадлежит текущему пользователю (суперадмину доступны все)."""
+    cluster = SentenceDuplicateCluster.get_by_id(cluster_id)
+    if not cluster or (cluster.user_id != current_user.id and not current_user.has_role("superadmin")):
+        return None
+    return cluster
+
+
+def run_edit_operation(op_name, data, success_status=200):
+    """Выполняет одну операцию редактирования для отдельного маршрута и формирует ответ."""
+    operation = EDIT_OPERATIONS[op_name]
+    try:
+        result = operation.apply(operation.prepare(data or {}))
+    except EditOperationError as e:
+        return jsonify({"status": "error", "message": str(e)}), e.status_code
+    except Exception as e:
+        logger.error(f"({op_name}) ❌ {operation.error_message}: {e}")
+        return jsonify({"status": "error", "message": f"{operation.error_message}: {e}"}), 500
+    return jsonify({"status": "success", "message": operation.success_message, **result}), success_status
+
+
 # Routs
 
 # Маршрут для запуска страницы редактирования протокола
 @editing_report_bp.route('/edit_report', methods=["GET"])
 @auth_required()
+@report_etag("report_id")
 def edit_report():
     logger.info("(Страница редактирования протокола /edit_report) ------------------------------------------------")
     logger.info("(Страница редактирования протокола /edit_report) 🚀 Начинаю получения данных для формирования страницы.")
@@ -58,6 +360,7 @@ def edit_report():
 # Маршрут для запуска страницы редактирования параграфа
 @editing_report_bp.route('/edit_paragraph', methods=["GET"])
 @auth_required()
+@report_etag("report_id")
 def edit_paragraph():
     logger.info("(Страница редактирования параграфа /edit_paragraph) ------------------------------------------------")
     logger.info("(Страница редактирования параграфа /edit_paragraph) 🚀 Начинаю получения данных для формирования страницы.")
@@ -79,6 +382,7 @@ def edit_paragraph():
 # Маршрут для запуска страницы редактирования главного предложения
 @editing_report_bp.route('/edit_head_sentence', methods=["GET"])
 @auth_required()
+@report_etag("report_id")
 def edit_head_sentence():
     logger.info("(Страница редактирования head предложений) ------------------------------------------------")
     logger.info("(Страница редактирования head предложений) 🚀 Начинаю получения данных для формирования страницы.")
@@ -111,20 +415,17 @@ def update_paragraph_order():
     logger.info("(Обновление порядка параграфов) ------------------------------------------------")
     logger.info("(Обновление порядка параграфов) 🚀 Начато обновление порядка параграфов")
     data = request.json.get("paragraphs", [])
+    profile_id = session.get("profile_id")
     
     try:
-        for item in data:
-            paragraph = Paragraph.get_by_id(item["id"])
-            if paragraph:
-                paragraph.paragraph_index = item["index"]
-        
-        db.session.commit()
+        positions = {int(item["id"]): int(item["index"]) for item in data}
+        new_order = Paragraph.reorder(positions, profile_id)
         logger.info("(Обновление порядка параграфов) ✅ Порядок параграфов успешно обновлен")
         logger.info("(Обновление порядка параграфов) ----------------------------------------------")
-        return jsonify({"status": "success", "message": "Порядок параграфов успешно обновлен"}), 200
+        return jsonify({"status": "success", "message": "Порядок параграфов успешно обновлен", "paragraphs": new_order}), 200
 
     except Exception as e:
-        db.session.rollback()
+        logger.error(f"(Обновление порядка параграфов) ❌ Ошибка обновления порядка параграфов: {e}")
         return jsonify({"status": "error", "message": f"Ошибка обновления порядка параграфов: {e}"}), 500
 
 
@@ -137,30 +438,7 @@ def update_head_sentence_order():
     """
     logger.info("(Обновление порядка главных предложений) ------------------------------------------------")
     logger.info("(Обновление порядка главных предложений) 🚀 Начато обновление порядка главных предложений")
-    data = request.json
-    updated_order = data.get("updated_order")
-    paragraph_id = int(data.get("paragraph_id"))
-    if not updated_order or not paragraph_id:
-        logger.error("(Обновление порядка главных предложений) ❌ Нет данных для обновления")
-        return jsonify({"status": "error", "message": "Нет данных для обновления"}), 400
-    
-    group_id = Paragraph.get_by_id(paragraph_id).head_sentence_group_id
-    if not group_id:
-        logger.error("(Обновление порядка главных предложений) ❌ Группа главных предложений не найдена")
-        return jsonify({"status": "error", "message": "Группа главных предложений не найдена"}), 404
-
-    try:
-        for item in updated_order:
-            sentence_id = int(item["sentence_id"])
-            if sentence_id:
-                HeadSentence.set_sentence_index_or_weight(sentence_id, group_id, new_index = item["new_index"])
-
-        logger.info("(Обновление порядка главных предложений) ✅ Порядок главных предложений успешно обновлен")
-        logger.info("(Обновление порядка главных предложений) ----------------------------------------------")
-        return jsonify({"status": "success", "message": "Порядок обновлен"}), 200
-
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"Ошибка сохранения: {e}"}), 500
+    return run_edit_operation("update_head_sentence_order", request.json)
 
 
 
@@ -189,7 +467,9 @@ def update_report():
     logger.info(f"(Обновление протокола) Получены данные для обновления протокола: {new_report_data}")
 
     try:
+        Report.touch(report.id)
         report.update(**new_report_data)
+        Report.invalidate_list_cache(report.profile_id)
         logger.info(f"(Обновление протокола) ✅ Данные протокола успешно обновлены")
         logger.info("(Обновление протокола) ------------------------------------------------------")
         return jsonify({"status": "success", "message": "Данные протокола успешно обновлены"}), 200
@@ -222,6 +502,7 @@ def update_paragraph_text():
             language = session.get("lang", "ru")
             assistant_id = current_app.config.get("OPENAI_ASSISTANT_GRAMMA_CORRECTOR_RU")
             new_paragraph_text = gramma_correction_ai(new_paragraph_text, language, assistant_id)
+        Report.touch(paragraph.report_id)
         paragraph.update(paragraph=new_paragraph_text)
         logger.info(f"(Обновление текста параграфа) ✅ Текст параграфа успешно обновлен")
         logger.info("(Обновление текста параграфа) -----------------------------------------------")
@@ -253,6 +534,7 @@ def update_paragraph_flags():
     logger.info(f"(Обновление флагов параграфа) Получены все необходимые данные для обновления флагов параграфа ID= {paragraph_id}. Начинаю обновление флагов")
     # Обновляем данные
     try:
+        Report.touch(paragraph.report_id)
         paragraph.update(**data)
 
         db.session.commit()
@@ -274,45 +556,7 @@ def update_sentence_text():
     """Обновляет текст head, body или tail предложения."""
     logger.info("(Обновление текста предложения /update_sentence_text) ------------------------------------------------")
     logger.info("(Обновление текста предложения /update_sentence_text) 🚀 Начато обновление текста предложения")
-    data = request.json
-    sentence_id = data.get("sentence_id")
-    sentence_text = data.get("sentence_text")
-    sentence_type = data.get("sentence_type")
-    group_id = data.get("group_id")
-    related_id = data.get("related_id")
-    ai_gramma_check = data.get("ai_gramma_check", False)
-    use_dublicate = data.get("use_dublicate", False)
-
-    # Проверка типа предложения
-    if sentence_type not in ["head", "body", "tail"]:
-        logger.error("(Обновление текста предложения /update_sentence_text) ❌ Некорректный тип предложения")
-        return jsonify({"status": "error", "message": "Некорректный тип предложения."}), 400
-
-    # Выбор модели по типу
-    sentence_class = {"head": HeadSentence, "body": BodySentence, "tail": TailSentence}.get(sentence_type)
-    logger.info(f"(Обновление текста предложения /update_sentence_text)(тип предложения {sentence_class}) Получены данные для обновления текста предложения: {data}. Проверка грамматики: {ai_gramma_check}. Использовать дубликат: {use_dublicate}")
-    if ai_gramma_check:
-        logger.info(f"(Обновление текста предложения /update_sentence_text) Проверка грамматики через ИИ")
-        try:
-            language = session.get("lang", "ru")
-            assistant_id = current_app.config.get("OPENAI_ASSISTANT_GRAMMA_CORRECTOR_RU")
-            sentence_text = gramma_correction_ai(sentence_text, language, assistant_id)
-        except Exception as e:
-            logger.error(f"(Обновление текста предложения /update_sentence_text) ❌ Ошибка при проверке грамматики через ИИ: {str(e)} текс остается прежним")
-            pass
-    try:
-        sentence_class.edit_sentence(sentence_id=sentence_id,
-                                     group_id=group_id,
-                                     related_id=related_id,
-                                     new_text=sentence_text,
-                                     use_dublicate=use_dublicate,
-                                     )
-        logger.info(f"(Обновление текста предложения /update_sentence_text) ✅ Текст предложения успешно обновлен")
-        logger.info("(Обновление текста предложения /update_sentence_text) ------------------------------------------------------")
-        return jsonify({"status": "success", "message": "Текст предложения успешно обновлен."}), 200
-    except Exception as e:
-        logger.error(f"(Обновление текста предложения /update_sentence_text) ❌ Ошибка при обновлении текста предложения: {str(e)}")
-        return jsonify({"status": "error", "message": f"Ошибка обновления текста: {str(e)}"}), 500
+    return run_edit_operation("update_sentence_text", request.json)
 
 
 
@@ -397,75 +641,10 @@ def add_paragraph():
 @editing_report_bp.route("/add_new_sentence", methods=["POST"])
 @auth_required()
 def add_new_sentence():
-    """Создаёт новое дополнительное предложение (BodySentence) для главного предложения."""
-    logger.info("(Создание нового дополнительного предложения) --------------------------------------------")
+    """Создаёт новое head, body или tail предложение (в том числе копию предложения из буфера)."""
+    logger.info("(Создание нового предложения) --------------------------------------------")
     logger.info("(Создание нового предложения) 🚀  Начат сбор данных для создания нового  предложения")
-    data = request.get_json()
-    
-    if not data:
-        logger.error("(Создание нового предложения) ❌ Отсутствуют данные для создания нового предложения")
-        return jsonify({"status": "error", "message": "Отсутствуют данные для создания нового предложения"}), 400
-    
-    logger.info(f"(Создание нового предложения) Получены данные для создания нового предложения: {data}. Использовать дубликат: {data.get('use_dublicate', True)}")
-    
-    sentence_type = data.get("sentence_type")
-    unique = data.get("unique", False)
-    
-    if sentence_type == "head":
-        class_type = HeadSentence
-    elif sentence_type == "body":
-        class_type = BodySentence
-    elif sentence_type == "tail":
-        class_type = TailSentence
-    else:
-        logger.error(f"(Создание нового предложения) ❌ Неизвестный тип предложения")
-        return jsonify({"status": "error", "message": "Неизвестный тип предложения"}), 400
-    
-    report_global_modality_id = Report.get_by_id(int(data.get("report_id"))).global_category_id
-    related_id = data.get("related_id")
-    sentence_index = data.get("sentence_index")
-    if not report_global_modality_id or not related_id:
-        logger.error(f"(Создание нового предложения) ❌ Отсутствуют необходимые данные для создания предложения")
-        return jsonify({"status": "error", "message": "Отсутствуют необходимые данные для создания предложения"}), 400
-    
-    sentence_id = data.get("sentence_id")
-    sentence_data = {
-            "user_id": current_user.id,
-            "report_global_modality_id": report_global_modality_id,
-            "sentence": "Введите текст предложения",
-            "related_id": related_id,
-            "sentence_index": sentence_index,
-            "unique": unique,
-        }
-    
-    if sentence_id:
-        sentence = class_type.get_by_id(sentence_id)
-        if not sentence:
-            logger.error(f"(Создание нового предложения) ❌ Предложение не найдено")
-            return jsonify({"status": "error", "message": "Предложение не найдено"}), 404
-        
-        sentence_data["sentence"] = sentence.sentence
-    
-    logger.info(f"(Создание нового предложения) Получены все необходимые данные для создания предложения {sentence_data}. Начато создание нового предложения")
-    
-    try:
-        new_sentence, new_sentence_group = class_type.create(**sentence_data)
-        if sentence_id and sentence_type == "head":
-            new_sentence.body_sentence_group_id = sentence.body_sentence_group_id
-            db.session.commit()
-            
-            logger.info(f"(Создание нового предложения) ✅ Успешно добавлено новое предложение с id={new_sentence.id} из буфера обмена")
-        logger.info(f"(Создание нового предложения) ✅ Успешно создано новое {sentence_type} предложение с id={new_sentence.id}")
-        logger.info("(Создание нового предложения) --------------------------------------------")
-        
-        return jsonify({
-            "status": "success",
-            "message": f"Успешно создано новое {sentence_type} предложение",
-        }), 201
-
-    except Exception as e:
-        logger.error(f"(Создание нового предложения) ❌ Ошибка при создании нового предложения: {e}")
-        return jsonify({"status": "error", "message": f"Ошибка при создании нового предложения: {e}"}), 500
+    return run_edit_operation("add_new_sentence", request.get_json(), success_status=201)
      
 
 @editing_report_bp.route('/delete_paragraph', methods=["DELETE"])
@@ -475,9 +654,6 @@ def delete_paragraph():
     logger.info(f"(Логика удаления параграфа) 🚀 Начинаю удаление параграфа")
     paragraph_id = request.json.get("paragraph_id")
     paragraph = Paragraph.get_by_id(paragraph_id)
-    report_id = paragraph.report_id
-    head_sentence_group = paragraph.head_sentence_group
-    tail_sentence_group = paragraph.tail_sentence_group
     profile_id = session.get("profile_id")
 
     if not paragraph or paragraph.paragraph_to_report.profile_id != profile_id:
@@ -485,41 +661,10 @@ def delete_paragraph():
         return jsonify({"status": "error", "message": "Параграф не найден или не соответствует профилю"}), 404
     
     try:
-        if tail_sentence_group:
-            logger.info(f"(Логика удаления параграфа) У параграфа есть группа tail предложений")
-            tail_sentence_group_count = TailSentenceGroup.is_linked(tail_sentence_group.id)
-            if  tail_sentence_group_count > 1:
-                logger.info(f"(Логика удаления параграфа) Tail предложения параграфа связаны с другими протоколами. Просто удаляю связь с текущим параграфом")
-                TailSentenceGroup.unlink_group(tail_sentence_group.id, paragraph_id)
-                logger.info(f"(Логика удаления параграфа) Связь с параграфом успешно удалена")
-                pass
-            else:
-                logger.info(f"(Логика удаления параграфа) Параграф связан только с текущим протоколом. Удаляю группу tail предложений")
-                TailSentenceGroup.delete_group(tail_sentence_group.id, paragraph_id)
-                logger.info(f"(Логика удаления параграфа) Группа tail предложений успешно удалена")
-                pass
-        if head_sentence_group:
-            logger.info(f"(Логика удаления параграфа) У параграфа есть группа head предложений")
-            head_sentence_group_count = HeadSentenceGroup.is_linked(head_sentence_group.id)
-            if head_sentence_group_count > 1:
-                logger.info(f"(Логика удаления параграфа) Head предложения параграфа связаны с другими протоколами. Просто удаляю связь с текущим параграфом")
-                HeadSentenceGroup.unlink_group(head_sentence_group.id, paragraph_id)
-                logger.info(f"(Логика удаления параграфа) Связь с параграфом успешно удалена")
-                pass
-            else:
-                logger.info(f"(Логика удаления параграфа) Параграф связан только с текущим протоколом. Удаляю группу head предложений")
-                HeadSentenceGroup.delete_group(head_sentence_group.id, paragraph_id)
-                logger.info(f"(Логика удаления параграфа) Группа head предложений успешно удалена")
-                pass
-        paragraph.delete()
-        logger.info(f"(Логика удаления параграфа) Параграф успешно удален")
-        try:
-            normalize_paragraph_indices(report_id)
-        except Exception as e:
-            logger.error(f"(Логика удаления параграфа) ❌ Ошибка при ренормализации индексов параграфов: {e}")
-            return jsonify({"status": "error", "message": f"Ошибка при ренормализации индексов параграфов: {e}"}), 500
-        
-            
+        # Группы, на которые больше ничто не ссылается, удаляются вместе с параграфом, 
+        # общие — только отвязываются; оставшиеся параграфы перенумеровываются
+        deleted = Paragraph.delete_paragraphs(paragraph.id)
+        logger.info(f"(Логика удаления параграфа) Удалено вместе с параграфом: {deleted}")
         logger.info("(Логика удаления параграфа) --------------------------------------------")
         logger.info("(Логика удаления параграфа) ✅ Параграф успешно удален")
         return jsonify({"status": "success", "message": "Параграф успешно удален"}), 200
@@ -534,56 +679,7 @@ def delete_sentence():
     """Удаляет предложение или отвязывает его от группы."""
     logger.info(f"(Удаление предложения) --------------------------------------------")
     logger.info(f"(Удаление предложения) 🚀 Начинаю удаление предложения")
-    data = request.get_json()
-    sentence_id = data.get("sentence_id")
-    sentence_type = data.get("sentence_type")
-    related_id = data.get("related_id") 
-    logger.info(f"Получены данные для удаления предложения: {data}")
-   
-    if not sentence_id or not related_id or not sentence_type:
-        logger.error(f"(Удаление предложения) ❌ Отсутствуют необходимые данные для удаления предложения")
-        return jsonify({"status": "error", "message": "Отсутствуют необходимые данные для удаления предложения"}), 400
-    
-    group_id = 0
-    if sentence_type == "body":
-        group_id = HeadSentence.query.get(related_id).body_sentence_group_id
-        logger.info(f"(Удаление предложения) Предложение является {sentence_type} и его группа предложений = {group_id}")
-        try:
-            BodySentence.delete_sentence(sentence_id, group_id)
-            logger.info(f"(Удаление предложения) ✅ Предложение успешно удалено")
-            logger.info("(Удаление предложения) --------------------------------------------")
-            return jsonify({"status": "success", "message": "Предложение удалено"}), 200
-        except ValueError as e:
-            logger.error(f"(Удаление предложения) ❌ Ошибка при удалении предложения: {str(e)}")
-            return jsonify({"status": "error", "message": str(e)}), 404
-    
-    elif sentence_type == "tail":
-        group_id = Paragraph.query.get(related_id).tail_sentence_group_id
-        logger.info(f"(Удаление предложения) Предложение является {sentence_type} и его группа предложений = {group_id}")
-        try:
-            TailSentence.delete_sentence(sentence_id, group_id)
-            logger.info(f"(Удаление предложения) ✅ Предложение успешно удалено")
-            logger.info("(Удаление предложения) --------------------------------------------")
-            return jsonify({"status": "success", "message": "Предложение удалено"}), 200
-        except ValueError as e:
-            logger.error(f"(Удаление предложения) ❌ Ошибка при удалении предложения: {str(e)}")
-            return jsonify({"status": "error", "message": str(e)}), 404
-        
-    elif sentence_type == "head":
-        group_id = Paragraph.query.get(related_id).head_sentence_group_id
-        logger.info(f"(Удаление предложения) Предложение является {sentence_type} и его группа предложений = {group_id}")
-        try:
-            HeadSentence.delete_sentence(sentence_id, group_id)
-            logger.info(f"(Удаление предложения) ✅ Предложение успешно удалено")
-            logger.info("(Удаление предложения) --------------------------------------------")
-            return jsonify({"status": "success", "message": "Предложение удалено"}), 200
-        except ValueError as e:
-            logger.error(f"(Удаление предложения) ❌ Ошибка при удалении предложения: {str(e)}")
-            return jsonify({"status": "error", "message": str(e)}), 404
-        
-    else:
-        logger.error(f"(Удаление предложения) ❌ Неизвестный тип предложения")
-        return jsonify({"status": "error", "message": "Неизвестный тип предложения"}), 400
+    return run_edit_operation("delete_sentence", request.get_json())
         
         
 @editing_report_bp.route('/delete_subsidiaries', methods=["DELETE"])
@@ -657,29 +753,32 @@ def unlink_group():
     
     if sentence_type == "head":
         try:
-            new_group_id = HeadSentenceGroup.copy_group(group_id)
-            paragragh = Paragraph.query.get(related_id)
-            paragragh.head_sentence_group_id = new_group_id
-            db.session.commit()
+            with unit_of_work("unlink_group"):
+                new_group_id = HeadSentenceGroup.copy_group(group_id)
+                paragragh = Paragraph.query.get(related_id)
+                paragragh.head_sentence_group_id = new_group_id
+                Report.touch(paragragh.report_id)
         except ValueError as e:
             logger.error(f"(Отделение группы) ❌ Ошибка при отделении группы: {str(e)}")
             return jsonify({"status": "error", "message": f"Ошибка при отделении группы: {str(e)}"}), 400
        
     elif sentence_type == "tail":
         try:
-            new_group_id = TailSentenceGroup.copy_group(group_id)
-            paragragh = Paragraph.query.get(related_id)
-            paragragh.tail_sentence_group_id = new_group_id
-            db.session.commit()
+            with unit_of_work("unlink_group"):
+                new_group_id = TailSentenceGroup.copy_group(group_id)
+                paragragh = Paragraph.query.get(related_id)
+                paragragh.tail_sentence_group_id = new_group_id
+                Report.touch(paragragh.report_id)
         except ValueError as e:
             logger.error(f"(Отделение группы) ❌ Ошибка при отделении группы: {str(e)}")
             return jsonify({"status": "error", "message": f"Ошибка при отделении группы: {str(e)}"}), 400
     else:
         try:
-            new_group_id = BodySentenceGroup.copy_group(group_id)
-            head_sentence = HeadSentence.query.get(related_id)
-            head_sentence.body_sentence_group_id = new_group_id
-            db.session.commit()
+            with unit_of_work("unlink_group"):
+                new_group_id = BodySentenceGroup.copy_group(group_id)
+                head_sentence = HeadSentence.query.get(related_id)
+                head_sentence.body_sentence_group_id = new_group_id
+                HeadSentence.touch_reports(head_sentence.id)
         except ValueError as e:
             logger.error(f"(Отделение группы) ❌ Ошибка при отделении группы: {str(e)}")
             return jsonify({"status": "error", "message": f"Ошибка при отделении группы: {str(e)}"}), 400
@@ -741,6 +840,7 @@ def toggle_public_report():
 
         # Переключаем флаг public
         report.public = not report.public
+        Report.touch(report.id)
         db.session.commit()
         logger.info("[toggle_public_report] ✅ Статус общедоступности успешно изменён")
         logger.info("[toggle_public_report] --------------------------------------------")
@@ -767,60 +867,7 @@ def unlink_sentence():
     """Отвязывает предложение от группы."""
     logger.info(f"(Отвязка предложения) --------------------------------------------")
     logger.info(f"(Отвязка предложения) 🚀 Начинаю отвязывать предложение от группы")
-    data = request.get_json()
-    
-    sentence_id = data.get("sentence_id")
-    sentence_type = data.get("sentence_type")
-    related_id = data.get("related_id") 
-    group_id = data.get("group_id")
-    sentence_index = data.get("sentence_index")
-    logger.info(f"(Отвязка предложения) Получены данные для отвязки предложения: {data}")
-    
-    if not sentence_id or not related_id: 
-        logger.error(f"(Отвязка предложения) ❌ Не указаны необходимые данные для отвязки предложения от группы")
-        return jsonify({"status": "error", "message": "Не указаны необходимые данные для отвязки предложения от группы"}), 400
-    
-    if sentence_type == "head":
-        sentence_class = HeadSentence
-    elif sentence_type == "tail":
-        sentence_class = TailSentence
-    elif sentence_type == "body":
-        sentence_class = BodySentence
-    else:
-        logger.error(f"(Отвязка предложения) ❌ Неизвестный тип предложения")
-        return jsonify({"status": "error", "message": "Неизвестный тип предложения"}), 400
-    
-    sentence = sentence_class.get_by_id(sentence_id)
-    if not sentence:
-        logger.error(f"(Отвязка предложения) ❌ Предложение не найдено")
-        return jsonify({"status": "error", "message": "Предложение не найдено"}), 404
-    
-    new_sentence_data = {
-        "user_id": current_user.id,
-        "report_global_modality_id": sentence.report_global_modality_id,
-        "sentence": sentence.sentence,
-        "related_id": related_id,
-        "sentence_index": sentence_index if sentence_type == "head" else None,
-        "tags": sentence.tags,
-        "comment": sentence.comment,
-        "sentence_weight": None if sentence_type == "head" else sentence_index,
-        "unique": True,
-    }
-    try:
-        new_sentence, new_group = sentence_class.create(**new_sentence_data)
-        if sentence_type == "head":
-            new_sentence.body_sentence_group_id = sentence.body_sentence_group_id
-            db.session.commit()
-            logger.info(f"(Отвязка предложения) ✅ Успешно отвязано предложение с id={sentence.id} от группы")
-        # Так как данное предложение имеет другие связи, то метод не удалит его а только отвяжет от текущей группы
-        sentence_class.delete_sentence(sentence_id, group_id)
-    except Exception as e:
-        logger.error(f"(Отвязка предложения) ❌ Ошибка при создании нового предложения: {str(e)}")
-        return jsonify({"status": "error", "message": f"Ошибка при создании нового предложения: {str(e)}"}), 500
-    
-    logger.info(f"(Отвязка предложения) ✅ Предложение успешно отвязано от группы")
-    logger.info(f"(Отвязка предложения) --------------------------------------------")
-    return jsonify({"status": "success", "message": "Предложение успешно отвязано от группы"}), 200
+    return run_edit_operation("unlink_sentence", request.get_json())
 
 
 
@@ -831,30 +878,126 @@ def update_sentence_weight():
     """Обновляет вес предложения."""
     logger.info(f"(Обновление веса предложения) --------------------------------------------")
     logger.info(f"(Обновление веса предложения) 🚀 Начато обновление веса предложения")
-    data = request.json
-    sentence_id = data.get("sentence_id")
-    sentence_weight = data.get("sentence_weight")
-    group_id = data.get("group_id")
-    sentence_type = data.get("sentence_type")
-    
-    if not sentence_id or not sentence_weight or not group_id or not sentence_type:
-        logger.error(f"(Обновление веса предложения) ❌ Не указаны необходимые данные для обновления веса предложения")
-        return jsonify({"status": "error", "message": "Не указаны необходимые данные для обновления веса предложения"}), 400
-    
-    if sentence_type not in ["body", "tail"]:
-        logger.error(f"(Обновление веса предложения) ❌ Неподходящий тип предложения")
-        return jsonify({"status": "error", "message": "Неподходящий тип предложения"}), 400
+    return run_edit_operation("update_sentence_weight", request.json)
 
-    # Выбор модели по типу
-    sentence_class = {"body": BodySentence, "tail": TailSentence}.get(sentence_type)
-    logger.info(f"(Обновление веса предложения) Получены данные для обновления веса предложения: {data}")
-    
+
+@editing_report_bp.route('/apply_ops', methods=["POST"])
+@auth_required()
+def apply_ops():
+    """
+    Применяет пачку операций редактирования шаблона одним запросом: {"ops": [{"op": "update_sentence_text", ...}, ...]}.
+    Данные операций те же, что у отдельных маршрутов. Сначала проверяются все операции, затем они применяются
+    по порядку в одной транзакции: при ошибке откатывается вся пачка. В ответе — результат каждой операции.
+    """
+    logger.info(f"(Пачка операций /apply_ops) --------------------------------------------")
+    data = request.get_json(silent=True) or {}
+    ops = data.get("ops")
+    if not isinstance(ops, list) or not ops:
+        logger.error(f"(Пачка операций /apply_ops) ❌ Не переданы операции")
+        return jsonify({"status": "error", "message": "Не переданы операции"}), 400
+    if len(ops) > APPLY_OPS_LIMIT:
+        logger.error(f"(Пачка операций /apply_ops) ❌ Слишком много операций: {len(ops)}")
+        return jsonify({"status": "error", "message": f"Не больше {APPLY_OPS_LIMIT} операций за запрос"}), 400
+    logger.info(f"(Пачка операций /apply_ops) 🚀 Получено операций: {len(ops)}")
+
+    results = [{"index": index, "op": op.get("op") if isinstance(op, dict) else None, "status": "skipped"} for index, op in enumerate(ops)]
+
+    def failed(index, message, status_code, applied_status="skipped"):
+        for result in results[:index]:
+            result["status"] = applied_status
+        for result in results[index + 1:]:
+            result["status"] = "skipped"
+        results[index].update(status="error", message=message)
+        return jsonify({"status": "error", "message": f"Операция {index + 1} ({results[index]['op']}): {message}", "results": results}), status_code
+
+    # 1. Проверка всех операций до изменений в базе
+    prepared = []
+    for index, op in enumerate(ops):
+        if not isinstance(op, dict) or op.get("op") not in EDIT_OPERATIONS:
+            logger.error(f"(Пачка операций /apply_ops) ❌ Неизвестная операция №{index}: {op}")
+            return failed(index, "Неизвестная операция", 400)
+        operation = EDIT_OPERATIONS[op["op"]]
+        try:
+            prepared.append((operation, operation.prepare(op)))
+        except EditOperationError as e:
+            return failed(index, str(e), e.status_code)
+        results[index]["status"] = "valid"
+
+    # 2. Применение по порядку в одной транзакции
+    current = None
     try:
-        sentence_class.set_sentence_index_or_weight(sentence_id, group_id, new_weight=sentence_weight,)
-        logger.info(f"(Обновление веса предложения) ✅ Вес предложения успешно обновлен")
-        logger.info(f"(Обновление веса предложения) --------------------------------------------")
-        return jsonify({"status": "success", "message": "Вес предложения успешно обновлен."}), 200
-    
+        with unit_of_work("apply_ops"):
+            for current, (operation, params) in enumerate(prepared):
+                results[current].update(status="success", message=operation.success_message, **operation.apply(params))
+            current = None
+    except EditOperationError as e:
+        return failed(current, str(e), e.status_code, applied_status="rolled_back")
     except Exception as e:
-        logger.error(f"(Обновление веса предложения) ❌ Ошибка при обновлении веса предложения: {str(e)}")
-        return jsonify({"status": "error", "message": f"Ошибка обновления веса"}), 500
\ No newline at end of file
+        if current is None:
+            logger.error(f"(Пачка операций /apply_ops) ❌ Ошибка при сохранении пачки: {e}")
+            for result in results:
+                result["status"] = "rolled_back"
+            return jsonify({"status": "error", "message": f"Ошибка при сохранении изменений: {e}", "results": results}), 500
+        operation = prepared[current][0]
+        logger.error(f"(Пачка операций /apply_ops) ❌ Операция {current} ({results[current]['op']}): {operation.error_message}: {e}")
+        return failed(current, f"{operation.error_message}: {e}", 500, applied_status="rolled_back")
+
+    logger.info(f"(Пачка операций /apply_ops) ✅ Применено операций: {len(results)}")
+    logger.info(f"(Пачка операций /apply_ops) --------------------------------------------")
+    return jsonify({"status": "success", "message": f"Изменения сохранены ({len(results)})", "results": results}), 200
+
+
+@editing_report_bp.route('/duplicate_clusters', methods=["GET"])
+@auth_required()
+def duplicate_clusters():
+    """
+    Список кластеров почти одинаковых предложений текущего пользователя (их собирает задача
+    cluster_near_duplicates). Параметры: sentence_type, limit; суперадмин может передать user_id.
+    """
+    sentence_type = request.args.get("sentence_type")
+    if sentence_type and sentence_type not in SENTENCE_CLASSES:
+        return jsonify({"status": "error", "message": "Неизвестный тип предложения"}), 400
+    user_id = current_user.id
+    if current_user.has_role("superadmin") and request.args.get("user_id", type=int):
+        user_id = request.args.get("user_id", type=int)
+    limit = min(request.args.get("limit", 100, type=int), 500)
+    clusters = SentenceDuplicateCluster.find_by_user(user_id, sentence_type=sentence_type, limit=limit)
+    return jsonify({"status": "success", "clusters": [{
+        "id": cluster.id,
+        "sentence_type": cluster.sentence_type,
+        "report_global_modality_id": cluster.report_global_modality_id,
+        "size": len(cluster.sentence_ids),
+        "similarity": cluster.similarity,
+    } for cluster in clusters]}), 200
+
+
+@editing_report_bp.route('/duplicate_clusters/<int:cluster_id>', methods=["GET"])
+@auth_required()
+def preview_duplicate_cluster(cluster_id):
+    """Предпросмотр кластера: тексты предложений, число их групп и можно ли их слить."""
+    cluster = get_accessible_cluster(cluster_id)
+    if not cluster:
+        return jsonify({"status": "error", "message": "Кластер не найден"}), 404
+    return jsonify({"status": "success", "cluster": cluster.get_preview()}), 200
+
+
+@editing_report_bp.route('/duplicate_clusters/<int:cluster_id>/merge', methods=["POST"])
+@auth_required()
+def merge_duplicate_cluster(cluster_id):
+    """
+    Сливает предложения кластера в одно: {"keep_id": ID оставляемого предложения, "sentence_ids": [...]}.
+    Оба поля необязательны: по умолчанию остается представитель кластера и сливаются все предложения.
+    """
+    logger.info(f"(Слияние дублей) --------------------------------------------")
+    logger.info(f"(Слияние дублей) 🚀 Начато слияние кластера ID={cluster_id}")
+    cluster = get_accessible_cluster(cluster_id)
+    if not cluster:
+        logger.error(f"(Слияние дублей) ❌ Кластер ID={cluster_id} не найден")
+        return jsonify({"status": "error", "message": "Кластер не найден"}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        merged = cluster.merge(keep_id=data.get("keep_id"), sentence_ids=data.get("sentence_ids"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    logger.info(f"(Слияние дублей) ✅ Кластер ID={cluster_id}: удалено дублей {merged}")
+    return jsonify({"status": "success", "message": f"Удалено дублей: {merged}", "merged": merged}), 200
@@ -7,6 +7,7 @@ from itertools import chain
 from app.utils.sentence_processing import group_keywords, sort_key_words_group, process_keywords, check_existing_keywords
 from app.utils.common import ensure_list
 from app.utils.db_processing import add_keywords_to_db
+from app.utils.redis_client import bump_user_settings_version, bump_keywords_version
 from flask_security.decorators import auth_required
 
 key_words_bp = Blueprint("key_words", __name__)
@@ -72,6 +73,7 @@ def add_keywords():
     
     # Добавляем ключевые слова в базу данных
     add_keywords_to_db(key_words, report_ids)
+    bump_user_settings_version(current_user.id)  # ключевые слова входят в ETag страницы протокола
 
     return {"status": "success"}, 200
 
@@ -111,6 +113,7 @@ def add_word_to_exist_group():
             reports=reports
         )
     db.session.commit()
+    bump_user_settings_version(current_user.id)
 
     return {"status": "success", "message": "Keywords added successfully"}, 200
 
@@ -128,6 +131,8 @@ def delete_keywords():
     # Удаление всех ключевых слов с данным group_index для текущего пользователя
     KeyWord.query.filter_by(group_index=group_index, profile_id=profile_id).delete()
     db.session.commit()
+    bump_user_settings_version(current_user.id)
+    bump_keywords_version(profile_id)
 
     return jsonify({"status": "success", "message": "Keywords group deleted successfully"}), 200
 
@@ -161,6 +166,7 @@ def unlink_keyword_from_report():
 
 
     db.session.commit()
+    bump_user_settings_version(current_user.id)
 
     return jsonify({"status": "success", "message": "Keywords unlinked from report successfully"}), 200
 
@@ -190,5 +196,6 @@ def edit_keywords():
                 keyword_entry.key_word = key_word
 
     db.session.commit()
+    bump_user_settings_version(current_user.id)
 
     return jsonify({"status": "success", "message": "Keywords updated successfully"}), 200
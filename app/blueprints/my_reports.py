@@ -15,8 +15,13 @@ def reports_list():
     profile_id = session.get("profile_id")
     user_id = current_user.id if current_user.is_authenticated else None
     # Initialize config variables
-    all_reports_obj = Report.find_by_profile(profile_id, user_id=user_id)
-    profile_reports = [Report.get_report_info(report.id) for report in all_reports_obj] if all_reports_obj else []
+    # Один запрос на весь список вместе с названиями категорий
+    profile_reports = Report.list_with_categories(
+        profile_id,
+        user_id=user_id,
+        after_id=request.args.get("after_id", type=int),
+        limit=request.args.get("limit", type=int),
+    )
     return render_template("my_reports.html",
                            title="Список протоколов текущего профиля",
                            profile_reports=profile_reports,
@@ -27,7 +32,7 @@ def reports_list():
 @auth_required()
 def delete_report(report_id):
     try:
-        Report.delete_by_id(report_id)
+        Report.delete_report(report_id)
     except Exception as e:
         logger.error(f"Error deleting report: {str(e)}")
         return jsonify({"status": "error", "message": "Ошибка при удалении записи"}), 500
@@ -16,6 +16,7 @@ import json
 from app.utils.redis_client import redis_set
 from celery.result import AsyncResult
 from app.utils.redis_client import redis_get
+from app.utils.unit_of_work import unit_of_work
 
 new_report_creation_bp = Blueprint('new_report_creation', __name__)
 
@@ -34,68 +35,70 @@ def create_report_from_existing(report_name, category_2_id, comment, report_side
     user_id = current_user.id
     profile_id = session.get("profile_id")
     
-    new_report = Report.create(
-        profile_id=profile_id,
-        category_1_id=cat_1_id,
-        category_2_id=category_2_id,
-        global_category_id=global_cat_id,
-        report_name=report_name,
-        user_id=user_id,
-        comment=comment,
-        public=False,
-        report_side=report_side
-    )
-
-    paragraph_index = 0
-    impression_exist = []
-
-    for report_id in selected_reports:
-        existing_report = Report.query.get(report_id)
-        if not existing_report:
-            raise ValueError(f"Протокол с ID {report_id} не найден")
-
-        sorted_paragraphs = sorted(existing_report.report_to_paragraphs, key=lambda p: p.paragraph_index)
-
-        for paragraph in sorted_paragraphs:
-            if paragraph.is_impression:
-                if not impression_exist:
-                    impression_exist.append(paragraph)
-                continue
+    # Протокол и все его параграфы создаются одной транзакцией
+    with unit_of_work("create_report_from_existing"):
+        new_report = Report.create(
+            profile_id=profile_id,
+            category_1_id=cat_1_id,
+            category_2_id=category_2_id,
+            global_category_id=global_cat_id,
+            report_name=report_name,
+            user_id=user_id,
+            comment=comment,
+            public=False,
+            report_side=report_side
+        )
 
+        paragraph_index = 0
+        impression_exist = []
+
+        for report_id in selected_reports:
+            existing_report = Report.query.get(report_id)
+            if not existing_report:
+                raise ValueError(f"Протокол с ID {report_id} не найден")
+
+            sorted_paragraphs = sorted(existing_report.report_to_paragraphs, key=lambda p: p.paragraph_index)
+
+            for paragraph in sorted_paragraphs:
+                if paragraph.is_impression:
+                    if not impression_exist:
+                        impression_exist.append(paragraph)
+                    continue
+
+                Paragraph.create(
+                    report_id=new_report.id,
+                    paragraph_index=paragraph_index,
+                    paragraph=paragraph.paragraph,
+                    paragraph_visible=paragraph.paragraph_visible,
+                    title_paragraph=paragraph.title_paragraph,
+                    bold_paragraph=paragraph.bold_paragraph,
+                    head_sentence_group_id=paragraph.head_sentence_group_id or None,
+                    tail_sentence_group_id=paragraph.tail_sentence_group_id or None,
+                    is_impression=False,
+                    is_additional=paragraph.is_additional,
+                    str_after=paragraph.str_after,
+                    str_before=paragraph.str_before,
+                    is_active=paragraph.is_active,
+                
+                )
+                paragraph_index += 1
+
+        for paragraph in impression_exist:
             Paragraph.create(
                 report_id=new_report.id,
                 paragraph_index=paragraph_index,
                 paragraph=paragraph.paragraph,
+                is_impression=True,
                 paragraph_visible=paragraph.paragraph_visible,
                 title_paragraph=paragraph.title_paragraph,
                 bold_paragraph=paragraph.bold_paragraph,
                 head_sentence_group_id=paragraph.head_sentence_group_id or None,
                 tail_sentence_group_id=paragraph.tail_sentence_group_id or None,
-                is_impression=False,
-                is_additional=paragraph.is_additional,
+                is_additional=False,
+                is_active=paragraph.is_active,
                 str_after=paragraph.str_after,
                 str_before=paragraph.str_before,
-                is_active=paragraph.is_active,
-                
             )
-            paragraph_index += 1
-
-    for paragraph in impression_exist:
-        Paragraph.create(
-            report_id=new_report.id,
-            paragraph_index=paragraph_index,
-            paragraph=paragraph.paragraph,
-            is_impression=True,
-            paragraph_visible=paragraph.paragraph_visible,
-            title_paragraph=paragraph.title_paragraph,
-            bold_paragraph=paragraph.bold_paragraph,
-            head_sentence_group_id=paragraph.head_sentence_group_id or None,
-            tail_sentence_group_id=paragraph.tail_sentence_group_id or None,
-            is_additional=False,
-            is_active=paragraph.is_active,
-            str_after=paragraph.str_after,
-            str_before=paragraph.str_before,
-        )
 
     return new_report
 
@@ -354,57 +357,49 @@ def create_report_from_file():
                 paragraphs_from_file = extract_paragraphs_and_sentences(filepath)
                 public = False
                 # Создаем новый отчет
-                new_report = Report.create(
-                        profile_id=profile_id,
-                        category_1_id=cat_1_id,
-                        category_2_id=category_2_id,
-                        global_category_id=global_cat_id,
-                        report_name=report_name,
-                        user_id=current_user.id,
-                        comment=comment,
-                        public=public,
-                        report_side=report_side
-                    )
+                # Протокол, параграфы и предложения из файла создаются одной транзакцией
+                with unit_of_work("create_report_from_file"):
+                    new_report = Report.create(
+                            profile_id=profile_id,
+                            category_1_id=cat_1_id,
+                            category_2_id=category_2_id,
+                            global_category_id=global_cat_id,
+                            report_name=report_name,
+                            user_id=current_user.id,
+                            comment=comment,
+                            public=public,
+                            report_side=report_side
+                        )
 
-                # Добавляем абзацы и предложения в отчет
-                for idx, paragraph in enumerate(paragraphs_from_file, start=1):
+                    # Добавляем абзацы и предложения в отчет
+                    for idx, paragraph in enumerate(paragraphs_from_file, start=1):
 
-                    # Создаем новый параграф
-                    new_paragraph = Paragraph.create(
-                        report_id=new_report.id,
-                        paragraph_index=idx,
-                        paragraph=paragraph['title']
-                    )
+                        # Создаем новый параграф
+                        new_paragraph = Paragraph.create(
+                            report_id=new_report.id,
+                            paragraph_index=idx,
+                            paragraph=paragraph['title']
+                        )
 
-                    # Обрабатываем предложения
-                    for sentence_index, sentence_data in enumerate(paragraph['sentences'], start=1):
-                        if isinstance(sentence_data, list):
-                            for weight, split_sentence in enumerate(sentence_data, start=1):
-                                if weight == 1:
-                                    new_head_sentence, _ = HeadSentence.create(
-                                        user_id=user_id,
-                                        report_global_modality_id=cat_1_id,
-                                        sentence=split_sentence.strip(),
-                                        related_id=new_paragraph.id,
-                                        sentence_index=sentence_index
-                                    )
-                                
-                                else:
-                                    BodySentence.create(
-                                        user_id=user_id,
-                                        report_global_modality_id=cat_1_id,
-                                        sentence=split_sentence.strip(),
-                                        related_id=new_head_sentence.id,
-                                        sentence_index=sentence_index
-                                    )
-                        else:
-                            HeadSentence.create(
-                                user_id=user_id,
-                                report_global_modality_id=cat_1_id,
-                                sentence=sentence_data.strip(),
-                                related_id=new_paragraph.id,
-                                sentence_index=sentence_index
-                            )
+                        # Обрабатываем предложения: первое из разделенных — head, остальные — его body.
+                        # Все head предложения параграфа создаются одной пачкой, body — пачкой на каждое head
+                        head_items = []
+                        body_texts_by_head = []
+                        for sentence_index, sentence_data in enumerate(paragraph['sentences'], start=1):
+                            split_sentences = sentence_data if isinstance(sentence_data, list) else [sentence_data]
+                            if not split_sentences:
+                                continue
+                            head_items.append({"sentence": split_sentences[0].strip(), "sentence_index": sentence_index})
+                            body_texts_by_head.append([split_sentence.strip() for split_sentence in split_sentences[1:]])
+                        if not head_items:
+                            continue
+
+                        head_group = HeadSentence.get_or_create_related_group(new_paragraph.id)
+                        head_sentence_ids = HeadSentence.bulk_create(head_items, head_group.id, user_id=user_id, report_global_modality_id=cat_1_id)
+                        for head_sentence_id, body_texts in zip(head_sentence_ids, body_texts_by_head):
+                            if body_texts:
+                                body_group = BodySentence.get_or_create_related_group(head_sentence_id)
+                                BodySentence.bulk_create([{"sentence": text} for text in body_texts], body_group.id, user_id=user_id, report_global_modality_id=cat_1_id)
 
                 # Удаляем временную папку после успешной обработки
                 if os.path.exists(user_temp_folder):
@@ -501,45 +496,46 @@ def create_report_from_public_route():
             logger.error("(Маршрут: создание протокола из публичного) ❌ Выбранный протокол не является общедоступным")
             return jsonify({"status": "error", "message": "Выбранный протокол не является общедоступным"}), 400
 
-        new_report = Report.create(
-            profile_id=profile_id,
-            category_1_id=cat_1_id,
-            category_2_id=category_2_id,
-            global_category_id=global_cat_id,
-            report_name=report_name,
-            user_id=current_user.id,
-            comment=comment,
-            public=False,
-            report_side=report_side
-        )
-
-        for paragraph in public_report.report_to_paragraphs:
-            sentences = HeadSentenceGroup.get_group_sentences(paragraph.head_sentence_group_id)
-            new_paragraph = Paragraph.create(
-                report_id=new_report.id,
-                paragraph_index=paragraph.paragraph_index,
-                paragraph=paragraph.paragraph,
-                paragraph_visible=paragraph.paragraph_visible,
-                title_paragraph=paragraph.title_paragraph,
-                bold_paragraph=paragraph.bold_paragraph,
-                head_sentence_group_id=None,
-                tail_sentence_group_id=None,
-                is_impression=paragraph.is_impression,
-                is_additional=paragraph.is_additional,
-                str_after=paragraph.str_after,
-                str_before=paragraph.str_before,
-                is_active=paragraph.is_active
+        with unit_of_work("create_report_from_public_route"):
+            new_report = Report.create(
+                profile_id=profile_id,
+                category_1_id=cat_1_id,
+                category_2_id=category_2_id,
+                global_category_id=global_cat_id,
+                report_name=report_name,
+                user_id=current_user.id,
+                comment=comment,
+                public=False,
+                report_side=report_side
             )
-            for s in sentences:
-                HeadSentence.create(
-                    user_id=current_user.id,
-                    report_global_modality_id=global_cat_id,
-                    sentence=s["sentence"],
-                    related_id=new_paragraph.id,
-                    sentence_index=s["sentence_index"],
-                    tags=s["tags"],
-                    comment=s["comment"]
+
+            for paragraph in public_report.report_to_paragraphs:
+                sentences = HeadSentenceGroup.get_group_sentences(paragraph.head_sentence_group_id)
+                new_paragraph = Paragraph.create(
+                    report_id=new_report.id,
+                    paragraph_index=paragraph.paragraph_index,
+                    paragraph=paragraph.paragraph,
+                    paragraph_visible=paragraph.paragraph_visible,
+                    title_paragraph=paragraph.title_paragraph,
+                    bold_paragraph=paragraph.bold_paragraph,
+                    head_sentence_group_id=None,
+                    tail_sentence_group_id=None,
+                    is_impression=paragraph.is_impression,
+                    is_additional=paragraph.is_additional,
+                    str_after=paragraph.str_after,
+                    str_before=paragraph.str_before,
+                    is_active=paragraph.is_active
                 )
+                for s in sentences:
+                    HeadSentence.create(
+                        user_id=current_user.id,
+                        report_global_modality_id=global_cat_id,
+                        sentence=s["sentence"],
+                        related_id=new_paragraph.id,
+                        sentence_index=s["sentence_index"],
+                        tags=s["tags"],
+                        comment=s["comment"]
+                    )
         logger.info("(Маршрут: создание протокола из публичного) ✅ Протокол успешно создан")
         return jsonify({"status": "success", "message": "Протокол успешно создан", "report_id": new_report.id}), 200
 
@@ -577,76 +573,64 @@ def create_report_from_shared_route():
 
         shared_report = shared_record.report
         
-        new_report = Report.create(
-            profile_id=profile_id,
-            category_1_id=cat_1_id,
-            category_2_id=category_2_id,
-            global_category_id=global_cat_id,
-            report_name=report_name,
-            user_id=current_user.id,
-            comment=comment,
-            public=False,
-            report_side=report_side
-        )
-
-        for paragraph in shared_report.report_to_paragraphs:
-            head_sentences = HeadSentenceGroup.get_group_sentences(paragraph.head_sentence_group_id)
-            new_paragraph = Paragraph.create(
-                report_id=new_report.id,
-                paragraph_index=paragraph.paragraph_index,
-                paragraph=paragraph.paragraph,
-                paragraph_visible=paragraph.paragraph_visible,
-                title_paragraph=paragraph.title_paragraph,
-                bold_paragraph=paragraph.bold_paragraph,
-                head_sentence_group_id=None,
-                tail_sentence_group_id=None,
-                is_impression=paragraph.is_impression,
-                is_additional=paragraph.is_additional,
-                str_after=paragraph.str_after,
-                str_before=paragraph.str_before,
-                is_active=paragraph.is_active
+        with unit_of_work("create_report_from_shared_route"):
+            new_report = Report.create(
+                profile_id=profile_id,
+                category_1_id=cat_1_id,
+                category_2_id=category_2_id,
+                global_category_id=global_cat_id,
+                report_name=report_name,
+                user_id=current_user.id,
+                comment=comment,
+                public=False,
+                report_side=report_side
             )
-            for hs in head_sentences:
-                new_hs, _ = HeadSentence.create(
-                    user_id=current_user.id,
-                    report_global_modality_id=global_cat_id,
-                    sentence=hs["sentence"],
-                    related_id=new_paragraph.id,
-                    sentence_index=hs["sentence_index"],
-                    tags=hs["tags"],
-                    comment=hs["comment"]
+
+            for paragraph in shared_report.report_to_paragraphs:
+                head_sentences = HeadSentenceGroup.get_group_sentences(paragraph.head_sentence_group_id)
+                new_paragraph = Paragraph.create(
+                    report_id=new_report.id,
+                    paragraph_index=paragraph.paragraph_index,
+                    paragraph=paragraph.paragraph,
+                    paragraph_visible=paragraph.paragraph_visible,
+                    title_paragraph=paragraph.title_paragraph,
+                    bold_paragraph=paragraph.bold_paragraph,
+                    head_sentence_group_id=None,
+                    tail_sentence_group_id=None,
+                    is_impression=paragraph.is_impression,
+                    is_additional=paragraph.is_additional,
+                    str_after=paragraph.str_after,
+                    str_before=paragraph.str_before,
+                    is_active=paragraph.is_active
                 )
-                if hs["body_sentence_group_id"]:
-                    logger.info(f"(!!!!!!!!!!!!!!!!!!!!!) У данного предложения есть группа body предложений. ID группы: {hs['body_sentence_group_id']}")
-                    body_sentences = BodySentenceGroup.get_group_sentences(hs["body_sentence_group_id"])
-                    logger.info(f"(!!!!!!!!!!!!!!!!!!!!!) Количество предложений в группе: {len(body_sentences)} и ниже они перечисленны: {body_sentences[:deep_limit]}")
-                    for bs in body_sentences[:deep_limit]: 
-                        logger.info(f"(!!!!!!!!!!!!!!!!!!!!!!) родительское предложение для данного имеет ID: {hs['id']}")
-                        BodySentence.create(
-                            user_id=current_user.id,
-                            report_global_modality_id=global_cat_id,
-                            sentence=bs["sentence"],
-                            related_id=new_hs.id,
-                            sentence_weight=bs["sentence_weight"],
-                            tags=bs["tags"],
-                            comment=bs["comment"]
-                        )
-            if paragraph.tail_sentence_group_id:
-                tail_sentences = TailSentenceGroup.get_group_sentences(paragraph.tail_sentence_group_id)
-                for ts in tail_sentences[:deep_limit]:
-                    TailSentence.create(
-                        user_id=current_user.id,
-                        report_global_modality_id=global_cat_id,
-                        sentence=ts["sentence"],
-                        related_id=new_paragraph.id,
-                        sentence_weight=ts["sentence_weight"],
-                        tags=ts["tags"],
-                        comment=ts["comment"]
+                if head_sentences:
+                    head_group = HeadSentence.get_or_create_related_group(new_paragraph.id)
+                    new_head_ids = HeadSentence.bulk_create(
+                        [{"sentence": hs["sentence"], "sentence_index": hs["sentence_index"], "tags": hs["tags"], "comment": hs["comment"]} for hs in head_sentences],
+                        head_group.id, user_id=current_user.id, report_global_modality_id=global_cat_id,
                     )
-                    logger.info(f"(!!!!!!!!!!!!!!!!!!!!!) Количество предложений в группе: {len(tail_sentences)} и ниже они перечисленны: {tail_sentences[:deep_limit]}")
+                    for hs, new_hs_id in zip(head_sentences, new_head_ids):
+                        if not hs["body_sentence_group_id"]:
+                            continue
+                        body_sentences = hs["body_sentences"][:deep_limit]
+                        logger.debug(f"(Маршрут: создание протокола из shared) Копирую {len(body_sentences)} body предложений из группы {hs['body_sentence_group_id']} для head предложения {new_hs_id}")
+                        if body_sentences:
+                            body_group = BodySentence.get_or_create_related_group(new_hs_id)
+                            BodySentence.bulk_create(
+                                [{"sentence": bs["sentence"], "sentence_weight": bs["sentence_weight"], "tags": bs["tags"], "comment": bs["comment"]} for bs in body_sentences],
+                                body_group.id, user_id=current_user.id, report_global_modality_id=global_cat_id,
+                            )
+                if paragraph.tail_sentence_group_id:
+                    tail_sentences = TailSentenceGroup.get_group_sentences(paragraph.tail_sentence_group_id)[:deep_limit]
+                    if tail_sentences:
+                        tail_group = TailSentence.get_or_create_related_group(new_paragraph.id)
+                        TailSentence.bulk_create(
+                            [{"sentence": ts["sentence"], "sentence_weight": ts["sentence_weight"], "tags": ts["tags"], "comment": ts["comment"]} for ts in tail_sentences],
+                            tail_group.id, user_id=current_user.id, report_global_modality_id=global_cat_id,
+                        )
 
-        logger.info("(Маршрут: создание протокола из расшаренного) ✅ Протокол успешно создан")
-        shared_record.delete()  
+            logger.info("(Маршрут: создание протокола из расшаренного) ✅ Протокол успешно создан")
+            shared_record.delete()  
         return jsonify({"status": "success", "message": "Протокол успешно создан", "report_id": new_report.id}), 200
 
     except Exception as e:
@@ -795,18 +779,15 @@ def get_ai_generated_template():
                 paragraph_index=idx,
                 paragraph=paragraph['paragraph'],
             )
+            head_items = []
             for sentence_index, sentence_data in enumerate(sentences, start=1):
                 if isinstance(sentence_data, str):
-                    HeadSentence.create(
-                        user_id=user_id,
-                        report_global_modality_id=global_category_id,
-                        sentence=sentence_data.strip(),
-                        related_id=new_paragraph.id,
-                        sentence_index=sentence_index
-                    )
+                    head_items.append({"sentence": sentence_data.strip(), "sentence_index": sentence_index})
                 else:
                     logger.warning(f"(Маршрут: get_ai_generated_template) ⚠️ Неожиданный формат предложения: {sentence_data}")
-                    pass
+            if head_items:
+                head_group = HeadSentence.get_or_create_related_group(new_paragraph.id)
+                HeadSentence.bulk_create(head_items, head_group.id, user_id=user_id, report_global_modality_id=global_category_id)
         logger.info(f"(Маршрут: get_ai_generated_template) ✅ Шаблон протокола успешно создан. ID: {new_report.id}")
         return jsonify({"status": "success", 
                         "message": "Шаблон протокола успешно создан", 
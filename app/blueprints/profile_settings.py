@@ -9,6 +9,7 @@ from app.utils.file_processing import sync_profile_files
 from app.utils.db_processing import sync_modalities_from_db
 from app.utils.logger import logger
 from app.utils.redis_client import invalidate_user_settings_cache, invalidate_profiles_cache
+from app.utils.unit_of_work import unit_of_work
 from app.utils.profile_constructor import ProfileSettingsManager
 
 profile_settings_bp = Blueprint('profile_settings', __name__)
@@ -189,98 +190,88 @@ def create_profile():
     if not other_profiles:
         is_default = True  # Первый профиль всегда по умолчанию
         logger.info(f"(route 'create_profile') This is the first profile for user {current_user.id}, setting as default.")
-    if existing_profile_id:
-        try:
-            logger.info(f"(route 'create_profile') Попытка получить профиль из базы по id: {existing_profile_id}")
-            profile = UserProfile.find_by_id_and_user(existing_profile_id, current_user.id)
-        except Exception as e:
-            logger.error(f"(route 'create_profile') ❌ Не удалось получить существующий профиль из базы: {str(e)}")
-            return jsonify({"status": "error", "message": str(e)}), 400
-    else:
-        logger.info(f"(route 'create_profile') Создаем новый профиль для пользователя {current_user.id}")
-        try:
-            profile = UserProfile.create(
-                current_user.id,
-                profile_name,
-                description,
-                default_profile=is_default
-            )
-        except Exception as e:
-            logger.error(f"(route 'create_profile') ❌ Ошибка при создании нового профиля: {str(e)}")
-            return jsonify({"status": "error", "message": str(e)}), 400
-
     try:
-        # --- Добавляем модальности и области профиля ---
-        logger.info(f"(route 'create_profile') Начинаем добавление модальностей и областей исследования в профиль {profile.profile_name}")
-        for modality_id in modalities:
-            selected_modality = ReportCategory.query.get(int(modality_id))
-            if not selected_modality:
-                logger.warning(f"(route 'create_profile') Модальность с id={modality_id} не найдена в базе данных.")
-                continue
-            global_modality = None
-            if selected_modality.is_global:
-                global_modality = selected_modality
-                logger.info(f"(route 'create_profile') Модальность {selected_modality.name} действительно глобальная, продолжаем")
+        # Профиль, его категории и настройки создаются одной транзакцией: при ошибке ничего не остается в базе
+        with unit_of_work("route 'create_profile'"):
+            if existing_profile_id:
+                logger.info(f"(route 'create_profile') Попытка получить профиль из базы по id: {existing_profile_id}")
+                profile = UserProfile.find_by_id_and_user(existing_profile_id, current_user.id)
             else:
-                global_modality = ReportCategory.query.get(int(selected_modality.global_id)) if selected_modality.global_id else None
-                logger.info(f"(route 'create_profile') Модальность {global_modality.name} не глобальная, ищем глобальную модальность по ее global_id: {global_modality.global_id}")
-            
-            modality_cat = ReportCategory.add_category(
-                name=selected_modality.name,
-                parent_id=None,
-                profile_id=profile.id,
-                is_global=False,
-                level=1,
-                global_id=global_modality.id 
-            )
-
-            # Добавляем области исследования для этой модальности
-            area_ids = areas.get(str(modality_id), [])
-            for area_id in area_ids:
-                # child-область только среди детей выбранной модальности
-                child_area = next((child for child in selected_modality.children if str(child.id) == str(area_id)), None)
-                if not child_area:
-                    logger.warning(f"(route 'create_profile') Область id={area_id} не найдена в модальности id={modality_id}.")
+                logger.info(f"(route 'create_profile') Создаем новый профиль для пользователя {current_user.id}")
+                profile = UserProfile.create(
+                    current_user.id,
+                    profile_name,
+                    description,
+                    default_profile=is_default
+                )
+
+            # --- Добавляем модальности и области профиля ---
+            logger.info(f"(route 'create_profile') Начинаем добавление модальностей и областей исследования в профиль {profile.profile_name}")
+            for modality_id in modalities:
+                selected_modality = ReportCategory.query.get(int(modality_id))
+                if not selected_modality:
+                    logger.warning(f"(route 'create_profile') Модальность с id={modality_id} не найдена в базе данных.")
                     continue
-                global_area = None
-                if child_area.is_global:
-                    global_area = child_area
-                    logger.info(f"(route 'create_profile') Область {child_area.name} действительно глобальная, продолжаем")
+                global_modality = None
+                if selected_modality.is_global:
+                    global_modality = selected_modality
+                    logger.info(f"(route 'create_profile') Модальность {selected_modality.name} действительно глобальная, продолжаем")
                 else:
-                    global_area = ReportCategory.query.get(int(child_area.global_id)) if child_area.global_id else None
-                    logger.info(f"(route 'create_profile') Область {child_area.name} не глобальная, ищем глобальную область по ее global_id: {child_area.global_id}")
-                area_cat = ReportCategory.add_category(
-                    name=child_area.name,
-                    parent_id=modality_cat.id,
+                    global_modality = ReportCategory.query.get(int(selected_modality.global_id)) if selected_modality.global_id else None
+                    logger.info(f"(route 'create_profile') Модальность {global_modality.name} не глобальная, ищем глобальную модальность по ее global_id: {global_modality.global_id}")
+                
+                modality_cat = ReportCategory.add_category(
+                    name=selected_modality.name,
+                    parent_id=None,
                     profile_id=profile.id,
                     is_global=False,
-                    level=2,
-                    global_id=global_area.id 
+                    level=1,
+                    global_id=global_modality.id 
                 )
 
-        logger.info(f"(route 'create_profile') Profile {profile.id} created and {len(modalities)} modalities with their areas added successfully")
-        try:
+                # Добавляем области исследования для этой модальности
+                area_ids = areas.get(str(modality_id), [])
+                for area_id in area_ids:
+                    # child-область только среди детей выбранной модальности
+                    child_area = next((child for child in selected_modality.children if str(child.id) == str(area_id)), None)
+                    if not child_area:
+                        logger.warning(f"(route 'create_profile') Область id={area_id} не найдена в модальности id={modality_id}.")
+                        continue
+                    global_area = None
+                    if child_area.is_global:
+                        global_area = child_area
+                        logger.info(f"(route 'create_profile') Область {child_area.name} действительно глобальная, продолжаем")
+                    else:
+                        global_area = ReportCategory.query.get(int(child_area.global_id)) if child_area.global_id else None
+                        logger.info(f"(route 'create_profile') Область {child_area.name} не глобальная, ищем глобальную область по ее global_id: {child_area.global_id}")
+                    area_cat = ReportCategory.add_category(
+                        name=child_area.name,
+                        parent_id=modality_cat.id,
+                        profile_id=profile.id,
+                        is_global=False,
+                        level=2,
+                        global_id=global_area.id 
+                    )
+
+            logger.info(f"(route 'create_profile') Profile {profile.id} created and {len(modalities)} modalities with their areas added successfully")
             default_settings = dict(current_app.config.get("DEFAULT_PROFILE_SETTINGS", {}))
             save_settings = set_profile_settings(profile.id, default_settings)
             if not save_settings:
                 logger.error(f"(route 'create_profile') ❌ Не удалось сохранить настройки профиля {profile.id}")
-                return jsonify({"status": "error", "message": "Не удалось сохранить настройки профиля"}), 400
+                raise ValueError("Не удалось сохранить настройки профиля")
             success = sync_modalities_from_db(profile.id)
             if not success:
                 logger.error(f"(route 'create_profile') ❌ Error syncing modalities for profile {profile.id}")
-            session["profile_id"] = profile.id  # Сохраняем id нового профиля в сессии
-            session["profile_name"] = profile.profile_name  # Сохраняем имя профиля в сессии
-        except Exception as e:
-            logger.error(f"(route 'create_profile') ❌ Error adding settings for this profile: {str(e)}")
-            return jsonify({"status": "error", "message": str(e)}), 400
-
-        invalidate_profiles_cache(current_user.id)  # стираю кэш профилей пользователя из redis
-        logger.info(f"(route 'create_profile') ✅ Профиль {profile.profile_name} успешно создан!")
-        return jsonify({"status": "success", "message": f"Профиль {profile.profile_name} успешно создан!", "data": profile.id}), 200
 
     except Exception as e:
-        logger.error(f"(route 'create_profile') ❌ Ошибка при добавлении модальностей и областей исследования: {str(e)}")
+        logger.error(f"(route 'create_profile') ❌ Ошибка при создании профиля: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 400
+
+    session["profile_id"] = profile.id  # Сохраняем id нового профиля в сессии
+    session["profile_name"] = profile.profile_name  # Сохраняем имя профиля в сессии
+    invalidate_profiles_cache(current_user.id)  # стираю кэш профилей пользователя из redis
+    logger.info(f"(route 'create_profile') ✅ Профиль {profile.profile_name} успешно создан!")
+    return jsonify({"status": "success", "message": f"Профиль {profile.profile_name} успешно создан!", "data": profile.id}), 200
         
     
     
@@ -446,6 +437,7 @@ def category_update():
         # Синхронизируем категории в AppConfig c ReportCategory
         success = sync_modalities_from_db(profile_id)
         invalidate_user_settings_cache(current_user.id)  # стираю кэш настроек пользователя из redis
+        Report.invalidate_list_cache(profile_id)  # в кэше списка протоколов лежат названия модальностей и областей
         if not success:
             logger.error(f"Error syncing modalities from DB after updating category {category_id}")
             return jsonify({"status": "error", "message": "Ошибка синхронизации модальностей после обновления категории"}), 500
@@ -477,6 +469,7 @@ def category_delete():
         # Синхронизируем категории в AppConfig c ReportCategory
         success = sync_modalities_from_db(profile_id)
         invalidate_user_settings_cache(current_user.id)  # стираю кэш настроек пользователя из redis
+        Report.invalidate_list_cache(profile_id)  # в кэше списка протоколов лежат названия модальностей и областей
         if not success:
             logger.error(f"Error syncing modalities from DB after updating category {category_id}")
             return jsonify({"status": "error", "message": "Ошибка синхронизации модальностей после обновления категории"}), 500
@@ -524,6 +517,7 @@ def category_create():
         if cat:
             logger.info(f"(route 'category_create') ✅ Category {cat.id} created successfully with name: {name} and global_id: {global_id}")
             invalidate_user_settings_cache(current_user.id)  # стираю кэш настроек пользователя из redis
+            Report.invalidate_list_cache(profile_id)  # в кэше списка протоколов лежат названия модальностей и областей
             success = sync_modalities_from_db(profile_id)
             if not success:
                 logger.error(f"(route 'category_create') ❌ Error syncing modalities from DB after creating category {cat.id}")
@@ -1,9 +1,10 @@
 #working_with_reports.py
 
-from flask import Blueprint, render_template, request, jsonify, current_app, session
+import copy
+from flask import Blueprint, render_template, request, jsonify, current_app, session, get_template_attribute
 from flask_security import current_user
 from celery.result import AsyncResult
-from app.models.models import Report, KeyWord, TailSentence, BodySentence, ReportTextSnapshot
+from app.models.models import Report, KeyWord, TailSentence, BodySentence, BodySentenceGroup, ReportTextSnapshot
 from app.utils.sentence_processing import (group_keywords, 
                                            split_sentences_if_needed, 
                                            clean_and_normalize_text, 
@@ -14,8 +15,11 @@ from app.utils.sentence_processing import (group_keywords,
                                            merge_ai_response_into_skeleton, 
                                            get_sentences_from_report_for_ai,
                                            build_soft_paragraphs,
+                                           get_keyword_matcher,
+                                           get_profile_except_words,
                                            )
 from app.utils.common import ensure_list
+from app.utils.decorators import report_etag
 from app.utils.logger import logger
 from flask_security.decorators import auth_required
 from tasks.celery_tasks import async_analyze_dynamics, async_reversed_analyze_dynamics
@@ -26,6 +30,49 @@ working_with_reports_bp = Blueprint('working_with_reports', __name__)
 
 # Functions
 
+def render_paragraph_fragments(paragraphs, paragraph_ids=None):
+    """
+    Отрисовывает параграфы протокола отдельными HTML фрагментами через макрос
+    partials/report_paragraph.html — без base.html и контекстных процессоров.
+
+    Args:
+        paragraphs (list[dict]): Параграфы в формате get_report_paragraphs.
+        paragraph_ids (set[int], optional): Какие параграфы отрисовать. По умолчанию — все.
+
+    Returns:
+        dict: {paragraph_id: html}
+    """
+    report_paragraph = get_template_attribute("partials/report_paragraph.html", "report_paragraph")
+    return {
+        paragraph["id"]: str(report_paragraph(paragraph))
+        for paragraph in paragraphs
+        if paragraph_ids is None or paragraph["id"] in paragraph_ids
+    }
+
+
+def build_paragraphs_delta(old_paragraphs, new_paragraphs):
+    """
+    Собирает ответ для частичного обновления страницы протокола: порядок параграфов,
+    данные и HTML только изменившихся параграфов и список неактивных параграфов.
+
+    Args:
+        old_paragraphs (list[dict]): Параграфы, по которым была отрисована страница.
+        new_paragraphs (list[dict]): Параграфы после трансформации.
+
+    Returns:
+        dict: {"paragraph_order", "changed_paragraphs", "paragraphs_html", "inactive_paragraphs_html"}
+    """
+    old_by_id = {paragraph["id"]: paragraph for paragraph in old_paragraphs}
+    changed_paragraphs = [paragraph for paragraph in new_paragraphs if old_by_id.get(paragraph["id"]) != paragraph]
+    changed_ids = {paragraph["id"] for paragraph in changed_paragraphs}
+    inactive_paragraph_item = get_template_attribute("partials/report_paragraph.html", "inactive_paragraph_item")
+    return {
+        "paragraph_order": [paragraph["id"] for paragraph in new_paragraphs],
+        "changed_paragraphs": changed_paragraphs,
+        "paragraphs_html": render_paragraph_fragments(new_paragraphs, changed_ids),
+        "inactive_paragraphs_html": "".join(str(inactive_paragraph_item(paragraph)) for paragraph in new_paragraphs if not paragraph.get("is_active", True)),
+    }
+
 # Routes
 
 @working_with_reports_bp.route("/choosing_report", methods=['POST', 'GET'])
@@ -41,7 +88,7 @@ def choosing_report():
             data = request.get_json()
             logger.info(f"(Выбор шаблона протокола) Полученные данные: {data}")
             rep_area = data.get("report_area")
-            reports = Report.find_by_category_2(rep_area, profile_id) if rep_area else []
+            reports = Report.list_with_categories(profile_id, category_2_id=rep_area) if rep_area else []
             if not reports:
                 logger.error("(Выбор шаблона протокола) ❌ Не найдено шаблонов протоколов для выбранного типа")
                 return jsonify({"status": "error", "message": "Не найдено шаблонов протоколов для выбранного типа"}), 404
@@ -64,6 +111,7 @@ def choosing_report():
 
 @working_with_reports_bp.route("/working_with_reports", methods=['GET'])
 @auth_required()
+@report_etag("reportId")
 def working_with_reports():
     logger.info(f"(работа с протоколом) ------------------------------------") 
     logger.info(f"(работа с протоколом) 🚀 Начинаю обработку запроса для вывода данных протокола")
@@ -75,7 +123,8 @@ def working_with_reports():
         logger.error(f"(работа с протоколом) ❌ Не получен id протокола")
         return render_template("errors/error.html", message="Нет данных о подходящем протоколе для работы")
     try:
-        report_data, paragraphs_data = Report.get_report_data(current_report_id)
+        # body предложения в страницу не встраиваем — они догружаются по запросу (см. body_sentences)
+        report_data, paragraphs_data = Report.get_report_data(current_report_id, lite=True)
         if report_data is None or paragraphs_data is None:
             logger.error(f"(работа с протоколом) ❌ Метод get_report_data вернул None")
             return render_template("errors/error.html", message="Метод get_report_data вернул None")
@@ -104,6 +153,45 @@ def working_with_reports():
     )
 
 
+# Постраничная выдача body предложений группы для всплывающего окна на странице протокола
+@working_with_reports_bp.route("/body_sentences/<int:group_id>", methods=["GET"])
+@auth_required()
+def body_sentences(group_id):
+    logger.debug(f"(Получение body предложений) 🚀 Начинаю обработку запроса для группы ID={group_id}")
+    try:
+        offset = max(int(request.args.get("offset", 0)), 0)
+        limit = min(max(int(request.args.get("limit", 100)), 1), 500)
+    except (TypeError, ValueError):
+        logger.error(f"(Получение body предложений) ❌ Некорректные параметры offset/limit: {request.args}")
+        return jsonify({"status": "error", "message": "Некорректные параметры offset/limit"}), 400
+
+    # Группа отдается только если она используется в протоколах текущего пользователя
+    if not BodySentenceGroup.is_used_in_user_reports(group_id, current_user.id):
+        logger.error(f"(Получение body предложений) ❌ Группа ID={group_id} не найдена в протоколах пользователя {current_user.id}")
+        return jsonify({"status": "error", "message": "Группа не найдена"}), 404
+
+    try:
+        sentences, total = BodySentenceGroup.get_group_sentences_page(group_id, offset=offset, limit=limit)
+    except Exception as e:
+        logger.error(f"(Получение body предложений) ❌ Ошибка при получении предложений группы ID={group_id}: {e}")
+        return jsonify({"status": "error", "message": f"Ошибка при получении предложений: {e}"}), 500
+
+    response = jsonify({
+        "status": "success",
+        "sentences": sentences,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+    })
+    # Веса меняются и без новой ревизии протокола (write-behind), поэтому браузер хранит ответ,
+    # но каждый раз сверяет ETag по содержимому и получает 304, если страница не изменилась
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    logger.debug(f"(Получение body предложений) ✅ Группа ID={group_id}: отдано {len(sentences)} из {total}")
+    return response.make_conditional(request)
+
+
     
 
 @working_with_reports_bp.route("/save_modified_sentences", methods=["POST"])
@@ -206,41 +294,46 @@ def save_modified_sentences():
         saved_count = 0  # Счётчик сохранённых предложений
         saved_sentences = []  # Для хранения сохранённых предложений и последующего включения в отчет
 
+        # Группируем новые предложения по родительской сущности: одна пачка (одна транзакция) на группу
+        # Нормализованный текст для следующих сравнений считаем сразу — ключевые слова протокола известны только здесь
+        keyword_matcher = get_keyword_matcher(profile_id, report_id, get_profile_except_words(profile_id))
+        pending_batches = {}
         for sentence in new_sentences:
             processed_paragraph_id = sentence["paragraph_id"]
             head_sent_id = sentence["head_sentence_id"]
             new_sentence_text = clean_and_normalize_text(sentence["text"], profile_id)
             sentence_type = sentence["sentence_type"]
             related_id = processed_paragraph_id if sentence_type == "tail" else head_sent_id
+            if sentence_type != "tail" and not head_sent_id:
+                logger.warning(f"(Сохранение измененных предложений) ⚠️ Не найден head_sentence_id для предложения: {new_sentence_text}. Пропускаю предложение")
+                missed_count += 1
+                continue
+            sentence_class = TailSentence if sentence_type == "tail" else BodySentence
+            pending_batches.setdefault((sentence_class, related_id, sentence_type), []).append({
+                "sentence": new_sentence_text,
+                "comment": "Added automatically",
+                "normalized_text": keyword_matcher.clean(new_sentence_text),
+                "normalization_version": keyword_matcher.version,
+            })
+
+        for (sentence_class, related_id, sentence_type), batch in pending_batches.items():
             try:
-                if sentence_type == "tail":
-                   new_sentence, sent_group = TailSentence.create(
-                        sentence=new_sentence_text,
-                        related_id=related_id,
-                        user_id=user_id,
-                        report_global_modality_id=report_global_modality_id,
-                        comment="Added automatically"
-                    )
-                # Сохраняем предложение в базу данных в качестве body_sentence 
-                # для текущего главного предложения
-                else:
-                    if sentence["head_sentence_id"]:
-                        new_sentence, sent_group = BodySentence.create(
-                        sentence=new_sentence_text,
-                        related_id=related_id,
-                        user_id=user_id,
-                        report_global_modality_id=report_global_modality_id,
-                        comment="Added automatically",
-                        )
-                    else:
-                        logger.warning(f"(Сохранение измененных предложений) ⚠️ Не найден head_sentence_id для предложения: {new_sentence_text}. Пропускаю предложение")
-                        missed_count += 1   
-                        continue
-                saved_count += 1
-                saved_sentences.append({"id": new_sentence.id, "related_id": related_id, "sentence_type": sentence_type, "text": new_sentence_text})
+                sentence_group = sentence_class.get_or_create_related_group(related_id)
+                sentence_ids = sentence_class.bulk_create(
+                    batch,
+                    sentence_group.id,
+                    user_id=user_id,
+                    report_global_modality_id=report_global_modality_id,
+                )
             except Exception as e:
-                logger.error(f"(Сохранение измененных предложений) ❌ При попытке сохранения предложения ({new_sentence_text}) произошла ошибка: {str(e)}. Ошибка добавлена в счётчик")
-                missed_count += 1
+                logger.error(f"(Сохранение измененных предложений) ❌ При попытке сохранения {len(batch)} предложений для {sentence_type} ID={related_id} произошла ошибка: {str(e)}. Ошибка добавлена в счётчик")
+                missed_count += len(batch)
+                continue
+            saved_count += len(batch)
+            saved_sentences.extend(
+                {"id": sentence_id, "related_id": related_id, "sentence_type": sentence_type, "text": item["sentence"]}
+                for sentence_id, item in zip(sentence_ids, batch)
+            )
 
         sentences_adding_report = {
             "message": f"Всего обработано предложений: {len(processed_sentences)}.",
@@ -425,23 +518,16 @@ def analyze_dynamics_prev_finalize():
             logger.warning(f"⚠️ Ошибка загрузки ключевых слов: {e}")
             key_words_groups = []
         initial_report = build_soft_paragraphs(flat_items=flat_items, sorted_parag=sorted_parag, report_id=report_id)
-        new_html = render_template(
-            "working_with_report.html",
-            title=report_data["report_name"],
-            report_data=report_data,
-            paragraphs_data=initial_report,
-            key_words_groups=key_words_groups,
-            )
+        # Вместо всей страницы отдаем только изменившиеся параграфы
+        paragraphs_delta = build_paragraphs_delta(sorted_parag, initial_report)
         logger.info(f"(Финальный этап анализа динамики prev) ------------------------------------")
         logger.info(f"(Финальный этап анализа динамики prev) ✅ Финальный этап анализа динамики успешно завершен")
         return jsonify({
             "status": "success",
             "message": "Структура отчета успешно обновлена",
             "mode": "prev",
-            "report_data": report_data,
-            "paragraphs_data": initial_report,
             "key_words_groups": key_words_groups,
-            "html": new_html,
+            **paragraphs_delta,
             "misc_sentences": [],
         }), 200
     except Exception as e:
@@ -494,6 +580,8 @@ def analyze_dynamics_finalize():
             key_words_groups = []
         initial_report = sorted_parag
         misc_sentences = []
+        # replace_head_sentences_with_fuzzy_check меняет параграфы на месте — сохраняем исходные для сравнения
+        original_parag = copy.deepcopy(sorted_parag)
             
         if mode_flag == "hard":
             logger.info(f"(Финальный этап анализа динамики) Режим: Жесткий (hard) - полный анализ и жесткая структуризация протокола по заданному шаблону")
@@ -507,23 +595,16 @@ def analyze_dynamics_finalize():
             logger.error(f"(Финальный этап анализа динамики) ❌ Неверный режим анализа динамики: {mode_flag}")
             return jsonify({"status": "error", "message": f"Неверный режим анализа динамики: {mode_flag}"}), 400
 
-        new_html = render_template(
-            "working_with_report.html",
-            title=report_data["report_name"],
-            report_data=report_data,
-            paragraphs_data=initial_report,
-                key_words_groups=key_words_groups,
-            )
+        # Вместо всей страницы отдаем только изменившиеся параграфы
+        paragraphs_delta = build_paragraphs_delta(original_parag, initial_report)
         logger.info(f"(Финальный этап анализа динамики) ------------------------------------")
         logger.info(f"(Финальный этап анализа динамики) ✅ Финальный этап анализа динамики успешно завершен")
         return jsonify({
             "status": "success",
             "message": "Структура отчета успешно обновлена",
             "mode": mode_flag,
-            "report_data": report_data,
-            "paragraphs_data": initial_report,
             "key_words_groups": key_words_groups,
-            "html": new_html,
+            **paragraphs_delta,
             "misc_sentences": misc_sentences,
         }), 200
     except Exception as e:
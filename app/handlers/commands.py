@@ -0,0 +1,133 @@
+# app/handlers/commands.py
+
+import json
+import click
+from flask.cli import with_appcontext
+from app.extensions import db
+from app.models.models import (
+    Report, HeadSentence, BodySentence, TailSentence,
+    HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup,
+)
+from app.utils.db_processing import cluster_near_duplicates, collect_orphans, get_orphan_ratios, renormalize_sentences
+from app.utils.logger import logger
+from app.utils.redis_client import redis_get, ORPHAN_GC_LAST_RUN_KEY
+
+
+@click.command("repair-link-counts")
+@with_appcontext
+def repair_link_counts():
+    """Пересчитывает link_count всех предложений и групп (по одному GROUP BY на таблицу)."""
+    logger.info("(repair-link-counts) 🚀 Начат пересчет счетчиков связей")
+    try:
+        for model in (HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup):
+            fixed = model.repair_link_counts()
+            click.echo(f"{model.__tablename__}: исправлено {fixed}")
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"(repair-link-counts) ❌ Ошибка при пересчете счетчиков связей: {e}")
+        raise click.ClickException(str(e))
+    logger.info("(repair-link-counts) ✅ Счетчики связей пересчитаны")
+
+
+@click.command("check-report-tree-parity")
+@click.option("--report-id", type=int, multiple=True, help="ID протокола (можно несколько). По умолчанию — последние протоколы.")
+@click.option("--limit", type=int, default=50, show_default=True, help="Сколько последних протоколов проверить, если --report-id не передан.")
+@with_appcontext
+def check_report_tree_parity(report_id, limit):
+    """Сравнивает дерево протокола, собранное ORM и SQL (json_agg) сборщиками."""
+    report_ids = list(report_id) or [row.id for row in Report.query.with_entities(Report.id).order_by(Report.id.desc()).limit(limit)]
+    mismatched = []
+    for current_id in report_ids:
+        orm_tree = Report.build_report_paragraphs(current_id, builder="orm")
+        sql_tree = Report.build_report_paragraphs(current_id, builder="sql")
+        if orm_tree != sql_tree:
+            mismatched.append(current_id)
+            click.echo(f"❌ report_id={current_id}: деревья различаются")
+    click.echo(f"Проверено протоколов: {len(report_ids)}, расхождений: {len(mismatched)}")
+    if mismatched:
+        raise click.ClickException(f"Расхождения в протоколах: {mismatched}")
+
+
+@click.command("collect-orphans")
+@click.option("--dry-run", is_flag=True, help="Только посчитать осиротевшие строки, ничего не удаляя.")
+@click.option("--batch-size", type=int, default=None, help="Строк на транзакцию. По умолчанию ORPHAN_GC_BATCH_SIZE.")
+@with_appcontext
+def collect_orphans_command(dry_run, batch_size):
+    """Удаляет осиротевшие предложения и группы (то же, что задача Celery beat)."""
+    stats = collect_orphans(batch_size=batch_size, dry_run=dry_run)
+    if stats is None:
+        raise click.ClickException("Сборка мусора уже выполняется")
+    if stats["first_run"] and not dry_run:
+        click.echo("Первый запуск: водяной знак сохранен, удаление начнется со следующего запуска")
+    for table_name, count in stats["counts"].items():
+        click.echo(f"{table_name}: {'найдено' if dry_run else 'удалено'} {count}")
+    click.echo(f"Пачек {stats['batches']}, {stats['duration_ms']} ms")
+
+
+@click.command("renormalize-sentences")
+@click.option("--profile-id", type=int, default=None, help="Только этот профиль. По умолчанию — все.")
+@click.option("--batch-size", type=int, default=None, help="Строк на транзакцию. По умолчанию RENORMALIZE_BATCH_SIZE.")
+@with_appcontext
+def renormalize_sentences_command(profile_id, batch_size):
+    """Пересчитывает сохраненные нормализованные тексты предложений (то же, что задача Celery beat)."""
+    stats = renormalize_sentences(profile_id=profile_id, batch_size=batch_size)
+    if stats is None:
+        raise click.ClickException("Пересчет уже выполняется")
+    counts = stats["counts"]
+    click.echo(f"Профилей {counts['profiles']} (пропущено {counts['skipped_profiles']}), протоколов {counts['reports']}, "
+               f"предложений {counts['sentences']}, пачек {stats['batches']}, {stats['duration_ms']} ms")
+
+
+@click.command("cluster-duplicates")
+@click.option("--batch-size", type=int, default=None, help="Предложений на транзакцию. По умолчанию DUPLICATE_CLUSTERS_BATCH_SIZE.")
+@click.option("--threshold", type=float, default=None, help="Порог коэффициента Жаккара. По умолчанию DUPLICATE_CLUSTERS_THRESHOLD.")
+@with_appcontext
+def cluster_duplicates_command(batch_size, threshold):
+    """Собирает кластеры почти одинаковых предложений (то же, что задача Celery beat)."""
+    stats = cluster_near_duplicates(batch_size=batch_size, threshold=threshold)
+    if stats is None:
+        raise click.ClickException("Поиск почти одинаковых предложений уже выполняется")
+    counts = stats["counts"]
+    click.echo(f"Захэшировано предложений {counts['hashed']}, удалено полос удаленных предложений {counts['dropped_bands']}, "
+               f"пересобрано групп {counts['groups']}, кластеров {counts['clusters']}, пачек {stats['batches']}, {stats['duration_ms']} ms")
+
+
+@click.command("orphan-stats")
+@click.option("--limit", type=int, default=30, show_default=True, help="Сколько строк по пользователям и модальностям показать.")
+@click.option("--min-orphans", type=int, default=1, show_default=True, help="Не показывать строки, где осиротевших меньше.")
+@with_appcontext
+def orphan_stats(limit, min_orphans):
+    """Доля осиротевших предложений по пользователям и модальностям и осиротевших групп по типам."""
+    sentence_rows, group_rows = get_orphan_ratios()
+    for row in group_rows:
+        click.echo(f"{row['group_type']} группы: {row['orphans']} из {row['total']} ({row['ratio']:.1%})")
+
+    rows = sorted((row for row in sentence_rows if row["orphans"] >= min_orphans), key=lambda row: row["orphans"], reverse=True)
+    click.echo(f"\n{'тип':<5} {'пользователь':<32} {'модальность':<24} {'сирот':>8} {'всего':>8} {'доля':>7}")
+    for row in rows[:limit]:
+        user = row["email"] or f"user_id={row['user_id']}"
+        modality = row["modality"] or f"id={row['modality_id']}"
+        click.echo(f"{row['sentence_type']:<5} {user[:32]:<32} {modality[:24]:<24} {row['orphans']:>8} {row['total']:>8} {row['ratio']:>7.1%}")
+    orphans = sum(row["orphans"] for row in sentence_rows)
+    total = sum(row["total"] for row in sentence_rows)
+    click.echo(f"Всего предложений: {total}, осиротевших: {orphans} ({orphans / total if total else 0:.1%})")
+
+    try:
+        last_run = redis_get(ORPHAN_GC_LAST_RUN_KEY)
+    except Exception as e:
+        logger.warning(f"(orphan-stats) ⚠️ Не удалось прочитать итоги последней сборки мусора из Redis: {e}")
+        last_run = None
+    if last_run:
+        last_run = json.loads(last_run)
+        click.echo(f"Последняя сборка мусора: {last_run['finished_at']}, dry_run={last_run['dry_run']}, "
+                   f"строк {sum(last_run['counts'].values())}, {last_run['duration_ms']} ms")
+
+
+def register_commands(app):
+    app.cli.add_command(repair_link_counts)
+    app.cli.add_command(check_report_tree_parity)
+    app.cli.add_command(collect_orphans_command)
+    app.cli.add_command(orphan_stats)
+    app.cli.add_command(renormalize_sentences_command)
+    app.cli.add_command(cluster_duplicates_command)
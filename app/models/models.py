@@ -9,13 +9,23 @@
 # но и отчеты и параграфы.
 
 
+from flask import current_app, g, has_app_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_security import UserMixin, RoleMixin
-from sqlalchemy.dialects.postgresql import ENUM
-from sqlalchemy import Index, event, func, cast, Date
-from app.utils.common import ensure_list
+from sqlalchemy.dialects.postgresql import ENUM, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import DDL, Index, event, func, cast, Date, bindparam, case, column, delete, exists, insert, literal, or_, select, text, union_all, update, values
+from sqlalchemy.orm import aliased, attributes
+from sqlalchemy.sql import Select
+from app.utils.common import ensure_list, normalize_sentence_text, sentence_normalized_hash, sentence_search_text
+from app.utils.redis_client import (
+    redis_get, redis_set, redis_delete, redis_keys, buffer_sentence_weight, get_buffered_weights, move_buffered_weights, bump_keywords_version,
+    get_app_config_version, get_app_config_snapshot, set_app_config_snapshot, invalidate_app_config_snapshot, mark_sentences_for_rehash,
+)
+from app.utils.unit_of_work import after_commit, commit_session, in_unit_of_work, rollback_session, unit_of_work
 from datetime import datetime, timezone  # Добавим для временных меток
 import json
+from collections import defaultdict, namedtuple
 from app.utils.logger import logger
 from app.extensions import db
 
@@ -30,6 +40,177 @@ class DatabaseDuplicateError(Exception):
     pass    
 
 
+def _copy_sentences_data(sentences):
+    """
+    Копирует список словарей предложений (вместе с вложенными body_sentences),
+    чтобы общие группы не делили одни и те же словари между разными родителями.
+    """
+    copied = []
+    for sentence in sentences:
+        item = dict(sentence)
+        if "body_sentences" in item:
+            item["body_sentences"] = [dict(body) for body in item["body_sentences"]]
+        copied.append(item)
+    return copied
+
+
+def _positions_update(table, id_column, position_column, positions, *criteria):
+    """
+    Собирает один UPDATE, который проставляет новые позиции всем строкам сразу.
+    В PostgreSQL это UPDATE ... FROM (VALUES (id, позиция), ...). SQLite не понимает
+    список колонок у VALUES, поэтому там (бенчмарки, локальные проверки) — CASE по id.
+    Args:
+        table (Table): Обновляемая таблица.
+        id_column (Column): Колонка ID, по которой сопоставляются позиции.
+        position_column (Column): Колонка индекса/веса.
+        positions (dict[int, int]): {ID: новая позиция}.
+        *criteria: Дополнительные условия WHERE (например, group_id).
+    Returns:
+        Update: Запрос для db.session.execute.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        new_positions = values(
+            column("id", id_column.type), column("position", position_column.type), name="new_positions"
+        ).data(list(positions.items()))
+        return (
+            update(table)
+            .where(id_column == new_positions.c.id, *criteria)
+            .values({position_column.name: new_positions.c.position})
+        )
+    return (
+        update(table)
+        .where(id_column.in_(list(positions)), *criteria)
+        .values({position_column.name: case(positions, value=id_column)})
+    )
+
+
+# Строка списка протоколов (Report.list_with_categories)
+ReportListRow = namedtuple("ReportListRow", [
+    "id", "report_name", "comment", "public", "report_side", "user_id", "profile_id",
+    "category_1_id", "category_1_name", "category_2_id", "category_2_name",
+    "global_category_id", "global_category_name",
+])
+
+
+def _merge_buffered_weights(paragraphs):
+    """
+    Прибавляет к весам body/tail предложений дерева протокола приросты, которые еще копятся
+    в Redis (increase_weight при SENTENCE_WEIGHT_WRITE_BEHIND), и пересортировывает измененные списки.
+    Кэш дерева хранит веса из базы, поэтому приросты учитываются при каждом чтении, а не при сборке.
+    Дерево меняется на месте. Без write-behind ничего не делает.
+    """
+    if not current_app.config.get("SENTENCE_WEIGHT_WRITE_BEHIND"):
+        return paragraphs
+    lists_by_type = {"body": [], "tail": []}
+    for paragraph in paragraphs:
+        lists_by_type["tail"].append(paragraph.get("tail_sentences") or [])
+        for head in paragraph.get("head_sentences") or []:
+            lists_by_type["body"].append(head.get("body_sentences") or [])
+
+    for sentence_type, sentence_lists in lists_by_type.items():
+        group_ids = {sentence["group_id"] for sentences in sentence_lists for sentence in sentences if sentence.get("group_id")}
+        pending_weights = get_buffered_weights(sentence_type, group_ids)
+        if not pending_weights:
+            continue
+        for sentences in sentence_lists:
+            changed = False
+            for sentence in sentences:
+                pending = pending_weights.get(sentence.get("group_id"), {}).get(sentence["id"])
+                if pending:
+                    sentence["sentence_weight"] = (sentence.get("sentence_weight") or 0) + pending
+                    changed = True
+            if changed:
+                # Тот же порядок, что при сборке: по весу в обратном порядке, затем по id
+                sentences.sort(key=lambda sentence: (-(sentence.get("sentence_weight") or 0), sentence["id"]))
+    return paragraphs
+
+
+# Дерево протокола одним запросом (PostgreSQL): параграфы → head (+ body) / tail предложения.
+# Ключи и порядок сортировки совпадают с Paragraph.build_paragraphs_data:
+# head — по sentence_index, body/tail — по sentence_weight по убыванию, при равенстве — по id.
+# Вместо {body_sentences} подставляются сами body предложения или, в lite дереве, только их количество.
+_REPORT_TREE_SQL_TEMPLATE = """
+    SELECT COALESCE(json_agg(paragraphs.paragraph_data ORDER BY paragraphs.paragraph_index, paragraphs.id), '[]'::json)
+    FROM (
+        SELECT p.id, p.paragraph_index, json_build_object(
+            'id', p.id,
+            'report_id', p.report_id,
+            'paragraph_index', p.paragraph_index,
+            'paragraph', p.paragraph,
+            'paragraph_visible', p.paragraph_visible,
+            'title_paragraph', p.title_paragraph,
+            'bold_paragraph', p.bold_paragraph,
+            'is_impression', p.is_impression,
+            'is_active', p.is_active,
+            'str_before', p.str_before,
+            'str_after', p.str_after,
+            'is_additional', p.is_additional,
+            'comment', p.comment,
+            'paragraph_weight', p.paragraph_weight,
+            'tags', p.tags,
+            'has_linked_head', COALESCE(hg.link_count, 0) > 1,
+            'has_linked_tail', COALESCE(tg.link_count, 0) > 1,
+            'head_sentence_group_id', p.head_sentence_group_id,
+            'tail_sentence_group_id', p.tail_sentence_group_id,
+            'head_sentences', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', hs.id,
+                    'sentence', hs.sentence,
+                    'tags', hs.tags,
+                    'comment', hs.comment,
+                    'is_linked', hs.link_count > 1,
+                    'group_id', hl.group_id,
+                    {body_sentences}
+                    'body_sentence_group_id', hs.body_sentence_group_id,
+                    'has_linked_body', COALESCE(bg.link_count, 0) > 1,
+                    'sentence_index', hl.sentence_index
+                ) ORDER BY COALESCE(hl.sentence_index, 0), hs.id)
+                FROM head_sentence_group_link hl
+                JOIN head_sentences hs ON hs.id = hl.head_sentence_id
+                LEFT JOIN body_sentence_groups bg ON bg.id = hs.body_sentence_group_id
+                WHERE hl.group_id = p.head_sentence_group_id
+            ), '[]'::json),
+            'tail_sentences', COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', ts.id,
+                    'sentence', ts.sentence,
+                    'tags', ts.tags,
+                    'comment', ts.comment,
+                    'is_linked', ts.link_count > 1,
+                    'group_id', tl.group_id,
+                    'sentence_weight', tl.sentence_weight
+                ) ORDER BY COALESCE(tl.sentence_weight, 0) DESC, ts.id)
+                FROM tail_sentence_group_link tl
+                JOIN tail_sentences ts ON ts.id = tl.tail_sentence_id
+                WHERE tl.group_id = p.tail_sentence_group_id
+            ), '[]'::json)
+        ) AS paragraph_data
+        FROM report_paragraphs p
+        LEFT JOIN head_sentence_groups hg ON hg.id = p.head_sentence_group_id
+        LEFT JOIN tail_sentence_groups tg ON tg.id = p.tail_sentence_group_id
+        WHERE p.report_id = :report_id
+    ) AS paragraphs
+"""
+REPORT_TREE_SQL = text(_REPORT_TREE_SQL_TEMPLATE.replace("{body_sentences}", """'body_sentences', COALESCE((
+                        SELECT json_agg(json_build_object(
+                            'id', bs.id,
+                            'sentence', bs.sentence,
+                            'tags', bs.tags,
+                            'comment', bs.comment,
+                            'is_linked', bs.link_count > 1,
+                            'group_id', bl.group_id,
+                            'sentence_weight', bl.sentence_weight
+                        ) ORDER BY COALESCE(bl.sentence_weight, 0) DESC, bs.id)
+                        FROM body_sentence_group_link bl
+                        JOIN body_sentences bs ON bs.id = bl.body_sentence_id
+                        WHERE bl.group_id = hs.body_sentence_group_id
+                    ), '[]'::json),"""))
+REPORT_TREE_LITE_SQL = text(_REPORT_TREE_SQL_TEMPLATE.replace("{body_sentences}", """'body_sentences_count', (
+                        SELECT count(*) FROM body_sentence_group_link bl
+                        WHERE bl.group_id = hs.body_sentence_group_id
+                    ),"""))
+
+
 # Ассоциативная таблица для связи ключевых слов с отчетами
 key_word_report_link = db.Table(
     'key_word_report_link',
@@ -92,14 +273,62 @@ class AppConfig(db.Model):
 
     @staticmethod
     def get_setting(profile_id, key, default=None):
-        """Возвращает значение настройки для профиля."""
+        """Возвращает значение настройки для профиля из снимка настроек (см. get_profile_settings)."""
         try:
-            logger.info(f"🔍 Получение настройки {key} для профиля {profile_id}")
-            config = AppConfig.query.filter_by(profile_id=profile_id, config_key=key).first()
-            return config.config_value if config else default
+            logger.debug(f"🔍 Получение настройки {key} для профиля {profile_id}")
+            return AppConfig.get_profile_settings(profile_id).get(key, default)
         except Exception as e:
             return default
-    
+
+
+    @staticmethod
+    def get_profile_settings(profile_id):
+        """
+        Возвращает все настройки профиля {ключ: config_value}. Снимок загружается одним запросом
+        при первом обращении, в пределах запроса хранится в flask.g, между запросами — в Redis
+        под ключом с версией настроек профиля. Внутри unit_of_work() снимок в Redis не пишется:
+        в нем могли оказаться еще не закоммиченные значения.
+        Вне запроса (Celery, CLI) снимок берется из Redis или базы при каждом вызове.
+
+        Args:
+            profile_id (int): ID профиля.
+        Returns:
+            dict: Значения настроек строками, как они хранятся в AppConfig.
+        """
+        if not profile_id:
+            return {}
+        profile_id = int(profile_id)
+        snapshots = g.setdefault("app_config_snapshots", {}) if has_request_context() else {}
+        settings = snapshots.get(profile_id)
+        if settings is not None:
+            return settings
+
+        # Версия читается до базы: если настройки поменяют во время загрузки, снимок ляжет под старую версию
+        version = get_app_config_version(profile_id)
+        settings = get_app_config_snapshot(profile_id, version) if version else None
+        if settings is None:
+            logger.info(f"🔍 Загрузка настроек профиля {profile_id} из базы")
+            rows = db.session.query(AppConfig.config_key, AppConfig.config_value).filter_by(profile_id=profile_id).all()
+            settings = {config_key: config_value for config_key, config_value in rows}
+            if version and not in_unit_of_work():
+                set_app_config_snapshot(profile_id, version, settings)
+        snapshots[profile_id] = settings
+        return settings
+
+
+    @staticmethod
+    def forget_profile_settings(profile_id):
+        """
+        Сбрасывает снимок настроек профиля в текущем запросе и в Redis. Вызывать после изменения AppConfig.
+        Внутри unit_of_work() версия увеличивается еще раз после коммита: снимок, собранный другим
+        запросом между изменением и коммитом, содержит старые значения.
+        """
+        if has_request_context():
+            g.get("app_config_snapshots", {}).pop(int(profile_id), None)
+        invalidate_app_config_snapshot(profile_id)
+        if in_unit_of_work():
+            after_commit(lambda: invalidate_app_config_snapshot(profile_id))
+
 
     @staticmethod
     def set_setting(profile_id, key, value):
@@ -147,10 +376,14 @@ class AppConfig(db.Model):
                 )
                 db.session.add(config)
 
-            db.session.commit()
+            commit_session()
         except Exception as e:
-            db.session.rollback()
+            logger.error(f"(метод set_setting класса AppConfig) ❌ Ошибка сохранения настройки {key} профиля {profile_id}: {e}")
+            rollback_session()
+            if in_unit_of_work():
+                raise  # откат выполнит unit_of_work: ошибку нельзя проглотить, иначе закоммитится остальное
             return False
+        AppConfig.forget_profile_settings(profile_id)
         return True
 
 
@@ -160,11 +393,11 @@ class BaseModel(db.Model):
 
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit_session()
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        commit_session()
         
         
     def update(self, **kwargs):
@@ -187,11 +420,11 @@ class BaseModel(db.Model):
                 logger.warning(f"(базовый метод update) ❌ Поле '{key}' отсутствует в {self.__class__.__name__} и будет проигнорировано")
 
         try:
-            db.session.commit()
+            commit_session()
             logger.info(f"(базовый метод update) ✅ Объект {self.__class__.__name__} ID={self.id} успешно обновлён")
             return 
         except Exception as e:
-            db.session.rollback()
+            rollback_session()
             logger.error(f"(базовый метод update) ❌ Ошибка обновления {self.__class__.__name__} ID={self.id}: {e}")
             raise ValueError(f"Ошибка обновления {self.__class__.__name__} ID={self.id}: {e}")
         
@@ -265,7 +498,7 @@ class User(BaseModel, UserMixin):
         if role and role not in self.roles:
             self.roles.append(role)
             if commit:
-                db.session.commit()
+                commit_session()
 
 
     def find_by_email(email):
@@ -407,7 +640,7 @@ class ReportCategory(BaseModel):
             global_id=global_id
         )
         db.session.add(category)
-        db.session.commit()
+        commit_session()
         return category
 
 
@@ -478,6 +711,7 @@ class Report(BaseModel):
     report_name = db.Column(db.String(255), nullable=False)
     public = db.Column(db.Boolean, default=False, nullable=False)
     report_side = db.Column(db.Boolean, nullable=False, default=False)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # Растет при любом изменении протокола, входит в ключ кэша дерева
 
 
     report_to_paragraphs = db.relationship('Paragraph', lazy=True, backref=db.backref("paragraph_to_report"), cascade="all, delete-orphan", passive_deletes=True)
@@ -496,8 +730,15 @@ class Report(BaseModel):
             report_side=report_side
         )
         db.session.add(new_report)
-        db.session.commit()
+        after_commit(lambda: cls.invalidate_list_cache(profile_id))
+        commit_session()
         return new_report
+
+
+    def delete(self):
+        profile_id = self.profile_id
+        after_commit(lambda: Report.invalidate_list_cache(profile_id))
+        super().delete()
     
     
     @classmethod
@@ -521,6 +762,123 @@ class Report(BaseModel):
         return cls.query.filter_by(category_2_id=category_2_id, profile_id=profile_id).all()
 
 
+    @classmethod
+    def list_with_categories(cls, profile_id, user_id=None, category_2_id=None, after_id=None, limit=None):
+        """
+        Список протоколов профиля вместе с названиями категорий одним запросом
+        (ReportCategory присоединяется трижды: модальность, область, глобальная категория).
+        Результат кэшируется в Redis для каждого профиля, кэш сбрасывается 
+        при создании, изменении и удалении протоколов (invalidate_list_cache).
+
+        Args:
+            profile_id (int): ID профиля.
+            user_id (int, optional): ID пользователя-владельца.
+            category_2_id (int, optional): Фильтр по области исследования.
+            after_id (int, optional): Keyset пагинация — вернуть протоколы с id больше указанного.
+            limit (int, optional): Максимальное количество строк.
+
+        Returns:
+            list[ReportListRow]: Строки, отсортированные по id.
+        """
+        cache_key = f"profile:{profile_id}:reports_list:{user_id}:{category_2_id}:{after_id}:{limit}"
+        try:
+            raw = redis_get(cache_key)
+            if raw:
+                return [ReportListRow(*row) for row in json.loads(raw)]
+        except Exception as e:
+            logger.warning(f"(list_with_categories) ⚠️ Не удалось прочитать кэш списка протоколов: {e}")
+
+        category_1 = aliased(ReportCategory)
+        category_2 = aliased(ReportCategory)
+        global_category = aliased(ReportCategory)
+        query = (
+            db.session.query(
+                cls.id, cls.report_name, cls.comment, cls.public, cls.report_side, cls.user_id, cls.profile_id,
+                cls.category_1_id, category_1.name,
+                cls.category_2_id, category_2.name,
+                cls.global_category_id, global_category.name,
+            )
+            .outerjoin(category_1, category_1.id == cls.category_1_id)
+            .outerjoin(category_2, category_2.id == cls.category_2_id)
+            .outerjoin(global_category, global_category.id == cls.global_category_id)
+            .filter(cls.profile_id == profile_id)
+        )
+        if user_id is not None:
+            query = query.filter(cls.user_id == user_id)
+        if category_2_id is not None:
+            query = query.filter(cls.category_2_id == category_2_id)
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        query = query.order_by(cls.id)
+        if limit is not None:
+            query = query.limit(limit)
+        rows = [ReportListRow(*row) for row in query.all()]
+
+        try:
+            redis_set(cache_key, json.dumps(rows, ensure_ascii=False), ex=60*60*3)
+        except Exception as e:
+            logger.warning(f"(list_with_categories) ⚠️ Не удалось сохранить список протоколов в кэш: {e}")
+        return rows
+
+
+    @staticmethod
+    def invalidate_list_cache(profile_id):
+        """Сбрасывает кэш списков протоколов профиля (все фильтры и страницы)."""
+        try:
+            for key in redis_keys(f"profile:{profile_id}:reports_list:*"):
+                redis_delete(key)
+        except Exception as e:
+            logger.warning(f"(invalidate_list_cache) ⚠️ Не удалось сбросить кэш списка протоколов профиля {profile_id}: {e}")
+
+
+    @classmethod
+    def touch(cls, report_ids):
+        """
+        Увеличивает revision протоколов. Кэш дерева протокола хранится под ключом
+        с номером ревизии, поэтому после touch старый кэш просто перестает читаться.
+        Коммит остается за вызывающим кодом.
+        Args:
+            report_ids (int | list[int] | Select): ID протоколов или подзапрос, возвращающий ID протоколов.
+        """
+        if not isinstance(report_ids, Select):
+            report_ids = [report_id for report_id in ensure_list(report_ids) if report_id]
+            if not report_ids:
+                return
+        cls.query.filter(cls.id.in_(report_ids)).update(
+            {cls.revision: cls.revision + 1}, synchronize_session=False
+        )
+
+
+    @classmethod
+    def delete_report(cls, report_id):
+        """
+        Удаляет протокол вместе с параграфами, группами и предложениями, на которые 
+        больше ничто не ссылается (Paragraph.delete_paragraphs). Одна транзакция.
+        Args:
+            report_id (int): ID протокола.
+        Returns:
+            bool: True, если протокол найден и удален.
+        """
+        logger.info(f"(метод delete_report класса Report) 🚀 Начато удаление протокола ID={report_id}")
+        report = cls.query.get(report_id)
+        if not report:
+            logger.error(f"(метод delete_report класса Report) ❌ Протокол ID={report_id} не найден")
+            return False
+
+        profile_id = report.profile_id
+        paragraph_ids = db.session.execute(select(Paragraph.id).where(Paragraph.report_id == report_id)).scalars().all()
+        with unit_of_work("delete_report"):
+            if paragraph_ids:
+                Paragraph.delete_paragraphs(paragraph_ids, renumber=False)
+            db.session.delete(report)
+            # Сбрасываем кэши только после коммита (внешнего, если delete_report вызван внутри unit_of_work):
+            # протокол пропадает из списков профиля, а ключевые слова, связанные только с ним, становятся общими
+            after_commit(lambda: cls.invalidate_list_cache(profile_id))
+            after_commit(lambda: bump_keywords_version(profile_id))
+        logger.info(f"(метод delete_report класса Report) ✅ Протокол ID={report_id} удален")
+        return True
+
+
     @classmethod
     def get_report_info(cls, report_id):
         """
@@ -554,19 +912,20 @@ class Report(BaseModel):
             "comment": report.comment,
             "report_side": report.report_side,
             "user_id": report.user_id,
-            "report_public": report.public
+            "report_public": report.public,
+            "revision": report.revision
         }
         logger.debug(f"(get_report_info)✅ Получил данные отчета: report_id={report_id}. Возвращаю данные")
         return report_data
     
     
     @classmethod
-    def get_report_data(cls, report_id):
+    def get_report_data(cls, report_id, lite=False):
         """
         Возвращает основные данные отчета и список параграфов.
         Args:
             report_id (int): ID отчета.
-            profile_id (int): ID профиля пользователя.
+            lite (bool): Если True — без body предложений (см. get_report_paragraphs).
         Returns:
             tuple: (dict, list) - (report_data, sorted_paragraphs)
         """
@@ -581,7 +940,7 @@ class Report(BaseModel):
             logger.error(f"Отчет не найден: report_id={report_id}")
             return None, None
         try:
-            sorted_paragraphs = Report.get_report_paragraphs(report_id)
+            sorted_paragraphs = Report.get_report_paragraphs(report_id, lite=lite)
         except Exception as e:
             logger.error(f"(get_report_data) ❌ Ошибка при получении параграфов отчета из (get_report_paragraphs): {e}")
             raise e
@@ -593,34 +952,74 @@ class Report(BaseModel):
     # Метод для получения параграфов отчета, отсортированных 
     # по index (использю его в методе get_report_data)
     @classmethod
-    def get_report_paragraphs(cls, report_id):
+    def get_report_paragraphs(cls, report_id, lite=False):
         """
         Получает список параграфов отчета, отсортированных по index.
-        
+        Собранное дерево кэшируется в Redis под ключом report:{id}:tree:{revision}
+        (lite дерево — report:{id}:tree:{revision}:lite), при любом изменении
+        протокола revision растет и кэш перестает читаться.
+        В кэше веса body/tail предложений из базы: приросты, еще не перенесенные
+        из Redis (write-behind), добавляются после чтения кэша.
+
         Args:
             report_id (int): ID отчета.
-        
+            lite (bool): Если True — у head предложений вместо body_sentences 
+                отдается только body_sentences_count (body предложения из базы
+                не читаются), сами body предложения страница догружает по требованию.
+
         Returns:
             list: Список параграфов, отсортированных по index.
         """
         logger.debug(f"(get_report_paragraphs)🚀 Начинаю выполнение запроса параграфов для отчета.")
 
-        # Получаем все параграфы отчета и сортируем по paragraph_index
-        paragraphs = Paragraph.query.filter_by(report_id=report_id).order_by(Paragraph.paragraph_index).all()
-        sorted_paragraphs = []
+        revision = db.session.query(cls.revision).filter_by(id=report_id).scalar()
+        cache_key = f"report:{report_id}:tree:{revision}{':lite' if lite else ''}"
+        if revision is not None:
+            try:
+                raw = redis_get(cache_key)
+                if raw:
+                    sorted_paragraphs = json.loads(raw)
+                    logger.debug(f"(метод get_report_paragraphs класса Report) ✅ Дерево протокола report_id={report_id} (revision={revision}) взято из кэша")
+                    return _merge_buffered_weights(sorted_paragraphs)
+            except Exception as e:
+                logger.warning(f"(метод get_report_paragraphs класса Report) ⚠️ Не удалось прочитать кэш дерева протокола: {e}")
 
-        for paragraph in paragraphs:
-            
-            paragraph_data = paragraph.get_paragraph_data(paragraph.id)
-            if paragraph_data is None:
-                logger.error(f"(get_report_paragraphs) ❌ Параграф {paragraph.id} не найден.")
-                continue
+        sorted_paragraphs = cls.build_report_paragraphs(report_id, lite=lite)
 
-            sorted_paragraphs.append(paragraph_data)
-            logger.debug(f"(метод get_report_paragraphs класса Report) Параграф {paragraph.id} обработан и добавлен в список параграфов.")
+        if revision is not None:
+            try:
+                redis_set(cache_key, json.dumps(sorted_paragraphs, ensure_ascii=False), ex=60*60*24)  # Старые ревизии просто истекают
+            except Exception as e:
+                logger.warning(f"(метод get_report_paragraphs класса Report) ⚠️ Не удалось сохранить дерево протокола в кэш: {e}")
 
-        logger.debug(f"(метод get_report_paragraphs класса Report) ✅ Получил параграфы для отчета: report_id={report_id}. Возвращаю данные")
-        return sorted_paragraphs  
+        logger.debug(f"(метод get_report_paragraphs класса Report) ✅ Получил {len(sorted_paragraphs)} параграфов для отчета: report_id={report_id}. Возвращаю данные")
+        return _merge_buffered_weights(sorted_paragraphs)
+    
+    
+    @classmethod
+    def build_report_paragraphs(cls, report_id, builder=None, lite=False):
+        """
+        Собирает дерево параграфов протокола из базы данных (без кэша и без приростов весов из Redis).
+        Args:
+            report_id (int): ID отчета.
+            builder (str, optional): "orm" или "sql". По умолчанию берется из REPORT_TREE_BUILDER.
+            lite (bool): Если True — у head предложений только body_sentences_count.
+        Returns:
+            list: Список параграфов, отсортированных по index.
+        """
+        if builder is None:
+            builder = current_app.config.get("REPORT_TREE_BUILDER") if has_app_context() else None
+        builder = (builder or "orm").lower()
+        
+        if builder == "sql":
+            # Всё дерево собирается в PostgreSQL одним запросом, Python только десериализует результат
+            result = db.session.execute(REPORT_TREE_LITE_SQL if lite else REPORT_TREE_SQL, {"report_id": report_id}).scalar()
+            return json.loads(result) if isinstance(result, str) else result
+        
+        # Получаем все параграфы отчета и сортируем по paragraph_index
+        paragraphs = Paragraph.query.filter_by(report_id=report_id).order_by(Paragraph.paragraph_index, Paragraph.id).all()
+        # Всё дерево собирается фиксированным числом запросов, независимо от размера протокола
+        return Paragraph.build_paragraphs_data(paragraphs, lite=lite)
 
 
 class ReportShare(db.Model):
@@ -643,11 +1042,13 @@ class ReportShare(db.Model):
         """
         try:
             db.session.delete(self)
-            db.session.commit()
+            commit_session()
             logger.info(f"[ReportShare.delete] ✅ Запись о шаринге ID={self.id} удалена")
         except Exception as e:
             logger.error(f"[ReportShare.delete] ❌ Ошибка при удалении записи о шаринге: {e}")
-            db.session.rollback()
+            rollback_session()
+            if in_unit_of_work():
+                raise
     
 
     @classmethod
@@ -670,11 +1071,13 @@ class ReportShare(db.Model):
                 shared_with_user_id=shared_with_user_id
             )
             db.session.add(new_share)
-            db.session.commit()
+            commit_session()
             return new_share
         except Exception as e:
             logger.error(f"[ReportShare.create] ❌ Ошибка при создании записи о шаринге: {e}")
-            db.session.rollback()
+            rollback_session()
+            if in_unit_of_work():
+                raise
             return None
 
 
@@ -748,7 +1151,8 @@ class Paragraph(BaseModel):
                 tail_sentence_group_id=tail_sentence_group_id
             )
             db.session.add(new_paragraph)
-            db.session.commit()
+            Report.touch(report_id)
+            commit_session()
             
             logger.debug(f"(метод create класса Paragraph) ✅ Параграф создан: paragraph_id={new_paragraph.id}")
             return new_paragraph
@@ -756,7 +1160,9 @@ class Paragraph(BaseModel):
         except Exception as e:
             logger.error(f"(метод create класса Paragraph) ❌ Ошибка при создании параграфа: {e}")
             
-            db.session.rollback()
+            rollback_session()
+            if in_unit_of_work():
+                raise
             return None
         
     
@@ -776,49 +1182,194 @@ class Paragraph(BaseModel):
             logger.error(f"(метод get_paragraph_data класса Paragraph) ❌ Параграф не найден.")
             return None
         
-        # Проверяем наличие связанных еще с каким либо параграфом групп head и tail
-        has_linked_head = False
-        has_linked_tail = False
-        if paragraph.head_sentence_group_id:
-            logger.debug(f"(метод get_paragraph_data класса Paragraph) Подтверждено наличие группы head предложений для параграфа {paragraph_id}")
-            if HeadSentenceGroup.is_linked(paragraph.head_sentence_group_id) > 1:
-                logger.debug(f"(метод get_paragraph_data класса Paragraph) 📌 Подтверждено наличие >1 связей для head у данного параграфа. Информация добавлена в аттрибуты")
-                has_linked_head = True
-        if paragraph.tail_sentence_group_id:
-            logger.debug(f"(метод get_paragraph_data класса Paragraph) Подтверждено наличие группы tail предложений для параграфа {paragraph_id}.")
-            if TailSentenceGroup.is_linked(paragraph.tail_sentence_group_id) > 1:
-                logger.debug(f"(метод get_paragraph_data класса Paragraph) 📌 Подтверждено наличие >1 связей для tail у данного параграфа. Информация добавлена в аттрибуты.")
-                has_linked_tail = True
-
-
-        paragraph_data = {
-            "id": paragraph.id,
-            "report_id": paragraph.report_id,
-            "paragraph_index": paragraph.paragraph_index,
-            "paragraph": paragraph.paragraph,
-            "paragraph_visible": paragraph.paragraph_visible,
-            "title_paragraph": paragraph.title_paragraph,
-            "bold_paragraph": paragraph.bold_paragraph,
-            "is_impression": paragraph.is_impression,
-            "is_active": paragraph.is_active,
-            "str_before": paragraph.str_before,
-            "str_after": paragraph.str_after,
-            "is_additional": paragraph.is_additional,
-            "comment": paragraph.comment,
-            "paragraph_weight": paragraph.paragraph_weight,
-            "tags": paragraph.tags,
-            "has_linked_head": has_linked_head,
-            "has_linked_tail": has_linked_tail,
-            "head_sentence_group_id": paragraph.head_sentence_group_id or None, 
-            "tail_sentence_group_id": paragraph.tail_sentence_group_id or None,
-            "head_sentences": HeadSentenceGroup.get_group_sentences(paragraph.head_sentence_group_id) if paragraph.head_sentence_group_id else [],
-            "tail_sentences": TailSentenceGroup.get_group_sentences(paragraph.tail_sentence_group_id) if paragraph.tail_sentence_group_id else []
-        }
+        paragraph_data = _merge_buffered_weights(cls.build_paragraphs_data([paragraph]))[0]
         
         logger.debug(f"(метод get_paragraph_data класса Paragraph) ✅ Получил данные параграфа: paragraph_id={paragraph_id}. Возвращаю данные")
         return paragraph_data
     
     
+    @classmethod
+    def build_paragraphs_data(cls, paragraphs, lite=False):
+        """
+        Собирает данные для списка параграфов (вместе с head/body/tail предложениями)
+        фиксированным числом запросов: предложения всех групп, веса/индексы из таблиц
+        связей и количество связей загружаются пачками, а дерево собирается в памяти.
+        Веса body/tail — из базы, без приростов из Redis (их добавляет _merge_buffered_weights).
+        Args:
+            paragraphs (list[Paragraph]): Параграфы в нужном порядке.
+            lite (bool): Если True — у head предложений только body_sentences_count.
+        Returns:
+            list[dict]: Данные параграфов в том же порядке.
+        """
+        logger.debug(f"(метод build_paragraphs_data класса Paragraph) 🚀 Начата сборка данных для {len(paragraphs)} параграфов")
+        head_group_ids = {p.head_sentence_group_id for p in paragraphs if p.head_sentence_group_id}
+        tail_group_ids = {p.tail_sentence_group_id for p in paragraphs if p.tail_sentence_group_id}
+
+        head_sentences_by_group = HeadSentenceGroup.get_groups_sentences(head_group_ids, buffered_weights=False, lite=lite)
+        tail_sentences_by_group = TailSentenceGroup.get_groups_sentences(tail_group_ids, buffered_weights=False)
+        head_group_links = HeadSentenceGroup.get_link_counts(head_group_ids)
+        tail_group_links = TailSentenceGroup.get_link_counts(tail_group_ids)
+
+        paragraphs_data = []
+        for paragraph in paragraphs:
+            head_group_id = paragraph.head_sentence_group_id
+            tail_group_id = paragraph.tail_sentence_group_id
+            paragraphs_data.append({
+                "id": paragraph.id,
+                "report_id": paragraph.report_id,
+                "paragraph_index": paragraph.paragraph_index,
+                "paragraph": paragraph.paragraph,
+                "paragraph_visible": paragraph.paragraph_visible,
+                "title_paragraph": paragraph.title_paragraph,
+                "bold_paragraph": paragraph.bold_paragraph,
+                "is_impression": paragraph.is_impression,
+                "is_active": paragraph.is_active,
+                "str_before": paragraph.str_before,
+                "str_after": paragraph.str_after,
+                "is_additional": paragraph.is_additional,
+                "comment": paragraph.comment,
+                "paragraph_weight": paragraph.paragraph_weight,
+                "tags": paragraph.tags,
+                "has_linked_head": head_group_links.get(head_group_id, 0) > 1,
+                "has_linked_tail": tail_group_links.get(tail_group_id, 0) > 1,
+                "head_sentence_group_id": head_group_id or None, 
+                "tail_sentence_group_id": tail_group_id or None,
+                # Одна и та же группа может быть у нескольких параграфов — отдаём каждому свои словари
+                "head_sentences": _copy_sentences_data(head_sentences_by_group.get(head_group_id, [])),
+                "tail_sentences": _copy_sentences_data(tail_sentences_by_group.get(tail_group_id, [])),
+            })
+
+        logger.debug(f"(метод build_paragraphs_data класса Paragraph) ✅ Данные {len(paragraphs_data)} параграфов собраны")
+        return paragraphs_data
+
+
+    @classmethod
+    def touch_reports(cls, paragraph_ids):
+        """
+        Увеличивает revision протоколов, которым принадлежат параграфы.
+        Args:
+            paragraph_ids (int | list[int] | Select): ID параграфов или подзапрос, возвращающий ID.
+        """
+        if not isinstance(paragraph_ids, Select):
+            paragraph_ids = ensure_list(paragraph_ids)
+        Report.touch(select(cls.report_id).where(cls.id.in_(paragraph_ids)))
+
+
+    @classmethod
+    def reorder(cls, positions, profile_id):
+        """
+        Меняет порядок параграфов протокола одним UPDATE в одной транзакции.
+        Все параграфы должны принадлежать одному протоколу профиля — это проверяется
+        одним запросом до обновления.
+        Args:
+            positions (dict[int, int]): {paragraph_id: новый paragraph_index}.
+            profile_id (int): ID профиля, которому должен принадлежать протокол.
+        Returns:
+            list[dict]: Новый порядок параграфов протокола [{"id", "paragraph_index"}].
+        """
+        logger.debug(f"(метод reorder класса Paragraph) 🚀 Начато обновление порядка {len(positions)} параграфов")
+        if not positions:
+            logger.error("(метод reorder класса Paragraph) ❌ Нет данных для обновления порядка")
+            raise ValueError("Нет данных для обновления порядка")
+
+        owned = db.session.execute(
+            select(cls.id, cls.report_id)
+            .join(Report, Report.id == cls.report_id)
+            .where(cls.id.in_(list(positions)), Report.profile_id == profile_id)
+        ).all()
+        report_ids = {row.report_id for row in owned}
+        if len(owned) != len(positions) or len(report_ids) != 1:
+            logger.error(f"(метод reorder класса Paragraph) ❌ Параграфы не найдены, принадлежат разным протоколам или чужому профилю")
+            raise ValueError("Параграфы не найдены, принадлежат разным протоколам или чужому профилю")
+        report_id = report_ids.pop()
+
+        try:
+            db.session.execute(
+                _positions_update(cls.__table__, cls.__table__.c.id, cls.__table__.c.paragraph_index, positions)
+            )
+            Report.touch(report_id)
+            new_order = db.session.execute(
+                select(cls.id, cls.paragraph_index)
+                .where(cls.report_id == report_id)
+                .order_by(cls.paragraph_index, cls.id)
+            ).all()
+            commit_session()
+        except Exception as e:
+            rollback_session()
+            logger.error(f"(метод reorder класса Paragraph) ❌ Ошибка при обновлении порядка параграфов: {e}")
+            raise ValueError(f"Ошибка при обновлении порядка параграфов: {e}")
+
+        logger.debug(f"(метод reorder класса Paragraph) ✅ Порядок параграфов протокола ID={report_id} обновлен")
+        return [{"id": row.id, "paragraph_index": row.paragraph_index} for row in new_order]
+
+
+    @classmethod
+    def renumber_indices(cls, report_ids):
+        """
+        Перенумеровывает параграфы протоколов подряд с нуля с сохранением порядка — одним
+        UPDATE с row_number() по протоколу. Строки с уже правильным индексом не трогаются.
+        Коммит остается за вызывающим кодом.
+        Args:
+            report_ids (int | list[int]): ID протоколов.
+        """
+        report_ids = [report_id for report_id in ensure_list(report_ids) if report_id]
+        if not report_ids:
+            return
+        table = cls.__table__
+        ranked = (
+            select(
+                table.c.id,
+                (func.row_number().over(partition_by=table.c.report_id, order_by=(table.c.paragraph_index, table.c.id)) - 1).label("new_index"),
+            )
+            .where(table.c.report_id.in_(report_ids))
+            .subquery("ranked")
+        )
+        db.session.execute(
+            update(table)
+            .where(table.c.id == ranked.c.id, table.c.paragraph_index != ranked.c.new_index)
+            .values(paragraph_index=ranked.c.new_index)
+        )
+
+
+    @classmethod
+    def delete_paragraphs(cls, paragraph_ids, renumber=True):
+        """
+        Удаляет параграфы вместе с head/tail группами, которые после этого ни к чему 
+        не привязаны, и всеми предложениями без других ссылок (SentenceGroupBase.purge_groups).
+        Оставшиеся параграфы протоколов перенумеровываются. Все в одной транзакции,
+        число запросов не зависит от количества предложений.
+        Args:
+            paragraph_ids (int | list[int]): ID параграфов.
+            renumber (bool): Перенумеровать оставшиеся параграфы (не нужно, если удаляется весь протокол).
+        Returns:
+            dict: Сколько удалено групп и предложений по видам (см. purge_groups).
+        """
+        paragraph_ids = ensure_list(paragraph_ids)
+        logger.debug(f"(метод delete_paragraphs класса Paragraph) 🚀 Начато удаление {len(paragraph_ids)} параграфов")
+        rows = db.session.execute(
+            select(cls.report_id, cls.head_sentence_group_id, cls.tail_sentence_group_id).where(cls.id.in_(paragraph_ids))
+        ).all()
+        report_ids = list({row.report_id for row in rows})
+
+        try:
+            Report.touch(report_ids)
+            db.session.execute(delete(cls.__table__).where(cls.__table__.c.id.in_(paragraph_ids)))
+            deleted = SentenceGroupBase.purge_groups(
+                head_group_ids=[row.head_sentence_group_id for row in rows],
+                tail_group_ids=[row.tail_sentence_group_id for row in rows],
+            )
+            if renumber:
+                cls.renumber_indices(report_ids)
+            commit_session()
+        except Exception as e:
+            rollback_session()
+            logger.error(f"(метод delete_paragraphs класса Paragraph) ❌ Ошибка при удалении параграфов: {e}")
+            raise ValueError(f"Ошибка при удалении параграфов: {e}")
+
+        logger.debug(f"(метод delete_paragraphs класса Paragraph) ✅ Удалено параграфов {len(rows)}, групп и предложений: {deleted}")
+        return deleted
+
+
     # Метод для получения групп предложений параграфа. Возвращает кортеж (head_group, tail_group)
     @classmethod
     def get_paragraph_groups(cls, paragraph_id):
@@ -842,6 +1393,11 @@ class SentenceBase(BaseModel):
     sentence = db.Column(db.String(600), nullable=False)
     tags = db.Column(db.String(100), nullable=True)
     comment = db.Column(db.String(255), nullable=True) 
+    link_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # Количество групп с этим предложением, ведется триггером в БД
+    normalized_hash = db.Column(db.String(64), nullable=True)  # sha256 нормализованного текста + tags + comment, заполняется событием before_insert/before_update
+    search_text = db.Column(db.String(600), nullable=True)  # текст без регистра, пунктуации и цифр для pg_trgm, заполняется тем же событием
+    normalized_text = db.Column(db.String(600), nullable=True)  # текст, очищенный для сравнения (KeywordMatcher.clean) с ключевыми словами протокола
+    normalization_version = db.Column(db.String(64), nullable=True)  # версия KeywordMatcher, которой посчитан normalized_text; NULL — еще не посчитан
 
 
     # Перед удалением предложения, удаляем связь с группами
@@ -869,6 +1425,7 @@ class SentenceBase(BaseModel):
 
         # Если у предложения только 1 или 0 связей → удаляем его полностью
         if linked_count <= 1: 
+            cls.touch_reports(sentence_id)
             if cls != HeadSentence:
                 logger.debug(f"(метод delete_sentence класса SentenceBase) ✅ Просто удаляю предложение ID={sentence_id}, так как у него 0 или 1 связь.")
                 sentence.delete()
@@ -889,6 +1446,8 @@ class SentenceBase(BaseModel):
                         BodySentenceGroup.delete_group(related_body_group_id, sentence_id)
                     except Exception as e:
                         logger.error(f"(метод delete_sentence класса SentenceBase) ❌ Ошибка при удалении body группы: {e}")
+                        if in_unit_of_work():
+                            raise
                     sentence.delete()
                     logger.info(f"(метод delete_sentence класса SentenceBase) ✅ head-предложение ID={sentence_id} удалено.")
                     return
@@ -1007,7 +1566,9 @@ class SentenceBase(BaseModel):
         new_sentence_data = {
             "sentence_text": new_text if new_text is not None else sentence.sentence,
             "sentence_type": sentence_type,
-            "report_global_modality_id": sentence.report_global_modality_id
+            "report_global_modality_id": sentence.report_global_modality_id,
+            "tags": new_tags if new_tags is not None else sentence.tags,
+            "comment": new_comment if new_comment is not None else sentence.comment,
             }
         similar_sentence = None
         if use_dublicate:
@@ -1028,8 +1589,10 @@ class SentenceBase(BaseModel):
                 sentence.tags = new_tags
             if new_comment is not None:
                 sentence.comment = new_comment
+            # Предложение может быть в нескольких группах — инвалидируем все протоколы, где оно видно
+            cls.touch_reports(sentence_id)
             logger.info(f"(метод edit_sentence класса SentenceBase) ✅ Предложение ID={sentence_id} успешно отредактировано ('Мягкое' редактирование).")
-            db.session.commit()
+            commit_session()
             return sentence
         
         
@@ -1077,42 +1640,15 @@ class SentenceBase(BaseModel):
             if sentence_index is None:
                 logger.error(f"(метод create класса SentenceBase) ❌ При создании главного предложения обязательно указывать индекс")
                 raise ValueError(f"При создании главного предложения обязательно указывать индекс")
-            paragraph = Paragraph.get_by_id(related_id)
-            if not paragraph:
-                logger.error(f"(метод create класса SentenceBase) ❌ Параграф с ID {related_id} не найден")
-                raise ValueError(f"Параграф с ID {related_id} не найден")
-            class_type = HeadSentence
-
-            group = paragraph.head_sentence_group or HeadSentenceGroup.create()
-            paragraph.head_sentence_group_id = group.id
             sentence_type = "head"
-
         elif cls == BodySentence:
-            head_sentence = HeadSentence.get_by_id(related_id)
-            if not head_sentence:
-                logger.error(f"(метод create класса SentenceBase) ❌ head предложение с ID {related_id} не найдено")
-                raise ValueError(f"head предложение с ID {related_id} не найдено")
-            class_type = BodySentence
-
-            group = head_sentence.body_sentence_group or BodySentenceGroup.create()
-            head_sentence.body_sentence_group_id = group.id
-            logger.warning(f"!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!    Группа body предложения для данного head {head_sentence.id} существует и это ID: {group.id}")
             sentence_type = "body"
-
         elif cls == TailSentence:
-            paragraph = Paragraph.get_by_id(related_id)
-            if not paragraph:
-                logger.error(f"(метод create класса SentenceBase) ❌ Параграф с ID {related_id} не найден")
-                raise ValueError(f"Параграф с ID {related_id} не найден")
-            class_type = TailSentence 
-
-            group = paragraph.tail_sentence_group or TailSentenceGroup.create()
-            paragraph.tail_sentence_group_id = group.id
             sentence_type = "tail"
-
         else:
             logger.error(f"(метод create класса SentenceBase) ❌ Неизвестный тип предложения")
             raise ValueError("Неизвестный тип предложения")
+        group = cls.get_or_create_related_group(related_id)
        
 
         # Проверяем наличие уже в базе такого предложения
@@ -1121,7 +1657,9 @@ class SentenceBase(BaseModel):
             similar_sentence = find_similar_exist_sentence(
                 sentence_text=sentence, 
                 sentence_type=sentence_type, 
-                report_global_modality_id=report_global_modality_id
+                report_global_modality_id=report_global_modality_id,
+                tags=tags,
+                comment=comment,
             )
             if similar_sentence:
                 logger.info(f"(метод create класса SentenceBase) 🧩🧩🧩 Найдено похожее предложение с ID {similar_sentence.id} в базе данных. Создание нового предложения не требуется.")
@@ -1150,7 +1688,7 @@ class SentenceBase(BaseModel):
         new_sentence = cls(**sentence_data)
 
         db.session.add(new_sentence)
-        db.session.commit()  
+        commit_session()  
         
         logger.info(f"(метод create класса SentenceBase)(тип предложения{cls.__name__}) ✅ Предложение создано.")
 
@@ -1241,10 +1779,183 @@ class SentenceBase(BaseModel):
             logger.error(f"(метод link_to_group класса SentenceBase) ❌ Неизвестный тип предложения")
             raise ValueError("Неизвестный тип предложения")
         
-        db.session.commit()
+        if group:
+            type(group).touch_reports(group.id)
+        commit_session()
         logger.debug(f"(метод link_to_group класса SentenceBase) ✅ Предложение {sentence.id} успешно привязано к группе {group.id}")
         return sentence, group
     
+
+    @classmethod
+    def get_or_create_related_group(cls, related_id):
+        """
+        Возвращает группу, в которую добавляются предложения данного типа, создавая её при отсутствии.
+        Для head и tail это группа параграфа, для body — группа head предложения.
+
+        Args:
+            related_id (int): ID параграфа (head/tail) или head предложения (body).
+
+        Returns:
+            SentenceGroupBase: Группа предложений.
+        """
+        if cls == HeadSentence or cls == TailSentence:
+            paragraph = Paragraph.get_by_id(related_id)
+            if not paragraph:
+                logger.error(f"(метод get_or_create_related_group класса SentenceBase) ❌ Параграф с ID {related_id} не найден")
+                raise ValueError(f"Параграф с ID {related_id} не найден")
+            if cls == HeadSentence:
+                group = paragraph.head_sentence_group or HeadSentenceGroup.create()
+                paragraph.head_sentence_group_id = group.id
+            else:
+                group = paragraph.tail_sentence_group or TailSentenceGroup.create()
+                paragraph.tail_sentence_group_id = group.id
+        elif cls == BodySentence:
+            head_sentence = HeadSentence.get_by_id(related_id)
+            if not head_sentence:
+                logger.error(f"(метод get_or_create_related_group класса SentenceBase) ❌ head предложение с ID {related_id} не найдено")
+                raise ValueError(f"head предложение с ID {related_id} не найдено")
+            group = head_sentence.body_sentence_group or BodySentenceGroup.create()
+            head_sentence.body_sentence_group_id = group.id
+        else:
+            logger.error(f"(метод get_or_create_related_group класса SentenceBase) ❌ Неизвестный тип предложения")
+            raise ValueError("Неизвестный тип предложения")
+        logger.debug(f"(метод get_or_create_related_group класса SentenceBase) Группа {cls.__name__} для родительской сущности {related_id}: ID={group.id}")
+        return group
+    
+    
+    @classmethod
+    def find_exact_duplicates(cls, user_id, report_global_modality_id, candidates):
+        """
+        Ищет точные дубли предложений (нормализованный текст + tags + comment) одним запросом 
+        по индексу (user_id, report_global_modality_id, normalized_hash).
+
+        Args:
+            user_id (int): ID пользователя.
+            report_global_modality_id (int): ID глобальной модальности.
+            candidates (Iterable[tuple]): Кортежи (sentence, tags, comment).
+
+        Returns:
+            dict: {(sentence, tags, comment): найденное предложение} — только для найденных кандидатов.
+        """
+        candidates_by_hash = defaultdict(list)
+        for candidate in candidates:
+            candidates_by_hash[sentence_normalized_hash(*candidate)].append(candidate)
+        if not candidates_by_hash:
+            return {}
+
+        rows = (
+            cls.query
+            .filter(
+                cls.user_id == user_id,
+                cls.report_global_modality_id == report_global_modality_id,
+                cls.normalized_hash.in_(list(candidates_by_hash)),
+            )
+            .order_by(cls.id)
+            .all()
+        )
+        found = {}
+        for sentence in rows:
+            # Сверяем нормализованные текст, теги и комментарий на случай коллизии хэша
+            normalized = tuple(map(normalize_sentence_text, (sentence.sentence, sentence.tags, sentence.comment)))
+            for candidate in candidates_by_hash[sentence.normalized_hash]:
+                if candidate not in found and tuple(map(normalize_sentence_text, candidate)) == normalized:
+                    found[candidate] = sentence
+        return found
+    
+    
+    @classmethod
+    def bulk_create(cls, items, group_id, user_id, report_global_modality_id, unique=False):
+        """
+        Создает пачку предложений одного типа и привязывает их к группе одной транзакцией.
+        Дубли ищутся одним запросом (и внутри самой пачки), новые предложения вставляются 
+        одним многострочным INSERT ... RETURNING, связи — INSERT ... ON CONFLICT DO NOTHING.
+
+        Args:
+            items (list[dict]): Предложения: {"sentence", "tags", "comment", "sentence_index" (только head) 
+                или "sentence_weight" (body/tail, по умолчанию 1)}. Необязательные "normalized_text" и
+                "normalization_version" сохраняются у новых предложений.
+            group_id (int): ID группы, к которой привязываются предложения.
+            user_id (int): ID пользователя.
+            report_global_modality_id (int): ID глобальной модальности.
+            unique (bool, optional): Если True, дубли не ищутся и для каждого элемента создается новое предложение.
+
+        Returns:
+            list[int]: ID предложений (найденных или созданных) в порядке items.
+        """
+        if not items:
+            return []
+        logger.info(f"(метод bulk_create класса SentenceBase)(тип предложения: {cls.__name__}) 🚀 Начато создание {len(items)} предложений для группы {group_id}")
+        link_table, sentence_field, index_field = cls.get_link_columns()
+        group_class = cls.get_group_class()
+        if not db.session.get(group_class, group_id):
+            logger.error(f"(метод bulk_create класса SentenceBase) ❌ Группа {group_class.__name__} ID={group_id} не найдена")
+            raise ValueError(f"Группа {group_class.__name__} ID={group_id} не найдена")
+
+        prepared = []
+        for item in items:
+            index_or_weight = item.get(index_field.name)
+            if index_or_weight is None:
+                if cls == HeadSentence:
+                    logger.error(f"(метод bulk_create класса SentenceBase) ❌ При создании главного предложения обязательно указывать индекс")
+                    raise ValueError(f"При создании главного предложения обязательно указывать индекс")
+                index_or_weight = 1
+            sentence = (item.get("sentence") or "").strip() or "Пустое предложение"
+            prepared.append((sentence, item.get("tags"), item.get("comment"), index_or_weight))
+
+        try:
+            existing = {} if unique else cls.find_exact_duplicates(
+                user_id, report_global_modality_id, [(sentence, tags, comment) for sentence, tags, comment, _ in prepared]
+            )
+            sentence_ids = [None] * len(prepared)
+            # Одинаковые новые предложения внутри пачки вставляем один раз
+            positions_by_key = defaultdict(list)
+            for position, (sentence, tags, comment, _) in enumerate(prepared):
+                found = existing.get((sentence, tags, comment))
+                if found:
+                    sentence_ids[position] = found.id
+                else:
+                    key = position if unique else sentence_normalized_hash(sentence, tags, comment)
+                    positions_by_key[key].append(position)
+
+            if positions_by_key:
+                # ORM bulk INSERT не вызывает событие before_insert, поэтому хэш и search_text считаем сами
+                rows = []
+                for positions in positions_by_key.values():
+                    sentence, tags, comment, _ = prepared[positions[0]]
+                    item = items[positions[0]]
+                    rows.append({
+                        "sentence": sentence,
+                        "tags": tags,
+                        "comment": comment,
+                        "user_id": user_id,
+                        "report_global_modality_id": report_global_modality_id,
+                        "normalized_hash": sentence_normalized_hash(sentence, tags, comment),
+                        "search_text": sentence_search_text(sentence),
+                        "normalized_text": item.get("normalized_text"),
+                        "normalization_version": item.get("normalization_version"),
+                    })
+                new_ids = db.session.scalars(insert(cls).returning(cls.id, sort_by_parameter_order=True), rows).all()
+                for new_id, positions in zip(new_ids, positions_by_key.values()):
+                    for position in positions:
+                        sentence_ids[position] = new_id
+
+            # Если предложение уже в группе, связь (и её индекс/вес) не меняем — как в link_to_group
+            link_rows = {}
+            for sentence_id, (_, _, _, index_or_weight) in zip(sentence_ids, prepared):
+                link_rows.setdefault(sentence_id, {sentence_field.name: sentence_id, "group_id": group_id, index_field.name: index_or_weight})
+            dialect_insert = sqlite_insert if db.session.get_bind().dialect.name == "sqlite" else postgresql_insert
+            db.session.execute(dialect_insert(link_table).on_conflict_do_nothing(), list(link_rows.values()))
+
+            group_class.touch_reports(group_id)
+            commit_session()
+        except Exception as e:
+            rollback_session()
+            logger.error(f"(метод bulk_create класса SentenceBase) ❌ Ошибка при создании предложений для группы {group_id}: {e}")
+            raise ValueError(f"Ошибка при создании предложений для группы {group_id}: {e}")
+
+        logger.info(f"(метод bulk_create класса SentenceBase) ✅ Привязано {len(link_rows)} предложений к группе {group_id}, из них новых: {len(positions_by_key)}")
+        return sentence_ids
+    
     
 
     @classmethod
@@ -1270,22 +1981,25 @@ class SentenceBase(BaseModel):
             group = HeadSentenceGroup.query.get(group_id)
             if group and sentence in group.head_sentences:
                 group.head_sentences.remove(sentence)
+                type(group).touch_reports(group.id)
                 logger.debug(f"(метод unlink_fro_group класса SentenceBase) ✅ Предложение {cls.__name__} с ID: {sentence.id} удалено из группы {group.id}")
-                db.session.commit()
+                commit_session()
                 return True
         elif isinstance(sentence, BodySentence):
             group = BodySentenceGroup.query.get(group_id)
             if group and sentence in group.body_sentences:
                 group.body_sentences.remove(sentence)
+                type(group).touch_reports(group.id)
                 logger.debug(f"(метод unlink_fro_group класса SentenceBase) ✅ Предложение {cls.__name__} с ID: {sentence.id} удалено из группы {group.id}")
-                db.session.commit()
+                commit_session()
                 return True
         elif isinstance(sentence, TailSentence):
             group = TailSentenceGroup.query.get(group_id)
             if group and sentence in group.tail_sentences:
                 group.tail_sentences.remove(sentence)
+                type(group).touch_reports(group.id)
                 logger.debug(f"(метод unlink_fro_group класса SentenceBase) ✅ Предложение {cls.__name__} с ID: {sentence.id} удалено из группы {group.id}")
-                db.session.commit()
+                commit_session()
                 return True
         else:
             logger.error(f"(метод unlink_fro_group класса SentenceBase) ❌ Изменения не были внесены")
@@ -1294,36 +2008,336 @@ class SentenceBase(BaseModel):
 
     
     @classmethod
-    def is_linked(cls, sentence_id):
+    def get_link_columns(cls):
         """
-        Проверяет, с каким количеством групп связано предложение.
-        Args:
-            sentence_id (int): ID предложения.
+        Возвращает таблицу связей предложения с группами и её колонки.
         Returns:
-            int: Количество групп, с которыми связано предложение.
+            tuple: (таблица связей, колонка ID предложения, колонка индекса/веса)
         """
-        logger.debug(f"Проверка количества связей для предложения ID={sentence_id}")
-        sentence = cls.query.get(sentence_id)
-        if not sentence:
-            return 0
-        
-        if isinstance(sentence, HeadSentence):
-            return db.session.query(func.count(HeadSentenceGroup.id)).join(HeadSentence.groups).filter(HeadSentence.id == sentence_id).scalar()
-
-        elif isinstance(sentence, BodySentence):
-            return db.session.query(func.count(BodySentenceGroup.id)).join(BodySentence.groups).filter(BodySentence.id == sentence_id).scalar()
-
-        elif isinstance(sentence, TailSentence):
-            return db.session.query(func.count(TailSentenceGroup.id)).join(TailSentence.groups).filter(TailSentence.id == sentence_id).scalar()
-
-        return 0
+        if cls == HeadSentence:
+            link_table = head_sentence_group_link
+            return link_table, link_table.c.head_sentence_id, link_table.c.sentence_index
+        elif cls == BodySentence:
+            link_table = body_sentence_group_link
+            return link_table, link_table.c.body_sentence_id, link_table.c.sentence_weight
+        elif cls == TailSentence:
+            link_table = tail_sentence_group_link
+            return link_table, link_table.c.tail_sentence_id, link_table.c.sentence_weight
+        logger.error(f"(метод get_link_columns класса SentenceBase) ❌ Неизвестный тип предложения: {cls.__name__}")
+        raise ValueError(f"Неизвестный тип предложения: {cls.__name__}")
     
     
     @classmethod
-    def get_sentence_index_or_weight(cls, sentence_id, group_id):
+    def get_group_class(cls):
         """
-        Получает индекс или вес предложения из таблицы связей.
-        
+        Возвращает класс группы, в которую входят предложения данного типа.
+        """
+        if cls == HeadSentence:
+            return HeadSentenceGroup
+        elif cls == BodySentence:
+            return BodySentenceGroup
+        elif cls == TailSentence:
+            return TailSentenceGroup
+        logger.error(f"(метод get_group_class класса SentenceBase) ❌ Неизвестный тип предложения: {cls.__name__}")
+        raise ValueError(f"Неизвестный тип предложения: {cls.__name__}")
+    
+    
+    @classmethod
+    def touch_reports(cls, sentence_ids):
+        """
+        Увеличивает revision всех протоколов, в группах которых есть данные предложения.
+        Args:
+            sentence_ids (int | list[int] | Select): ID предложений или подзапрос, возвращающий ID.
+        """
+        if not isinstance(sentence_ids, Select):
+            sentence_ids = ensure_list(sentence_ids)
+        link_table, sentence_field, _ = cls.get_link_columns()
+        group_ids = select(link_table.c.group_id).where(sentence_field.in_(sentence_ids))
+        cls.get_group_class().touch_reports(group_ids)
+    
+    
+    @classmethod
+    def get_normalized_texts(cls, sentence_ids, normalization_version):
+        """
+        Возвращает сохраненные нормализованные тексты предложений, посчитанные с заданной версией.
+        Args:
+            sentence_ids (Iterable[int]): ID предложений.
+            normalization_version (str): Версия KeywordMatcher.
+        Returns:
+            dict: {sentence_id: normalized_text} — только для предложений с этой версией.
+        """
+        sentence_ids = list(sentence_ids)
+        if not sentence_ids:
+            return {}
+        rows = db.session.execute(
+            select(cls.id, cls.normalized_text)
+            .where(cls.id.in_(sentence_ids), cls.normalization_version == normalization_version)
+        ).all()
+        return dict(rows)
+
+
+    @classmethod
+    def store_normalized_texts(cls, normalized_texts, normalization_version):
+        """
+        Сохраняет нормализованные тексты предложений одним UPDATE по первичному ключу (без коммита).
+        Args:
+            normalized_texts (dict): {sentence_id: normalized_text}.
+            normalization_version (str): Версия KeywordMatcher, которой они посчитаны.
+        """
+        if not normalized_texts:
+            return
+        db.session.execute(update(cls), [
+            {"id": sentence_id, "normalized_text": normalized_text, "normalization_version": normalization_version}
+            for sentence_id, normalized_text in normalized_texts.items()
+        ])
+
+
+    @classmethod
+    def find_stale_normalized(cls, report_id, normalization_version, limit, after_id=0):
+        """
+        Находит предложения групп протокола, у которых нет нормализованного текста нужной версии.
+        Args:
+            report_id (int): ID протокола.
+            normalization_version (str): Актуальная версия KeywordMatcher протокола.
+            limit (int): Сколько строк вернуть.
+            after_id (int): Вернуть только предложения с ID больше этого (постраничный обход).
+        Returns:
+            list[Row]: Строки (id, sentence) по возрастанию ID.
+        """
+        link_table, sentence_field, _ = cls.get_link_columns()
+        query = select(cls.id, cls.sentence).join(link_table, sentence_field == cls.id)
+        if cls == HeadSentence:
+            query = query.join(Paragraph, Paragraph.head_sentence_group_id == link_table.c.group_id)
+        elif cls == BodySentence:
+            head_link_table, head_sentence_field, _ = HeadSentence.get_link_columns()
+            query = (
+                query.join(HeadSentence, HeadSentence.body_sentence_group_id == link_table.c.group_id)
+                .join(head_link_table, head_sentence_field == HeadSentence.id)
+                .join(Paragraph, Paragraph.head_sentence_group_id == head_link_table.c.group_id)
+            )
+        elif cls == TailSentence:
+            query = query.join(Paragraph, Paragraph.tail_sentence_group_id == link_table.c.group_id)
+        else:
+            logger.error(f"(метод find_stale_normalized класса SentenceBase) ❌ Неизвестный тип предложения: {cls.__name__}")
+            raise ValueError(f"Неизвестный тип предложения: {cls.__name__}")
+        return db.session.execute(
+            query.where(
+                Paragraph.report_id == report_id,
+                cls.id > after_id,
+                or_(cls.normalization_version.is_(None), cls.normalization_version != normalization_version),
+            )
+            .distinct()
+            .order_by(cls.id)
+            .limit(limit)
+        ).all()
+
+
+    @classmethod
+    def has_pending_normalization(cls, user_id):
+        """Есть ли у пользователя предложения, для которых нормализованный текст еще не считался."""
+        return db.session.execute(
+            select(exists().where(cls.user_id == user_id, cls.normalization_version.is_(None)))
+        ).scalar()
+
+
+    @classmethod
+    def count_links(cls, sentence_ids):
+        """
+        Считает количество групп для набора предложений одним запросом (GROUP BY).
+        Args:
+            sentence_ids (Iterable[int]): ID предложений.
+        Returns:
+            dict: {sentence_id: количество групп}. Предложения без связей в словарь не попадают.
+        """
+        sentence_ids = list(sentence_ids)
+        if not sentence_ids:
+            return {}
+        link_table, sentence_field, _ = cls.get_link_columns()
+        rows = (
+            db.session.query(sentence_field, func.count(link_table.c.group_id))
+            .filter(sentence_field.in_(sentence_ids))
+            .group_by(sentence_field)
+            .all()
+        )
+        return {sentence_id: count for sentence_id, count in rows}
+    
+    
+    @classmethod
+    def is_linked(cls, sentence_id):
+        """
+        Проверяет, с каким количеством групп связано предложение.
+        Args:
+            sentence_id (int): ID предложения.
+        Returns:
+            int: Количество групп, с которыми связано предложение.
+        """
+        logger.debug(f"Проверка количества связей для предложения ID={sentence_id}")
+        # Читаем колонку, а не атрибут объекта: триггер мог обновить ее в этой же транзакции
+        return db.session.query(cls.link_count).filter(cls.id == sentence_id).scalar() or 0
+    
+    
+    @classmethod
+    def repair_link_counts(cls):
+        """
+        Пересчитывает link_count всех предложений данного типа одним проходом GROUP BY 
+        по таблице связей. Обновляет только расходящиеся строки. Коммит остается за вызывающим кодом.
+        Returns:
+            int: Количество исправленных предложений.
+        """
+        link_table, sentence_field, _ = cls.get_link_columns()
+        counts = (
+            select(cls.id.label("id"), func.count(link_table.c.group_id).label("link_count"))
+            .select_from(cls)
+            .outerjoin(link_table, sentence_field == cls.id)
+            .group_by(cls.id)
+            .subquery()
+        )
+        table = cls.__table__
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == counts.c.id)
+            .where(table.c.link_count != counts.c.link_count)
+            .values(link_count=counts.c.link_count)
+        )
+        logger.info(f"(метод repair_link_counts класса SentenceBase)({cls.__name__}) ✅ Исправлено счетчиков: {result.rowcount}")
+        return result.rowcount
+
+
+    @classmethod
+    def orphan_filter(cls):
+        """Условие anti-join для предложений, которые не входят ни в одну группу."""
+        _, sentence_field, _ = cls.get_link_columns()
+        return ~exists().where(sentence_field == cls.id)
+
+
+    @classmethod
+    def delete_orphans(cls, batch_size, max_id=None):
+        """
+        Удаляет одну пачку предложений без связей с группами (не больше batch_size, по возрастанию ID).
+        Строки, заблокированные другими транзакциями (например, их как раз привязывают к группе), 
+        пропускаются (FOR UPDATE SKIP LOCKED в PostgreSQL). Коммит остается за вызывающим кодом.
+        Args:
+            batch_size (int): Размер пачки.
+            max_id (int, optional): Рассматривать только предложения с ID не больше этого.
+        Returns:
+            int: Количество удаленных предложений.
+        """
+        query = select(cls.id).where(cls.orphan_filter())
+        if max_id is not None:
+            query = query.where(cls.id <= max_id)
+        orphan_ids = db.session.execute(
+            query.order_by(cls.id).limit(batch_size).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if orphan_ids:
+            db.session.execute(delete(cls.__table__).where(cls.__table__.c.id.in_(orphan_ids)))
+        return len(orphan_ids)
+
+
+    @classmethod
+    def merge_duplicates(cls, keep_id, duplicate_ids, threshold=None):
+        """
+        Сливает почти одинаковые предложения в одно: связи дублей с группами переводятся на оставляемое
+        предложение пачкой UPDATE, сами дубли удаляются. Если в группе уже есть оставляемое предложение
+        (или несколько дублей), остается одна связь: у body/tail ее вес — сумма весов, у head — индекс
+        оставляемой связи (или наименьший из индексов дублей). link_count ведут триггеры.
+        Накопленные в Redis приросты весов дублей после коммита переносятся на оставляемое предложение.
+        Коммит остается за вызывающим кодом.
+
+        Кластеры дублей могли устареть (текст правили после поиска), поэтому сходство проверяется
+        заново по текущему тексту: дубль с коэффициентом Жаккара ниже порога отменяет слияние.
+        Args:
+            keep_id (int): ID предложения, которое остается.
+            duplicate_ids (Iterable[int]): ID удаляемых дублей.
+            threshold (float, optional): Порог сходства. По умолчанию DUPLICATE_CLUSTERS_THRESHOLD.
+        Returns:
+            int: Количество удаленных дублей.
+        Raises:
+            ValueError: Предложения не найдены, принадлежат разным пользователям или модальностям,
+                у head предложений разные body группы или текст дубля уже не похож на оставляемый.
+        """
+        from app.utils.sentence_processing import jaccard_similarity, near_duplicate_text, text_shingles
+
+        duplicate_ids = [sentence_id for sentence_id in dict.fromkeys(ensure_list(duplicate_ids)) if sentence_id != keep_id]
+        if not duplicate_ids:
+            return 0
+        sentence_ids = [keep_id, *duplicate_ids]
+        logger.info(f"(метод merge_duplicates класса SentenceBase)({cls.__name__}) 🚀 Сливаю предложения {duplicate_ids} в ID={keep_id}")
+
+        columns = [cls.id, cls.user_id, cls.report_global_modality_id, cls.sentence, cls.normalized_text]
+        if cls == HeadSentence:
+            columns.append(cls.body_sentence_group_id)
+        rows = {row.id: row for row in db.session.execute(select(*columns).where(cls.id.in_(sentence_ids))).all()}
+        missing = [sentence_id for sentence_id in sentence_ids if sentence_id not in rows]
+        if missing:
+            logger.error(f"(метод merge_duplicates класса SentenceBase) ❌ Предложения не найдены: {missing}")
+            raise ValueError(f"Предложения не найдены: {missing}")
+        keep = rows[keep_id]
+        if any((row.user_id, row.report_global_modality_id) != (keep.user_id, keep.report_global_modality_id) for row in rows.values()):
+            logger.error(f"(метод merge_duplicates класса SentenceBase) ❌ Предложения {sentence_ids} принадлежат разным пользователям или модальностям")
+            raise ValueError("Сливать можно только предложения одного пользователя и одной модальности")
+        if cls == HeadSentence:
+            # У head предложения своя body группа: слияние с разными группами потеряло бы body предложения
+            body_group_ids = {row.body_sentence_group_id for row in rows.values()} - {None}
+            if len(body_group_ids) > 1:
+                logger.error(f"(метод merge_duplicates класса SentenceBase) ❌ У предложений {sentence_ids} разные body группы: {body_group_ids}")
+                raise ValueError("У главных предложений разные body группы, слияние отменено")
+        threshold = threshold or current_app.config.get("DUPLICATE_CLUSTERS_THRESHOLD", 0.8)
+        keep_shingles = text_shingles(near_duplicate_text(keep.sentence, keep.normalized_text))
+        dissimilar = [
+            sentence_id for sentence_id in duplicate_ids
+            if jaccard_similarity(keep_shingles, text_shingles(near_duplicate_text(rows[sentence_id].sentence, rows[sentence_id].normalized_text))) < threshold
+        ]
+        if dissimilar:
+            logger.error(f"(метод merge_duplicates класса SentenceBase) ❌ Предложения {dissimilar} уже не похожи на ID={keep_id} (порог {threshold})")
+            raise ValueError(f"Текст предложений {dissimilar} изменился и уже не совпадает с оставляемым, слияние отменено")
+
+        link_table, sentence_field, position_field = cls.get_link_columns()
+        cls.touch_reports(sentence_ids)
+        links_by_group = defaultdict(list)
+        for group_id, sentence_id, position in db.session.execute(
+            select(link_table.c.group_id, sentence_field, position_field).where(sentence_field.in_(sentence_ids))
+        ).all():
+            links_by_group[group_id].append((sentence_id, position))
+
+        repointed, weights = [], []
+        for group_id, links in links_by_group.items():
+            if not any(sentence_id == keep_id for sentence_id, _ in links):
+                sentence_id, _ = min(links, key=lambda link: (link[1], link[0]))
+                repointed.append({"b_group_id": group_id, "b_sentence_id": sentence_id})
+            if cls != HeadSentence and len(links) > 1:
+                weights.append({"b_group_id": group_id, "b_weight": sum(position for _, position in links)})
+
+        if repointed:
+            db.session.execute(
+                link_table.update()
+                .where(link_table.c.group_id == bindparam("b_group_id"), sentence_field == bindparam("b_sentence_id"))
+                .values({sentence_field.name: keep_id}),
+                repointed,
+            )
+        if weights:
+            db.session.execute(
+                link_table.update()
+                .where(link_table.c.group_id == bindparam("b_group_id"), sentence_field == keep_id)
+                .values({position_field.name: bindparam("b_weight")}),
+                weights,
+            )
+        db.session.execute(delete(link_table).where(sentence_field.in_(duplicate_ids)))
+        if cls == HeadSentence and keep.body_sentence_group_id is None and body_group_ids:
+            db.session.execute(update(cls).where(cls.id == keep_id).values(body_sentence_group_id=body_group_ids.pop()))
+        db.session.execute(delete(cls.__table__).where(cls.__table__.c.id.in_(duplicate_ids)))
+        if cls != HeadSentence and current_app.config.get("SENTENCE_WEIGHT_WRITE_BEHIND"):
+            sentence_type = "body" if cls == BodySentence else "tail"
+            group_ids = list(links_by_group)
+            after_commit(lambda: move_buffered_weights(sentence_type, group_ids, keep_id, duplicate_ids))
+        logger.info(f"(метод merge_duplicates класса SentenceBase)({cls.__name__}) ✅ Переведено связей: {len(repointed)}, удалено дублей: {len(duplicate_ids)}")
+        return len(duplicate_ids)
+
+
+    @classmethod
+    def get_sentence_index_or_weight(cls, sentence_id, group_id):
+        """
+        Получает индекс или вес предложения из таблицы связей.
+        
         Args:
             sentence_id (int): ID предложения.
             group_id (int): ID группы.
@@ -1433,10 +2447,96 @@ class SentenceBase(BaseModel):
             logger.error(f"(Обновление позиции - set_sentence_index_or_weight) ❌ Неизвестный тип предложения: {cls.__name__}")
             raise ValueError(f"Неизвестный тип предложения: {cls.__name__}")
 
-        db.session.commit()
+        cls.get_group_class().touch_reports(group_id)
+        commit_session()
         logger.debug(f"(Обновление позиции - set_sentence_index_or_weight)(тип предложения: {cls.__name__}) ✅ Обновление позиции завершено.")
 
 
+    @classmethod
+    def reorder_in_group(cls, group_id, positions):
+        """
+        Проставляет новые индексы (head) или веса (body/tail) предложениям группы
+        одним UPDATE в одной транзакции. Одним запросом проверяется, что все предложения
+        входят в группу: принадлежность самой группы профилю проверяет вызывающий код.
+        Args:
+            group_id (int): ID группы.
+            positions (dict[int, int]): {sentence_id: новый индекс/вес}.
+        Returns:
+            list[dict]: Новый порядок предложений группы [{"id", "position"}].
+        """
+        logger.debug(f"(метод reorder_in_group класса SentenceBase) (тип предложения {cls.__name__}) 🚀 Начато обновление порядка {len(positions)} предложений в группе ID={group_id}")
+        if not positions:
+            logger.error("(метод reorder_in_group класса SentenceBase) ❌ Нет данных для обновления порядка")
+            raise ValueError("Нет данных для обновления порядка")
+
+        link_table, sentence_field, index_field = cls.get_link_columns()
+        owned = db.session.execute(
+            select(sentence_field)
+            .where(link_table.c.group_id == group_id, sentence_field.in_(list(positions)))
+        ).scalars().all()
+        if len(owned) != len(positions):
+            logger.error(f"(метод reorder_in_group класса SentenceBase) ❌ Не все предложения входят в группу ID={group_id}")
+            raise ValueError("Не все предложения входят в группу")
+
+        try:
+            db.session.execute(
+                _positions_update(link_table, sentence_field, index_field, positions, link_table.c.group_id == group_id)
+            )
+            cls.get_group_class().touch_reports(group_id)
+            new_order = db.session.execute(
+                select(sentence_field, index_field)
+                .where(link_table.c.group_id == group_id)
+                .order_by(index_field, sentence_field)
+            ).all()
+            commit_session()
+        except Exception as e:
+            rollback_session()
+            logger.error(f"(метод reorder_in_group класса SentenceBase) ❌ Ошибка при обновлении порядка предложений: {e}")
+            raise ValueError(f"Ошибка при обновлении порядка предложений: {e}")
+
+        logger.debug(f"(метод reorder_in_group класса SentenceBase) (тип предложения {cls.__name__}) ✅ Порядок предложений группы ID={group_id} обновлен")
+        return [{"id": sentence_id, "position": position} for sentence_id, position in new_order]
+
+
+
+    @classmethod
+    def apply_weight_deltas(cls, deltas):
+        """
+        Прибавляет накопленные приросты к весам body/tail предложений одним UPDATE
+        и увеличивает revision затронутых протоколов. В PostgreSQL это
+        UPDATE ... FROM (VALUES (group_id, sentence_id, delta), ...), в SQLite — executemany.
+        Args:
+            deltas (dict): {(group_id, sentence_id): прирост веса}.
+        """
+        if cls not in (BodySentence, TailSentence):
+            logger.error(f"(метод apply_weight_deltas класса SentenceBase) ❌ Вес есть только у body и tail предложений, получено: {cls.__name__}")
+            raise ValueError(f"Вес есть только у body и tail предложений, получено: {cls.__name__}")
+        if not deltas:
+            return
+
+        link_table, sentence_field, weight_field = cls.get_link_columns()
+        if db.session.get_bind().dialect.name == "postgresql":
+            new_weights = values(
+                column("group_id", link_table.c.group_id.type), column("sentence_id", sentence_field.type),
+                column("delta", weight_field.type), name="weight_deltas",
+            ).data([(group_id, sentence_id, delta) for (group_id, sentence_id), delta in deltas.items()])
+            db.session.execute(
+                update(link_table)
+                .where(link_table.c.group_id == new_weights.c.group_id, sentence_field == new_weights.c.sentence_id)
+                .values({weight_field.name: func.coalesce(weight_field, 0) + new_weights.c.delta})
+            )
+        else:
+            db.session.execute(
+                update(link_table)
+                .where(link_table.c.group_id == bindparam("row_group_id"), sentence_field == bindparam("row_sentence_id"))
+                .values({weight_field.name: func.coalesce(weight_field, 0) + bindparam("row_delta")}),
+                [{"row_group_id": group_id, "row_sentence_id": sentence_id, "row_delta": delta}
+                 for (group_id, sentence_id), delta in deltas.items()],
+            )
+        cls.get_group_class().touch_reports(list({group_id for group_id, _ in deltas}))
+        commit_session()
+        logger.debug(f"(метод apply_weight_deltas класса SentenceBase) ✅ Веса {len(deltas)} предложений ({cls.__name__}) обновлены")
+
 class HeadSentence(SentenceBase):
     __tablename__ = "head_sentences"
     body_sentence_group_id = db.Column(db.BigInteger, db.ForeignKey("body_sentence_groups.id", ondelete="SET NULL"))
@@ -1466,6 +2566,10 @@ class BodySentence(SentenceBase):
     @staticmethod
     def increase_weight(sentence_id, group_id):
         logger.debug(f"(increase_weight) 🚀 Начато увеличение веса предложения ID={sentence_id} в группе ID={group_id}")
+        # Обычно прирост копится в Redis и переносится в базу пачкой (flush_buffered_sentence_weights)
+        if current_app.config.get("SENTENCE_WEIGHT_WRITE_BEHIND") and buffer_sentence_weight("body", group_id, sentence_id):
+            logger.debug(f"(increase_weight) ✅ Прирост веса предложения ID={sentence_id} в группе ID={group_id} отложен в Redis")
+            return
         link_table = body_sentence_group_link
         try:
             stmt = (
@@ -1476,7 +2580,8 @@ class BodySentence(SentenceBase):
             )
 
             db.session.execute(stmt)
-            db.session.commit()
+            BodySentenceGroup.touch_reports(group_id)
+            commit_session()
             logger.debug(f"(increase_weight) ✅ Вес предложения ID={sentence_id} увеличен на 1 в группе ID={group_id}")
         except Exception as e:
             logger.error(f"(increase_weight) ❌ Ошибка при увеличении веса предложения ID={sentence_id} в группе ID={group_id}: {e}")
@@ -1496,6 +2601,10 @@ class TailSentence(SentenceBase):
     @staticmethod
     def increase_weight(sentence_id, group_id):
         logger.debug(f"(increase_weight) 🚀 Начато увеличение веса предложения ID={sentence_id} в группе ID={group_id}")
+        # Обычно прирост копится в Redis и переносится в базу пачкой (flush_buffered_sentence_weights)
+        if current_app.config.get("SENTENCE_WEIGHT_WRITE_BEHIND") and buffer_sentence_weight("tail", group_id, sentence_id):
+            logger.debug(f"(increase_weight) ✅ Прирост веса предложения ID={sentence_id} в группе ID={group_id} отложен в Redis")
+            return
         link_table = tail_sentence_group_link
         try:
             stmt = (
@@ -1506,18 +2615,49 @@ class TailSentence(SentenceBase):
             )
 
             db.session.execute(stmt)
-            db.session.commit()
+            TailSentenceGroup.touch_reports(group_id)
+            commit_session()
             logger.debug(f"(increase_weight) ✅ Вес предложения ID={sentence_id} увеличен на 1 в группе ID={group_id}")
         except Exception as e:
             logger.error(f"(increase_weight) ❌ Ошибка при увеличении веса предложения ID={sentence_id} в группе ID={group_id}: {e}")
             raise ValueError(f"Ошибка при увеличении веса предложения ID={sentence_id} в группе ID={group_id}: {e}")
     
     
+# normalized_hash пересчитывается при любом сохранении предложения через ORM (create, edit, прямое присваивание полей)
+@event.listens_for(SentenceBase, "before_insert", propagate=True)
+@event.listens_for(SentenceBase, "before_update", propagate=True)
+def _set_sentence_normalized_hash(mapper, connection, target):
+    target.normalized_hash = sentence_normalized_hash(target.sentence, target.tags, target.comment)
+    target.search_text = sentence_search_text(target.sentence)
+    # normalized_text зависит от ключевых слов протокола, которых здесь нет: если текст поменяли,
+    # а нормализованный текст не передали, сбрасываем его — пересчитает renormalize_sentences
+    if attributes.get_history(target, "sentence").has_changes() and not attributes.get_history(target, "normalized_text").has_changes():
+        target.normalized_text = None
+        target.normalization_version = None
+
+
+# Полосы MinHash посчитаны по старому тексту: при правке текста на месте они удаляются,
+# а предложение после коммита ставится в очередь повторного хэширования (cluster_near_duplicates)
+@event.listens_for(SentenceBase, "before_update", propagate=True)
+def _invalidate_sentence_minhash_bands(mapper, connection, target):
+    if not attributes.get_history(target, "sentence").has_changes():
+        return
+    sentence_type = next(name for name, sentence_class in SENTENCE_TYPES.items() if isinstance(target, sentence_class))
+    connection.execute(
+        delete(SentenceMinhashBand.__table__)
+        .where(SentenceMinhashBand.sentence_type == sentence_type, SentenceMinhashBand.sentence_id == target.id)
+    )
+    sentence_id = target.id
+    after_commit(lambda: mark_sentences_for_rehash(sentence_type, [sentence_id]))
+    
+    
 class SentenceGroupBase(BaseModel):
     """
     Базовый класс для групп предложений (HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup).
     """
     __abstract__ = True  
+    
+    link_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")  # Количество родительских сущностей группы, ведется триггером в БД
 
 
     @classmethod
@@ -1525,6 +2665,8 @@ class SentenceGroupBase(BaseModel):
         """
         Удаляет группу, если она больше нигде не используется.
         Если у группы несколько связей, просто удаляет связь с переданной сущностью.
+        Предложения группы, body группы ее head предложений и их предложения удаляются
+        пачкой через purge_groups — только те, на которые больше ничто не ссылается.
         Args:
             group_id (int): ID группы, которую нужно удалить.
             entity_id (int): ID сущности (параграфа или предложения), откуда поступил запрос.
@@ -1532,71 +2674,155 @@ class SentenceGroupBase(BaseModel):
             ValueError: Если группа не найдена или её нельзя удалить.
         """
         logger.info(f"(метод delete_group класса SentenceGroupBase) 🚀 Начата попытка удаления группы ID={group_id} для родительской сущности ID={entity_id}")
+        if cls not in (HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup):
+            logger.error(f"(метод delete_group класса SentenceGroupBase) ❌ Неизвестный тип группы: {cls.__name__}")
+            raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
+
         group = cls.query.get(group_id)
         if not group:
             logger.info(f"(метод delete_group класса SentenceGroupBase) ❌ Группа ID={group_id} не найдена.")
             raise ValueError(f"Группа ID={group_id} не найдена.")
 
-
         # Если не передана информация о сущности → удаляем группу полностью
         if entity_id is None:
             logger.info(f"(метод delete_group класса SentenceGroupBase) ❌ Не передана информация о родительской сущности. Ошибка.")
             raise ValueError("Удаление группы невозможно так как не передана информация о родительской сущности.")
-        
-        # Проверяем, с каким количеством сущностей связана группа
-        linked_count = cls.is_linked(group_id)
-        logger.info(f"(метод delete_group класса SentenceGroupBase) Группа ID={group_id} связана с {linked_count} сущностями.")
 
-        # Если группа связана больше чем с одной сущностью → просто отвязываем entity_id
-        if linked_count > 1:
-            logger.info(f"(метод delete_group класса SentenceGroupBase) ⚠️ Группа связана с несколькими сущностями. Удаление остановлено, просто отвязываем группу.")
-            
-            # Определяем, что за сущность (параграф или предложение) и отвязываем
-            if cls == HeadSentenceGroup:
-                cls.unlink_group(group_id, entity_id)
-            elif cls == BodySentenceGroup:
-                cls.unlink_group(group_id, entity_id)
-            elif cls == TailSentenceGroup:
-                cls.unlink_group(group_id, entity_id)
-            else:    
-                logger.error(f"(метод delete_group класса SentenceGroupBase) ❌ Неизвестный тип группы: {type(group).__name__}")
-                raise ValueError(f"Неизвестный тип группы: {type(group).__name__}")
-
-            db.session.commit()
-            logger.info(f"(метод delete_group класса SentenceGroupBase)({cls.__name__}) ✅ Группа ID={group_id} успешно отвязана от сущности ID={entity_id}. Операция завершена.")
-            return  
-
-        # Если у группы только 1 связь → удаляем все предложения внутри неё
-        logger.info(f"(метод delete_group класса SentenceGroupBase) 🚀 Группа связана только с одной сущностью. Начинаем удаление всех предложений внутри группы.")
-        
-        # Определяем, какие предложения связаны с группой
-        sentence_map = {
-            HeadSentenceGroup: ("head_sentences", HeadSentence),
-            BodySentenceGroup: ("body_sentences", BodySentence),
-            TailSentenceGroup: ("tail_sentences", TailSentence),
-        }
+        # Отвязываем группу от сущности. Если на нее ссылается кто-то еще, purge_groups ее не тронет
+        with unit_of_work("delete_group"):
+            cls.unlink_group(group_id, entity_id)
+            deleted = SentenceGroupBase.purge_groups(**{cls.purge_key(): [group_id]})
+
+        if deleted[cls.purge_key()]:
+            logger.info(f"(метод delete_group класса SentenceGroupBase)({cls.__name__}) ✅ Группа ID={group_id} успешно удалена: {deleted}")
+        else:
+            logger.info(f"(метод delete_group класса SentenceGroupBase)({cls.__name__}) ✅ Группа ID={group_id} связана с другими сущностями и только отвязана от сущности ID={entity_id}.")
 
-        sentence_attr, sentence_cls = sentence_map.get(type(group), (None, None))
-        
-        if not sentence_attr or not sentence_cls:
-            logger.error(f"(метод delete_group класса SentenceGroupBase) ❌ Неизвестный тип группы: {type(group).__name__}")
-            raise ValueError(f"Неизвестный тип группы: {type(group).__name__}")
 
-        sentences = getattr(group, sentence_attr, [])
-        logger.debug(f"(метод delete_group класса SentenceGroupBase) Найдено {len(sentences)} предложений в группе ID={group_id} для удаления.")
+    @classmethod
+    def purge_key(cls):
+        """Имя аргумента purge_groups для групп данного типа."""
+        if cls == HeadSentenceGroup:
+            return "head_group_ids"
+        elif cls == BodySentenceGroup:
+            return "body_group_ids"
+        elif cls == TailSentenceGroup:
+            return "tail_group_ids"
+        logger.error(f"(метод purge_key класса SentenceGroupBase) ❌ Неизвестный тип группы: {cls.__name__}")
+        raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
+
+
+    @staticmethod
+    def purge_groups(head_group_ids=None, body_group_ids=None, tail_group_ids=None):
+        """
+        Удаляет группы-кандидаты, на которые больше не ссылается ни один параграф 
+        (head/tail) или head предложение (body), вместе со всем, что остается без ссылок:
+            - предложения этих групп, не входящие ни в одну оставшуюся группу;
+            - body группы удаляемых head предложений, если на них не ссылаются другие head предложения,
+              и их body предложения по тому же правилу.
+        Предложения, которые входят и в другие группы, только теряют связь с удаляемыми.
         
-        for sentence in sentences:
-            logger.info(f"(метод delete_group класса SentenceGroupBase) Удаляем предложение ID={sentence.id} из группы ID={group_id}")
-            try:
-                sentence_cls.delete_sentence(sentence.id, group_id)
-            except Exception as e:
-                logger.error(f"(метод delete_group класса SentenceGroupBase) ❌ Ошибка при удалении предложения: {e}")
-                raise ValueError(f"Ошибка при удалении предложения: {e}")
+        Все удаляемые ID вычисляются одним запросом с CTE, затем удаление идет по таблицам — 
+        не больше 9 запросов независимо от числа предложений. Коммит остается за вызывающим кодом
+        (используется внутри unit_of_work). Родительские ссылки на кандидатов нужно снять заранее.
+        
+        Args:
+            head_group_ids (Iterable[int], optional): Кандидаты среди head групп.
+            body_group_ids (Iterable[int], optional): Кандидаты среди body групп.
+            tail_group_ids (Iterable[int], optional): Кандидаты среди tail групп.
+        Returns:
+            dict: Сколько удалено по видам: {"head_group_ids", "body_group_ids", "tail_group_ids", "head", "body", "tail"}.
+        """
+        head_group_ids = [group_id for group_id in ensure_list(head_group_ids or []) if group_id]
+        body_group_ids = [group_id for group_id in ensure_list(body_group_ids or []) if group_id]
+        tail_group_ids = [group_id for group_id in ensure_list(tail_group_ids or []) if group_id]
+        deleted = dict.fromkeys(("head_group_ids", "body_group_ids", "tail_group_ids", "head", "body", "tail"), 0)
+        if not (head_group_ids or body_group_ids or tail_group_ids):
+            return deleted
+        logger.debug(f"(метод purge_groups класса SentenceGroupBase) 🚀 Кандидаты на удаление: head групп {len(head_group_ids)}, body групп {len(body_group_ids)}, tail групп {len(tail_group_ids)}")
+
+        paragraphs = Paragraph.__table__
+        head_sentences = HeadSentence.__table__
+        head_groups = HeadSentenceGroup.__table__
+        body_groups = BodySentenceGroup.__table__
+        tail_groups = TailSentenceGroup.__table__
+
+        def unreferenced_sentences(sentence_class, doomed_groups, name):
+            # Предложения удаляемых групп, у которых нет связей с другими группами
+            link_table, sentence_field, _ = sentence_class.get_link_columns()
+            other_links = link_table.alias(f"{name}_other_links")
+            other_sentence_field = other_links.c[sentence_field.name]
+            return (
+                select(sentence_field.label("id"))
+                .where(link_table.c.group_id.in_(select(doomed_groups.c.id)))
+                .where(~exists().where(
+                    other_sentence_field == sentence_field,
+                    other_links.c.group_id.not_in(select(doomed_groups.c.id)),
+                ))
+                .group_by(sentence_field)
+                .cte(name)
+            )
 
-        # Удаляем саму группу
-        db.session.delete(group)
-        db.session.commit()
-        logger.info(f"Группа ID={group_id} успешно удалена.")
+        doomed_head_groups = (
+            select(head_groups.c.id)
+            .where(head_groups.c.id.in_(head_group_ids))
+            .where(~exists().where(paragraphs.c.head_sentence_group_id == head_groups.c.id))
+            .cte("doomed_head_groups")
+        )
+        doomed_tail_groups = (
+            select(tail_groups.c.id)
+            .where(tail_groups.c.id.in_(tail_group_ids))
+            .where(~exists().where(paragraphs.c.tail_sentence_group_id == tail_groups.c.id))
+            .cte("doomed_tail_groups")
+        )
+        doomed_heads = unreferenced_sentences(HeadSentence, doomed_head_groups, "doomed_heads")
+        # Body группа удаляется, если на нее ссылаются только удаляемые head предложения
+        doomed_body_groups = (
+            select(body_groups.c.id)
+            .where(or_(
+                body_groups.c.id.in_(body_group_ids),
+                body_groups.c.id.in_(
+                    select(head_sentences.c.body_sentence_group_id).where(head_sentences.c.id.in_(select(doomed_heads.c.id)))
+                ),
+            ))
+            .where(~exists().where(
+                head_sentences.c.body_sentence_group_id == body_groups.c.id,
+                head_sentences.c.id.not_in(select(doomed_heads.c.id)),
+            ))
+            .cte("doomed_body_groups")
+        )
+        doomed_bodies = unreferenced_sentences(BodySentence, doomed_body_groups, "doomed_bodies")
+        doomed_tails = unreferenced_sentences(TailSentence, doomed_tail_groups, "doomed_tails")
+
+        doomed = defaultdict(list)
+        rows = db.session.execute(union_all(
+            select(literal("head_group_ids").label("kind"), doomed_head_groups.c.id),
+            select(literal("body_group_ids").label("kind"), doomed_body_groups.c.id),
+            select(literal("tail_group_ids").label("kind"), doomed_tail_groups.c.id),
+            select(literal("head").label("kind"), doomed_heads.c.id),
+            select(literal("body").label("kind"), doomed_bodies.c.id),
+            select(literal("tail").label("kind"), doomed_tails.c.id),
+        )).all()
+        for kind, object_id in rows:
+            doomed[kind].append(object_id)
+
+        # Сначала связи удаляемых групп (все связи удаляемых предложений среди них), 
+        # затем head предложения (они ссылаются на body группы), остальные предложения и сами группы
+        for sentence_class, group_kind in ((HeadSentence, "head_group_ids"), (BodySentence, "body_group_ids"), (TailSentence, "tail_group_ids")):
+            if doomed[group_kind]:
+                link_table = sentence_class.get_link_columns()[0]
+                db.session.execute(delete(link_table).where(link_table.c.group_id.in_(doomed[group_kind])))
+        for sentence_class, sentence_kind in ((HeadSentence, "head"), (BodySentence, "body"), (TailSentence, "tail")):
+            if doomed[sentence_kind]:
+                table = sentence_class.__table__
+                deleted[sentence_kind] = db.session.execute(delete(table).where(table.c.id.in_(doomed[sentence_kind]))).rowcount
+        for group_class, group_kind in ((HeadSentenceGroup, "head_group_ids"), (BodySentenceGroup, "body_group_ids"), (TailSentenceGroup, "tail_group_ids")):
+            if doomed[group_kind]:
+                table = group_class.__table__
+                deleted[group_kind] = db.session.execute(delete(table).where(table.c.id.in_(doomed[group_kind]))).rowcount
+
+        logger.debug(f"(метод purge_groups класса SentenceGroupBase) ✅ Удалено: {deleted}")
+        return deleted
 
 
     @classmethod
@@ -1614,19 +2840,202 @@ class SentenceGroupBase(BaseModel):
         if not group_id:
             return 0
         
+        # Читаем колонку, а не атрибут объекта: триггер мог обновить ее в этой же транзакции
+        return db.session.query(cls.link_count).filter(cls.id == group_id).scalar() or 0
+    
+    
+    @classmethod
+    def get_link_counts(cls, group_ids):
+        """
+        Возвращает link_count для набора групп одним запросом по первичному ключу.
+        Args:
+            group_ids (Iterable[int]): ID групп.
+        Returns:
+            dict: {group_id: количество связанных объектов}.
+        """
+        group_ids = [group_id for group_id in group_ids if group_id]
+        if not group_ids:
+            return {}
+        rows = db.session.query(cls.id, cls.link_count).filter(cls.id.in_(group_ids)).all()
+        return {group_id: link_count for group_id, link_count in rows}
+    
+    
+    @classmethod
+    def get_sentence_counts(cls, group_ids):
+        """
+        Возвращает количество предложений в каждой группе одним запросом
+        (COUNT ... GROUP BY по таблице связей), сами предложения не загружаются.
+        Args:
+            group_ids (Iterable[int]): ID групп.
+        Returns:
+            dict: {group_id: количество предложений}. Пустых групп в словаре нет.
+        """
+        group_ids = [group_id for group_id in group_ids if group_id]
+        if not group_ids:
+            return {}
         if cls == HeadSentenceGroup:
-            return Paragraph.query.filter_by(head_sentence_group_id=group_id).count()
-
+            sentence_model = HeadSentence
+        elif cls == BodySentenceGroup:
+            sentence_model = BodySentence
         elif cls == TailSentenceGroup:
-            return Paragraph.query.filter_by(tail_sentence_group_id=group_id).count()
-
+            sentence_model = TailSentence
+        else:
+            logger.error(f"(метод get_sentence_counts класса SentenceGroupBase) ❌ Неизвестный тип группы: {cls.__name__}")
+            raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
+        link_table, _, _ = sentence_model.get_link_columns()
+        rows = db.session.execute(
+            select(link_table.c.group_id, func.count())
+            .where(link_table.c.group_id.in_(group_ids))
+            .group_by(link_table.c.group_id)
+        ).all()
+        return {group_id: count for group_id, count in rows}
+    
+    
+    @classmethod
+    def get_parent_field(cls):
+        """
+        Возвращает колонку родительской сущности, которая ссылается на группу
+        (параграф для head/tail, head предложение для body).
+        """
+        if cls == HeadSentenceGroup:
+            return Paragraph.head_sentence_group_id
+        elif cls == TailSentenceGroup:
+            return Paragraph.tail_sentence_group_id
         elif cls == BodySentenceGroup:
-            return HeadSentence.query.filter_by(body_sentence_group_id=group_id).count()
-        
-        logger.error(f"(метод is_linked класса SentenceGroupBase) ❌ Неизвестный тип группы: {cls.__name__}, возвращаю 0")
-        return 0  
+            return HeadSentence.body_sentence_group_id
+        logger.error(f"(метод get_parent_field класса SentenceGroupBase) ❌ Неизвестный тип группы: {cls.__name__}")
+        raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
+    
+    
+    @classmethod
+    def repair_link_counts(cls):
+        """
+        Пересчитывает link_count всех групп данного типа одним проходом GROUP BY 
+        по родительской таблице. Обновляет только расходящиеся строки. Коммит остается за вызывающим кодом.
+        Returns:
+            int: Количество исправленных групп.
+        """
+        parent_field = cls.get_parent_field()
+        counts = (
+            select(cls.id.label("id"), func.count(parent_field).label("link_count"))
+            .select_from(cls)
+            .outerjoin(parent_field.class_, parent_field == cls.id)
+            .group_by(cls.id)
+            .subquery()
+        )
+        table = cls.__table__
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == counts.c.id)
+            .where(table.c.link_count != counts.c.link_count)
+            .values(link_count=counts.c.link_count)
+        )
+        logger.info(f"(метод repair_link_counts класса SentenceGroupBase)({cls.__name__}) ✅ Исправлено счетчиков: {result.rowcount}")
+        return result.rowcount
+
+
+    @classmethod
+    def orphan_filter(cls):
+        """Условие anti-join для групп, на которые не ссылается ни одна родительская сущность."""
+        return ~exists().where(cls.get_parent_field() == cls.id)
+
+
+    @classmethod
+    def delete_orphans(cls, batch_size, max_id=None):
+        """
+        Удаляет одну пачку групп без родительской сущности вместе с их связями с предложениями.
+        Предложения остаются — те, что после этого не входят ни в одну группу, удаляются
+        следующим проходом SentenceBase.delete_orphans. Коммит остается за вызывающим кодом.
+        Args:
+            batch_size (int): Размер пачки.
+            max_id (int, optional): Рассматривать только группы с ID не больше этого.
+        Returns:
+            int: Количество удаленных групп.
+        """
+        query = select(cls.id).where(cls.orphan_filter())
+        if max_id is not None:
+            query = query.where(cls.id <= max_id)
+        orphan_ids = db.session.execute(
+            query.order_by(cls.id).limit(batch_size).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if orphan_ids:
+            if cls == HeadSentenceGroup:
+                link_table = head_sentence_group_link
+            elif cls == BodySentenceGroup:
+                link_table = body_sentence_group_link
+            else:
+                link_table = tail_sentence_group_link
+            db.session.execute(delete(link_table).where(link_table.c.group_id.in_(orphan_ids)))
+            db.session.execute(delete(cls.__table__).where(cls.__table__.c.id.in_(orphan_ids)))
+        return len(orphan_ids)
    
    
+    @classmethod
+    def count_links(cls, group_ids):
+        """
+        Считает количество родительских сущностей для набора групп одним запросом (GROUP BY).
+        
+        Args:
+            group_ids (Iterable[int]): ID групп.
+
+        Returns:
+            dict: {group_id: количество связанных объектов}. Группы без связей в словарь не попадают.
+        """
+        group_ids = [group_id for group_id in group_ids if group_id]
+        if not group_ids:
+            return {}
+        
+        parent_field = cls.get_parent_field()
+        rows = (
+            db.session.query(parent_field, func.count())
+            .filter(parent_field.in_(group_ids))
+            .group_by(parent_field)
+            .all()
+        )
+        return {group_id: count for group_id, count in rows}
+    
+    
+    @classmethod
+    def touch_reports(cls, group_ids):
+        """
+        Увеличивает revision всех протоколов, которые ссылаются на группы. 
+        Группа может быть общей для нескольких параграфов/предложений (copy_group
+        копирует ее только при отделении), поэтому ищем протоколы по ссылкам, а не 
+        по тому, откуда пришел запрос. Для body групп идем через head предложения 
+        и их head группы.
+        Args:
+            group_ids (int | list[int] | Select): ID групп или подзапрос, возвращающий ID.
+        """
+        if not isinstance(group_ids, Select):
+            group_ids = [group_id for group_id in ensure_list(group_ids) if group_id]
+            if not group_ids:
+                return
+        
+        if cls == HeadSentenceGroup:
+            Report.touch(select(Paragraph.report_id).where(Paragraph.head_sentence_group_id.in_(group_ids)))
+        elif cls == TailSentenceGroup:
+            Report.touch(select(Paragraph.report_id).where(Paragraph.tail_sentence_group_id.in_(group_ids)))
+        elif cls == BodySentenceGroup:
+            HeadSentence.touch_reports(select(HeadSentence.id).where(HeadSentence.body_sentence_group_id.in_(group_ids)))
+        else:
+            logger.error(f"(метод touch_reports класса SentenceGroupBase) ❌ Неизвестный тип группы: {cls.__name__}")
+            raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
+    
+    
+    @classmethod
+    def touch_related_reports(cls, related_id):
+        """
+        Увеличивает revision протоколов родительской сущности группы 
+        (параграфа для head/tail, head предложения для body).
+        Args:
+            related_id (int): ID родительской сущности.
+        """
+        if cls == BodySentenceGroup:
+            HeadSentence.touch_reports(related_id)
+        else:
+            Paragraph.touch_reports(related_id)
+    
+    
     # Метод для отвязывания группы от родительской сущности (параграфа или предложения)
     @classmethod
     def unlink_group(cls, group_id, related_id):
@@ -1639,6 +3048,7 @@ class SentenceGroupBase(BaseModel):
             bool: True, если отвязка прошла успешно, иначе False.
         """
         logger.info(f"Отвязываем группу ID={group_id} от сущности ID={related_id}")
+        cls.touch_related_reports(related_id)
         # Определяем, что за сущность (параграф или предложение) и отвязываем
         if cls == HeadSentenceGroup:
             Paragraph.query.filter_by(id=related_id).update({"head_sentence_group_id": None})
@@ -1650,7 +3060,7 @@ class SentenceGroupBase(BaseModel):
             logger.error(f"Неизвестный тип группы: {cls.__name__}")
             raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
 
-        db.session.commit()
+        commit_session()
         logger.info(f"Успешно отвязали группу ID={group_id} от сущности ID={related_id}.")
         return 
 
@@ -1678,7 +3088,8 @@ class SentenceGroupBase(BaseModel):
             logger.error(f"Неизвестный тип группы: {cls.__name__}")
             raise ValueError(f"Неизвестный тип группы: {cls.__name__}")
 
-        db.session.commit()
+        cls.touch_related_reports(related_id)
+        commit_session()
         logger.info(f"Успешно связали группу ID={group_id} с сущностью ID={related_id}.")
         return
 
@@ -1687,59 +3098,58 @@ class SentenceGroupBase(BaseModel):
     def copy_group(cls, group_id, new_group_id=None):
         """
         Создает копию указанной группы и привязывает туда все предложения из заданной группы.
+        Копирование идет двумя запросами независимо от размера группы:
+        INSERT INTO <группы> ... RETURNING id и INSERT INTO <таблица связей> ... SELECT
+        из связей исходной группы (вместе с индексами/весами).
 
         Args:
-            group (BaseModel): Группа, из которой перепривязываем.
-            new_group (BaseModel): Группа, в которую перепривязываем.
+            group_id (int): ID группы, из которой перепривязываем.
+            new_group_id (int, optional): ID группы, в которую перепривязываем. Если не передан, создается новая группа.
+        Returns:
+            int: ID группы, в которую скопированы связи.
         """
-        logger.info(f"(метод relink_all_to_group класса SentenceBase) 🚀 Начата перепривязка всех предложений из группы {group_id} в группу {new_group_id}")
-        group = cls.query.get(group_id)
-        if new_group_id:
-            new_group = cls.query.get(new_group_id)
-        else:
-            new_group = cls.create()
-            new_group_id = new_group.id
-        
-        if not group or not new_group:
-            logger.error(f"(метод relink_all_to_group класса SentenceBase) ❌ Группа {group_id} или {new_group_id} не найдена.")
-            raise ValueError(f"Группа {group_id} или {new_group_id} не найдена.")
-        
-        if isinstance(group, HeadSentenceGroup):
-            sentences = group.head_sentences
-            for sentence in sentences:
-                sentence_index = HeadSentence.get_sentence_index_or_weight(sentence.id, group_id)
-                db.session.execute(
-                    head_sentence_group_link.insert().values(
-                    head_sentence_id=sentence.id,
-                    group_id=new_group_id,
-                    sentence_index=sentence_index)
-                )
-        elif isinstance(group, BodySentenceGroup):
-            sentences = group.body_sentences
-            for sentence in sentences:
-                sentence_weight = BodySentence.get_sentence_index_or_weight(sentence.id, group_id)
-                db.session.execute(
-                    body_sentence_group_link.insert().values(
-                    body_sentence_id=sentence.id,
-                    group_id=new_group_id,
-                    sentence_weight=sentence_weight)
-                )
-        elif isinstance(group, TailSentenceGroup):
-            sentences = group.tail_sentences
-            for sentence in sentences:
-                sentence_weight = TailSentence.get_sentence_index_or_weight(sentence.id, group_id)
-                db.session.execute(
-                    tail_sentence_group_link.insert().values(
-                    tail_sentence_id=sentence.id,
-                    group_id=new_group_id,
-                    sentence_weight=sentence_weight)
-                )
+        logger.info(f"(метод copy_group класса SentenceGroupBase) 🚀 Начато копирование связей группы {group_id} в группу {new_group_id or 'новую'}")
+        if cls == HeadSentenceGroup:
+            sentence_model = HeadSentence
+        elif cls == BodySentenceGroup:
+            sentence_model = BodySentence
+        elif cls == TailSentenceGroup:
+            sentence_model = TailSentence
         else:
-            logger.error(f"(метод relink_all_to_group класса SentenceBase) ❌ Изменения не были внесены так как не была идентифицирована группа")
+            logger.error(f"(метод copy_group класса SentenceGroupBase) ❌ Изменения не были внесены так как не была идентифицирована группа")
             raise ValueError(f"Изменения не были внесены так как не была идентифицирована группа")
-        
-        db.session.commit()
-        logger.info(f"(метод relink_all_to_group класса SentenceBase) ✅ Все предложения из группы {group_id} успешно перепривязаны в группу {new_group_id}")
+
+        requested_group_id = new_group_id
+        if new_group_id is None:
+            # Новая группа создается только если исходная существует — проверка и вставка одним запросом
+            new_group_id = db.session.execute(
+                insert(cls)
+                .from_select([cls.link_count], select(literal(0)).where(cls.id == group_id))
+                .returning(cls.id)
+            ).scalar()
+            new_group_is_linked = False
+        else:
+            found = db.session.query(func.count(cls.id)).filter(cls.id.in_([group_id, new_group_id])).scalar()
+            new_group_id = new_group_id if found == len({group_id, new_group_id}) else None
+            new_group_is_linked = True
+
+        if not new_group_id:
+            logger.error(f"(метод copy_group класса SentenceGroupBase) ❌ Группа {group_id} или {requested_group_id} не найдена.")
+            raise ValueError(f"Группа {group_id} или {requested_group_id} не найдена.")
+
+        link_table, sentence_field, index_field = sentence_model.get_link_columns()
+        db.session.execute(
+            insert(link_table).from_select(
+                [link_table.c.group_id, sentence_field, index_field],
+                select(literal(new_group_id), sentence_field, index_field).where(link_table.c.group_id == group_id),
+            )
+        )
+
+        # Новая группа еще ни к чему не привязана, а переданная уже могла быть привязана
+        if new_group_is_linked:
+            cls.touch_reports(new_group_id)
+        commit_session()
+        logger.info(f"(метод copy_group класса SentenceGroupBase) ✅ Все предложения из группы {group_id} успешно перепривязаны в группу {new_group_id}")
         return new_group_id
     
 
@@ -1753,7 +3163,7 @@ class SentenceGroupBase(BaseModel):
         """
         new_group = cls()
         db.session.add(new_group)
-        db.session.commit()
+        commit_session()
         return new_group
 
     
@@ -1769,6 +3179,167 @@ class SentenceGroupBase(BaseModel):
             list[dict]: Список предложений в виде словарей с полными данными + индекс.
         """
         logger.debug(f"(get_group_sentences)  🚀 (тип группы: {cls.__name__}) Начато получение предложений для группы ID={group_id}.")
+        sentence_data = cls.get_groups_sentences([group_id]).get(group_id, [])
+        logger.debug(f"(get_group_sentences) ✅ Получено {len(sentence_data)} предложений для группы ID={group_id}")
+        return sentence_data
+
+
+    @classmethod
+    def is_used_in_user_reports(cls, group_id, user_id):
+        """
+        Проверяет одним запросом, что body/tail группа используется в протоколах пользователя:
+        body группа — у head предложения из параграфа протокола, tail группа — у параграфа протокола.
+
+        Args:
+            group_id (int): ID группы.
+            user_id (int): ID пользователя.
+
+        Returns:
+            bool: True, если группа встречается хотя бы в одном протоколе пользователя.
+        """
+        if cls == BodySentenceGroup:
+            query = (
+                select(literal(1))
+                .select_from(HeadSentence)
+                .join(head_sentence_group_link, head_sentence_group_link.c.head_sentence_id == HeadSentence.id)
+                .join(Paragraph, Paragraph.head_sentence_group_id == head_sentence_group_link.c.group_id)
+                .join(Report, Report.id == Paragraph.report_id)
+                .where(HeadSentence.body_sentence_group_id == group_id, Report.user_id == user_id)
+            )
+        elif cls == TailSentenceGroup:
+            query = (
+                select(literal(1))
+                .select_from(Paragraph)
+                .join(Report, Report.id == Paragraph.report_id)
+                .where(Paragraph.tail_sentence_group_id == group_id, Report.user_id == user_id)
+            )
+        else:
+            logger.error(f"(is_used_in_user_reports) ❌ Проверка не поддерживается для {cls.__name__}")
+            raise ValueError(f"Проверка не поддерживается для {cls.__name__}")
+        return bool(db.session.execute(select(exists(query))).scalar())
+
+
+    @classmethod
+    def get_group_sentences_page(cls, group_id, offset=0, limit=100):
+        """
+        Возвращает страницу предложений body/tail группы, отсортированных
+        по весу в обратном порядке (как в дереве протокола). Приросты весов,
+        еще копящиеся в Redis (write-behind), учитываются прямо в ORDER BY,
+        чтобы страницы не расходились с деревом протокола.
+
+        Args:
+            group_id (int): ID группы.
+            offset (int): Сколько предложений пропустить.
+            limit (int): Максимальное количество предложений на странице.
+
+        Returns:
+            tuple: (list[dict], int) — предложения страницы и общее количество предложений в группе.
+        """
+        if cls == BodySentenceGroup:
+            sentence_model = BodySentence
+        elif cls == TailSentenceGroup:
+            sentence_model = TailSentence
+        else:
+            logger.error(f"(get_group_sentences_page) ❌ Постраничная выдача не поддерживается для {cls.__name__}")
+            raise ValueError(f"Постраничная выдача не поддерживается для {cls.__name__}")
+
+        link_table, sentence_field, weight_field = sentence_model.get_link_columns()
+        total = db.session.query(func.count()).select_from(link_table).filter(link_table.c.group_id == group_id).scalar() or 0
+        weight = func.coalesce(weight_field, 0)
+        if current_app.config.get("SENTENCE_WEIGHT_WRITE_BEHIND"):
+            sentence_type = "body" if sentence_model == BodySentence else "tail"
+            pending = get_buffered_weights(sentence_type, [group_id]).get(group_id)
+            if pending:
+                weight = weight + case(pending, value=sentence_model.id, else_=0)
+        rows = (
+            db.session.query(sentence_model, weight)
+            .join(link_table, sentence_field == sentence_model.id)
+            .filter(link_table.c.group_id == group_id)
+            .order_by(weight.desc(), sentence_model.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+        sentences = [
+            {
+                "id": sentence.id,
+                "sentence": sentence.sentence,
+                "tags": sentence.tags,
+                "comment": sentence.comment,
+                "is_linked": (sentence.link_count or 0) > 1,
+                "group_id": group_id,
+                "sentence_weight": weight,
+            }
+            for sentence, weight in rows
+        ]
+        logger.debug(f"(get_group_sentences_page) ✅ Группа ID={group_id}: отдано {len(sentences)} из {total} предложений (offset={offset})")
+        return sentences, total
+
+
+    @classmethod
+    def find_similar_sentences(cls, group_id, text, min_similarity):
+        """
+        Возвращает предложения body/tail группы, триграммное сходство (pg_trgm similarity) 
+        которых с текстом не ниже порога. Сравнение идет по колонке search_text.
+        Работает только в PostgreSQL с расширением pg_trgm.
+
+        Отбор идет оператором %, который использует GIN индекс gin_trgm_ops (условие
+        similarity() >= порог индексом не обслуживается). Порог оператора задается
+        pg_trgm.similarity_threshold до конца текущей транзакции (аналог SET LOCAL);
+        similarity() считается только для отобранных строк.
+
+        Args:
+            group_id (int): ID группы.
+            text (str): Текст, с которым сравниваем.
+            min_similarity (float): Порог similarity() от 0 до 1.
+
+        Returns:
+            list[dict]: {"id", "sentence", "similarity"} в порядке группы (по весу в обратном порядке, затем по id).
+        """
+        if cls == BodySentenceGroup:
+            sentence_model = BodySentence
+        elif cls == TailSentenceGroup:
+            sentence_model = TailSentence
+        else:
+            logger.error(f"(find_similar_sentences) ❌ Триграммный поиск не поддерживается для {cls.__name__}")
+            raise ValueError(f"Триграммный поиск не поддерживается для {cls.__name__}")
+
+        link_table, sentence_field, weight_field = sentence_model.get_link_columns()
+        search_text = sentence_search_text(text)
+        # SET LOCAL не принимает параметры запроса, set_config(..., true) — то же с привязкой значения
+        db.session.execute(select(func.set_config("pg_trgm.similarity_threshold", str(min_similarity), True)))
+        rows = (
+            db.session.query(sentence_model.id, sentence_model.sentence, func.similarity(sentence_model.search_text, search_text).label("similarity"))
+            .join(link_table, sentence_field == sentence_model.id)
+            .filter(link_table.c.group_id == group_id, sentence_model.search_text.op("%")(search_text))
+            .order_by(func.coalesce(weight_field, 0).desc(), sentence_model.id)
+            .all()
+        )
+        logger.debug(f"(find_similar_sentences) ✅ Группа ID={group_id}: найдено {len(rows)} кандидатов с similarity >= {min_similarity}")
+        return [{"id": row.id, "sentence": row.sentence, "similarity": row.similarity} for row in rows]
+
+    
+    @classmethod
+    def get_groups_sentences(cls, group_ids, buffered_weights=True, lite=False):
+        """
+        Возвращает предложения сразу для нескольких групп. Количество запросов 
+        не зависит ни от числа групп, ни от числа предложений: строки связей, 
+        количество связей и body-группы head-предложений загружаются пачками.
+        
+        Args:
+            group_ids (Iterable[int]): ID групп.
+            buffered_weights (bool): Прибавлять ли к весам body/tail приросты, еще копящиеся в Redis.
+            lite (bool): Для head групп — вместо body_sentences только body_sentences_count,
+                body предложения не загружаются.
+        
+        Returns:
+            dict: {group_id: list[dict]} — предложения каждой группы, отсортированные 
+            по индексу (head) или по весу в обратном порядке (body/tail).
+        """
+        group_ids = {group_id for group_id in group_ids if group_id}
+        if not group_ids:
+            return {}
+        logger.debug(f"(get_groups_sentences) 🚀 (тип группы: {cls.__name__}) Начато получение предложений для {len(group_ids)} групп.")
 
         # Определяем модель предложений
         if cls == HeadSentenceGroup:
@@ -1781,27 +3352,72 @@ class SentenceGroupBase(BaseModel):
             sentence_model = TailSentence
             index_name = "sentence_weight"
         else:
-            logger.error(f"(get_group_sentences) ❌ Неизвестный тип группы: {cls.__name__}")
-            return []
-
-        # Загружаем все предложения группы одним запросом
-        sentences = sentence_model.query.join(sentence_model.groups).filter(cls.id == group_id).all()
+            logger.error(f"(get_groups_sentences) ❌ Неизвестный тип группы: {cls.__name__}")
+            return {}
+
+        # Загружаем все предложения всех групп вместе с индексом/весом из связи одним запросом
+        link_table, sentence_field, index_field = sentence_model.get_link_columns()
+        # link_count берем колонкой в той же строке — признак "общее предложение" без отдельных запросов
+        rows = (
+            db.session.query(sentence_model, link_table.c.group_id, index_field, sentence_model.link_count)
+            .join(link_table, sentence_field == sentence_model.id)
+            .filter(link_table.c.group_id.in_(group_ids))
+            .order_by(sentence_model.id)
+            .all()
+        )
 
-        # Создаём список словарей с добавлением индекса/веса из связи
-        sentence_data = []
-        for s in sentences:
-            s_data = sentence_model.get_sentence_data(s.id, group_id)
-            sentence_data.append(s_data)
+        # Для head предложений сразу собираем все их body группы
+        body_sentences_by_group = {}
+        body_sentence_counts = {}
+        body_group_links = {}
+        if sentence_model == HeadSentence:
+            body_group_ids = {sentence.body_sentence_group_id for sentence, _, _, _ in rows if sentence.body_sentence_group_id}
+            if lite:
+                body_sentence_counts = BodySentenceGroup.get_sentence_counts(body_group_ids)
+            else:
+                body_sentences_by_group = BodySentenceGroup.get_groups_sentences(body_group_ids, buffered_weights=buffered_weights)
+            body_group_links = BodySentenceGroup.get_link_counts(body_group_ids)
+
+        # Приросты весов, которые еще копятся в Redis, учитываем сразу, чтобы порядок не отставал от базы
+        pending_weights = {}
+        if buffered_weights and sentence_model != HeadSentence and current_app.config.get("SENTENCE_WEIGHT_WRITE_BEHIND"):
+            pending_weights = get_buffered_weights("body" if sentence_model == BodySentence else "tail", group_ids)
+
+        # Создаём словари предложений и раскладываем их по группам
+        sentences_by_group = defaultdict(list)
+        for sentence, group_id, index_or_weight, link_count in rows:
+            s_data = {
+                "id": sentence.id,
+                "sentence": sentence.sentence,
+                "tags": sentence.tags,
+                "comment": sentence.comment,
+                "is_linked": (link_count or 0) > 1,
+                "group_id": group_id
+            }
+            if sentence_model == HeadSentence:
+                body_group_id = sentence.body_sentence_group_id or None
+                if lite:
+                    s_data["body_sentences_count"] = body_sentence_counts.get(body_group_id, 0)
+                else:
+                    s_data["body_sentences"] = _copy_sentences_data(body_sentences_by_group.get(body_group_id, []))
+                s_data["body_sentence_group_id"] = body_group_id
+                s_data["has_linked_body"] = body_group_links.get(body_group_id, 0) > 1
+            pending = pending_weights.get(group_id, {}).get(sentence.id)
+            if pending:
+                index_or_weight = (index_or_weight or 0) + pending
+            s_data[index_name] = index_or_weight
+            sentences_by_group[group_id].append(s_data)
 
         # Сортируем по `index_or_weight`
-        if index_name == "sentence_index":
-            sentence_data.sort(key=lambda x: x[f"{index_name}"] or 0)
-        else:
-            # Для Body и Tail предложений сортируем по весу в обратном порядке
-            sentence_data.sort(key=lambda x: x[f"{index_name}"] or 0, reverse=True)
+        for sentence_data in sentences_by_group.values():
+            if index_name == "sentence_index":
+                sentence_data.sort(key=lambda x: x[f"{index_name}"] or 0)
+            else:
+                # Для Body и Tail предложений сортируем по весу в обратном порядке
+                sentence_data.sort(key=lambda x: x[f"{index_name}"] or 0, reverse=True)
 
-        logger.debug(f"(get_group_sentences) ✅ Получено {len(sentence_data)} предложений для группы ID={group_id}")
-        return sentence_data   
+        logger.debug(f"(get_groups_sentences) ✅ Получено {len(rows)} предложений для {len(group_ids)} групп")
+        return dict(sentences_by_group)
         
         
 class HeadSentenceGroup(SentenceGroupBase):
@@ -1832,10 +3448,239 @@ class TailSentenceGroup(SentenceGroupBase):
         secondary="tail_sentence_group_link",
         back_populates="groups"
     )
-       
-       
-       
-        
+
+
+# Типы предложений в таблицах, общих для всех трех типов (полосы MinHash, кластеры дублей)
+SENTENCE_TYPES = {"head": HeadSentence, "body": BodySentence, "tail": TailSentence}
+
+
+class SentenceMinhashBand(db.Model):
+    """
+    Полосы LSH MinHash-подписей предложений (cluster_near_duplicates). На предложение —
+    MINHASH_BANDS строк; предложения одного пользователя, модальности и типа с одинаковым
+    хэшем хотя бы одной полосы — кандидаты в почти одинаковые.
+    """
+    __tablename__ = "sentence_minhash_bands"
+
+    sentence_type = db.Column(db.String(10), primary_key=True)
+    sentence_id = db.Column(db.BigInteger, primary_key=True)
+    band = db.Column(db.SmallInteger, primary_key=True)
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    report_global_modality_id = db.Column(db.BigInteger, nullable=True)
+    bucket = db.Column(db.BigInteger, nullable=False)
+
+
+    @classmethod
+    def group_filter(cls, sentence_type, user_id, report_global_modality_id):
+        """Условие на строки одного типа, пользователя и модальности (NULL совпадает с NULL)."""
+        return (
+            cls.sentence_type == sentence_type,
+            cls.user_id.is_not_distinct_from(user_id),
+            cls.report_global_modality_id.is_not_distinct_from(report_global_modality_id),
+        )
+
+
+    @classmethod
+    def last_hashed_id(cls, sentence_type):
+        """Наибольший ID предложения данного типа, для которого уже сохранены полосы (0, если их нет)."""
+        return db.session.query(func.max(cls.sentence_id)).filter(cls.sentence_type == sentence_type).scalar() or 0
+
+
+    @classmethod
+    def store_bands(cls, rows):
+        """
+        Сохраняет полосы одним INSERT (без коммита).
+        Args:
+            rows (list[dict]): Словари с ключами sentence_type, sentence_id, band, user_id, report_global_modality_id, bucket.
+        """
+        if rows:
+            db.session.execute(insert(cls.__table__), rows)
+
+
+    @classmethod
+    def find_shared_buckets(cls, sentence_type, user_id, report_global_modality_id):
+        """
+        Находит полосы, общие для нескольких предложений пользователя, модальности и типа.
+        Returns:
+            list[list[int]]: ID предложений каждой такой полосы.
+        """
+        criteria = cls.group_filter(sentence_type, user_id, report_global_modality_id)
+        shared = (
+            select(cls.band, cls.bucket)
+            .where(*criteria)
+            .group_by(cls.band, cls.bucket)
+            .having(func.count() > 1)
+            .subquery()
+        )
+        rows = db.session.execute(
+            select(cls.band, cls.bucket, cls.sentence_id)
+            .join(shared, (cls.band == shared.c.band) & (cls.bucket == shared.c.bucket))
+            .where(*criteria)
+            .order_by(cls.band, cls.bucket, cls.sentence_id)
+        ).all()
+        buckets = defaultdict(list)
+        for band, bucket, sentence_id in rows:
+            buckets[(band, bucket)].append(sentence_id)
+        return list(buckets.values())
+
+
+    @classmethod
+    def delete_for_sentences(cls, sentence_type, sentence_ids):
+        """Удаляет полосы предложений (без коммита)."""
+        sentence_ids = ensure_list(sentence_ids)
+        if sentence_ids:
+            db.session.execute(delete(cls.__table__).where(cls.sentence_type == sentence_type, cls.sentence_id.in_(sentence_ids)))
+
+
+    @classmethod
+    def delete_missing(cls, sentence_type):
+        """
+        Удаляет полосы предложений, которых больше нет в базе (anti-join, без коммита).
+        Returns:
+            tuple[int, set]: Количество удаленных строк и пары (user_id, report_global_modality_id), у которых они были.
+        """
+        sentence_class = SENTENCE_TYPES[sentence_type]
+        rows = db.session.execute(
+            delete(cls.__table__)
+            .where(
+                cls.sentence_type == sentence_type,
+                ~exists().where(sentence_class.id == cls.sentence_id),
+            )
+            .returning(cls.user_id, cls.report_global_modality_id)
+        ).all()
+        return len(rows), {tuple(row) for row in rows}
+
+
+class SentenceDuplicateCluster(BaseModel):
+    """
+    Кластер почти одинаковых предложений пользователя, найденный задачей cluster_near_duplicates.
+    Первое предложение кластера — представитель: при слиянии остальные сливаются в него.
+    """
+    __tablename__ = "sentence_duplicate_clusters"
+
+    user_id = db.Column(db.BigInteger, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    sentence_type = db.Column(db.String(10), nullable=False)
+    report_global_modality_id = db.Column(db.BigInteger, nullable=True)
+    sentence_ids = db.Column(db.JSON, nullable=False)  # ID предложений, представитель первым
+    similarity = db.Column(db.Float, nullable=False)  # наименьший коэффициент Жаккара с представителем
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+    @classmethod
+    def replace_for_group(cls, sentence_type, user_id, report_global_modality_id, clusters):
+        """
+        Заменяет кластеры пользователя, модальности и типа новыми (без коммита).
+        Args:
+            clusters (list[dict]): {"sentence_ids": [...], "similarity": float}.
+        """
+        db.session.execute(
+            delete(cls.__table__).where(
+                cls.sentence_type == sentence_type,
+                cls.user_id.is_not_distinct_from(user_id),
+                cls.report_global_modality_id.is_not_distinct_from(report_global_modality_id),
+            )
+        )
+        if clusters:
+            created_at = datetime.now(timezone.utc)
+            db.session.execute(insert(cls.__table__), [
+                {
+                    "user_id": user_id,
+                    "sentence_type": sentence_type,
+                    "report_global_modality_id": report_global_modality_id,
+                    "sentence_ids": cluster["sentence_ids"],
+                    "similarity": cluster["similarity"],
+                    "created_at": created_at,
+                }
+                for cluster in clusters
+            ])
+
+
+    @classmethod
+    def find_by_user(cls, user_id, sentence_type=None, limit=100):
+        """Кластеры пользователя (сначала самые крупные)."""
+        query = cls.query.filter(cls.user_id == user_id)
+        if sentence_type:
+            query = query.filter(cls.sentence_type == sentence_type)
+        clusters = query.order_by(cls.id).all()
+        clusters.sort(key=lambda cluster: len(cluster.sentence_ids), reverse=True)
+        return clusters[:limit]
+
+
+    def get_preview(self):
+        """
+        Собирает данные кластера для предпросмотра: тексты предложений, которые еще есть в базе,
+        количество их групп и, для head, body группы, которые мешают слиянию.
+        Returns:
+            dict: Данные кластера; sentences — в порядке кластера, представитель первым.
+        """
+        sentence_class = SENTENCE_TYPES[self.sentence_type]
+        sentences = {sentence.id: sentence for sentence in sentence_class.query.filter(sentence_class.id.in_(self.sentence_ids)).all()}
+        link_counts = sentence_class.count_links(sentences)
+        items = []
+        for sentence_id in self.sentence_ids:
+            sentence = sentences.get(sentence_id)
+            if not sentence:
+                continue
+            item = {
+                "id": sentence.id,
+                "sentence": sentence.sentence,
+                "tags": sentence.tags,
+                "comment": sentence.comment,
+                "groups": link_counts.get(sentence.id, 0),
+            }
+            if sentence_class == HeadSentence:
+                item["body_sentence_group_id"] = sentence.body_sentence_group_id
+            items.append(item)
+        body_group_ids = {item.get("body_sentence_group_id") for item in items} - {None}
+        return {
+            "id": self.id,
+            "sentence_type": self.sentence_type,
+            "report_global_modality_id": self.report_global_modality_id,
+            "similarity": self.similarity,
+            "created_at": self.created_at.isoformat(),
+            "sentences": items,
+            "mergeable": len(items) > 1 and len(body_group_ids) <= 1,
+        }
+
+
+    def merge(self, keep_id=None, sentence_ids=None):
+        """
+        Сливает предложения кластера в одно (SentenceBase.merge_duplicates) и удаляет их полосы MinHash.
+        Слитые предложения убираются из кластера; если в нем осталось меньше двух, кластер удаляется.
+        Кластер мог устареть: если текст дубля после правки уже не похож на оставляемый, слияние отменяется.
+        Args:
+            keep_id (int, optional): Какое предложение оставить. По умолчанию — представитель кластера.
+            sentence_ids (list[int], optional): Какие предложения кластера сливать. По умолчанию — все.
+        Returns:
+            int: Количество удаленных дублей.
+        """
+        logger.info(f"(метод merge класса SentenceDuplicateCluster) 🚀 Слияние кластера ID={self.id}")
+        sentence_class = SENTENCE_TYPES[self.sentence_type]
+        existing = set(db.session.execute(select(sentence_class.id).where(sentence_class.id.in_(self.sentence_ids))).scalars())
+        members = [sentence_id for sentence_id in self.sentence_ids if sentence_id in existing]
+        keep_id = keep_id or (members[0] if members else None)
+        chosen = ensure_list(sentence_ids) if sentence_ids else members
+        if keep_id not in members or not set(chosen) <= set(members):
+            logger.error(f"(метод merge класса SentenceDuplicateCluster) ❌ Предложения {chosen} (keep_id={keep_id}) не входят в кластер ID={self.id}")
+            raise ValueError("Предложения не входят в кластер")
+        duplicate_ids = [sentence_id for sentence_id in chosen if sentence_id != keep_id]
+        try:
+            merged = sentence_class.merge_duplicates(keep_id, duplicate_ids)
+            SentenceMinhashBand.delete_for_sentences(self.sentence_type, duplicate_ids)
+            remaining = [sentence_id for sentence_id in members if sentence_id not in duplicate_ids]
+            if len(remaining) < 2:
+                db.session.delete(self)
+            else:
+                self.sentence_ids = remaining
+            commit_session()
+        except Exception as e:
+            logger.error(f"(метод merge класса SentenceDuplicateCluster) ❌ Ошибка при слиянии кластера ID={self.id}: {e}")
+            rollback_session()
+            raise ValueError(f"Ошибка при слиянии кластера ID={self.id}: {e}")
+        logger.info(f"(метод merge класса SentenceDuplicateCluster) ✅ Кластер ID={self.id}: удалено дублей {merged}")
+        return merged
+
+
 class KeyWord(BaseModel):
     __tablename__ = 'key_words_group'
     profile_id = db.Column(db.BigInteger, db.ForeignKey('user_profiles.id', ondelete='CASCADE'), nullable=False)
@@ -1866,7 +3711,7 @@ class KeyWord(BaseModel):
                 new_key_word_group.key_word_reports.append(report)
 
         db.session.add(new_key_word_group)
-        db.session.commit()
+        commit_session()
         return new_key_word_group
 
     @classmethod
@@ -1940,7 +3785,7 @@ class KeyWord(BaseModel):
                 if report not in keyword.key_word_reports:
                     keyword.key_word_reports.append(report)
 
-        db.session.commit()
+        commit_session()
 
     @classmethod
     def remove_reports_from_keywords(cls, keywords, reports):
@@ -1955,7 +3800,7 @@ class KeyWord(BaseModel):
                 if report in keyword.key_word_reports:
                     keyword.key_word_reports.remove(report)
 
-        db.session.commit()
+        commit_session()
         
     @classmethod
     def remove_all_reports_from_keywords(cls, keywords):
@@ -1965,7 +3810,32 @@ class KeyWord(BaseModel):
         for keyword in keywords:
             keyword.key_word_reports = []  
 
-        db.session.commit()
+        commit_session()
+
+
+# Версия ключевых слов профиля (redis_client.bump_keywords_version) меняется после коммита
+# любой транзакции, в которой через ORM добавлялись, менялись или удалялись KeyWord,
+# включая их связи с протоколами. Массовые query(...).delete() сюда не попадают —
+# после них версия поднимается явно
+@event.listens_for(db.session, "after_flush")
+def _collect_changed_keyword_profiles(session, flush_context):
+    profile_ids = {
+        obj.profile_id for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, KeyWord) and obj.profile_id
+    }
+    if profile_ids:
+        session.info.setdefault("keyword_profiles", set()).update(profile_ids)
+
+
+@event.listens_for(db.session, "after_commit")
+def _bump_changed_keyword_profiles(session):
+    for profile_id in session.info.pop("keyword_profiles", ()):
+        bump_keywords_version(profile_id)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_changed_keyword_profiles(session):
+    session.info.pop("keyword_profiles", None)
 
 
 class FileMetadata(BaseModel):
@@ -1991,7 +3861,7 @@ class FileMetadata(BaseModel):
             ai_file_id=ai_file_id
         )
         db.session.add(new_file)
-        db.session.commit()
+        commit_session()
         return new_file
     
     @classmethod
@@ -2058,11 +3928,11 @@ class ReportTextSnapshot(BaseModel):
                 text=text
             )
             db.session.add(snapshot)
-            db.session.commit()
+            commit_session()
             logger.info(f"(ReportTextSnapshot.create) ✅ Создан снапшот текста отчета ID={report_id} global_category_id={report.global_category_id} snapshot_id={snapshot.id}")
             return snapshot
         except Exception as e:
-            db.session.rollback()
+            rollback_session()
             logger.error(f"(ReportTextSnapshot.create) ❌ Ошибка при создании снапшота: {e}")
             raise ValueError(f"Ошибка при создании снапшота: {e}")
 
@@ -2093,6 +3963,25 @@ class ReportTextSnapshot(BaseModel):
 
 
 
+# Поиск точных дублей предложений пользователя (find_similar_exist_sentence)
+db.Index("ix_head_sentences_user_modality_hash", HeadSentence.user_id, HeadSentence.report_global_modality_id, HeadSentence.normalized_hash)
+db.Index("ix_body_sentences_user_modality_hash", BodySentence.user_id, BodySentence.report_global_modality_id, BodySentence.normalized_hash)
+db.Index("ix_tail_sentences_user_modality_hash", TailSentence.user_id, TailSentence.report_global_modality_id, TailSentence.normalized_hash)
+
+# Кандидаты в почти одинаковые предложения: полосы одного пользователя, модальности и типа (cluster_near_duplicates)
+db.Index("ix_sentence_minhash_bands_bucket", SentenceMinhashBand.sentence_type, SentenceMinhashBand.user_id, SentenceMinhashBand.report_global_modality_id, SentenceMinhashBand.band, SentenceMinhashBand.bucket)
+db.Index("ix_sentence_duplicate_clusters_user", SentenceDuplicateCluster.user_id, SentenceDuplicateCluster.sentence_type)
+
+# Предложения, для которых еще не посчитан normalized_text (renormalize_sentences)
+db.Index("ix_head_sentences_pending_normalization", HeadSentence.user_id, postgresql_where=HeadSentence.normalization_version.is_(None), sqlite_where=HeadSentence.normalization_version.is_(None))
+db.Index("ix_body_sentences_pending_normalization", BodySentence.user_id, postgresql_where=BodySentence.normalization_version.is_(None), sqlite_where=BodySentence.normalization_version.is_(None))
+db.Index("ix_tail_sentences_pending_normalization", TailSentence.user_id, postgresql_where=TailSentence.normalization_version.is_(None), sqlite_where=TailSentence.normalization_version.is_(None))
+
+# Триграммный поиск похожих предложений (SentenceGroupBase.find_similar_sentences)
+event.listen(db.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+db.Index("ix_body_sentences_search_text_trgm", BodySentence.search_text, postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"})
+db.Index("ix_tail_sentences_search_text_trgm", TailSentence.search_text, postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"})
+
 # Индексы для ускорения поиска по группам
 db.Index("ix_tail_sentence_group_id", TailSentenceGroup.id)
 db.Index("ix_body_sentence_group_id", BodySentenceGroup.id)
@@ -127,11 +127,8 @@ async function addBodySentence(itemFromBuffer) {
     }
 
     try {
-        const response = await sendRequest({
-            url: "/editing_report/add_new_sentence",
-            method: "POST",
-            data: data
-        });
+        // Новое предложение уходит вместе с накопленными правками, после чего страница перезагружается
+        const response = await editOpsQueue.run({ op: "add_new_sentence", ...data });
 
         if (response.status === "success") {
             console.log("Предложение успешно добавлено:", response.data);
@@ -215,7 +212,7 @@ function makeSentenceEditableActions(sentenceElement) {
 
         if (newText !== oldText) {
             sentenceElement.textContent = newText; // Обновляем текст в элементе
-            updateSentence(sentenceElement); // Вызов твоей функции обновления
+            updateSentence(sentenceElement, oldText); // Вызов твоей функции обновления
         }
     }
 
@@ -463,18 +460,20 @@ async function deleteBodySentence(button) {
     const headSentenceId = sentenceItem.getAttribute("data-head-sentence-id");
 
     try {
-        const response = await sendRequest({
-            url: "/editing_report/delete_sentence",
-            method: "DELETE",
-            data: { sentence_id: sentenceId,
-                    related_id: headSentenceId,
-                    sentence_type: "body"
-                }
+        // Прячем сразу, удаление уходит в очереди вместе с другими правками
+        sentenceItem.style.display = "none";
+        const response = await editOpsQueue.enqueue({
+            op: "delete_sentence",
+            sentence_id: sentenceId,
+            related_id: headSentenceId,
+            sentence_type: "body"
         });
 
         if (response.status === "success") {
-            sentenceItem.closest(".edit-sentence__item").remove();
-        } 
+            sentenceItem.remove();
+        } else {
+            sentenceItem.style.display = "";
+        }
     } catch (error) {
         console.error("Ошибка запроса:", error);
     }
@@ -482,7 +481,7 @@ async function deleteBodySentence(button) {
 
 
 // Функция отправки обновленного текста предложения на сервер
-async function updateSentence(sentenceElement) {
+async function updateSentence(sentenceElement, oldText) {
     const sentenceId = sentenceElement.closest("li").getAttribute("data-sentence-id");
     const sentenceType = sentenceElement.closest("li").getAttribute("data-sentence-type");
     const groupId = sentenceElement.closest("li").getAttribute("data-sentence-group-id"); // id группы через параграф
@@ -491,23 +490,36 @@ async function updateSentence(sentenceElement) {
     const aiGrammaCheck = document.getElementById("grammaAiChecker").checked;
 
 
+    const op = {
+        op: "update_sentence_text",
+        sentence_id: sentenceId,
+        sentence_type: sentenceType,
+        group_id: groupId,
+        sentence_text: sentenceText,
+        related_id: related_id,
+        ai_gramma_check: aiGrammaCheck
+    };
+    // Последний текст, подтвержденный сервером: пачка операций применяется целиком или никак,
+    // поэтому при ее откате возвращаем его, а не промежуточные правки из той же пачки
+    if (sentenceElement._savedText === undefined) {
+        sentenceElement._savedText = oldText;
+    }
     try {
-        const response = await sendRequest({
-            url: "/editing_report/update_sentence_text",
-            method: "PATCH",
-            data: {
-                sentence_id: sentenceId,
-                sentence_type: sentenceType,
-                group_id: groupId,
-                sentence_text: sentenceText,
-                related_id: related_id,
-                ai_gramma_check: aiGrammaCheck
-            }
-        });
+        // Без проверки грамматики текст уходит в очереди, с ней — сразу, так как страница перезагружается
+        const response = aiGrammaCheck ? await editOpsQueue.run(op) : await editOpsQueue.enqueue(op);
 
-        if (response.status === "success" && aiGrammaCheck) {
-            window.location.reload();
+        if (response.status === "success") {
+            sentenceElement._savedText = sentenceText;
+            if (aiGrammaCheck) {
+                window.location.reload();
+            }
+            return;
+        }
+        // Откатываем только если после этой правки предложение больше не меняли
+        if (sentenceElement.textContent.trim() === sentenceText) {
+            sentenceElement.textContent = sentenceElement._savedText;
         }
+        toastr.error(`Изменение предложения не сохранено, текст возвращен: ${response.message || "ошибка сохранения"}`);
     } catch (error) {
         console.error("Ошибка обновления предложения:", error);
     }
@@ -588,14 +600,15 @@ function unlinkGroup(itemWrapper) {
     const relatedId = itemWrapper.getAttribute("data-head-sentence-id");
     
 
-    sendRequest({
+    // Сначала досылаем накопленные правки, они относятся к текущей группе
+    editOpsQueue.flush().then(() => sendRequest({
         url: "/editing_report/unlink_group",
         method: "PATCH",
         data: { group_id: groupId,
                 sentence_type: sentenceType,
                 related_id: relatedId
             }
-    }).then(response => {
+    })).then(response => {
         if (response.status === "success") {
             window.location.reload();
         } else {
@@ -634,16 +647,13 @@ function unlinkSentence(sentenceItem) {
     const sentenceIndex = sentenceType === "head" ? sentenceItem.getAttribute("data-sentence-index") : sentenceItem.getAttribute("data-sentence-weight");
     const groupId = sentenceItem.getAttribute("data-sentence-group-id");
 
-    sendRequest({
-        url: "/editing_report/unlink_sentence",
-        method: "POST",
-        data: {
-            sentence_id: sentenceId,
-            sentence_type: sentenceType,
-            related_id: related_id,
-            sentence_index: sentenceIndex,
-            group_id: groupId
-        }
+    editOpsQueue.run({
+        op: "unlink_sentence",
+        sentence_id: sentenceId,
+        sentence_type: sentenceType,
+        related_id: related_id,
+        sentence_index: sentenceIndex,
+        group_id: groupId
     }).then(response => {
         if (response.status === "success") {
             window.location.reload();
@@ -674,15 +684,12 @@ function saveBodySentencesOrder(evt) {
         newWeight = prevWeight + 1;
     }
 
-    sendRequest({
-        url: "/editing_report/update_sentence_weight",
-        method: "PATCH",
-        data: {
-            sentence_id: sentenceId,
-            group_id: groupId,
-            sentence_weight: newWeight,
-            sentence_type: sentenceType
-        }
+    editOpsQueue.run({
+        op: "update_sentence_weight",
+        sentence_id: sentenceId,
+        group_id: groupId,
+        sentence_weight: newWeight,
+        sentence_type: sentenceType
     }).then(response => {
         if (response.status === "success") {
             window.location.reload();
@@ -710,10 +717,34 @@ function insertAllFromBuffer() {
         alert("Буфер пуст или не содержит подходящих предложений для вставки.");
         return;
     } else if (acceptableItems.length > 1) {
-       alert("Сделаю эту логику позднее")
+        insertBodySentencesFromBuffer(acceptableItems);
     } else {
         const itemFromBuffer = acceptableItems[0];
         addBodySentence(itemFromBuffer);
     }
 
-}
\ No newline at end of file
+}
+
+
+// Вставка нескольких предложений из буфера одной пачкой операций
+async function insertBodySentencesFromBuffer(items) {
+    if (isLocked()) return;
+
+    const bodySentenceList = document.getElementById("editBodySentenceList");
+    const headSentenceId = bodySentenceList.getAttribute("data-head-sentence-id");
+
+    const results = items.map(item => editOpsQueue.enqueue({
+        op: "add_new_sentence",
+        related_id: headSentenceId,
+        report_id: reportInfo.id,
+        sentence_type: "body",
+        sentence_id: item.object_id,
+        unique: false
+    }));
+    editOpsQueue.flush({ loader: true });
+
+    const responses = await Promise.all(results);
+    if (responses.every(response => response.status === "success")) {
+        window.location.reload();
+    }
+}
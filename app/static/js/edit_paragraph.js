@@ -197,7 +197,7 @@ function makeSentenceEditableActions(sentenceElement) {
 
         if (newText !== oldText) {
             sentenceElement.textContent = newText; // Обновляем текст элемента
-            updateSentence(sentenceElement); // Вызов твоей функции обновления
+            updateSentence(sentenceElement, oldText); // Вызов твоей функции обновления
         }
     }
 
@@ -485,11 +485,8 @@ async function addHeadSentence(itemFromBuffer) {
     };
 
     try {
-        const response = await sendRequest({
-            url: "/editing_report/add_new_sentence",
-            method: "POST",
-            data: data
-        });
+        // Новое предложение уходит вместе с накопленными правками, после чего страница перезагружается
+        const response = await editOpsQueue.run({ op: "add_new_sentence", ...data });
 
         if (response.status === "success") {
             console.log("Успешно добавлено новое предложение:", response);
@@ -536,11 +533,8 @@ async function addTailSentence(itemFromBuffer) {
 
 
     try {
-        const response = await sendRequest({
-            url: "/editing_report/add_new_sentence",
-            method: "POST",
-            data: data
-        });
+        // Новое предложение уходит вместе с накопленными правками, после чего страница перезагружается
+        const response = await editOpsQueue.run({ op: "add_new_sentence", ...data });
 
         
         if (response.status === "success") {
@@ -588,18 +582,20 @@ async function deleteTailSentence(button) {
     const paragraphId = sentenceItem.getAttribute("data-paragraph-id");
 
     try {
-        const response = await sendRequest({
-            url: "/editing_report/delete_sentence",
-            method: "DELETE",
-            data: { sentence_id: sentenceId,
-                    related_id: paragraphId,
-                    sentence_type: "tail"
-                }
+        // Прячем сразу, удаление уходит в очереди вместе с другими правками
+        sentenceItem.style.display = "none";
+        const response = await editOpsQueue.enqueue({
+            op: "delete_sentence",
+            sentence_id: sentenceId,
+            related_id: paragraphId,
+            sentence_type: "tail"
         });
 
         if (response.status === "success") {
-            sentenceItem.closest(".edit-sentence__item").remove();
-        } 
+            sentenceItem.remove();
+        } else {
+            sentenceItem.style.display = "";
+        }
     } catch (error) {
         console.error("Ошибка запроса:", error);
     }
@@ -623,18 +619,20 @@ async function deleteHeadSentence(button) {
     const sentenceId = sentenceItem.getAttribute("data-sentence-id");
     const paragraphId = sentenceItem.getAttribute("data-paragraph-id");
     try {
-        const response = await sendRequest({
-            url: "/editing_report/delete_sentence",
-            method: "DELETE",
-            data: { sentence_id: sentenceId,
-                    related_id: paragraphId,
-                    sentence_type: "head"
-                }
+        // Прячем сразу, удаление уходит в очереди вместе с другими правками
+        sentenceItem.style.display = "none";
+        const response = await editOpsQueue.enqueue({
+            op: "delete_sentence",
+            sentence_id: sentenceId,
+            related_id: paragraphId,
+            sentence_type: "head"
         });
 
         if (response.status === "success") {
-            sentenceItem.closest(".edit-sentence__item").remove();
-        } 
+            sentenceItem.remove();
+        } else {
+            sentenceItem.style.display = "";
+        }
     } catch (error) {
         console.error("Ошибка запроса:", error);
     }
@@ -658,12 +656,10 @@ function saveHeadSentencesOrder() {
         });
     });
     
-    sendRequest({
-        url: "/editing_report/update_head_sentence_order",
-        method: "POST",
-        data: { updated_order: updatedOrder,
-                paragraph_id: paragraphId 
-            }
+    editOpsQueue.run({
+        op: "update_head_sentence_order",
+        updated_order: updatedOrder,
+        paragraph_id: paragraphId
     }).then(response => {
         if (response.status === "success") {
             window.location.reload();
@@ -691,15 +687,12 @@ function saveTailSentencesOrder(evt) {
         newWeight = prevWeight + 1;
     }
 
-    sendRequest({
-        url: "/editing_report/update_sentence_weight",
-        method: "PATCH",
-        data: {
-            sentence_id: sentenceId,
-            group_id: groupId,
-            sentence_weight: newWeight,
-            sentence_type: sentenceType
-        }
+    editOpsQueue.run({
+        op: "update_sentence_weight",
+        sentence_id: sentenceId,
+        group_id: groupId,
+        sentence_weight: newWeight,
+        sentence_type: sentenceType
     }).then(response => {
         if (response.status === "success") {
             window.location.reload();
@@ -714,7 +707,7 @@ function saveTailSentencesOrder(evt) {
 
 
 // Функция отправки обновленного текста предложения на сервер
-async function updateSentence(sentenceElement) {
+async function updateSentence(sentenceElement, oldText) {
     const sentenceId = sentenceElement.closest("li").getAttribute("data-sentence-id");
     const sentenceType = sentenceElement.closest("li").getAttribute("data-sentence-type");
     const groupId = sentenceElement.closest("li").getAttribute("data-sentence-group-id"); // id группы через параграф
@@ -722,25 +715,37 @@ async function updateSentence(sentenceElement) {
     const related_id = sentenceElement.closest("li").getAttribute("data-paragraph-id");
     const aiGrammaCheck = document.getElementById("grammaAiChecker").checked;
     const useDublicate = document.getElementById("useDuplicate").checked;
+    const op = {
+        op: "update_sentence_text",
+        sentence_id: sentenceId,
+        sentence_type: sentenceType,
+        group_id: groupId,
+        sentence_text: sentenceText,
+        related_id: related_id,
+        ai_gramma_check: aiGrammaCheck,
+        use_dublicate: useDublicate
+    };
+    // Последний текст, подтвержденный сервером: пачка операций применяется целиком или никак,
+    // поэтому при ее откате возвращаем его, а не промежуточные правки из той же пачки
+    if (sentenceElement._savedText === undefined) {
+        sentenceElement._savedText = oldText;
+    }
     try {
-        const response = await sendRequest({
-            url: "/editing_report/update_sentence_text",
-            method: "PATCH",
-            data: {
-                sentence_id: sentenceId,
-                sentence_type: sentenceType,
-                group_id: groupId,
-                sentence_text: sentenceText,
-                related_id: related_id,
-                ai_gramma_check: aiGrammaCheck,
-                use_dublicate: useDublicate
-            }
-        });
+        // Без проверки грамматики текст уходит в очереди, с ней — сразу, так как страница перезагружается
+        const response = aiGrammaCheck ? await editOpsQueue.run(op) : await editOpsQueue.enqueue(op);
 
-        if (response.status === "success" && aiGrammaCheck) {
-            window.location.reload();
+        if (response.status === "success") {
+            sentenceElement._savedText = sentenceText;
+            if (aiGrammaCheck) {
+                window.location.reload();
+            }
+            return;
         }
-
+        // Откатываем только если после этой правки предложение больше не меняли
+        if (sentenceElement.textContent.trim() === sentenceText) {
+            sentenceElement.textContent = sentenceElement._savedText;
+        }
+        toastr.error(`Изменение предложения не сохранено, текст возвращен: ${response.message || "ошибка сохранения"}`);
     } catch (error) {
         console.error("Ошибка обновления предложения:", error);
     }
@@ -795,13 +800,14 @@ function deleteSubsidiaries (button) {
     const relatedId = button.closest(".control-buttons").getAttribute("data-related-id");
     const sentenceGroupId = button.closest(".control-buttons").getAttribute("data-group-id");
 
-    sendRequest({
+    // Сначала досылаем накопленные правки, они относятся к текущим группам
+    editOpsQueue.flush().then(() => sendRequest({
         url: `/editing_report/delete_subsidiaries`,
         method: "DELETE",
         data: { object_id: objectId, 
             object_type: objectType, 
          }
-    }).then(response => {
+    })).then(response => {
         window.location.reload();
     }).catch(error => {
         console.error(response.message || "Ошибка удаления дочерних элементов:", error);
@@ -851,14 +857,15 @@ function unlinkGroup(itemWrapper) {
     const relatedId = itemWrapper.getAttribute("data-related-id");
     
 
-    sendRequest({
+    // Сначала досылаем накопленные правки, они относятся к текущей группе
+    editOpsQueue.flush().then(() => sendRequest({
         url: "/editing_report/unlink_group",
         method: "PATCH",
         data: { group_id: groupId,
                 sentence_type: sentenceType,
                 related_id: relatedId
             }
-    }).then(response => {
+    })).then(response => {
         if (response.status === "success") {
             window.location.reload();
         } else {
@@ -914,16 +921,13 @@ function unlinkSentence(sentenceItem) {
     const sentenceIndex = sentenceType === "head" ? sentenceItem.getAttribute("data-sentence-index") : sentenceItem.getAttribute("data-sentence-weight");
     const groupId = sentenceItem.getAttribute("data-sentence-group-id");
 
-    sendRequest({
-        url: "/editing_report/unlink_sentence",
-        method: "POST",
-        data: {
-            sentence_id: sentenceId,
-            sentence_type: sentenceType,
-            related_id: related_id,
-            sentence_index: sentenceIndex,
-            group_id: groupId
-        }
+    editOpsQueue.run({
+        op: "unlink_sentence",
+        sentence_id: sentenceId,
+        sentence_type: sentenceType,
+        related_id: related_id,
+        sentence_index: sentenceIndex,
+        group_id: groupId
     }).then(response => {
         if (response.status === "success") {
             window.location.reload();
@@ -0,0 +1,118 @@
+// edit_ops_queue.js
+
+/**
+ * Очередь операций редактирования шаблона.
+ *
+ * Операции (update_sentence_text, update_sentence_weight, unlink_sentence, delete_sentence,
+ * update_head_sentence_order, add_new_sentence) копятся и отправляются одним запросом
+ * на /editing_report/apply_ops, где применяются по порядку в одной транзакции.
+ * Пачка уходит через FLUSH_DELAY_MS после последней операции, при MAX_BATCH операциях
+ * или по явному вызову flush() (например, перед перезагрузкой страницы).
+ * Пачка применяется целиком или никак: при ошибке одной операции остальные получают
+ * status "rolled_back" / "error", и вызывающий код должен вернуть их изменения в интерфейсе.
+ *
+ *     editOpsQueue.enqueue({ op: "update_sentence_text", sentence_id: 1, ... });
+ *     const result = await editOpsQueue.run({ op: "delete_sentence", ... }); // отправить сразу
+ */
+const editOpsQueue = (() => {
+    const APPLY_OPS_URL = "/editing_report/apply_ops";
+    const FLUSH_DELAY_MS = 800;
+    const MAX_BATCH = 50;
+
+    let pending = [];               // [{ op, resolve }]
+    let timer = null;
+    let inFlight = Promise.resolve();
+    let unsettled = 0;              // операций отправлено, но ответ по ним еще не получен
+
+    /**
+     * Добавляет операцию в очередь.
+     * @param {Object} op - Операция: { op: "<тип>", ...данные как у отдельного маршрута }.
+     * @returns {Promise<Object>} - Результат операции из ответа сервера ({ status, message, ... }).
+     */
+    function enqueue(op) {
+        return new Promise(resolve => {
+            pending.push({ op, resolve });
+            if (pending.length >= MAX_BATCH) {
+                flush();
+            } else {
+                clearTimeout(timer);
+                timer = setTimeout(flush, FLUSH_DELAY_MS);
+            }
+        });
+    }
+
+    /**
+     * Отправляет накопленные операции. Пачки уходят строго по очереди,
+     * чтобы операции применялись в том порядке, в котором были добавлены.
+     * @param {Object} [options]
+     * @param {boolean} [options.loader=false] - Показывать ли индикатор загрузки.
+     * @returns {Promise<void>} - Завершается, когда все отправленные ранее пачки обработаны.
+     */
+    function flush({ loader = false } = {}) {
+        clearTimeout(timer);
+        timer = null;
+        const batch = pending;
+        pending = [];
+        if (batch.length === 0) {
+            return inFlight;
+        }
+
+        unsettled += batch.length;
+        inFlight = inFlight.then(() => sendRequest({
+            url: APPLY_OPS_URL,
+            method: "POST",
+            data: { ops: batch.map(item => item.op) },
+            loader: loader
+        })).then(response => {
+            unsettled -= batch.length;
+            const results = response.results || [];
+            batch.forEach((item, index) => {
+                item.resolve(results[index] || { status: "error", message: response.message });
+            });
+        }).catch(error => {
+            unsettled -= batch.length;
+            console.error("Ошибка отправки пачки операций:", error);
+            batch.forEach(item => item.resolve({ status: "error", message: error.message }));
+        });
+        return inFlight;
+    }
+
+    /**
+     * Добавляет операцию и сразу отправляет очередь вместе с ней.
+     * @param {Object} op - Операция.
+     * @returns {Promise<Object>} - Результат операции.
+     */
+    function run(op) {
+        const result = enqueue(op);
+        flush({ loader: true });
+        return result;
+    }
+
+    // Пока есть неотправленные операции или пачка без ответа, уход со страницы требует подтверждения:
+    // очередь сразу отправляется, и если пользователь остается, ошибки пачки показываются как обычно
+    window.addEventListener("beforeunload", event => {
+        if (pending.length === 0 && unsettled === 0) return;
+        flush();
+        event.preventDefault();
+        event.returnValue = "";
+    });
+
+    // Пользователь ушел, несмотря на предупреждение: досылаем остаток (keepalive переживает выгрузку страницы).
+    // Показать результат уже некому — ошибки видны только в консоли, если страница попала в bfcache
+    window.addEventListener("pagehide", () => {
+        if (pending.length === 0 || !csrfToken) return;
+        const batch = pending;
+        pending = [];
+        clearTimeout(timer);
+        fetch(APPLY_OPS_URL, {
+            method: "POST",
+            keepalive: true,
+            headers: { "Content-Type": "application/json", "X-CSRFToken": csrfToken },
+            body: JSON.stringify({ ops: batch.map(item => item.op) })
+        }).then(response => {
+            if (!response.ok) console.error(`Пачка операций при уходе со страницы не применена (HTTP ${response.status})`);
+        }).catch(error => console.error("Ошибка отправки пачки операций при уходе со страницы:", error));
+    });
+
+    return { enqueue, flush, run };
+})();
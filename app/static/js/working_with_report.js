@@ -40,13 +40,7 @@ function initWorkingWithReport() {
     }
     
     
-    linkSentences(); // Связываем предложения с данными
-    
-    updateCoreAndImpessionParagraphText(); // Запускает выделение ключевых слов при загрузке страницы
-
-    sentenceDoubleClickHandle(); // Включаем логику двойного клика на предложение
-
-    addSentenceButtonLogic(); // Включаем логику кнопки "+"
+    initParagraphElements(document); // Связываем предложения с данными и развешиваем слушатели на параграфы
 
     
 
@@ -80,14 +74,6 @@ function initWorkingWithReport() {
     }
 
 
-    // Слушатель на получение и потерю фокуса для всех предложений
-    document.querySelectorAll(".report__sentence").forEach(sentenceElement => {
-        // Attach focus and blur event listeners
-        sentenceElement.addEventListener("focus", handleSentenceFocus);
-        sentenceElement.addEventListener("blur", handleSentenceBlur);
-    }); 
-
-
     // Слушатель на кнопку "Завершить"
     document.getElementById("finishWork").addEventListener("click", function() {
         finishWorkAndSaveSnapShot();
@@ -109,6 +95,30 @@ function initWorkingWithReport() {
 }
 
 
+/**
+ * Связывает предложения с данными и развешивает слушатели на параграфы внутри root.
+ * Вызывается для всей страницы при загрузке и для отдельных параграфов,
+ * пришедших фрагментами после анализа динамики.
+ * @param {Document|HTMLElement} root - Вся страница или элемент параграфа.
+ */
+function initParagraphElements(root = document) {
+    linkSentences(root); // Связываем предложения с данными
+    
+    updateCoreAndImpessionParagraphText(root); // Запускает выделение ключевых слов
+
+    sentenceDoubleClickHandle(root); // Включаем логику двойного клика на предложение
+
+    addSentenceButtonLogic(root); // Включаем логику кнопки "+"
+
+    // Слушатель на получение и потерю фокуса для всех предложений
+    root.querySelectorAll(".report__sentence").forEach(sentenceElement => {
+        // Attach focus and blur event listeners
+        sentenceElement.addEventListener("focus", handleSentenceFocus);
+        sentenceElement.addEventListener("blur", handleSentenceBlur);
+    }); 
+}
+
+
 /**
  * Extracts the maximum number from the protocol number and increments it by 1 used in working with report.
  * 
@@ -156,6 +166,10 @@ function handleSentenceFocus() {
         };
         onEnter(this, this._onEnterHandler, true);
     }
+    // Заранее подгружаем связанные предложения — они нужны для проверки дубликатов и всплывающего окна
+    if (this.bodySentencesCount > 0) {
+        loadLinkedSentences(this);
+    }
 }
 
 
@@ -163,11 +177,11 @@ function handleSentenceFocus() {
 /**
  * Handles the blur event for a sentence element.
  * Checks for changes and marks the sentence as modified if needed.
+ * Связанные предложения для проверки дубликатов сначала догружаются (loadLinkedSentences).
  */
-function handleSentenceBlur() {
+async function handleSentenceBlur() {
     const originalText = this.getAttribute("data-original-text");
     const currentText = this.textContent;
-    const linkedSentences = this.linkedSentences || [];
     const firstGrammaCheckedText = this.getAttribute("data-first-gramma-checked-text") || "";
     
     if (!currentText) {return;}
@@ -180,6 +194,11 @@ function handleSentenceBlur() {
     if (normalizedFirstGrammaChecked === normalizedCurrent) {return;}
     if (normalizedCurrent === normalizedOriginal) {return;}
     
+    // Облегченное дерево: body предложения могли еще не загрузиться — ждем их, иначе дубликат не поймать
+    const linkedSentences = await loadLinkedSentences(this);
+    // Пока шла загрузка, пользователь снова начал править предложение — проверит следующий blur
+    if (this.textContent !== currentText) {return;}
+
     const isDuplicate = linkedSentences.some(sentence =>
         normalizeSentence(sentence.sentence, keyWordsGroups) === normalizedCurrent
     );
@@ -345,8 +364,9 @@ function handleKeywordClick(event) {
  * Обновляет текст абзацев с классом `paragraph__item--core` и "paragraph__item--impression" и выделяет ключевые слова.
  * 
  */
-function updateCoreAndImpessionParagraphText() {
-    const coreAndImpessionParagraphLists = document.querySelectorAll(".paragraph__item--core, .paragraph__item--impression");
+function updateCoreAndImpessionParagraphText(root = document) {
+    const selector = ".paragraph__item--core, .paragraph__item--impression";
+    const coreAndImpessionParagraphLists = root.matches && root.matches(selector) ? [root] : root.querySelectorAll(selector);
     coreAndImpessionParagraphLists.forEach(paragraphList => {
         paragraphList.querySelectorAll("span").forEach(paragraph => {
             if (isElementVisible(paragraph)) { // Проверяем, виден ли элемент
@@ -444,9 +464,9 @@ function findHeadSentenceById(paragraphData, sentenceId) {
 
 
 // Связывает head предложения с body предложениями. САМОЕ ВАЖНОЕ
-function linkSentences() {
+function linkSentences(root = document) {
     // Находим все предложения на странице
-    const sentencesOnPage = document.querySelectorAll(".report__sentence");
+    const sentencesOnPage = root.querySelectorAll(".report__sentence");
     // Проходим по каждому предложению на странице
     sentencesOnPage.forEach(sentenceElement => {
         const paragraphId = parseInt(sentenceElement.getAttribute("data-paragraph-id"));
@@ -456,24 +476,84 @@ function linkSentences() {
         const currentHeadSentence = paragraphData.head_sentences.find(sentence => sentence.id === sentenceId) || null;
         const bodySentences = currentHeadSentence.body_sentences;
 
-        // Связываем видимое предложение с отфильтрованными предложениями из reportData
-        sentenceElement.linkedSentences = bodySentences;
+        if (Array.isArray(bodySentences)) {
+            // Полное дерево (например, после анализа динамики) — body предложения уже на месте
+            sentenceElement.linkedSentences = bodySentences;
+            sentenceElement.bodySentencesCount = bodySentences.length;
+        } else {
+            // Облегченное дерево — body предложения загрузим при первом обращении (loadLinkedSentences)
+            sentenceElement.linkedSentences = null;
+            sentenceElement.bodySentencesCount = currentHeadSentence.body_sentences_count || 0;
+        }
+        sentenceElement.bodySentenceGroupId = currentHeadSentence.body_sentence_group_id;
+        sentenceElement._linkedSentencesPromise = null;
 
         // Если есть связанные предложения, выделяем цветом текущее предложение
-        if (sentenceElement.linkedSentences.length > 0) {
+        if (sentenceElement.bodySentencesCount > 0) {
             sentenceElement.classList.add("has-linked-sentences-highlighted-sentence");
         }
     });
 }
 
 
+/**
+ * Загружает body предложения для head предложения постранично и сохраняет их в linkedSentences.
+ * Повторные вызовы возвращают тот же промис, поэтому запрос уходит один раз.
+ * @param {HTMLElement} sentenceElement - Элемент head предложения.
+ * @returns {Promise<Array>} - Список body предложений.
+ */
+function loadLinkedSentences(sentenceElement) {
+    if (Array.isArray(sentenceElement.linkedSentences)) {
+        return Promise.resolve(sentenceElement.linkedSentences);
+    }
+    if (!sentenceElement.bodySentencesCount || !sentenceElement.bodySentenceGroupId) {
+        return Promise.resolve([]);
+    }
+    if (sentenceElement._linkedSentencesPromise) {
+        return sentenceElement._linkedSentencesPromise;
+    }
+
+    const groupId = sentenceElement.bodySentenceGroupId;
+    const revision = (window.reportData && window.reportData.revision) || 0;
+    const limit = 100;
+
+    sentenceElement._linkedSentencesPromise = (async () => {
+        const sentences = [];
+        let offset = 0;
+        let total = Infinity;
+        while (offset < total) {
+            // Обычный fetch, а не sendRequest: ответ не нужно показывать пользователю в toastr
+            const res = await fetch(`/working_with_reports/body_sentences/${groupId}?offset=${offset}&limit=${limit}&rev=${revision}`);
+            const response = await res.json();
+            if (!res.ok || response.status !== "success") {
+                throw new Error(response?.message || "Не удалось загрузить связанные предложения");
+            }
+            sentences.push(...response.sentences);
+            total = response.total;
+            if (response.sentences.length === 0) break;
+            offset += response.sentences.length;
+        }
+        sentenceElement.linkedSentences = sentences;
+        return sentences;
+    })().catch(error => {
+        // Даем возможность повторить загрузку при следующем обращении
+        sentenceElement._linkedSentencesPromise = null;
+        console.error("Ошибка загрузки связанных предложений:", error);
+        return [];
+    });
+
+    return sentenceElement._linkedSentencesPromise;
+}
+
+
 // Добавляет обработчики двойного клика и ввода для элементов предложений на странице. САМОЕ ВАЖНОЕ
-function sentenceDoubleClickHandle (){
-    const sentencesOnPage = document.querySelectorAll(".report__sentence");
+function sentenceDoubleClickHandle (root = document){
+    const sentencesOnPage = root.querySelectorAll(".report__sentence");
     sentencesOnPage.forEach(sentenceElement => {
         // Добавляю слушатель двойного клика на предложение
-        sentenceElement.addEventListener("dblclick", function(event){
+        sentenceElement.addEventListener("dblclick", async function(event){
             activeSentence = sentenceElement;
+            await loadLinkedSentences(sentenceElement);
             if (sentenceElement.linkedSentences && sentenceElement.linkedSentences.length > 0) {
                 // Передаем функцию, которая заменяет текст предложения
                 showPopupSentences(event.pageX, event.pageY, sentenceElement.linkedSentences, (selectedSentence) => {
@@ -540,8 +620,8 @@ window.matchesAllWords = function (text, query) {
 
 
 // Логика для кнопки "+". Открывает popup с отфильтрованными предложениями.
-function addSentenceButtonLogic() {
-    document.querySelectorAll(".icon-btn--add-sentence").forEach(button => {
+function addSentenceButtonLogic(root = document) {
+    root.querySelectorAll(".icon-btn--add-sentence").forEach(button => {
         button.addEventListener("click", function(event) {
             const paragraphId = parseInt(this.closest(".paragraph__item").querySelector("p").getAttribute("data-paragraph-id"));
             // Создаем пустое предложение и добавляем перед кнопкой
@@ -1344,34 +1424,12 @@ async function showDynamicReportPopup(boxForAiImpressionResponse, boxForAiRedact
 }
 
 
-// Функция для повторного выполнения встроенных скриптов в контейнере
-// использую после ререндеринга body без перезагрузки страницы
-function reexecuteInlineScripts(container = document.body) {
-    const scripts = container.querySelectorAll("script:not(.no-reexec)");
-
-    scripts.forEach(oldScript => {
-        const newScript = document.createElement("script");
-        [...oldScript.attributes].forEach(attr => newScript.setAttribute(attr.name, attr.value));
-        if (oldScript.src) {
-            newScript.src = oldScript.src;
-        } else {
-            newScript.textContent = oldScript.textContent;
-        }
-        oldScript.replaceWith(newScript);
-    });
-}
-
-
 // Функция для обработки ответа после трансформации предыдущего протокола. 
-// Перерисовывает body
+// Сервер присылает HTML только изменившихся параграфов — перерисовываем их, остальные оставляем
 function handleAnalyzeDynamicsResponse(response) {
-    document.body.innerHTML = response.html;
     window.keyWordsGroups = response.key_words_groups;
-    window.reportData = response.report_data;
-    window.currentReportParagraphsData = response.paragraphs_data;
-    refreshCsrfToken();
-    initWorkingWithReport();
-    reexecuteInlineScripts(); // Перезапускаем скрипты в новом body
+    mergeChangedParagraphsData(response);
+    applyParagraphsDelta(response);
     additionalFindings(response); // Отображаем нераспознанные предложения
     attachPrevReportOverlayLogic(); // навешиваем поведение Overlay
     // показываем кнопку showPrevReportButton
@@ -1396,6 +1454,77 @@ function handleAnalyzeDynamicsResponse(response) {
 }
 
 
+/**
+ * Вливает данные изменившихся параграфов в window.currentReportParagraphsData:
+ * изменившиеся заменяет, неизменные оставляет, порядок берет из paragraph_order.
+ * @param {Object} delta - {paragraph_order, changed_paragraphs}
+ */
+function mergeChangedParagraphsData({ paragraph_order = [], changed_paragraphs = [] }) {
+    const paragraphsById = new Map();
+    (window.currentReportParagraphsData || []).forEach(paragraph => {
+        paragraphsById.set(String(paragraph.id), paragraph);
+    });
+    changed_paragraphs.forEach(paragraph => {
+        paragraphsById.set(String(paragraph.id), paragraph);
+    });
+    window.currentReportParagraphsData = paragraph_order
+        .map(paragraphId => paragraphsById.get(String(paragraphId)))
+        .filter(Boolean);
+}
+
+
+/**
+ * Применяет частичное обновление параграфов: ставит параграфы в порядке paragraph_order,
+ * изменившиеся заменяет HTML из paragraphs_html, неизменные переиспользует вместе со слушателями.
+ * @param {Object} delta - {paragraph_order, paragraphs_html, inactive_paragraphs_html}
+ */
+function applyParagraphsDelta({ paragraph_order = [], paragraphs_html = {}, inactive_paragraphs_html = "" }) {
+    const paragraphList = document.querySelector(".paragraph__list");
+    if (!paragraphList) return;
+
+    const existingItems = new Map();
+    paragraphList.querySelectorAll(":scope > .paragraph__item").forEach(item => {
+        existingItems.set(String(item.getAttribute("data-paragraph-id")), item);
+    });
+
+    const fragment = document.createDocumentFragment();
+    const renderedItems = [];
+    paragraph_order.forEach(paragraphId => {
+        const html = paragraphs_html[paragraphId] ?? paragraphs_html[String(paragraphId)];
+        if (html !== undefined) {
+            const template = document.createElement("template");
+            template.innerHTML = html.trim();
+            const item = template.content.firstElementChild;
+            fragment.appendChild(item);
+            renderedItems.push(item);
+        } else if (existingItems.has(String(paragraphId))) {
+            fragment.appendChild(existingItems.get(String(paragraphId)));
+        }
+    });
+    paragraphList.replaceChildren(fragment);
+
+    // Слушатели и подсветку навешиваем только на новые параграфы (элементы уже в DOM)
+    renderedItems.forEach(item => initParagraphElements(item));
+
+    // Список неактивных параграфов маленький — перерисовываем целиком
+    const inactiveParagraphsList = document.getElementById("inactiveParagraphsList");
+    if (inactiveParagraphsList) {
+        inactiveParagraphsList.querySelectorAll(".report-controlpanel__inactive-paragraphs-item").forEach(item => item.remove());
+        const title = inactiveParagraphsList.querySelector("h3");
+        const template = document.createElement("template");
+        template.innerHTML = inactive_paragraphs_html;
+        const items = [...template.content.querySelectorAll(".report-controlpanel__inactive-paragraphs-item")];
+        items.forEach(item => {
+            item.addEventListener("click", function() {
+                inactiveParagraphsListClickHandler(item);
+            });
+        });
+        title ? title.after(...items) : inactiveParagraphsList.prepend(...items);
+        inactiveParagraphsList.style.display = items.length === 0 ? "none" : "";
+    }
+}
+
+
 // Функция для обработки дополнительных находок после анализа динамики
 // Отображает нераспознанные предложения в блоке aiDynamicBlock
 function additionalFindings(response) {
@@ -1450,6 +1579,13 @@ function attachPrevReportOverlayLogic() {
     const overlay = document.getElementById("prevReportOverlay");
     const textBlock = overlay.querySelector("#prevReportText");
 
+    // Страница больше не перерисовывается целиком — при повторном анализе только обновляем текст
+    if (overlay.dataset.logicAttached) {
+        textBlock.textContent = window.previousDynamicsText || "(нет сохранённого текста)";
+        return;
+    }
+    overlay.dataset.logicAttached = "true";
+
     // Вешаем обработчик на кнопку "Показать предыдущий отчет"
     const showPrevReportButton = document.getElementById("showPrevReportButton");
     if (showPrevReportButton) {
@@ -1,5 +1,8 @@
 # common.py
 
+import hashlib
+import re
+import unicodedata
 from sqlalchemy import func
 from app.utils.logger import logger
 
@@ -14,6 +17,38 @@ def ensure_list(value):
 
 
 
+def normalize_sentence_text(text):
+    """Нормализует текст предложения для сравнения: NFC, обрезка краев и схлопывание пробелов. Регистр сохраняется."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+
+def sentence_search_text(text):
+    """
+    Форма предложения для триграммного поиска (колонка search_text): нижний регистр, без знаков
+    препинания и цифр, с одиночными пробелами. Совпадает с clean_text_with_keywords без ключевых слов и слов-исключений.
+    """
+    text = str(text or "").lower()
+    text = re.sub(r"[^\w\s]", "", text)
+    text = re.sub(r"\d+", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+
+def sentence_normalized_hash(sentence, tags=None, comment=None):
+    """
+    Хэш нормализованного текста предложения вместе с тегами и комментарием.
+    Хранится в колонке normalized_hash таблиц предложений и используется для поиска точных дублей.
+    Функция используется и в миграции заполнения колонки — менять алгоритм можно только вместе с пересчетом хэшей.
+
+    Returns:
+        str: sha256 в hex (64 символа).
+    """
+    parts = (normalize_sentence_text(sentence), normalize_sentence_text(tags), normalize_sentence_text(comment))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+
 def get_max_index(model, filter_field, filter_value, column):
     """
     Вычисляет максимальный индекс для указанного столбца модели для текущего пользователя.
@@ -37,7 +72,7 @@ def get_max_index(model, filter_field, filter_value, column):
 
 # Нормализация индексов параграфов (кажется не используется)
 def normalize_paragraph_indices(report_id):
-    from app.models.models import db, Report, Paragraph, HeadSentence
+    from app.models.models import db, Report, Paragraph
 
     report = Report.get_by_id(report_id)
     if not report:
@@ -45,12 +80,9 @@ def normalize_paragraph_indices(report_id):
         raise ValueError(f"Протокол {report_id} не найден")
         
     try:
-        paragraphs = Paragraph.query.filter_by(report_id=report.id).order_by(Paragraph.paragraph_index).all()
-        
-        # Обновляем индексы параграфов
-        for new_index, paragraph in enumerate(paragraphs):
-            paragraph.paragraph_index = new_index
-        
+        # Один UPDATE с row_number() вместо загрузки и перезаписи каждого параграфа
+        Paragraph.renumber_indices(report.id)
+        Report.touch(report.id)
         db.session.commit()  
         logger.info(f"Индексы успешно исправлены")
         return
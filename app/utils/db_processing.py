@@ -2,10 +2,28 @@
 
 from flask import current_app, session
 from flask_security import current_user
-from app.models.models import KeyWord, db, AppConfig, UserProfile, ReportCategory, User, Report
+from sqlalchemy import case, func, select
+from app.models.models import (
+    KeyWord, db, AppConfig, UserProfile, ReportCategory, User, Report, HeadSentence, BodySentence, TailSentence,
+    HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup, SENTENCE_TYPES, SentenceMinhashBand, SentenceDuplicateCluster,
+)
 from app.utils.logger import logger
 from app.utils.common import get_max_index
+from app.utils.unit_of_work import commit_session, rollback_session, unit_of_work
+from app.utils.redis_client import (
+    read_all_buffered_weights, ack_buffered_weights, acquire_weights_flush_lock, release_weights_flush_lock,
+    redis_get, redis_set, acquire_orphan_gc_lock, release_orphan_gc_lock, ORPHAN_GC_WATERMARK_KEY, ORPHAN_GC_LAST_RUN_KEY,
+    get_keywords_version, acquire_renormalize_lock, release_renormalize_lock, renormalize_state_key, RENORMALIZE_LAST_RUN_KEY,
+    acquire_duplicate_clusters_lock, release_duplicate_clusters_lock, DUPLICATE_CLUSTERS_LAST_RUN_KEY, DUPLICATE_CLUSTERS_WATERMARK_KEY,
+    get_sentences_for_rehash, ack_sentences_rehash,
+)
+from app.utils.sentence_processing import (
+    NORMALIZATION_RULES_VERSION, get_keyword_matcher, get_profile_except_words,
+    group_near_duplicates, minhash_band_buckets, minhash_signature, near_duplicate_text, text_shingles,
+)
+from datetime import datetime, timezone
 import json
+import time
 
 
 def add_keywords_to_db(key_words, report_ids):
@@ -67,7 +85,8 @@ def sync_all_profiles_settings(user_id):
                     AppConfig.query.filter_by(profile_id=profile.id, config_key=key).delete()
         
         # Фиксируем изменения
-        db.session.commit()
+        commit_session()
+        AppConfig.forget_profile_settings(profile.id)
 
     logger.info(f"Синхронизация настроек для всех профилей пользователя {user_id} завершена")
     
@@ -127,8 +146,398 @@ def delete_all_User_except(keep_ids=None):
     count = len(users_to_delete)
     for user in users_to_delete:
         db.session.delete(user)
-    db.session.commit()
+    commit_session()
     logger.info(f"Удалено пользователей: {count}")
     return count
 
 
+# Перенос накопленных в Redis приростов весов body/tail предложений в базу (Celery beat)
+def flush_buffered_sentence_weights():
+    """
+    Записывает в базу приросты весов, накопленные increase_weight в Redis: по одному UPDATE
+    на тип предложений в одной транзакции. Из Redis приросты вычитаются только после коммита,
+    поэтому при ошибке они дождутся следующего запуска, а новые клики во время переноса не теряются.
+    Returns:
+        int: Сколько пар (группа, предложение) перенесено.
+    """
+    lock_token = acquire_weights_flush_lock()
+    if not lock_token:
+        logger.info("(flush_buffered_sentence_weights) ⚠️ Перенос весов уже выполняется, пропускаю запуск")
+        return 0
+    try:
+        snapshot = read_all_buffered_weights()
+        deltas_by_type = {"body": {}, "tail": {}}
+        for (sentence_type, group_id), deltas in snapshot.items():
+            for sentence_id, delta in deltas.items():
+                deltas_by_type[sentence_type][(group_id, sentence_id)] = delta
+        if not any(deltas_by_type.values()):
+            return 0
+
+        with unit_of_work("flush_buffered_sentence_weights"):
+            BodySentence.apply_weight_deltas(deltas_by_type["body"])
+            TailSentence.apply_weight_deltas(deltas_by_type["tail"])
+        ack_buffered_weights(snapshot)
+
+        flushed = sum(len(deltas) for deltas in deltas_by_type.values())
+        logger.info(f"(flush_buffered_sentence_weights) ✅ Перенесены веса {flushed} предложений из {len(snapshot)} групп")
+        return flushed
+    finally:
+        release_weights_flush_lock(lock_token)
+
+
+# Порядок сборки мусора: удаление групп оставляет без связей их предложения,
+# удаление head предложений — их body группы, поэтому они идут раньше
+ORPHAN_GC_ORDER = (HeadSentenceGroup, TailSentenceGroup, HeadSentence, BodySentenceGroup, BodySentence, TailSentence)
+
+
+# Удаление осиротевших предложений и групп (Celery beat)
+def collect_orphans(batch_size=None, dry_run=None):
+    """
+    Удаляет группы без родительской сущности и предложения без групп, которые остаются после 
+    копирования групп при редактировании, отвязывания и удалений. Поиск — anti-join по таблицам
+    связей, удаление пачками по batch_size строк, каждая пачка в своей транзакции.
+    
+    Удаляются только строки с ID не больше водяного знака прошлого запуска: только что созданные
+    предложения и группы коммитятся до привязки к родителю и не должны попасть под удаление.
+    Первый запуск только запоминает водяной знак.
+    
+    Args:
+        batch_size (int, optional): Строк на транзакцию. По умолчанию ORPHAN_GC_BATCH_SIZE.
+        dry_run (bool, optional): Только посчитать осиротевшие строки, ничего не удаляя. По умолчанию ORPHAN_GC_DRY_RUN.
+            Предложения, которые осиротели бы после удаления своих групп, в этом режиме не учитываются.
+    Returns:
+        dict | None: Итоги запуска (они же сохраняются в Redis) или None, если сборка уже идет.
+    """
+    batch_size = batch_size or current_app.config.get("ORPHAN_GC_BATCH_SIZE", 5000)
+    if dry_run is None:
+        dry_run = current_app.config.get("ORPHAN_GC_DRY_RUN", False)
+    if not acquire_orphan_gc_lock():
+        logger.info("(collect_orphans) ⚠️ Сборка мусора уже выполняется, пропускаю запуск")
+        return None
+    try:
+        logger.info(f"(collect_orphans) 🚀 Начата сборка мусора (dry_run={dry_run}, batch_size={batch_size})")
+        started = time.perf_counter()
+        watermark = json.loads(redis_get(ORPHAN_GC_WATERMARK_KEY) or "{}")
+        next_watermark = {
+            model.__tablename__: db.session.query(func.max(model.id)).scalar() or 0 for model in ORPHAN_GC_ORDER
+        }
+        db.session.commit()
+
+        counts = {}
+        batches = 0
+        for model in ORPHAN_GC_ORDER:
+            table_name = model.__tablename__
+            max_id = watermark.get(table_name)
+            if dry_run:
+                query = select(func.count()).select_from(model).where(model.orphan_filter())
+                if max_id is not None:
+                    query = query.where(model.id <= max_id)
+                counts[table_name] = db.session.execute(query).scalar()
+                continue
+            counts[table_name] = 0
+            if max_id is None:
+                continue
+            while True:
+                with unit_of_work("collect_orphans"):
+                    deleted = model.delete_orphans(batch_size, max_id)
+                batches += 1
+                counts[table_name] += deleted
+                if deleted < batch_size:
+                    break
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            redis_set(ORPHAN_GC_WATERMARK_KEY, json.dumps(next_watermark))
+
+        stats = {
+            "dry_run": dry_run,
+            "first_run": not watermark,
+            "batch_size": batch_size,
+            "batches": batches,
+            "counts": counts,
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        redis_set(ORPHAN_GC_LAST_RUN_KEY, json.dumps(stats))
+        action = "Найдено" if dry_run else "Удалено"
+        logger.info(f"(collect_orphans) ✅ {action} осиротевших строк: {sum(counts.values())} {counts} за {stats['duration_ms']} ms, пачек {batches}")
+        return stats
+    finally:
+        release_orphan_gc_lock()
+
+
+# Пересчет сохраненных нормализованных текстов предложений (Celery beat и после изменения ключевых слов)
+def renormalize_sentences(profile_id=None, batch_size=None):
+    """
+    Пересчитывает normalized_text предложений, у которых он еще не посчитан или посчитан другой версией
+    KeywordMatcher (другие правила очистки, ключевые слова протокола или EXCEPT_WORDS профиля).
+    Для каждого протокола собирается его KeywordMatcher, устаревшие предложения его групп
+    пересчитываются пачками по batch_size строк, каждая пачка в своей транзакции.
+    
+    Профиль пропускается, если с прошлого полного прохода не менялись ни правила, ни версия ключевых
+    слов, ни EXCEPT_WORDS, а у пользователя нет предложений без normalized_text. Предложение из группы,
+    общей для протоколов с разными ключевыми словами, хранит форму последнего из них — сравнение
+    в другом протоколе очистит его на месте.
+    
+    Args:
+        profile_id (int, optional): Пересчитать только этот профиль. По умолчанию — все профили.
+        batch_size (int, optional): Строк на транзакцию. По умолчанию RENORMALIZE_BATCH_SIZE.
+    Returns:
+        dict | None: Итоги запуска (они же сохраняются в Redis) или None, если пересчет уже идет.
+    """
+    batch_size = batch_size or current_app.config.get("RENORMALIZE_BATCH_SIZE", 2000)
+    if not acquire_renormalize_lock():
+        logger.info("(renormalize_sentences) ⚠️ Пересчет нормализованных текстов уже выполняется, пропускаю запуск")
+        return None
+    try:
+        logger.info(f"(renormalize_sentences) 🚀 Начат пересчет нормализованных текстов (profile_id={profile_id}, batch_size={batch_size})")
+        started = time.perf_counter()
+        query = select(UserProfile.id, UserProfile.user_id).order_by(UserProfile.id)
+        if profile_id:
+            query = query.where(UserProfile.id == profile_id)
+        profiles = db.session.execute(query).all()
+
+        counts = {"profiles": 0, "skipped_profiles": 0, "reports": 0, "sentences": 0}
+        batches = 0
+        for current_profile_id, user_id in profiles:
+            except_words = get_profile_except_words(current_profile_id)
+            keywords_version = get_keywords_version(current_profile_id)
+            state = json.dumps([NORMALIZATION_RULES_VERSION, keywords_version, except_words], ensure_ascii=False)
+            if (
+                keywords_version is not None
+                and redis_get(renormalize_state_key(current_profile_id)) == state
+                and not any(sentence_class.has_pending_normalization(user_id) for sentence_class in (HeadSentence, BodySentence, TailSentence))
+            ):
+                counts["skipped_profiles"] += 1
+                continue
+
+            report_ids = db.session.execute(
+                select(Report.id).where(Report.profile_id == current_profile_id).order_by(Report.id)
+            ).scalars().all()
+            for report_id in report_ids:
+                keyword_matcher = get_keyword_matcher(current_profile_id, report_id, except_words)
+                for sentence_class in (HeadSentence, BodySentence, TailSentence):
+                    after_id = 0
+                    while True:
+                        rows = sentence_class.find_stale_normalized(report_id, keyword_matcher.version, batch_size, after_id)
+                        if not rows:
+                            break
+                        with unit_of_work("renormalize_sentences"):
+                            sentence_class.store_normalized_texts(
+                                {row.id: keyword_matcher.clean(row.sentence) for row in rows}, keyword_matcher.version
+                            )
+                        batches += 1
+                        counts["sentences"] += len(rows)
+                        after_id = rows[-1].id
+                        if len(rows) < batch_size:
+                            break
+                counts["reports"] += 1
+            db.session.commit()
+            # Состояние запоминаем только после полного прохода профиля; без Redis пропускать профили не получится
+            if keywords_version is not None:
+                redis_set(renormalize_state_key(current_profile_id), state)
+            counts["profiles"] += 1
+
+        stats = {
+            "profile_id": profile_id,
+            "batch_size": batch_size,
+            "batches": batches,
+            "counts": counts,
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        redis_set(RENORMALIZE_LAST_RUN_KEY, json.dumps(stats))
+        logger.info(f"(renormalize_sentences) ✅ Пересчитано предложений: {counts['sentences']} {counts} за {stats['duration_ms']} ms, пачек {batches}")
+        return stats
+    finally:
+        release_renormalize_lock()
+
+
+# Поиск почти одинаковых предложений (Celery beat)
+def cluster_near_duplicates(batch_size=None, threshold=None):
+    """
+    Собирает кластеры почти одинаковых предложений библиотеки: варианты, которые отличаются только
+    пунктуацией, пробелами или ключевыми словами. Поиск идет отдельно по каждому пользователю,
+    модальности и типу предложений.
+
+    Для новых предложений (ID больше водяного знака прошлого запуска) считаются MinHash-подписи
+    нормализованного текста, их полосы LSH сохраняются в sentence_minhash_bands пачками по
+    batch_size строк. Уже обработанные предложения повторно хэшируются, только если их текст
+    поменяли на месте: при правке полосы удаляются, а предложение попадает в очередь в Redis.
+    Для пользователей и модальностей с новыми или измененными предложениями кластеры пересобираются: кандидаты —
+    предложения с общей полосой, в кластер попадают кандидаты с коэффициентом Жаккара n-грамм
+    с представителем не ниже threshold.
+
+    Args:
+        batch_size (int, optional): Предложений на транзакцию. По умолчанию DUPLICATE_CLUSTERS_BATCH_SIZE.
+        threshold (float, optional): Порог коэффициента Жаккара. По умолчанию DUPLICATE_CLUSTERS_THRESHOLD.
+    Returns:
+        dict | None: Итоги запуска (они же сохраняются в Redis) или None, если поиск уже идет.
+    """
+    batch_size = batch_size or current_app.config.get("DUPLICATE_CLUSTERS_BATCH_SIZE", 2000)
+    threshold = threshold or current_app.config.get("DUPLICATE_CLUSTERS_THRESHOLD", 0.8)
+    if not acquire_duplicate_clusters_lock():
+        logger.info("(cluster_near_duplicates) ⚠️ Поиск почти одинаковых предложений уже выполняется, пропускаю запуск")
+        return None
+    try:
+        logger.info(f"(cluster_near_duplicates) 🚀 Начат поиск почти одинаковых предложений (batch_size={batch_size}, threshold={threshold})")
+        started = time.perf_counter()
+        watermark = json.loads(redis_get(DUPLICATE_CLUSTERS_WATERMARK_KEY) or "{}")
+        counts = {"hashed": 0, "dropped_bands": 0, "groups": 0, "clusters": 0}
+        batches = 0
+        rehash_done = {}
+        for sentence_type, sentence_class in SENTENCE_TYPES.items():
+            # Кластеры пересобираются там, где появились новые предложения или были удалены старые
+            with unit_of_work("cluster_near_duplicates"):
+                dropped, touched = SentenceMinhashBand.delete_missing(sentence_type)
+            counts["dropped_bands"] += dropped
+
+            # Водяной знак из Redis учитывает предложения без полос (пустой текст), полосы в базе — потерю Redis
+            after_id = max(watermark.get(sentence_type, 0), SentenceMinhashBand.last_hashed_id(sentence_type))
+            columns = (sentence_class.id, sentence_class.user_id, sentence_class.report_global_modality_id,
+                       sentence_class.sentence, sentence_class.normalized_text)
+
+            # Предложения с правленым текстом: ID старше водяного знака, основной проход их не увидит
+            rehash_ids = get_sentences_for_rehash(sentence_type)
+            rehashed = [sentence_id for sentence_id in rehash_ids if sentence_id <= after_id]
+            for start in range(0, len(rehashed), batch_size):
+                chunk = rehashed[start:start + batch_size]
+                rows = db.session.execute(select(*columns).where(sentence_class.id.in_(chunk)).order_by(sentence_class.id)).all()
+                for row in rows:
+                    touched.add((row.user_id, row.report_global_modality_id))
+                with unit_of_work("cluster_near_duplicates"):
+                    SentenceMinhashBand.delete_for_sentences(sentence_type, chunk)
+                    SentenceMinhashBand.store_bands(_minhash_band_rows(sentence_type, rows, touched))
+                batches += 1
+                counts["hashed"] += len(rows)
+
+            while True:
+                rows = db.session.execute(
+                    select(*columns)
+                    .where(sentence_class.id > after_id)
+                    .order_by(sentence_class.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                with unit_of_work("cluster_near_duplicates"):
+                    SentenceMinhashBand.store_bands(_minhash_band_rows(sentence_type, rows, touched))
+                batches += 1
+                counts["hashed"] += len(rows)
+                after_id = rows[-1].id
+                if len(rows) < batch_size:
+                    break
+            watermark[sentence_type] = after_id
+            rehash_done[sentence_type] = rehash_ids
+
+            for user_id, modality_id in sorted(touched, key=lambda key: (key[0] or 0, key[1] or 0)):
+                clusters = _build_duplicate_clusters(sentence_type, sentence_class, user_id, modality_id, threshold)
+                with unit_of_work("cluster_near_duplicates"):
+                    SentenceDuplicateCluster.replace_for_group(sentence_type, user_id, modality_id, clusters)
+                counts["groups"] += 1
+                counts["clusters"] += len(clusters)
+        db.session.commit()
+        redis_set(DUPLICATE_CLUSTERS_WATERMARK_KEY, json.dumps(watermark))
+        for sentence_type, sentence_ids in rehash_done.items():
+            ack_sentences_rehash(sentence_type, sentence_ids)
+
+        stats = {
+            "batch_size": batch_size,
+            "threshold": threshold,
+            "batches": batches,
+            "counts": counts,
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        redis_set(DUPLICATE_CLUSTERS_LAST_RUN_KEY, json.dumps(stats))
+        logger.info(f"(cluster_near_duplicates) ✅ Захэшировано предложений: {counts['hashed']}, кластеров: {counts['clusters']} {counts} за {stats['duration_ms']} ms")
+        return stats
+    finally:
+        release_duplicate_clusters_lock()
+
+
+def _minhash_band_rows(sentence_type, rows, touched):
+    """
+    Строки sentence_minhash_bands для предложений. Пары (user_id, report_global_modality_id)
+    предложений с непустым текстом добавляются в touched — там кластеры нужно пересобрать.
+    """
+    band_rows = []
+    for row in rows:
+        buckets = minhash_band_buckets(minhash_signature(text_shingles(near_duplicate_text(row.sentence, row.normalized_text))))
+        band_rows.extend({
+            "sentence_type": sentence_type,
+            "sentence_id": row.id,
+            "band": band,
+            "user_id": row.user_id,
+            "report_global_modality_id": row.report_global_modality_id,
+            "bucket": bucket,
+        } for band, bucket in enumerate(buckets))
+        if buckets:
+            touched.add((row.user_id, row.report_global_modality_id))
+    return band_rows
+
+
+def _build_duplicate_clusters(sentence_type, sentence_class, user_id, modality_id, threshold):
+    """Кластеры одного пользователя, модальности и типа: кандидаты из общих полос LSH, проверка точным Жаккаром."""
+    candidates = {}
+    for sentence_ids in SentenceMinhashBand.find_shared_buckets(sentence_type, user_id, modality_id):
+        for sentence_id in sentence_ids:
+            candidates.setdefault(sentence_id, set()).update(sentence_ids)
+    if not candidates:
+        return []
+    shingles = {}
+    candidate_ids = sorted(candidates)
+    for start in range(0, len(candidate_ids), 1000):
+        for row in db.session.execute(
+            select(sentence_class.id, sentence_class.sentence, sentence_class.normalized_text)
+            .where(sentence_class.id.in_(candidate_ids[start:start + 1000]))
+        ).all():
+            shingles[row.id] = text_shingles(near_duplicate_text(row.sentence, row.normalized_text))
+    return group_near_duplicates(candidate_ids, candidates, shingles, threshold)
+
+
+def get_orphan_ratios():
+    """
+    Доля осиротевших предложений по пользователям и модальностям (по одному GROUP BY на тип предложений)
+    и доля осиротевших групп по типам.
+    Returns:
+        tuple[list[dict], list[dict]]: Строки по предложениям {"sentence_type", "user_id", "email",
+            "modality_id", "modality", "total", "orphans", "ratio"} и по группам {"group_type", "total", "orphans", "ratio"}.
+    """
+    sentence_rows = []
+    for sentence_type, model in (("head", HeadSentence), ("body", BodySentence), ("tail", TailSentence)):
+        rows = db.session.execute(
+            select(
+                model.user_id, User.email, model.report_global_modality_id, ReportCategory.name,
+                func.count(model.id), func.sum(case((model.orphan_filter(), 1), else_=0)),
+            )
+            .select_from(model)
+            .outerjoin(User, User.id == model.user_id)
+            .outerjoin(ReportCategory, ReportCategory.id == model.report_global_modality_id)
+            .group_by(model.user_id, User.email, model.report_global_modality_id, ReportCategory.name)
+        ).all()
+        for user_id, email, modality_id, modality, total, orphans in rows:
+            sentence_rows.append({
+                "sentence_type": sentence_type,
+                "user_id": user_id,
+                "email": email,
+                "modality_id": modality_id,
+                "modality": modality,
+                "total": total,
+                "orphans": orphans or 0,
+                "ratio": (orphans or 0) / total,
+            })
+
+    group_rows = []
+    for group_type, model in (("head", HeadSentenceGroup), ("body", BodySentenceGroup), ("tail", TailSentenceGroup)):
+        total, orphans = db.session.execute(
+            select(func.count(model.id), func.sum(case((model.orphan_filter(), 1), else_=0))).select_from(model)
+        ).one()
+        group_rows.append({
+            "group_type": group_type,
+            "total": total,
+            "orphans": orphans or 0,
+            "ratio": (orphans or 0) / total if total else 0.0,
+        })
+    return sentence_rows, group_rows
@@ -1,6 +1,10 @@
+import hashlib
+import time
 from functools import wraps
-from flask import abort
+from flask import abort, current_app, make_response, request, session
 from flask_login import current_user
+from app.models.models import db, Report
+from app.utils.redis_client import get_user_settings_version
 
 def require_role_rank(min_rank):
     """
@@ -25,3 +29,67 @@ def require_role_rank(min_rank):
             return func(*args, **kwargs)
         return wrapper
     return decorator
+
+
+def report_etag(report_id_arg="report_id"):
+    """
+    Декоратор условного GET для страниц протокола. Строгий ETag считается из
+    ревизии протокола (Report.revision), версии настроек пользователя и данных
+    сессии, влияющих на шаблон. Если браузер прислал совпадающий If-None-Match,
+    отвечаем 304 до вызова view — дерево протокола при этом не собирается.
+
+    Args:
+        report_id_arg (str): Имя query-параметра с ID протокола.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            etag = _build_report_etag(request.args.get(report_id_arg, type=int))
+            if etag is None:
+                return func(*args, **kwargs)
+
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Браузер хранит страницу, но перед использованием всегда сверяет ETag
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def _build_report_etag(report_id):
+    """Возвращает ETag страницы протокола или None, если его нельзя посчитать надежно."""
+    if not report_id or not current_user.is_authenticated:
+        return None
+    revision = db.session.query(Report.revision).filter(Report.id == report_id).scalar()
+    if revision is None:
+        return None
+    settings_version = get_user_settings_version(current_user.id)
+    if settings_version is None:
+        return None
+
+    # CSRF токен в странице живет WTF_CSRF_TIME_LIMIT секунд — ETag меняется 
+    # каждые полсрока, чтобы из кэша не достали страницу с просроченным токеном
+    csrf_time_limit = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    csrf_bucket = int(time.time() // max(csrf_time_limit // 2, 1)) if csrf_time_limit else 0
+
+    parts = [
+        request.endpoint,
+        request.query_string.decode("utf-8", "ignore"),
+        current_user.id,
+        session.get("profile_id"),
+        session.get("lang"),
+        session.get("user_max_rank"),
+        session.get("csrf_token"),
+        current_app.config.get("APP_VERSION"),
+        revision,
+        settings_version,
+        csrf_bucket,
+    ]
+    return hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()
@@ -8,8 +8,8 @@ import os
 from unidecode import unidecode
 from datetime import datetime
 from config import get_config, Config
-from app.models.models import AppConfig, db, FileMetadata, Report, HeadSentenceGroup, TailSentenceGroup, BodySentenceGroup, KeyWord
-from app.utils.sentence_processing import _add_if_unique
+from app.models.models import AppConfig, db, FileMetadata, Report, HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, TailSentenceGroup, BodySentenceGroup
+from app.utils.sentence_processing import fuzzy_deduplicate_blocked, get_keyword_matcher, normalize_existing_sentences
 from openai import OpenAI
 from app.utils.logger import logger
 from app.utils.redis_client import redis_set, redis_delete
@@ -297,7 +297,12 @@ def generate_impression_json(modality, profile_id, user_id, user_email, except_w
         logger.error("(функция generate_impression_json) ❌ Не указан profile_id для генерации impression JSON.")
         return None
     similarity_threshold = 95
-    unique_sentences = set()
+    # EXCEPT_WORDS приходит строкой настройки — разбиваем так же, как compare_sentences_by_paragraph
+    if isinstance(except_words, str):
+        except_words = except_words.split(",")
+    # Предложения собираются в порядке обхода и отбираются одним вызовом fuzzy_deduplicate_blocked:
+    # точные повторы отсекаются сразу, fuzz.ratio считается только с похожими по длине и n-граммам
+    raw_sentences = []
     cleaned_sentences = []
 
     report_global_modality_id = {"CT": "1", "MRI": "2", "XRAY": "7"}.get(modality.upper(), None)
@@ -347,8 +352,8 @@ def generate_impression_json(modality, profile_id, user_id, user_email, except_w
         pass
 
     for report in reports:
-        key_words_for_report = KeyWord.get_keywords_for_report(profile_id, report.id)
-        key_words = [keyword.key_word for keyword in key_words_for_report]
+        keyword_matcher = get_keyword_matcher(profile_id, report.id, except_words)
+        report_sentences = []
 
         for paragraph in report.report_to_paragraphs:
             if not paragraph.is_impression:
@@ -359,11 +364,11 @@ def generate_impression_json(modality, profile_id, user_id, user_email, except_w
 
             if head_group:
                 for head in HeadSentenceGroup.get_group_sentences(head_group.id):
-                    _add_if_unique(head["sentence"], key_words, except_words, cleaned_sentences, unique_sentences, similarity_threshold)
+                    report_sentences.append((HeadSentence, head["id"], head["sentence"]))
 
             if tail_group:
                 for tail in TailSentenceGroup.get_group_sentences(tail_group.id):
-                    _add_if_unique(tail["sentence"], key_words, except_words, cleaned_sentences, unique_sentences, similarity_threshold)
+                    report_sentences.append((TailSentence, tail["id"], tail["sentence"]))
 
             # body из head-группы
             if head_group:
@@ -371,7 +376,14 @@ def generate_impression_json(modality, profile_id, user_id, user_email, except_w
                     body_group_id = head.get("body_sentence_group_id")
                     if body_group_id:
                         for body in BodySentenceGroup.get_group_sentences(body_group_id):
-                            _add_if_unique(body["sentence"], key_words, except_words, cleaned_sentences, unique_sentences, similarity_threshold)
+                            report_sentences.append((BodySentence, body["id"], body["sentence"]))
+
+        # Тексты очищаются ключевыми словами своего протокола (или берутся сохраненные normalized_text)
+        raw_sentences.extend(sentence_text for _, _, sentence_text in report_sentences)
+        cleaned_sentences.extend(normalize_existing_sentences(report_sentences, keyword_matcher))
+
+    unique_sentences = {raw_sentences[index] for index in fuzzy_deduplicate_blocked(cleaned_sentences, similarity_threshold)}
+    logger.info(f"(функция generate_impression_json) Собрано предложений: {len(raw_sentences)}, уникальных: {len(unique_sentences)}")
 
     # Финальный JSON
     data = {
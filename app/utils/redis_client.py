@@ -1,8 +1,11 @@
 # redis_client.py
 
-from flask import current_app, session
+from flask import current_app, g, session
 from flask_security import current_user
+import json
 import os
+import time
+import uuid
 import redis
 from app.utils.logger import logger
 
@@ -67,17 +70,361 @@ def redis_keys(pattern):
     return r.scan_iter(pattern)
 
 
-# Инвалидация кэша настроек пользователя использую этот кэш в context_processors.py
+# Версия настроек пользователя (входит в ETag страниц протокола, см. decorators.report_etag)
+def get_user_settings_version(user_id: int):
+    """
+    Возвращает версию настроек пользователя или None, если Redis недоступен.
+    Если ключа нет (первый запрос или Redis очищен), версия начинается 
+    с текущего времени в наносекундах, чтобы не повторить старые значения.
+    """
+    try:
+        r = get_redis()
+        key = f"user:{user_id}:settings_version"
+        r.set(key, time.time_ns(), nx=True)
+        return r.get(key)
+    except Exception:
+        return None
+
+def bump_user_settings_version(user_id: int):
+    try:
+        r = get_redis()
+        key = f"user:{user_id}:settings_version"
+        r.set(key, time.time_ns(), nx=True)
+        r.incr(key)
+    except Exception:
+        pass
+
+# Версия набора ключевых слов профиля (входит в ключ кэша ключевых слов протокола,
+# см. sentence_processing.get_keyword_matcher). Меняется после коммита изменений KeyWord
+def get_keywords_version(profile_id: int):
+    """
+    Возвращает версию ключевых слов профиля или None, если Redis недоступен.
+    Как и версия настроек, начинается с текущего времени в наносекундах.
+    """
+    try:
+        r = get_redis()
+        key = f"profile:{profile_id}:keywords_version"
+        r.set(key, time.time_ns(), nx=True)
+        return r.get(key)
+    except Exception:
+        return None
+
+def bump_keywords_version(profile_id: int):
+    try:
+        r = get_redis()
+        key = f"profile:{profile_id}:keywords_version"
+        r.set(key, time.time_ns(), nx=True)
+        r.incr(key)
+    except Exception:
+        pass
+
+# Снимок настроек профиля для AppConfig.get_setting: значения в том виде, как хранятся в AppConfig.
+# Лежит рядом с кэшем user_settings (тот хранит уже разобранные по config_type значения для шаблонов)
+# и живет столько же. Ключ снимка содержит версию настроек профиля: изменение AppConfig увеличивает
+# версию после коммита, поэтому снимок, собранный параллельным запросом до коммита, больше не читается.
+# Версия ведется по профилю, а не по пользователю: снимок читают и вне запроса (Celery), где пользователя нет
+APP_CONFIG_SNAPSHOT_TTL = 10800
+
+def get_app_config_version(profile_id: int):
+    """
+    Возвращает версию настроек профиля или None, если Redis недоступен.
+    Как и версия настроек пользователя, начинается с текущего времени в наносекундах.
+    """
+    try:
+        r = get_redis()
+        key = f"profile:{profile_id}:app_config_version"
+        r.set(key, time.time_ns(), nx=True)
+        return r.get(key)
+    except Exception:
+        return None
+
+def get_app_config_snapshot(profile_id: int, version):
+    """
+    Возвращает снимок настроек профиля {ключ: значение} для версии или None, если его нет или Redis недоступен.
+    """
+    try:
+        raw = redis_get(f"profile:{profile_id}:app_config:{version}")
+        return json.loads(raw) if raw else None
+    except Exception:
+        return None
+
+def set_app_config_snapshot(profile_id: int, version, settings: dict):
+    try:
+        redis_set(f"profile:{profile_id}:app_config:{version}", json.dumps(settings, ensure_ascii=False), ex=APP_CONFIG_SNAPSHOT_TTL)
+    except Exception:
+        pass
+
+def invalidate_app_config_snapshot(profile_id: int):
+    """Увеличивает версию настроек профиля: прежние снимки перестают читаться и истекают по TTL."""
+    try:
+        r = get_redis()
+        key = f"profile:{profile_id}:app_config_version"
+        r.set(key, time.time_ns(), nx=True)
+        r.incr(key)
+    except Exception:
+        pass
+
+# Инвалидация кэша настроек пользователя использую этот кэш в context_processors.py.
+# Сбрасывает и снимок AppConfig профиля: в Redis и в flask.g текущего запроса
 def invalidate_user_settings_cache(user_id: int):
+    bump_user_settings_version(user_id)
     try:
         cache_key = f"user:{current_user.id}:profile:{session.get('profile_id')}:user_settings:v1"
         redis_delete(cache_key)
     except Exception:
         pass
+    profile_id = session.get("profile_id")
+    if profile_id:
+        invalidate_app_config_snapshot(profile_id)
+        g.get("app_config_snapshots", {}).pop(int(profile_id), None)
 
 # Инвалидация кэша профилей пользователя использую этот кэш в context_processors.py
 def invalidate_profiles_cache(user_id: int):
+    bump_user_settings_version(user_id)
     try:
         redis_delete(f"user:{user_id}:profiles:v1")
     except Exception:
-        pass
\ No newline at end of file
+        pass
+
+# Отложенная запись весов body/tail предложений (write-behind).
+# Прирост веса копится в хэше weights:{тип}:{group_id} (поле — ID предложения), а ключи
+# с накопленными приростами — в множестве weights:dirty. Celery beat периодически
+# переносит их в базу одним UPDATE (см. db_processing.flush_buffered_sentence_weights).
+# Тип входит в ключ, потому что ID body и tail групп независимы.
+WEIGHTS_DIRTY_KEY = "weights:dirty"
+WEIGHTS_FLUSH_LOCK_KEY = "weights:flush_lock"
+
+# Вычитает перенесенные в базу приросты, удаляет обнуленные поля и снимает ключ из weights:dirty,
+# если в нем ничего не осталось. Атомарно, поэтому приросты, пришедшие во время переноса, не теряются.
+# KEYS[1] — хэш группы, KEYS[2] — weights:dirty, ARGV — пары (sentence_id, delta)
+_ACK_WEIGHTS_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    local left = redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+    if left <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[2], KEYS[1])
+end
+return 1
+"""
+
+
+def _weights_key(sentence_type, group_id):
+    return f"weights:{sentence_type}:{group_id}"
+
+
+def buffer_sentence_weight(sentence_type, group_id, sentence_id, delta=1):
+    """
+    Добавляет прирост веса предложения в Redis (HINCRBY).
+    Возвращает False, если Redis недоступен — тогда вес нужно записать в базу сразу.
+    """
+    try:
+        key = _weights_key(sentence_type, group_id)
+        pipe = get_redis().pipeline()
+        pipe.hincrby(key, sentence_id, delta)
+        pipe.sadd(WEIGHTS_DIRTY_KEY, key)
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"(buffer_sentence_weight) ⚠️ Redis недоступен, вес будет записан сразу в базу: {e}")
+        return False
+
+
+def get_buffered_weights(sentence_type, group_ids):
+    """
+    Возвращает еще не перенесенные в базу приросты весов для групп одним запросом (pipeline).
+    Returns:
+        dict: {group_id: {sentence_id: delta}} или {}, если Redis недоступен.
+    """
+    group_ids = list(group_ids)
+    if not group_ids:
+        return {}
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for group_id in group_ids:
+            pipe.hgetall(_weights_key(sentence_type, group_id))
+        results = pipe.execute()
+    except Exception as e:
+        logger.warning(f"(get_buffered_weights) ⚠️ Не удалось получить накопленные веса из Redis: {e}")
+        return {}
+    return {
+        group_id: {int(sentence_id): int(delta) for sentence_id, delta in pending.items()}
+        for group_id, pending in zip(group_ids, results) if pending
+    }
+
+
+# Переносит приросты слитых предложений на оставляемое (SentenceBase.merge_duplicates): HINCRBY
+# на его поле и HDEL полей дублей одним скриптом, чтобы перенос весов не вклинивался посередине.
+# KEYS[1] — хэш группы, KEYS[2] — weights:dirty, ARGV[1] — ID оставляемого предложения, далее — ID дублей
+_MOVE_WEIGHTS_SCRIPT = """
+local moved = 0
+for i = 2, #ARGV do
+    local delta = redis.call('HGET', KEYS[1], ARGV[i])
+    if delta then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        moved = moved + tonumber(delta)
+    end
+end
+if moved ~= 0 then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], moved)
+    redis.call('SADD', KEYS[2], KEYS[1])
+end
+return moved
+"""
+
+
+def move_buffered_weights(sentence_type, group_ids, keep_id, duplicate_ids):
+    """
+    Переносит еще не записанные в базу приросты весов дублей на оставляемое предложение в каждой группе.
+    Ошибки Redis только логируются: потеряется лишь накопленный прирост.
+    """
+    if not group_ids or not duplicate_ids:
+        return
+    try:
+        r = get_redis()
+        move = r.register_script(_MOVE_WEIGHTS_SCRIPT)
+        pipe = r.pipeline(transaction=False)
+        for group_id in group_ids:
+            move(keys=[_weights_key(sentence_type, group_id), WEIGHTS_DIRTY_KEY], args=[keep_id, *duplicate_ids], client=pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"(move_buffered_weights) ⚠️ Не удалось перенести накопленные веса {duplicate_ids} на ID={keep_id}: {e}")
+
+
+def read_all_buffered_weights():
+    """
+    Снимок всех накопленных приростов весов.
+    Returns:
+        dict: {(sentence_type, group_id): {sentence_id: delta}}
+    """
+    r = get_redis()
+    keys = list(r.smembers(WEIGHTS_DIRTY_KEY))
+    if not keys:
+        return {}
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+    snapshot = {}
+    for key, pending in zip(keys, pipe.execute()):
+        _, sentence_type, group_id = key.split(":")
+        snapshot[(sentence_type, int(group_id))] = {int(sentence_id): int(delta) for sentence_id, delta in pending.items()}
+    return snapshot
+
+
+def ack_buffered_weights(snapshot):
+    """
+    Вычитает из Redis приросты, которые уже записаны в базу.
+    Args:
+        snapshot (dict): Результат read_all_buffered_weights().
+    """
+    r = get_redis()
+    ack = r.register_script(_ACK_WEIGHTS_SCRIPT)
+    pipe = r.pipeline(transaction=False)
+    for (sentence_type, group_id), deltas in snapshot.items():
+        args = [value for sentence_id, delta in deltas.items() for value in (sentence_id, delta)]
+        ack(keys=[_weights_key(sentence_type, group_id), WEIGHTS_DIRTY_KEY], args=args, client=pipe)
+    pipe.execute()
+
+
+# Снимает блокировку, только если она все еще принадлежит владельцу токена: если перенос шел дольше
+# таймаута и блокировку уже взял следующий запуск, чужая блокировка не удаляется.
+# KEYS[1] — ключ блокировки, ARGV[1] — токен
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_weights_flush_lock(timeout_sec=300):
+    """
+    Не дает двум переносам весов идти одновременно.
+    Returns:
+        str | None: Токен блокировки (нужен для release_weights_flush_lock) или None, если блокировка занята.
+    """
+    token = uuid.uuid4().hex
+    return token if get_redis().set(WEIGHTS_FLUSH_LOCK_KEY, token, nx=True, ex=timeout_sec) else None
+
+
+def release_weights_flush_lock(token):
+    r = get_redis()
+    r.register_script(_RELEASE_LOCK_SCRIPT)(keys=[WEIGHTS_FLUSH_LOCK_KEY], args=[token])
+
+
+# Сборка мусора: водяной знак максимальных ID прошлого запуска, итоги последнего запуска и блокировка.
+# Водяной знак нужен потому, что новые предложения и группы коммитятся до привязки к родителю
+# и какое-то время выглядят осиротевшими — удаляется только то, что существовало уже при прошлом запуске.
+ORPHAN_GC_WATERMARK_KEY = "orphan_gc:watermark"
+ORPHAN_GC_LAST_RUN_KEY = "orphan_gc:last_run"
+ORPHAN_GC_LOCK_KEY = "orphan_gc:lock"
+
+
+def acquire_orphan_gc_lock(timeout_sec=3600):
+    """Не дает двум сборкам мусора идти одновременно. Возвращает True, если блокировка получена."""
+    return bool(get_redis().set(ORPHAN_GC_LOCK_KEY, time.time_ns(), nx=True, ex=timeout_sec))
+
+
+def release_orphan_gc_lock():
+    redis_delete(ORPHAN_GC_LOCK_KEY)
+
+
+# Пересчет нормализованных текстов предложений: блокировка и итоги последнего запуска.
+# У каждого профиля хранится состояние прошлого полного прохода (правила, версия ключевых слов, EXCEPT_WORDS)
+RENORMALIZE_LAST_RUN_KEY = "renormalize:last_run"
+RENORMALIZE_LOCK_KEY = "renormalize:lock"
+
+
+def renormalize_state_key(profile_id):
+    return f"profile:{profile_id}:renormalize_state"
+
+
+def acquire_renormalize_lock(timeout_sec=3600):
+    """Не дает двум пересчетам идти одновременно. Возвращает True, если блокировка получена."""
+    return bool(get_redis().set(RENORMALIZE_LOCK_KEY, time.time_ns(), nx=True, ex=timeout_sec))
+
+
+def release_renormalize_lock():
+    redis_delete(RENORMALIZE_LOCK_KEY)
+
+
+# Поиск почти одинаковых предложений: блокировка, итоги последнего запуска и водяной знак
+# (наибольшие ID уже обработанных предложений каждого типа, включая предложения без полос)
+DUPLICATE_CLUSTERS_LAST_RUN_KEY = "duplicate_clusters:last_run"
+DUPLICATE_CLUSTERS_LOCK_KEY = "duplicate_clusters:lock"
+DUPLICATE_CLUSTERS_WATERMARK_KEY = "duplicate_clusters:watermark"
+
+
+# Предложения, текст которых поменяли после хэширования: их полосы удалены, следующий запуск хэширует их заново
+def duplicate_clusters_rehash_key(sentence_type):
+    return f"duplicate_clusters:rehash:{sentence_type}"
+
+
+def mark_sentences_for_rehash(sentence_type, sentence_ids):
+    """Ставит предложения в очередь на повторное хэширование MinHash (cluster_near_duplicates)."""
+    try:
+        get_redis().sadd(duplicate_clusters_rehash_key(sentence_type), *sentence_ids)
+    except Exception as e:
+        logger.warning(f"(mark_sentences_for_rehash) ⚠️ Не удалось поставить предложения {sentence_ids} на повторное хэширование: {e}")
+
+
+def get_sentences_for_rehash(sentence_type):
+    """ID предложений, ожидающих повторного хэширования."""
+    return sorted(int(sentence_id) for sentence_id in get_redis().smembers(duplicate_clusters_rehash_key(sentence_type)))
+
+
+def ack_sentences_rehash(sentence_type, sentence_ids):
+    """Снимает обработанные предложения с очереди повторного хэширования."""
+    if sentence_ids:
+        get_redis().srem(duplicate_clusters_rehash_key(sentence_type), *sentence_ids)
+
+
+def acquire_duplicate_clusters_lock(timeout_sec=3600):
+    """Не дает двум поискам дублей идти одновременно. Возвращает True, если блокировка получена."""
+    return bool(get_redis().set(DUPLICATE_CLUSTERS_LOCK_KEY, time.time_ns(), nx=True, ex=timeout_sec))
+
+
+def release_duplicate_clusters_lock():
+    redis_delete(DUPLICATE_CLUSTERS_LOCK_KEY)
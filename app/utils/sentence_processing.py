@@ -1,15 +1,23 @@
 # sentence_processing.py
 
+from flask import current_app
 from flask_security import current_user
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+import numpy as np
+import hashlib
+import math
 import re
 import json
+import zlib
 from docx import Document
-from sqlalchemy import select
+from sqlalchemy import select, text
 from app.utils.spacy_manager import SpacyModel
 from app.models.models import db, Paragraph, KeyWord, HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup, AppConfig, head_sentence_group_link
 from app.utils.logger import logger
-from collections import defaultdict
+from app.utils.redis_client import get_keywords_version
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+import threading
 
 
 
@@ -135,6 +143,17 @@ def extract_paragraphs_and_sentences(file_path):
     return paragraphs_from_file
 
 
+# Шаблоны очистки текста компилируются один раз при импорте модуля
+_LETTER_OR_DIGIT_RE = re.compile(r'[a-zA-Zа-яА-ЯёЁ0-9]')
+_REPEATED_MARKS_RE = re.compile(r'([,!?:;"\'\(\)])\1+')
+_LONG_ELLIPSIS_RE = re.compile(r'\.\.\.\.+')
+_DOUBLE_DOT_RE = re.compile(r'(?<!\.)\.\.(?!\.)')
+_MISSING_SPACE_RE = re.compile(r'([.!?,;:])(?!\s)')
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_DIGITS_RE = re.compile(r"\d+")
+_SPACES_RE = re.compile(r"\s+")
+
+
 # Предварительная очистка. Проверяю на наличие предложения. 
 # Убираю только повторяющиеся знаки и лишние пробелы. 
 # Исключение - многоточие, обрабатывается отдельно. 
@@ -148,7 +167,7 @@ def preprocess_sentence(text):
         str: The preprocessed text.
     """
     # Проверяем, содержит ли текст хотя бы одну букву или цифру
-    if not re.search(r'[a-zA-Zа-яА-ЯёЁ0-9]', text):
+    if not _LETTER_OR_DIGIT_RE.search(text):
         logger.info(f"(preprocess_sentence) ⚠️ Пропускаю некорректные данные: {text}")
         return ""
 
@@ -157,17 +176,17 @@ def preprocess_sentence(text):
         return ""
 
    # Обрабатываем повторяющиеся знаки, кроме точки
-    text = re.sub(r'([,!?:;"\'\(\)])\1+', r'\1', text)  # Повторяющиеся знаки → один
+    text = _REPEATED_MARKS_RE.sub(r'\1', text)  # Повторяющиеся знаки → один
 
     # Обрабатываем многоточия отдельно
-    text = re.sub(r'\.\.\.\.+', '...', text)  # Четыре и более точек → многоточие
-    text = re.sub(r'(?<!\.)\.\.(?!\.)', '.', text)  # Две точки → одна
+    text = _LONG_ELLIPSIS_RE.sub('...', text)  # Четыре и более точек → многоточие
+    text = _DOUBLE_DOT_RE.sub('.', text)  # Две точки → одна
     
     # Добавляю пробелы после знаков препинания, если их нет
-    text = re.sub(r'([.!?,;:])(?!\s)', r'\1 ', text)
+    text = _MISSING_SPACE_RE.sub(r'\1 ', text)
     
     # Убираем лишние пробелы
-    text = re.sub(r'\s+', ' ', text)  # Заменяем любые пробельные символы на один пробел
+    text = _SPACES_RE.sub(' ', text)  # Заменяем любые пробельные символы на один пробел
 
     return text
 
@@ -177,31 +196,150 @@ def preprocess_sentence(text):
 def clean_text_with_keywords(sentence, key_words, except_words=None):
     """ Функция очистки текста от лишних пробелов, знаков припенания, 
     цифр, слов исключений и ключевых слов с приведением всех слов 
-    предложения к нижнему регистру """
-    
-    
-    
-    
-    # Приводим текст к строчным буквам
-    sentence = str(sentence).lower()
-    
-    # Удаляем ключевые слова
-    if key_words:
-        for word in key_words:
-            sentence = re.sub(rf'(?<!\w){re.escape(word)}(?!\w)', '', sentence, flags=re.IGNORECASE)
-    
-    # Удаляем все кроме букв цифр и робелов
-    sentence = re.sub(r"[^\w\s]", "", sentence)
-    # Убираем цифры
-    sentence = re.sub(r"\d+", "", sentence)
-    # Удаляем лишние пробелы
-    sentence = re.sub(r"\s+", " ", sentence).strip()
-    # Убираем дополнительные слова
-    if except_words:
-        for word in except_words:
-            sentence = re.sub(rf"(?<!\w){re.escape(word)}(?!\w)", "", sentence, flags=re.IGNORECASE)
-    
-    return sentence
+    предложения к нижнему регистру. Регулярные выражения для набора
+    слов собираются один раз (KeywordMatcher.for_words) """
+    return KeywordMatcher.for_words(key_words, except_words).clean(sentence)
+
+
+KEYWORD_MATCHER_CACHE_SIZE = 512
+
+# Версия правил KeywordMatcher.clean. Поднимать при любом изменении правил очистки —
+# сохраненные normalized_text предложений пересчитает renormalize_sentences
+NORMALIZATION_RULES_VERSION = 1
+
+
+class KeywordMatcher:
+    """
+    Очистка текста от ключевых слов и слов-исключений (clean_text_with_keywords).
+    Каждый набор слов собирается в одно регулярное выражение — альтернативу от длинных
+    слов к коротким с теми же границами слова (?<!\w)...(?!\w) — вместо re.sub с новым
+    шаблоном на каждое слово. Если одно ключевое слово входит в другое ("печень" и
+    "печень правая"), удаляется более длинное.
+
+        matcher = KeywordMatcher.for_words(["печень", "мм"])
+        matcher.clean("Печень 12 мм, без изменений.")  # "без изменений"
+    """
+
+    def __init__(self, key_words=(), except_words=()):
+        self.key_words_re = self._compile(key_words)
+        self.except_words_re = self._compile(except_words)
+        # Версия хранится в колонке normalization_version рядом с normalized_text предложения
+        self.version = hashlib.sha256(json.dumps([
+            NORMALIZATION_RULES_VERSION,
+            self.key_words_re.pattern if self.key_words_re else None,
+            self.except_words_re.pattern if self.except_words_re else None,
+        ], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _compile(words):
+        words = sorted({word.lower() for word in words if word}, key=lambda word: (-len(word), word))
+        if not words:
+            return None
+        return re.compile(rf"(?<!\w)(?:{'|'.join(re.escape(word) for word in words)})(?!\w)", flags=re.IGNORECASE)
+
+    @classmethod
+    def for_words(cls, key_words, except_words=None):
+        """Возвращает собранный ранее matcher для того же набора слов или собирает новый."""
+        return _build_keyword_matcher(tuple(key_words or ()), tuple(except_words or ()))
+
+    def clean(self, sentence):
+        # Приводим текст к строчным буквам
+        sentence = str(sentence).lower()
+        # Удаляем ключевые слова
+        if self.key_words_re:
+            sentence = self.key_words_re.sub("", sentence)
+        # Удаляем все кроме букв цифр и робелов
+        sentence = _PUNCTUATION_RE.sub("", sentence)
+        # Убираем цифры
+        sentence = _DIGITS_RE.sub("", sentence)
+        # Удаляем лишние пробелы
+        sentence = _SPACES_RE.sub(" ", sentence).strip()
+        # Убираем дополнительные слова
+        if self.except_words_re:
+            sentence = self.except_words_re.sub("", sentence)
+        return sentence
+
+
+@lru_cache(maxsize=KEYWORD_MATCHER_CACHE_SIZE)
+def _build_keyword_matcher(key_words, except_words):
+    return KeywordMatcher(key_words, except_words)
+
+
+# Ключевые слова протокола в памяти процесса: (profile_id, report_id, версия ключевых слов профиля) -> слова.
+# Версия поднимается после коммита изменений KeyWord (см. models._bump_changed_keyword_profiles),
+# так что записи со старой версией просто перестают запрашиваться и вытесняются
+_report_key_words_cache = OrderedDict()
+_report_key_words_lock = threading.Lock()
+
+
+def get_report_key_words(profile_id, report_id):
+    """
+    Возвращает ключевые слова протокола (KeyWord.get_keywords_for_report) из кэша процесса.
+    Без Redis версия неизвестна, и слова каждый раз читаются из базы.
+
+    Returns:
+        tuple[str]: Ключевые слова.
+    """
+    version = get_keywords_version(profile_id)
+    if version is None:
+        return tuple(keyword.key_word for keyword in KeyWord.get_keywords_for_report(profile_id, report_id))
+
+    cache_key = (profile_id, report_id, version)
+    with _report_key_words_lock:
+        key_words = _report_key_words_cache.get(cache_key)
+        if key_words is not None:
+            _report_key_words_cache.move_to_end(cache_key)
+            return key_words
+
+    key_words = tuple(keyword.key_word for keyword in KeyWord.get_keywords_for_report(profile_id, report_id))
+    with _report_key_words_lock:
+        _report_key_words_cache[cache_key] = key_words
+        while len(_report_key_words_cache) > KEYWORD_MATCHER_CACHE_SIZE:
+            _report_key_words_cache.popitem(last=False)
+    return key_words
+
+
+def get_keyword_matcher(profile_id, report_id, except_words=None):
+    """
+    Возвращает KeywordMatcher для ключевых слов протокола и слов-исключений профиля.
+    Повторные вызовы с той же версией ключевых слов не обращаются к базе и не компилируют шаблоны.
+    """
+    return KeywordMatcher.for_words(get_report_key_words(profile_id, report_id), except_words)
+
+
+def get_profile_except_words(profile_id):
+    """Слова-исключения профиля (настройка EXCEPT_WORDS через запятую)."""
+    return AppConfig.get_setting(profile_id, "EXCEPT_WORDS", "").split(",")
+
+
+def normalize_existing_sentences(sentences, keyword_matcher):
+    """
+    Возвращает очищенные тексты существующих предложений: сохраненный normalized_text, если он
+    посчитан той же версией KeywordMatcher, иначе очищает текст на месте. Сохраненные тексты
+    читаются одним запросом на тип предложений.
+
+    Args:
+        sentences (list[tuple]): (класс предложения, ID, текст предложения).
+        keyword_matcher (KeywordMatcher): Matcher протокола.
+
+    Returns:
+        list[str]: Очищенные тексты в порядке sentences.
+    """
+    ids_by_class = defaultdict(set)
+    for sentence_class, sentence_id, _ in sentences:
+        if sentence_id:
+            ids_by_class[sentence_class].add(sentence_id)
+    stored = {}
+    for sentence_class, sentence_ids in ids_by_class.items():
+        for sentence_id, normalized_text in sentence_class.get_normalized_texts(sentence_ids, keyword_matcher.version).items():
+            stored[(sentence_class, sentence_id)] = normalized_text
+
+    cleaned = [
+        stored[(sentence_class, sentence_id)] if (sentence_class, sentence_id) in stored else keyword_matcher.clean(sentence_text)
+        for sentence_class, sentence_id, sentence_text in sentences
+    ]
+    logger.debug(f"(функция normalize_existing_sentences) Сохраненных нормализованных текстов: {len(stored)} из {len(sentences)}")
+    return cleaned
 
 
 # это функция для окончательной очистки предложения перед сохранением в базу данных
@@ -388,29 +526,378 @@ def group_keywords(keywords, with_index=False, with_report=False):
     return list(grouped_keywords.values())
 
 
+# Общий движок нечеткого сравнения. Строки очищаются вызывающим кодом один раз на корпус,
+# здесь они только сравниваются fuzz.ratio — матрицей process.cdist во всех потоках
+FUZZY_MATCH_CHUNK_SIZE = 1000
+
+
+def fuzzy_score_matrix(queries, choices, score_cutoff=0):
+    """
+    Считает fuzz.ratio каждой строки queries с каждой строкой choices.
+
+    Args:
+        queries (list[str]): Очищенные строки-запросы.
+        choices (list[str]): Очищенные строки, с которыми сравниваем.
+        score_cutoff (float): Оценки ниже порога обнуляются.
+
+    Returns:
+        numpy.ndarray: Матрица len(queries) x len(choices) с оценками 0-100 (float64, как у fuzz.ratio).
+    """
+    if not queries or not choices:
+        return np.zeros((len(queries), len(choices)))
+    return process.cdist(queries, choices, scorer=fuzz.ratio, score_cutoff=score_cutoff, dtype=np.float64, workers=-1)
+
+
+def first_fuzzy_matches(queries, choices, score_cutoff, chunk_size=FUZZY_MATCH_CHUNK_SIZE):
+    """
+    Для каждого запроса находит первую по порядку choices строку с оценкой не ниже порога —
+    то же решение, что и цикл fuzz.ratio с break на первом совпадении (extractOne вернул бы
+    лучшее совпадение, а не первое). choices сравниваются блоками по chunk_size, и запросы,
+    уже нашедшие совпадение, в следующие блоки не попадают.
+
+    Returns:
+        list: (индекс в choices, оценка) или None для каждого запроса.
+    """
+    matches = [None] * len(queries)
+    pending = list(range(len(queries)))
+    for start in range(0, len(choices), chunk_size):
+        if not pending:
+            break
+        scores = fuzzy_score_matrix([queries[index] for index in pending], choices[start:start + chunk_size], score_cutoff)
+        still_pending = []
+        for query_index, row in zip(pending, scores):
+            hits = np.flatnonzero(row >= score_cutoff)
+            if hits.size:
+                matches[query_index] = (start + int(hits[0]), float(row[hits[0]]))
+            else:
+                still_pending.append(query_index)
+        pending = still_pending
+    return matches
+
+
+def fuzzy_pair_scores(left, right):
+    """
+    Попарный fuzz.ratio: left[i] с right[i] (process.cpdist).
+
+    Returns:
+        list[float]: Оценки для каждой пары.
+    """
+    if not left:
+        return []
+    return process.cpdist(left, right, scorer=fuzz.ratio, dtype=np.float64, workers=-1).tolist()
+
+
+def fuzzy_deduplicate(texts, score_cutoff, chunk_size=FUZZY_MATCH_CHUNK_SIZE):
+    """
+    Отбирает строки, не похожие ни на одну из ранее отобранных (fuzz.ratio < score_cutoff) —
+    то же решение, что и последовательная проверка каждой строки по уже отобранным.
+    Строки идут блоками по chunk_size: блок сравнивается с отобранными до него и сам с собой,
+    так что матрица занимает chunk_size x len(texts), а не len(texts) x len(texts).
+
+    Args:
+        texts (list[str]): Очищенные строки в порядке отбора.
+        score_cutoff (float): Порог схожести.
+        chunk_size (int): Размер блока.
+
+    Returns:
+        list[int]: Индексы отобранных строк по возрастанию.
+    """
+    kept = []
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts[start:start + chunk_size]
+        rejected = (fuzzy_score_matrix(chunk, [texts[index] for index in kept], score_cutoff) >= score_cutoff).any(axis=1)
+        within = fuzzy_score_matrix(chunk, chunk, score_cutoff) >= score_cutoff
+        kept_in_chunk = []
+        for offset in range(len(chunk)):
+            if not rejected[offset] and not within[offset, kept_in_chunk].any():
+                kept_in_chunk.append(offset)
+        kept.extend(start + offset for offset in kept_in_chunk)
+    return kept
+
+
+# Отбор уникальных строк с блокировкой кандидатов. fuzz.ratio = (1 - D / (len_a + len_b)) * 100,
+# где D — число вставок и удалений, поэтому при пороге score_cutoff строки похожи только если
+# их длины отличаются не больше чем на (1 - score_cutoff / 100) от суммы длин, а D ограничено
+# сверху — значит, у них не меньше известного числа общих символьных n-грамм, сдвинутых не
+# дальше чем на D позиций. Отсев по этим признакам не теряет ни одной пары с оценкой выше порога,
+# решения те же, что у fuzzy_deduplicate, а fuzz.ratio считается только для оставшихся кандидатов
+FUZZY_BLOCK_SHINGLE_SIZE = 3
+
+
+def _similar_length_band(length, tolerance):
+    """Границы длины строки, которая может набрать с данной оценку не ниже порога."""
+    low = math.ceil(length * (1 - tolerance) / (1 + tolerance) - 1e-9)
+    high = math.floor(length * (1 + tolerance) / (1 - tolerance) + 1e-9)
+    return low, high
+
+
+def _length_bucket(length, bucket_log):
+    """
+    Номер корзины длины: корзины растут в (1 + tolerance) / (1 - tolerance) раз, так что полоса
+    похожих длин занимает соседние корзины. Номер не убывает с длиной, поэтому корзины границ
+    полосы покрывают все корзины внутри нее.
+    """
+    if not length:
+        return -1
+    return math.floor(math.log(length) / bucket_log) if bucket_log else length
+
+
+def _position_cell_width(bucket, bucket_log, tolerance):
+    """Ширина ячейки позиций n-грамм в корзине длины — около наибольшего D для строк этой корзины."""
+    top_length = math.exp((bucket + 1) * bucket_log) if bucket_log else bucket
+    return max(1, int(2 * tolerance * top_length))
+
+
+def _shingle_prefix(text, tolerance, shingle_size, frequency):
+    """
+    Префикс n-грамм строки, с которым обязана пересечься любая похожая строка (префиксная фильтрация).
+
+    Каждая вставка или удаление портит не больше shingle_size n-грамм, поэтому у похожих строк
+    не меньше required общих n-грамм, сохраненных выравниванием. Если n-граммы упорядочены
+    одинаково для всех строк (редкие первыми, повторы по позиции), самая ранняя из сохраненных
+    попадает в первые len(shingles) - required + 1 у обеих строк, и ее позиции отличаются не
+    больше чем на max_distance.
+
+    Returns:
+        tuple: (пары (n-грамма, позиция) префикса, наибольшее D для похожей строки, есть ли гарантия).
+               Без гарантии (короткая строка) возвращаются все n-граммы, а сравнивать нужно со всеми
+               строками соседних длин.
+    """
+    _, high = _similar_length_band(len(text), tolerance)
+    max_distance = math.floor(tolerance * (len(text) + high) + 1e-9)
+    shingles = [(text[start:start + shingle_size], start) for start in range(len(text) - shingle_size + 1)]
+    required = len(shingles) - shingle_size * max_distance
+    if required <= 0:
+        return shingles, max_distance, False
+    shingles.sort(key=lambda shingle: (frequency[shingle[0]], shingle))
+    return shingles[:len(shingles) - required + 1], max_distance, True
+
+
+def fuzzy_deduplicate_blocked(texts, score_cutoff, shingle_size=FUZZY_BLOCK_SHINGLE_SIZE):
+    """
+    Отбирает строки, не похожие ни на одну из ранее отобранных (fuzz.ratio < score_cutoff), —
+    те же решения, что у fuzzy_deduplicate, без сравнения каждой строки со всеми отобранными.
+
+    Точные повторы отсеиваются по множеству уже встреченных строк. Для остальных кандидаты
+    берутся из индекса отобранных строк по n-граммам префикса, соседним корзинам длины и
+    ячейкам позиций, и только с ними строка сравнивается через process.extractOne. Выигрыш
+    тем больше, чем выше порог; при пороге 0 и ниже блокировка ничего не отсекает и
+    работает fuzzy_deduplicate.
+
+    Args:
+        texts (list[str]): Очищенные строки в порядке отбора.
+        score_cutoff (float): Порог схожести.
+        shingle_size (int): Длина символьных n-грамм.
+
+    Returns:
+        list[int]: Индексы отобранных строк по возрастанию.
+    """
+    tolerance = 1 - score_cutoff / 100
+    if tolerance >= 1:
+        return fuzzy_deduplicate(texts, score_cutoff)
+
+    frequency = defaultdict(int)
+    for text in set(texts):
+        for start in range(len(text) - shingle_size + 1):
+            frequency[text[start:start + shingle_size]] += 1
+
+    bucket_log = math.log((1 + tolerance) / (1 - tolerance))
+    cell_widths = {}
+    kept = []
+    seen = set()
+    kept_by_bucket = defaultdict(list)
+    kept_by_shingle = defaultdict(list)
+    for position, text in enumerate(texts):
+        # Повтор уже встреченной строки получает то же решение, что и она: отобранную он повторяет,
+        # а отсеянную отсеял бы тот же отобранный предшественник
+        if text in seen:
+            continue
+        seen.add(text)
+
+        low, high = _similar_length_band(len(text), tolerance)
+        shingles, max_distance, filtered = _shingle_prefix(text, tolerance, shingle_size, frequency)
+        buckets = range(_length_bucket(low, bucket_log), _length_bucket(high, bucket_log) + 1)
+        for bucket in buckets:
+            if bucket not in cell_widths:
+                cell_widths[bucket] = _position_cell_width(bucket, bucket_log, tolerance)
+        if filtered:
+            candidates = set().union(*(
+                kept_by_shingle.get((shingle, bucket, cell), ())
+                for shingle, start in shingles
+                for bucket in buckets
+                for cell in range((start - max_distance) // cell_widths[bucket], (start + max_distance) // cell_widths[bucket] + 1)
+            ))
+        else:
+            candidates = set().union(*(kept_by_bucket.get(bucket, ()) for bucket in buckets))
+        choices = [texts[index] for index in candidates if low <= len(texts[index]) <= high]
+        if choices and process.extractOne(text, choices, scorer=fuzz.ratio, score_cutoff=score_cutoff) is not None:
+            continue
+
+        kept.append(position)
+        bucket = _length_bucket(len(text), bucket_log)
+        cell_width = cell_widths.setdefault(bucket, _position_cell_width(bucket, bucket_log, tolerance))
+        kept_by_bucket[bucket].append(position)
+        # Для коротких строк гарантии префикса нет, в индекс попадают все их n-граммы
+        for shingle, start in shingles:
+            kept_by_shingle[(shingle, bucket, start // cell_width)].append(position)
+    return kept
+
+
+# Поиск почти одинаковых предложений в библиотеке пользователя (cluster_near_duplicates).
+# MinHash-подпись — минимумы MINHASH_PERMUTATIONS хэш-функций по символьным n-граммам текста.
+# LSH делит подпись на MINHASH_BANDS полос по MINHASH_PERMUTATIONS / MINHASH_BANDS значений:
+# предложения с совпавшей полосой становятся кандидатами, и для них считается точный Жаккар.
+# Хэши стабильны между процессами (crc32 и фиксированное зерно), полосы хранятся в базе
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+MINHASH_SHINGLE_SIZE = 4
+MINHASH_SEED = 1
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_minhash_random = np.random.RandomState(MINHASH_SEED)
+_MINHASH_A = _minhash_random.randint(1, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _minhash_random.randint(0, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def near_duplicate_text(sentence, normalized_text=None):
+    """Текст предложения для поиска почти одинаковых: сохраненный normalized_text или очистка без ключевых слов."""
+    if normalized_text is not None:
+        return normalized_text
+    return clean_text_with_keywords(sentence, None)
+
+
+def text_shingles(text, shingle_size=MINHASH_SHINGLE_SIZE):
+    """Множество символьных n-грамм текста. Текст короче n-граммы — одна n-грамма, пустой — пустое множество."""
+    if len(text) <= shingle_size:
+        return {text} if text else set()
+    return {text[start:start + shingle_size] for start in range(len(text) - shingle_size + 1)}
+
+
+def jaccard_similarity(left, right):
+    """Коэффициент Жаккара двух множеств n-грамм (0 для двух пустых)."""
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def minhash_signature(shingles):
+    """
+    MinHash-подпись множества n-грамм.
+
+    Returns:
+        numpy.ndarray | None: MINHASH_PERMUTATIONS значений uint64 или None для пустого множества.
+    """
+    if not shingles:
+        return None
+    hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    # Умножение в uint64 переполняется так же, как в других реализациях MinHash, результат детерминирован
+    permuted = ((hashes[:, None] * _MINHASH_A + _MINHASH_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+def minhash_band_buckets(signature, bands=MINHASH_BANDS):
+    """
+    Хэши полос LSH: по одному знаковому 64-битному числу на полосу (помещается в BigInteger).
+
+    Returns:
+        list[int]: bands хэшей, пустой список для пустой подписи.
+    """
+    if signature is None:
+        return []
+    rows = len(signature) // bands
+    return [
+        int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].astype("<u8").tobytes(), digest_size=8).digest(), "big", signed=True)
+        for band in range(bands)
+    ]
+
+
+def group_near_duplicates(sentence_ids, candidates, shingles, threshold):
+    """
+    Собирает кластеры почти одинаковых предложений из кандидатов LSH.
+
+    Предложения обходятся по возрастанию ID: первое еще не распределенное становится представителем
+    (в него потом сливаются остальные), в кластер попадают его кандидаты с Жаккаром не ниже порога.
+    Так каждое предложение кластера похоже именно на представителя, а не только на соседа по цепочке.
+
+    Args:
+        sentence_ids (Iterable[int]): ID предложений.
+        candidates (dict): {sentence_id: множество ID кандидатов}.
+        shingles (dict): {sentence_id: множество n-грамм}. Предложения без n-грамм пропускаются.
+        threshold (float): Порог коэффициента Жаккара.
+
+    Returns:
+        list[dict]: {"sentence_ids": [представитель, ...], "similarity": наименьший Жаккар с представителем}.
+    """
+    assigned = set()
+    clusters = []
+    for sentence_id in sorted(sentence_ids):
+        if sentence_id in assigned or not shingles.get(sentence_id):
+            continue
+        members, similarities = [sentence_id], []
+        for other_id in sorted(candidates.get(sentence_id, ())):
+            if other_id == sentence_id or other_id in assigned or not shingles.get(other_id):
+                continue
+            similarity = jaccard_similarity(shingles[sentence_id], shingles[other_id])
+            if similarity >= threshold:
+                members.append(other_id)
+                similarities.append(similarity)
+        if len(members) > 1:
+            assigned.update(members)
+            clusters.append({"sentence_ids": members, "similarity": round(min(similarities), 4)})
+    return clusters
+
+
 # Сравниваю 2 предложения. Используется в working_with_report/save_modified_sentences. 
 # Ищет совпадения с заданным порогом, также очищает текст от чисел и ключевых слов
-def compare_sentences_by_paragraph(new_sentences, report_id, profile_id=None):    
+# Выбор движка поиска похожих предложений для compare_sentences_by_paragraph.
+# pg_trgm используется только если он включен в настройках и расширение установлено в базе
+def get_similarity_engine(engine=None):
+    """
+    Returns:
+        str: "pg_trgm" или "rapidfuzz".
+    """
+    engine = (engine or current_app.config.get("SENTENCE_SIMILARITY_ENGINE") or "rapidfuzz").lower()
+    if engine != "pg_trgm":
+        return "rapidfuzz"
+    if db.engine.dialect.name != "postgresql":
+        logger.warning(f"(функция get_similarity_engine) ⚠️ pg_trgm доступен только в PostgreSQL. Использую rapidfuzz")
+        return "rapidfuzz"
+    if not db.session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar():
+        logger.warning(f"(функция get_similarity_engine) ⚠️ Расширение pg_trgm не установлено. Использую rapidfuzz")
+        return "rapidfuzz"
+    return "pg_trgm"
+
+
+def compare_sentences_by_paragraph(new_sentences, report_id, profile_id=None, engine=None):    
     """
     Compares new sentences with existing sentences in their respective paragraphs to determine uniqueness.
+    With the pg_trgm engine only candidates above SENTENCE_TRGM_THRESHOLD are loaded from the group,
+    the final decision is still made by fuzz.ratio against SIMILARITY_THRESHOLD_FUZZ.
     """
     logger.info(f"(функция compare_sentences_by_paragraph) 🚀 Начато сравнение новых предложений с существующими в базе данных")
     logger.debug(f"(функция compare_sentences_by_paragraph) Получены новые предложения - ({new_sentences})")
     similarity_threshold_fuzz = int(AppConfig.get_setting(profile_id, "SIMILARITY_THRESHOLD_FUZZ", 80))
-    except_words = AppConfig.get_setting(profile_id, "EXCEPT_WORDS", "").split(",")
+    except_words = get_profile_except_words(profile_id)
     logger.debug(f"(функция compare_sentences_by_paragraph) Порог схожести: {similarity_threshold_fuzz}")
     logger.info(f"(функция compare_sentences_by_paragraph) Исключаемые слова: {except_words}")
+    engine = get_similarity_engine(engine)
+    trgm_threshold = current_app.config.get("SENTENCE_TRGM_THRESHOLD", 0.3)
+    logger.debug(f"(функция compare_sentences_by_paragraph) Движок поиска похожих предложений: {engine}")
     
     existing_paragraphs = Paragraph.query.filter_by(report_id=report_id).all()
-    key_words_obj = KeyWord.get_keywords_for_report(profile_id, report_id)
-    key_words = [keyword.key_word for keyword in key_words_obj]
-    logger.debug(f"(функция compare_sentences_by_paragraph) Получено {len(key_words)} ключевых слов.")
+    keyword_matcher = get_keyword_matcher(profile_id, report_id, except_words)
     
     duplicates = []
     unique_sentences = []
     errors_count = 0
+    # Группа очищается один раз на все новые предложения, которые с ней сравниваются,
+    # сами сравнения идут одной матрицей на группу. Решения собираются по позиции
+    # во входном списке, чтобы порядок дублей и уникальных не зависел от группировки
+    corpora = {}
+    decisions = {}
     # Итерируем по новым предложениям
-    for new_sentence in new_sentences:
+    for position, new_sentence in enumerate(new_sentences):
         new_paragraph_id = int(new_sentence.get("paragraph_id"))
         new_text = new_sentence.get("text")
         new_sentence_type = new_sentence.get("sentence_type")
@@ -425,7 +912,6 @@ def compare_sentences_by_paragraph(new_sentences, report_id, profile_id=None):
         paragraph = next((p for p in existing_paragraphs if p.id == new_paragraph_id), None)
         # Находим соответствующую группу для предложения
         related_group_id = None
-        sentence_group_class = None
         
         if new_sentence_type == "body":
             head_sentence = HeadSentence.query.get(new_sentence_head_sentence_id)
@@ -434,9 +920,16 @@ def compare_sentences_by_paragraph(new_sentences, report_id, profile_id=None):
                 errors_count += 1
                 continue
             related_group_id = head_sentence.body_sentence_group_id or None
-            existing_sentences = BodySentenceGroup.get_group_sentences(related_group_id) or []
-            logger.debug(f"(функция compare_sentences_by_paragraph) {existing_sentences}")
-            existing_sentences.append({"id": head_sentence.id, "sentence": head_sentence.sentence})
+            # pg_trgm отбирает кандидатов под конкретный текст, поэтому его корпус у каждого предложения свой
+            corpus_key = ("body", head_sentence.id, position if engine == "pg_trgm" else None)
+            if corpus_key not in corpora:
+                if engine == "pg_trgm" and related_group_id:
+                    existing_sentences = BodySentenceGroup.find_similar_sentences(related_group_id, new_text, trgm_threshold)
+                else:
+                    existing_sentences = BodySentenceGroup.get_group_sentences(related_group_id) or []
+                logger.debug(f"(функция compare_sentences_by_paragraph) {existing_sentences}")
+                existing_sentences = [(BodySentence, sent) for sent in existing_sentences]
+                existing_sentences.append((HeadSentence, {"id": head_sentence.id, "sentence": head_sentence.sentence}))
             
         else:
             if not paragraph:
@@ -446,78 +939,122 @@ def compare_sentences_by_paragraph(new_sentences, report_id, profile_id=None):
             related_group_id = paragraph.tail_sentence_group_id or None
             if not related_group_id:
                 logger.warning(f"(функция compare_sentences_by_paragraph) Группа хвостовых предложений не найдена. Добавляю в уникальные")
-                unique_sentences.append(new_sentence)
+                decisions[position] = None
                 continue
-            existing_sentences = TailSentenceGroup.get_group_sentences(related_group_id)
-            
-            logger.debug(f"(функция compare_sentences_by_paragraph) {existing_sentences}")
+            corpus_key = ("tail", related_group_id, position if engine == "pg_trgm" else None)
+            if corpus_key not in corpora:
+                if engine == "pg_trgm":
+                    existing_sentences = TailSentenceGroup.find_similar_sentences(related_group_id, new_text, trgm_threshold)
+                else:
+                    existing_sentences = TailSentenceGroup.get_group_sentences(related_group_id)
+                
+                logger.debug(f"(функция compare_sentences_by_paragraph) {existing_sentences}")
+                existing_sentences = [(TailSentence, sent) for sent in existing_sentences]
         
-        # Очищаем существующие предложения
-        cleaned_existing = []
-        for sent in existing_sentences:
-            cleaned_item = {
-                "id": sent.get("id"),
-                "original_text": sent["sentence"],
-                "cleaned_text": clean_text_with_keywords(sent.get("sentence"), key_words, except_words)
+        if corpus_key not in corpora:
+            corpora[corpus_key] = {
+                "existing": [
+                    {
+                        "id": sent.get("id"),
+                        "sentence_class": sentence_class,
+                        "original_text": sent["sentence"],
+                    }
+                    for sentence_class, sent in existing_sentences
+                ],
+                "queries": [],
             }
-            cleaned_existing.append(cleaned_item)
-            
         # Очищаем новое предложение
-        cleaned_new_text = clean_text_with_keywords(new_text, key_words, except_words)
-        # Проверяем на схожесть с существующими предложениями
-        is_duplicate = False
-        for existing in cleaned_existing:
-            similarity_rapidfuzz = fuzz.ratio(cleaned_new_text, existing["cleaned_text"])
-            if similarity_rapidfuzz >= similarity_threshold_fuzz:
-                duplicates.append({
-                    "new_sentence": new_sentence,
-                   
-                    "new_sentence_paragraph": new_sentence.get("paragraph_id"),
-                    "matched_with": {
-                                "id": existing["id"],
-                                "text": existing["original_text"]
-                            },
-                    "similarity_rapidfuzz": similarity_rapidfuzz
-                })
-                is_duplicate = True
-                logger.debug(f"(функция compare_sentences_by_paragraph) 🔄 Найдено дублирующее предложение ({new_sentence}) с существующим ({existing['original_text']}) с похожестью {similarity_rapidfuzz}")
-                break
-
-        if not is_duplicate:
-            unique_sentences.append(new_sentence)
+        cleaned_new_text = keyword_matcher.clean(new_text)
+        corpora[corpus_key]["queries"].append((position, new_sentence, cleaned_new_text))
+
+    # Существующие предложения берем в сохраненной нормализованной форме (для всех групп сразу),
+    # очищаем на месте только те, у которых ее нет или она посчитана другой версией
+    all_existing = [existing for corpus in corpora.values() for existing in corpus["existing"]]
+    cleaned_texts = normalize_existing_sentences(
+        [(existing["sentence_class"], existing["id"], existing["original_text"]) for existing in all_existing], keyword_matcher
+    )
+    for existing, cleaned_text in zip(all_existing, cleaned_texts):
+        existing["cleaned_text"] = cleaned_text
+
+    # Проверяем на схожесть с существующими предложениями — первое совпадение не ниже порога
+    for corpus in corpora.values():
+        cleaned_existing = corpus["existing"]
+        matches = first_fuzzy_matches(
+            [cleaned_new_text for _, _, cleaned_new_text in corpus["queries"]],
+            [existing["cleaned_text"] for existing in cleaned_existing],
+            similarity_threshold_fuzz,
+        )
+        for (position, new_sentence, _), match in zip(corpus["queries"], matches):
+            if match is None:
+                decisions[position] = None
+                continue
+            matched_index, similarity_rapidfuzz = match
+            existing = cleaned_existing[matched_index]
+            decisions[position] = {
+                "new_sentence": new_sentence,
+                "new_sentence_paragraph": new_sentence.get("paragraph_id"),
+                "matched_with": {
+                            "id": existing["id"],
+                            "text": existing["original_text"]
+                        },
+                "similarity_rapidfuzz": similarity_rapidfuzz
+            }
+            logger.debug(f"(функция compare_sentences_by_paragraph) 🔄 Найдено дублирующее предложение ({new_sentence}) с существующим ({existing['original_text']}) с похожестью {similarity_rapidfuzz}")
+
+    for position in sorted(decisions):
+        if decisions[position] is None:
+            unique_sentences.append(new_sentences[position])
+        else:
+            duplicates.append(decisions[position])
 
     return {"duplicates": duplicates, "unique": unique_sentences, "errors_count": errors_count}
 
 
 
 # Функция для поиска существующих аналогичных предложений того же типа в базе данных 
-# использую в models.py. Ищет 100% совпадения
-def find_similar_exist_sentence(sentence_text, sentence_type, report_global_modality_id):
+# использую в models.py. Ищет 100% совпадения (по нормализованному тексту, тегам и комментарию)
+def find_similar_exist_sentence(sentence_text, sentence_type, report_global_modality_id, tags=None, comment=None):
     """
-    Ищет похожие предложения в базе данных.
+    Ищет точный дубль предложения в базе данных одним запросом по индексу
+    (user_id, report_global_modality_id, normalized_hash).
     """
-    user_id = current_user.id
-    tags = None
     logger.info(f"(функция find_similar_exist_sentence)(тип предложения: '{sentence_type}') 🚀 Начат поиск существующих аналогичных предложений в базе данных")
-    
-    # Получаем все предложения того же типа и с такими же базовыми параметрами из базы данных
-    if sentence_type == "head":
-        similar_type_sentences = HeadSentence.query.filter_by(tags=tags, report_global_modality_id=report_global_modality_id, user_id = user_id).all()
-    elif sentence_type == "body":
-        similar_type_sentences = BodySentence.query.filter_by(tags=tags, report_global_modality_id=report_global_modality_id, user_id = user_id).all()
-    elif sentence_type == "tail":
-        similar_type_sentences = TailSentence.query.filter_by(tags=tags, report_global_modality_id=report_global_modality_id, user_id = user_id).all()
-    else:
-        raise ValueError(f"Invalid sentence type: {sentence_type}")
-
-    logger.info(f"-----тип {sentence_type}------найдено предложений для данного пользователя {len(similar_type_sentences)} --------------------")
-    # Сравниваем входное предложение с каждым из существующих
-    for exist_sentence in similar_type_sentences:
-        if exist_sentence.sentence == sentence_text:
-            logger.info(f"(функция find_similar_exist_sentence) 🧩 Найдено совпадение с предложением '{exist_sentence.sentence}' в базе данных. Возвращаю предложение")
-            return exist_sentence
+    found = find_existing_sentences_batch([sentence_text], sentence_type, report_global_modality_id, tags=tags, comment=comment)
+    exist_sentence = found.get(sentence_text)
+    if exist_sentence:
+        logger.info(f"(функция find_similar_exist_sentence) 🧩 Найдено совпадение с предложением '{exist_sentence.sentence}' в базе данных. Возвращаю предложение")
+        return exist_sentence
     logger.info(f"(функция find_similar_exist_sentence) Совпадений не найдено. Возвращаю None")
     return None
+
+
+# Пакетный вариант find_similar_exist_sentence: один запрос с IN по normalized_hash
+def find_existing_sentences_batch(sentence_texts, sentence_type, report_global_modality_id, tags=None, comment=None):
+    """
+    Находит существующие точные дубли для списка предложений одного типа одним запросом.
+
+    Args:
+        sentence_texts (list[str]): Тексты предложений-кандидатов.
+        sentence_type (str): "head", "body" или "tail".
+        report_global_modality_id (int): ID глобальной модальности.
+        tags (str, optional): Теги, общие для всех кандидатов.
+        comment (str, optional): Комментарий, общий для всех кандидатов.
+
+    Returns:
+        dict: {текст: найденное предложение или None} для каждого переданного текста.
+    """
+    sentence_classes = {"head": HeadSentence, "body": BodySentence, "tail": TailSentence}
+    sentence_class = sentence_classes.get(sentence_type)
+    if sentence_class is None:
+        raise ValueError(f"Invalid sentence type: {sentence_type}")
+
+    found = sentence_class.find_exact_duplicates(
+        current_user.id, report_global_modality_id, [(text, tags, comment) for text in sentence_texts]
+    )
+    result = {text: found.get((text, tags, comment)) for text in sentence_texts}
+
+    logger.info(f"(функция find_existing_sentences_batch)(тип предложения: '{sentence_type}') Кандидатов: {len(result)}, найдено дублей: {sum(1 for sentence in result.values() if sentence)}")
+    return result
     
       
       
@@ -535,30 +1072,6 @@ def check_head_sentence_indexes(paragraph_id):
 
         
 
-# Функция проверяет предложение на уникальность и добавляет его 
-# в результат, если оно уникально. Работает со списком по ссылке, 
-# ничего не возвращает, просто меняет предоставленные список и множество
-def _add_if_unique(raw_text, key_words, except_words, cleaned_list, result_set, threshold):
-    """
-    Проверяет, является ли предложение уникальным, и добавляет его в результат.
-
-    Args:
-        raw_text (str): Оригинальный текст.
-        key_words (list): Ключевые слова для очистки.
-        except_words (list): Слова-исключения.
-        cleaned_list (list): Уже очищенные тексты.
-        result_set (set): Уникальные предложения (результат).
-        threshold (int): Порог схожести.
-    """
-    cleaned = clean_text_with_keywords(raw_text, key_words, except_words)
-    for existing in cleaned_list:
-        if fuzz.ratio(cleaned, existing) >= threshold:
-            return
-    cleaned_list.append(cleaned)
-    result_set.add(raw_text)
-   
-
-
 def convert_template_json_to_text(template_json: list) -> str:
     """
     Преобразует шаблон отчета из JSON-структуры (список параграфов с head_sentences)
@@ -727,17 +1240,25 @@ def replace_head_sentences_with_fuzzy_check(main_data, ai_data, threshold=95):
     # 2. Индексируем AI-параграфы по id для быстрого доступа
     ai_paragraphs_by_id = {str(p["id"]): p for p in ai_data}
 
-    # 3. Обрабатываем каждый параграф main_data
-    for main_par in main_data:
+    # 3. Сравниваем заголовки всех пар параграфов одним вызовом
+    pairs = [(main_par, ai_paragraphs_by_id.get(str(main_par["id"]))) for main_par in main_data]
+    matched_pairs = [(main_par, ai_par) for main_par, ai_par in pairs if ai_par]
+    title_ratios = fuzzy_pair_scores(
+        [main_par.get("paragraph", "").strip() for main_par, _ in matched_pairs],
+        [ai_par.get("paragraph", "").strip() for _, ai_par in matched_pairs],
+    )
+    title_ratios = iter(title_ratios)
+
+    # 4. Обрабатываем каждый параграф main_data
+    for main_par, ai_par in pairs:
         para_id = str(main_par["id"])
         main_title = main_par.get("paragraph", "").strip()
-        ai_par = ai_paragraphs_by_id.get(para_id)
         if not ai_par:
             logger.warning(f"(replace_head_sentences_with_fuzzy_check) Не найден параграф id={para_id} в AI-ответе, пропускаю")
             continue
 
         ai_title = ai_par.get("paragraph", "").strip()
-        ratio = fuzz.ratio(main_title, ai_title)
+        ratio = next(title_ratios)
         if ratio < threshold:
             logger.error(f"(replace_head_sentences_with_fuzzy_check) ❌ Заголовок параграфа '{main_title}' не совпадает с AI '{ai_title}' (совпадение {ratio}%)")
             raise ValueError(
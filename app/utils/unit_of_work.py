@@ -0,0 +1,117 @@
+# app/utils/unit_of_work.py
+"""
+Единица работы (unit of work) для многошаговых операций с базой данных.
+
+Методы моделей сохраняют изменения через commit_session() / rollback_session().
+Вне unit_of_work() это обычные commit и rollback. Внутри блока commit_session() делает
+только flush, и вся операция коммитится один раз при выходе из внешнего блока.
+Вложенные блоки открывают SAVEPOINT: ошибка внутри откатывает только их изменения.
+
+    with unit_of_work():
+        report = Report.create(...)
+        for paragraph in paragraphs:
+            Paragraph.create(...)
+
+Побочные действия вне базы (сброс кэшей в Redis и т.п.) регистрируются через after_commit():
+они выполняются только после настоящего коммита и отбрасываются при откате транзакции.
+"""
+
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.utils.logger import logger
+
+
+_DEPTH_KEY = "unit_of_work_depth"
+_DEFERRED_COMMITS_KEY = "unit_of_work_deferred_commits"
+_AFTER_COMMIT_KEY = "unit_of_work_after_commit"
+
+
+def after_commit(callback):
+    """
+    Откладывает действие до коммита текущей транзакции (внутри unit_of_work() — внешнего блока).
+    Если транзакция откатывается, действие не выполняется. Откат вложенного SAVEPOINT
+    действия не отменяет, поэтому они должны быть безопасны к лишнему вызову (сброс кэша).
+
+    Args:
+        callback (Callable[[], None]): Действие без аргументов.
+    """
+    db.session.info.setdefault(_AFTER_COMMIT_KEY, []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    if session.in_nested_transaction():
+        return  # after_commit приходит и на RELEASE SAVEPOINT — ждем коммита внешней транзакции
+    for callback in session.info.pop(_AFTER_COMMIT_KEY, []):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"(after_commit) ⚠️ Ошибка действия после коммита {getattr(callback, '__name__', callback)}: {e}")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_after_commit(session, transaction):
+    # Внешняя транзакция закончилась без коммита (rollback, close) — отложенные действия отбрасываются
+    if transaction.parent is None:
+        session.info.pop(_AFTER_COMMIT_KEY, None)
+
+
+def in_unit_of_work():
+    """Возвращает True, если текущая сессия находится внутри unit_of_work()."""
+    return db.session.info.get(_DEPTH_KEY, 0) > 0
+
+
+def commit_session():
+    """Коммитит сессию или, внутри unit_of_work(), только отправляет изменения в базу (flush)."""
+    session = db.session
+    if session.info.get(_DEPTH_KEY, 0) > 0:
+        session.info[_DEFERRED_COMMITS_KEY] = session.info.get(_DEFERRED_COMMITS_KEY, 0) + 1
+        session.flush()
+    else:
+        session.commit()
+
+
+def rollback_session():
+    """
+    Откатывает сессию. Внутри unit_of_work() ничего не делает: откат выполнит
+    блок (или SAVEPOINT), через который пройдет исключение.
+    """
+    if not in_unit_of_work():
+        db.session.rollback()
+
+
+@contextmanager
+def unit_of_work(name=None):
+    """
+    Объединяет изменения нескольких методов моделей в одну транзакцию.
+
+    Args:
+        name (str, optional): Название операции для логов.
+
+    Yields:
+        Session: Текущая сессия.
+    """
+    session = db.session
+    depth = session.info.get(_DEPTH_KEY, 0)
+    label = name or "unit_of_work"
+    session.info[_DEPTH_KEY] = depth + 1
+    try:
+        if depth:
+            # Вложенный блок — SAVEPOINT внутри общей транзакции
+            with session.begin_nested():
+                yield session
+            return
+
+        session.info[_DEFERRED_COMMITS_KEY] = 0
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.error(f"({label}) ❌ Единица работы откатана")
+            raise
+        logger.debug(f"({label}) ✅ Единица работы закоммичена: 1 commit вместо {session.info.get(_DEFERRED_COMMITS_KEY, 0) + 1}")
+    finally:
+        session.info[_DEPTH_KEY] = depth
@@ -0,0 +1,94 @@
+# benchmarks/bench_bulk_create.py
+"""
+Сравнивает создание пачки body предложений:
+    loop — SentenceBase.create в цикле (поиск дубля, коммит предложения, link_to_group и второй коммит на каждое);
+    bulk — SentenceBase.bulk_create: один запрос на дубли, многострочный INSERT ... RETURNING, связи с ON CONFLICT DO NOTHING, один коммит.
+
+Каждый способ пишет в свою новую body группу. Часть текстов (--duplicate-ratio) повторяет уже
+существующие предложения пользователя, чтобы проверить и путь с найденными дублями.
+По умолчанию — временный SQLite файл, для PostgreSQL передайте --database-url пустой базы.
+В SQLite BigInteger ключ не считается rowid, и SQLAlchemy выполняет INSERT ... RETURNING построчно —
+число запросов bulk показательно только в PostgreSQL:
+    python benchmarks/bench_bulk_create.py --sentences 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models.models import BodySentence, HeadSentence, body_sentence_group_link
+from app.utils.logger import logger
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+def build_texts(prefix, count, existing_texts, duplicate_ratio, rnd):
+    texts = []
+    for index in range(count):
+        if existing_texts and rnd.random() < duplicate_ratio:
+            texts.append(rnd.choice(existing_texts))
+        else:
+            texts.append(f"{prefix} {index}: {rnd.choice(('без особенностей', 'контуры четкие', 'структура однородная'))}")
+    return texts
+
+
+def run_loop(head_id, texts, user_id):
+    for text in texts:
+        BodySentence.create(user_id=user_id, report_global_modality_id=None, sentence=text, related_id=head_id)
+
+
+def run_bulk(head_id, texts, user_id):
+    group = BodySentence.get_or_create_related_group(head_id)
+    BodySentence.bulk_create([{"sentence": text} for text in texts], group.id, user_id=user_id, report_global_modality_id=None)
+
+
+def group_links(head_id):
+    group_id = db.session.get(HeadSentence, head_id).body_sentence_group_id
+    return db.session.query(body_sentence_group_link).filter(body_sentence_group_link.c.group_id == group_id).count()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--sentences", type=int, default=500)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2, help="доля текстов, совпадающих с существующими предложениями")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    rnd = random.Random(args.seed)
+
+    app = make_app(database_url)
+    with app.app_context():
+        db.create_all()
+        seeded = generate(SyntheticParams(reports=1, paragraphs=2, heads=2, bodies=20, tails=0, share_ratio=0, keyword_groups=0, seed=args.seed))
+        user_id = seeded["user_id"]
+        existing_texts = [sentence.sentence for sentence in BodySentence.query.filter_by(user_id=user_id)]
+        # Новые head предложения без body групп — по одному на способ
+        heads = [HeadSentence(sentence=f"Head {name}", user_id=user_id) for name in ("loop", "bulk")]
+        db.session.add_all(heads)
+        db.session.commit()
+        head_ids = [head.id for head in heads]
+
+        with mock.patch("app.utils.sentence_processing.current_user", SimpleNamespace(id=user_id)):
+            for name, runner, head_id in (("loop", run_loop, head_ids[0]), ("bulk", run_bulk, head_ids[1])):
+                texts = build_texts(f"Новое {name}", args.sentences, existing_texts, args.duplicate_ratio, rnd)
+                with StatementCounter(db.engine) as counter:
+                    started = time.perf_counter()
+                    runner(head_id, texts, user_id)
+                    elapsed = (time.perf_counter() - started) * 1000
+                print(f"{name:<5} запросов {counter.count:>6}   {elapsed:10.2f} ms   связей в группе {group_links(head_id)} "
+                      f"(уникальных текстов {len(set(texts))})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_copy_group.py
+"""
+Сравнивает копирование body группы при отделении (unlink_group):
+    loop — прежний copy_group: создание группы с коммитом, загрузка предложений группы,
+           get_sentence_index_or_weight и INSERT связи на каждое предложение;
+    set  — SentenceGroupBase.copy_group: INSERT ... RETURNING id новой группы и
+           INSERT INTO body_sentence_group_link ... SELECT из связей исходной группы.
+
+Проверяет, что обе копии содержат те же предложения с теми же весами (иначе код выхода 1):
+    python benchmarks/bench_copy_group.py --sentences 200 --database-url postgresql://.../bench_empty
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models.models import BodySentence, BodySentenceGroup, HeadSentence, body_sentence_group_link
+from app.utils.logger import logger
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+def copy_group_loop(group_id):
+    new_group = BodySentenceGroup.create()
+    group = db.session.get(BodySentenceGroup, group_id)
+    for sentence in group.body_sentences:
+        sentence_weight = BodySentence.get_sentence_index_or_weight(sentence.id, group_id)
+        db.session.execute(
+            body_sentence_group_link.insert().values(
+                body_sentence_id=sentence.id, group_id=new_group.id, sentence_weight=sentence_weight)
+        )
+    db.session.commit()
+    return new_group.id
+
+
+def group_links(group_id):
+    return sorted(
+        db.session.query(body_sentence_group_link.c.body_sentence_id, body_sentence_group_link.c.sentence_weight)
+        .filter(body_sentence_group_link.c.group_id == group_id)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--sentences", type=int, default=200, help="body предложений в копируемой группе")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+
+    app = make_app(database_url)
+    with app.app_context():
+        db.create_all()
+        generate(SyntheticParams(reports=1, paragraphs=1, heads=1, bodies=args.sentences, tails=0,
+                                 share_ratio=0, keyword_groups=0, seed=args.seed))
+        group_id = db.session.query(HeadSentence.body_sentence_group_id).filter(HeadSentence.body_sentence_group_id.isnot(None)).scalar()
+        source = group_links(group_id)
+
+        copies = {}
+        for name, copier in (("loop", copy_group_loop), ("set", BodySentenceGroup.copy_group)):
+            db.session.expire_all()
+            with StatementCounter(db.engine) as counter:
+                started = time.perf_counter()
+                copies[name] = copier(group_id)
+                elapsed = (time.perf_counter() - started) * 1000
+            print(f"{name:<5} запросов {counter.count:>5}   {elapsed:9.2f} ms   связей в копии {len(group_links(copies[name]))} из {len(source)}")
+
+        matched = all(group_links(new_group_id) == source for new_group_id in copies.values())
+    print("✅ Копии совпадают с исходной группой" if matched else "❌ Копия отличается от исходной группы")
+    return 0 if matched else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
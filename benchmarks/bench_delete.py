@@ -0,0 +1,183 @@
+# benchmarks/bench_delete.py
+"""
+Сравнивает удаление всех параграфов протокола по одному, как это делает маршрут delete_paragraph:
+    legacy — прежний путь: is_linked, delete_group с рекурсивным delete_sentence на каждое
+             предложение (и body группы head предложений), удаление параграфа и
+             normalize_paragraph_indices с загрузкой и перезаписью всех параграфов;
+    engine — Paragraph.delete_paragraphs: удаляемые группы и предложения вычисляются одним
+             запросом с CTE, удаление по таблицам, перенумерация одним UPDATE с row_number().
+Дополнительно замеряется удаление всего протокола одним вызовом Report.delete_report.
+
+Каждый способ запускается на заново созданной базе с одинаковыми данными, после чего
+сравнивается, что осталось в таблицах предложений, групп, связей и параграфов (код выхода 1
+при расхождении). Прежний путь полагается на счетчики link_count, которые ведут триггеры
+из миграций, а create_all их не создает: без триггеров прежний путь видит устаревшие счетчики
+общих групп, поэтому по умолчанию --share-ratio 0:
+    python benchmarks/bench_delete.py --paragraphs 10 --heads 10 --bodies 10 --tails 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models.models import (
+    BodySentence, BodySentenceGroup, HeadSentence, HeadSentenceGroup, Paragraph, Report, TailSentence, TailSentenceGroup,
+    body_sentence_group_link, head_sentence_group_link, tail_sentence_group_link,
+)
+from app.utils.logger import logger
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+GROUP_SENTENCES = {
+    HeadSentenceGroup: ("head_sentences", HeadSentence),
+    BodySentenceGroup: ("body_sentences", BodySentence),
+    TailSentenceGroup: ("tail_sentences", TailSentence),
+}
+
+
+def legacy_delete_sentence(sentence_class, sentence_id, group_id):
+    sentence = db.session.get(sentence_class, sentence_id)
+    if sentence_class.is_linked(sentence_id) > 1:
+        sentence_class.unlink_from_group(sentence_id, group_id)
+        return
+    sentence_class.touch_reports(sentence_id)
+    if sentence_class == HeadSentence and sentence.body_sentence_group_id:
+        body_group_id = sentence.body_sentence_group_id
+        if BodySentenceGroup.is_linked(body_group_id) > 1:
+            BodySentenceGroup.unlink_group(body_group_id, sentence_id)
+        else:
+            legacy_delete_group(BodySentenceGroup, body_group_id, sentence_id)
+    sentence.delete()
+
+
+def legacy_delete_group(group_class, group_id, entity_id):
+    group = db.session.get(group_class, group_id)
+    if group_class.is_linked(group_id) > 1:
+        group_class.unlink_group(group_id, entity_id)
+        db.session.commit()
+        return
+    group_class.touch_reports(group_id)
+    attr, sentence_class = GROUP_SENTENCES[group_class]
+    for sentence in getattr(group, attr):
+        legacy_delete_sentence(sentence_class, sentence.id, group_id)
+    db.session.delete(group)
+    db.session.commit()
+
+
+def legacy_delete_paragraph(paragraph_id):
+    paragraph = db.session.get(Paragraph, paragraph_id)
+    report_id = paragraph.report_id
+    for group_class, group in ((TailSentenceGroup, paragraph.tail_sentence_group), (HeadSentenceGroup, paragraph.head_sentence_group)):
+        if not group:
+            continue
+        if group_class.is_linked(group.id) > 1:
+            group_class.unlink_group(group.id, paragraph_id)
+        else:
+            legacy_delete_group(group_class, group.id, paragraph_id)
+    Report.touch(report_id)
+    paragraph.delete()
+    paragraphs = Paragraph.query.filter_by(report_id=report_id).order_by(Paragraph.paragraph_index).all()
+    for new_index, remaining in enumerate(paragraphs):
+        remaining.paragraph_index = new_index
+    Report.touch(report_id)
+    db.session.commit()
+
+
+def snapshot():
+    """То, что осталось в базе после удаления."""
+    tables = (HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup)
+    state = {model.__tablename__: sorted(db.session.execute(select(model.id)).scalars()) for model in tables}
+    for link_table in (head_sentence_group_link, body_sentence_group_link, tail_sentence_group_link):
+        state[link_table.name] = sorted(tuple(row) for row in db.session.execute(select(link_table)))
+    state["paragraphs"] = sorted(tuple(row) for row in db.session.execute(
+        select(Paragraph.id, Paragraph.report_id, Paragraph.paragraph_index, Paragraph.head_sentence_group_id, Paragraph.tail_sentence_group_id)))
+    return state
+
+
+def sentence_count(report_id):
+    return sum(
+        len(paragraph["tail_sentences"]) + sum(1 + len(head.get("body_sentences", [])) for head in paragraph["head_sentences"])
+        for paragraph in Report.build_report_paragraphs(report_id)
+    )
+
+
+def run_mode(app, params, mode):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seeded = generate(params)
+        report_id = seeded["report_ids"][0]
+        paragraph_ids = db.session.execute(
+            select(Paragraph.id).where(Paragraph.report_id == report_id).order_by(Paragraph.paragraph_index)).scalars().all()
+        sentences = sentence_count(report_id)
+        db.session.expire_all()
+
+        with StatementCounter(db.engine) as counter:
+            started = time.perf_counter()
+            if mode == "legacy":
+                for paragraph_id in paragraph_ids:
+                    legacy_delete_paragraph(paragraph_id)
+            elif mode == "engine":
+                for paragraph_id in paragraph_ids:
+                    Paragraph.delete_paragraphs(paragraph_id)
+            else:
+                Report.delete_report(report_id)
+            elapsed = (time.perf_counter() - started) * 1000
+        print(f"{mode:<7} параграфов {len(paragraph_ids):>3}, предложений {sentences:>5}   запросов {counter.count:>6}   {elapsed:10.2f} ms")
+
+        db.session.expire_all()
+        state = snapshot()
+        if mode == "report":
+            # Протокол удален целиком — сравнивать с поочередным удалением параграфов можно все, кроме самого протокола
+            state["reports"] = db.session.execute(select(Report.id).where(Report.id == report_id)).scalars().all()
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL базы, таблицы в ней пересоздаются. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--reports", type=int, default=2)
+    parser.add_argument("--paragraphs", type=int, default=10)
+    parser.add_argument("--heads", type=int, default=10)
+    parser.add_argument("--bodies", type=int, default=10)
+    parser.add_argument("--tails", type=int, default=5)
+    parser.add_argument("--share-ratio", type=float, default=0.0, help="доля общих групп (см. описание про триггеры)")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    params = SyntheticParams(reports=args.reports, paragraphs=args.paragraphs, heads=args.heads, bodies=args.bodies,
+                             tails=args.tails, share_ratio=args.share_ratio, keyword_groups=0, seed=args.seed)
+
+    app = make_app(database_url)
+    states = {mode: run_mode(app, params, mode) for mode in ("legacy", "engine", "report")}
+
+    failed = False
+    if states["legacy"] != states["engine"]:
+        failed = True
+        diff = [table for table in states["legacy"] if states["legacy"][table] != states["engine"][table]]
+        print(f"❌ После удаления параграфов состояние базы различается в таблицах: {', '.join(diff)}")
+    report_state = dict(states["report"])
+    if report_state.pop("reports"):
+        failed = True
+        print("❌ Report.delete_report не удалил протокол")
+    if report_state != states["engine"]:
+        failed = True
+        diff = [table for table in report_state if report_state[table] != states["engine"][table]]
+        print(f"❌ После удаления протокола состояние базы отличается от удаления его параграфов в таблицах: {', '.join(diff)}")
+    if not failed:
+        print("✅ Все способы оставляют базу в одинаковом состоянии")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
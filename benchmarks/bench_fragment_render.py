@@ -0,0 +1,105 @@
+# benchmarks/bench_fragment_render.py
+"""
+Сравнивает отрисовку ответа финального этапа анализа динамики:
+    full_page — render_template("working_with_report.html") целиком (как было раньше);
+    fragments — build_paragraphs_delta: HTML только изменившихся параграфов через макрос partials/report_paragraph.html.
+
+Данные параграфов генерируются в памяти, база не нужна. Если SECRET_KEY не задан, берется
+тестовый ключ, CSRF отключен — скрипт запускается без окружения приложения:
+    python benchmarks/bench_fragment_render.py --paragraphs 40 --changed 40 --repeat 50
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import render_template
+
+from app import create_app
+from app.blueprints.working_with_reports import build_paragraphs_delta
+from app.utils.logger import logger
+
+
+def make_paragraphs(paragraphs, heads, bodies):
+    """Синтетическое дерево протокола в формате Report.get_report_paragraphs."""
+    tree = []
+    sentence_id = 1
+    for paragraph_index in range(1, paragraphs + 1):
+        head_sentences = []
+        for head_index in range(1, heads + 1):
+            body_sentences = []
+            for _ in range(bodies):
+                body_sentences.append({"id": sentence_id, "sentence": f"Body предложение {sentence_id} без патологических изменений.", "tags": None, "comment": None, "is_linked": False, "group_id": paragraph_index, "sentence_weight": 1})
+                sentence_id += 1
+            head_sentences.append({
+                "id": sentence_id, "sentence": f"Head предложение {sentence_id}: контуры четкие, ровные.", "tags": None, "comment": None,
+                "is_linked": False, "group_id": paragraph_index, "body_sentences": body_sentences,
+                "body_sentence_group_id": paragraph_index, "has_linked_body": False, "sentence_index": head_index,
+            })
+            sentence_id += 1
+        tree.append({
+            "id": paragraph_index, "report_id": 1, "paragraph_index": paragraph_index, "paragraph": f"Параграф {paragraph_index}",
+            "paragraph_visible": True, "title_paragraph": False, "bold_paragraph": False, "is_impression": paragraph_index == paragraphs,
+            "is_active": paragraph_index % 10 != 0, "str_before": False, "str_after": False, "is_additional": False, "comment": None,
+            "paragraph_weight": 1, "tags": None, "has_linked_head": False, "has_linked_tail": False,
+            "head_sentence_group_id": paragraph_index, "tail_sentence_group_id": paragraph_index,
+            "head_sentences": head_sentences, "tail_sentences": [],
+        })
+    return tree
+
+
+def measure(func_, repeat):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = func_()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), min(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--heads", type=int, default=5)
+    parser.add_argument("--bodies", type=int, default=10)
+    parser.add_argument("--changed", type=int, default=40, help="сколько параграфов изменилось после анализа")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    logger.setLevel("WARNING")
+
+    original = make_paragraphs(args.paragraphs, args.heads, args.bodies)
+    transformed = copy.deepcopy(original)
+    for paragraph in transformed[:args.changed]:
+        for head in paragraph["head_sentences"]:
+            head["sentence"] = head["sentence"].replace("контуры четкие", "без динамики, контуры четкие")
+
+    app = create_app()
+    # Ключи для csrf_token() в шаблоне, проверка CSRF бенчмарку не нужна
+    app.config["SECRET_KEY"] = app.config.get("SECRET_KEY") or "bench"
+    app.config["WTF_CSRF_SECRET_KEY"] = app.config.get("WTF_CSRF_SECRET_KEY") or app.config["SECRET_KEY"]
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.test_request_context("/working_with_reports/analyze_dynamics_finalize"):
+        def full_page():
+            return len(render_template(
+                "working_with_report.html", title="Benchmark", report_data={"id": 1, "report_name": "Benchmark"},
+                paragraphs_data=transformed, key_words_groups=[], user_settings={},
+            ))
+
+        def fragments():
+            delta = build_paragraphs_delta(original, transformed)
+            return sum(map(len, delta["paragraphs_html"].values())) + len(delta["inactive_paragraphs_html"])
+
+        print(f"Параграфов: {args.paragraphs}, изменилось: {args.changed}, head: {args.heads}, body: {args.bodies}")
+        for name, case in (("full_page", full_page), ("fragments", fragments)):
+            median, best, size = measure(case, args.repeat)
+            print(f"{name:<10} median {median:8.2f} ms   min {best:8.2f} ms   HTML {size / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
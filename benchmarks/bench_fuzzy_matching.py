@@ -0,0 +1,140 @@
+# benchmarks/bench_fuzzy_matching.py
+"""
+Сравнивает прежние циклы fuzz.ratio с общим движком сравнения из sentence_processing:
+    first — поиск первого совпадения для каждого нового предложения (compare_sentences_by_paragraph):
+            цикл с break против first_fuzzy_matches (process.cdist);
+    dedup — отбор уникальных предложений (generate_impression_json): проверка каждого по уже
+            отобранным против fuzzy_deduplicate (process.cdist блоками);
+    pairs — сверка заголовков параграфов (replace_head_sentences_with_fuzzy_check):
+            fuzz.ratio по парам против fuzzy_pair_scores (process.cpdist).
+
+Корпус и запросы — синтетические очищенные предложения: копии, копии с небольшими правками и
+посторонние тексты. Печатает время каждого способа и проверяет, что решения при заданных порогах
+совпадают (при расхождении код выхода 1). База не нужна:
+    python benchmarks/bench_fuzzy_matching.py --queries 1000 --corpus 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from rapidfuzz import fuzz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.logger import logger
+from app.utils.sentence_processing import clean_text_with_keywords, first_fuzzy_matches, fuzzy_deduplicate, fuzzy_pair_scores
+from benchmarks.synthetic import SyntheticParams
+
+
+PHRASES = (
+    "без патологических изменений", "умеренно расширен", "контуры четкие ровные", "структура однородная",
+    "очаговых изменений не выявлено", "плотность не изменена", "размеры в пределах нормы", "признаки отека",
+    "печень", "селезенка", "почки", "желчный пузырь", "поджелудочная железа", "лимфатические узлы",
+    "в сегменте", "слева", "справа", "с обеих сторон", "незначительно", "выраженно",
+)
+
+
+def mutate(text, rnd):
+    chars = list(text)
+    for _ in range(rnd.randint(1, 3)):
+        position = rnd.randrange(len(chars))
+        if rnd.random() < 0.5:
+            chars[position] = rnd.choice("абвгдежзиклмнопрст ")
+        else:
+            chars.insert(position, rnd.choice("абвгдежзиклмнопрст "))
+    return "".join(chars)
+
+
+def sentence(rnd):
+    return " ".join(rnd.choice(PHRASES) for _ in range(rnd.randint(2, 5)))
+
+
+def build_texts(count, source, rnd):
+    """count предложений: треть копий из source, треть правок, треть новых."""
+    texts = []
+    for _ in range(count):
+        mode = rnd.random()
+        if source and mode < 0.3:
+            texts.append(rnd.choice(source))
+        elif source and mode < 0.6:
+            texts.append(mutate(rnd.choice(source), rnd))
+        else:
+            texts.append(sentence(rnd))
+    return [clean_text_with_keywords(text, []) for text in texts]
+
+
+def loop_first(queries, choices, threshold):
+    matches = []
+    for query in queries:
+        match = None
+        for index, choice in enumerate(choices):
+            score = fuzz.ratio(query, choice)
+            if score >= threshold:
+                match = (index, score)
+                break
+        matches.append(match)
+    return matches
+
+
+def loop_dedup(texts, threshold):
+    kept, kept_texts = [], []
+    for index, text in enumerate(texts):
+        if any(fuzz.ratio(text, existing) >= threshold for existing in kept_texts):
+            continue
+        kept.append(index)
+        kept_texts.append(text)
+    return kept
+
+
+def loop_pairs(left, right):
+    return [fuzz.ratio(a, b) for a, b in zip(left, right)]
+
+
+def timed(func_, *args):
+    started = time.perf_counter()
+    result = func_(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=1000, help="новых предложений")
+    parser.add_argument("--corpus", type=int, default=5000, help="существующих предложений")
+    parser.add_argument("--fuzz-threshold", type=int, default=80, help="порог SIMILARITY_THRESHOLD_FUZZ для first")
+    parser.add_argument("--dedup-threshold", type=int, default=95, help="порог generate_impression_json для dedup")
+    parser.add_argument("--title-threshold", type=int, default=95, help="порог replace_head_sentences_with_fuzzy_check для pairs")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    rnd = random.Random(args.seed)
+    corpus = build_texts(args.corpus, [], rnd)
+    corpus = build_texts(args.corpus, corpus[:args.corpus // 5], rnd)
+    queries = build_texts(args.queries, corpus, rnd)
+    titles = build_texts(args.queries, corpus, rnd)
+
+    checks = (
+        ("first", (loop_first, first_fuzzy_matches), (queries, corpus, args.fuzz_threshold), lambda result: result),
+        ("dedup", (loop_dedup, fuzzy_deduplicate), (corpus, args.dedup_threshold), lambda result: result),
+        ("pairs", (loop_pairs, fuzzy_pair_scores), (queries, titles),
+         lambda result: [score >= args.title_threshold for score in result]),
+    )
+
+    failed = False
+    for name, (loop_func, engine_func), func_args, decide in checks:
+        loop_result, loop_ms = timed(loop_func, *func_args)
+        engine_result, engine_ms = timed(engine_func, *func_args)
+        matched = decide(loop_result) == decide(engine_result)
+        failed = failed or not matched
+        print(f"{name:<6} цикл {loop_ms:10.2f} ms   движок {engine_ms:9.2f} ms   ускорение x{loop_ms / max(engine_ms, 1e-6):6.1f}   "
+              f"{'решения совпадают' if matched else 'РЕШЕНИЯ РАЗЛИЧАЮТСЯ'}")
+
+    print("❌ Движок принимает другие решения, чем циклы fuzz.ratio" if failed else "✅ Решения движка и циклов fuzz.ratio совпадают")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
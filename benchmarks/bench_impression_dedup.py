@@ -0,0 +1,97 @@
+# benchmarks/bench_impression_dedup.py
+"""
+Кривая времени отбора уникальных заключений (generate_impression_json) по размеру корпуса:
+    loop    — прежняя проверка каждого предложения fuzz.ratio по всем уже отобранным;
+    cdist   — fuzzy_deduplicate (process.cdist блоками), та же квадратичная работа в матрицах;
+    blocked — fuzzy_deduplicate_blocked: точные повторы по множеству, fuzz.ratio только
+              с кандидатами, соседними по длине и общим n-граммам.
+
+Корпус — синтетические очищенные предложения заключений: точные повторы, повторы с небольшими
+правками и новые тексты. loop и cdist на больших корпусах идут долго, поэтому запускаются только
+до --loop-limit и --cdist-limit предложений. Проверяет, что отобранные индексы совпадают (при
+расхождении код выхода 1). База не нужна:
+    python benchmarks/bench_impression_dedup.py --sizes 1000,10000,50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.logger import logger
+from app.utils.sentence_processing import clean_text_with_keywords, fuzzy_deduplicate, fuzzy_deduplicate_blocked
+from benchmarks.bench_fuzzy_matching import PHRASES, loop_dedup, mutate, timed
+from benchmarks.bench_keyword_matcher import SYLLABLES
+from benchmarks.synthetic import SyntheticParams
+
+
+def impression(rnd):
+    parts = [rnd.choice(PHRASES) for _ in range(rnd.randint(2, 5))]
+    for _ in range(rnd.randint(0, 2)):
+        word = "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+        parts.insert(rnd.randrange(len(parts) + 1), word)
+    return " ".join(parts)
+
+
+def build_corpus(count, rnd, repeat_share, mutate_share):
+    """count предложений в порядке обхода: повторы и правки ранее встреченных, остальные новые."""
+    texts = []
+    for _ in range(count):
+        mode = rnd.random()
+        if texts and mode < repeat_share:
+            texts.append(rnd.choice(texts))
+        elif texts and mode < repeat_share + mutate_share:
+            texts.append(mutate(rnd.choice(texts), rnd))
+        else:
+            texts.append(impression(rnd))
+    return [clean_text_with_keywords(text, []) for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="размеры корпуса через запятую")
+    parser.add_argument("--threshold", type=int, default=95, help="порог generate_impression_json")
+    parser.add_argument("--repeat-share", type=float, default=0.15, help="доля точных повторов")
+    parser.add_argument("--mutate-share", type=float, default=0.25, help="доля повторов с правками")
+    parser.add_argument("--loop-limit", type=int, default=10000, help="наибольший корпус для loop")
+    parser.add_argument("--cdist-limit", type=int, default=10000, help="наибольший корпус для cdist")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    engines = (
+        ("loop", loop_dedup, args.loop_limit),
+        ("cdist", fuzzy_deduplicate, args.cdist_limit),
+        ("blocked", fuzzy_deduplicate_blocked, None),
+    )
+
+    print(f"порог {args.threshold}, повторов {args.repeat_share:.0%}, правок {args.mutate_share:.0%}")
+    print(f"{'корпус':>8} {'уникальных':>11} " + " ".join(f"{name + ', ms':>12}" for name, _, _ in engines) + "   ускорение")
+    failed = False
+    for size in sizes:
+        texts = build_corpus(size, random.Random(args.seed), args.repeat_share, args.mutate_share)
+        results = {}
+        for name, engine, limit in engines:
+            if limit is None or size <= limit:
+                results[name] = timed(engine, texts, args.threshold)
+
+        blocked, blocked_ms = results["blocked"]
+        mismatched = [name for name, (kept, _) in results.items() if kept != blocked]
+        failed = failed or bool(mismatched)
+        baseline = results.get("loop") or results.get("cdist")
+        speedup = f"x{baseline[1] / max(blocked_ms, 1e-6):.1f}" if baseline and baseline is not results["blocked"] else "—"
+        cells = " ".join(f"{results[name][1]:12.1f}" if name in results else f"{'—':>12}" for name, _, _ in engines)
+        print(f"{size:8d} {len(blocked):11d} {cells}   {speedup}"
+              + (f"   РАСХОЖДЕНИЕ с {', '.join(mismatched)}" if mismatched else ""))
+
+    print("❌ fuzzy_deduplicate_blocked отбирает другие предложения" if failed
+          else "✅ Отобранные предложения совпадают во всех запущенных способах")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# benchmarks/bench_keyword_matcher.py
+"""
+Сравнивает очистку текста от ключевых слов:
+    legacy  — прежний clean_text_with_keywords: re.sub с новым шаблоном на каждое ключевое слово
+              и слово-исключение при каждом вызове;
+    matcher — KeywordMatcher: одно регулярное выражение на набор слов, собранное один раз.
+
+Ключевые слова и предложения синтетические, ключевые слова не входят одно в другое (для таких
+KeywordMatcher удаляет более длинное, а прежний цикл — то, что раньше в списке). Проверяет, что
+результаты очистки совпадают (при расхождении код выхода 1). База не нужна:
+    python benchmarks/bench_keyword_matcher.py --keywords 300 --sentences 5000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.logger import logger
+from app.utils.sentence_processing import KeywordMatcher
+from benchmarks.synthetic import SyntheticParams
+
+
+SYLLABLES = ("ка", "ро", "ми", "ле", "ту", "вра", "сто", "ни", "пе", "зу", "ло", "ган", "тер", "ви")
+WORDS = ("печень", "почка", "контур", "без", "изменений", "четкий", "ровный", "размер", "мм", "справа", "слева")
+
+
+def legacy_clean(sentence, key_words, except_words=None):
+    sentence = str(sentence).lower()
+    if key_words:
+        for word in key_words:
+            sentence = re.sub(rf'(?<!\w){re.escape(word)}(?!\w)', '', sentence, flags=re.IGNORECASE)
+    sentence = re.sub(r"[^\w\s]", "", sentence)
+    sentence = re.sub(r"\d+", "", sentence)
+    sentence = re.sub(r"\s+", " ", sentence).strip()
+    if except_words:
+        for word in except_words:
+            sentence = re.sub(rf"(?<!\w){re.escape(word)}(?!\w)", "", sentence, flags=re.IGNORECASE)
+    return sentence
+
+
+def build_key_words(count, rnd):
+    """Одиночные слова и фразы из двух слов, собранные из разных слогов, чтобы не входили друг в друга."""
+    single, phrases = set(), set()
+    while len(single) + len(phrases) < count:
+        word = "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+        if rnd.random() < 0.2:
+            phrases.add(f"{word}ф {''.join(rnd.choice(SYLLABLES) for _ in range(2))}ф")
+        else:
+            single.add(word)
+    return [word.capitalize() if rnd.random() < 0.3 else word for word in sorted(single | phrases)]
+
+
+def build_sentences(count, key_words, rnd):
+    sentences = []
+    for _ in range(count):
+        parts = [rnd.choice(WORDS) for _ in range(rnd.randint(4, 10))]
+        for _ in range(rnd.randint(0, 3)):
+            parts.insert(rnd.randrange(len(parts) + 1), rnd.choice(key_words).upper() if rnd.random() < 0.2 else rnd.choice(key_words))
+        parts.append(f"{rnd.randint(1, 99)} мм.")
+        sentences.append(", ".join(parts) if rnd.random() < 0.3 else " ".join(parts))
+    return sentences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", type=int, default=300)
+    parser.add_argument("--sentences", type=int, default=5000)
+    parser.add_argument("--except-words", default="без,справа,слева", help="слова-исключения через запятую, как EXCEPT_WORDS")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    rnd = random.Random(args.seed)
+    key_words = build_key_words(args.keywords, rnd)
+    except_words = args.except_words.split(",")
+    sentences = build_sentences(args.sentences, key_words, rnd)
+
+    started = time.perf_counter()
+    legacy = [legacy_clean(sentence, key_words, except_words) for sentence in sentences]
+    legacy_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher.for_words(key_words, except_words)
+    build_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    cleaned = [matcher.clean(sentence) for sentence in sentences]
+    matcher_ms = (time.perf_counter() - started) * 1000
+
+    # Как clean_text_with_keywords: matcher берется из кэша на каждом вызове
+    started = time.perf_counter()
+    cached = [KeywordMatcher.for_words(key_words, except_words).clean(sentence) for sentence in sentences]
+    cached_ms = (time.perf_counter() - started) * 1000
+
+    print(f"ключевых слов {len(key_words)}, предложений {len(sentences)}")
+    print(f"legacy           {legacy_ms:10.2f} ms")
+    print(f"matcher          {matcher_ms:10.2f} ms   (сборка {build_ms:.2f} ms)   ускорение x{legacy_ms / max(matcher_ms, 1e-6):.1f}")
+    print(f"matcher из кэша  {cached_ms:10.2f} ms   ускорение x{legacy_ms / max(cached_ms, 1e-6):.1f}")
+
+    mismatched = [index for index, text in enumerate(legacy) if cleaned[index] != text or cached[index] != text]
+    for index in mismatched[:10]:
+        print(f"❌ '{sentences[index]}': legacy → '{legacy[index]}', matcher → '{cleaned[index]}'")
+    print(f"❌ Расхождений: {len(mismatched)}" if mismatched else "✅ Результаты очистки совпадают")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
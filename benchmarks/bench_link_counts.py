@@ -0,0 +1,136 @@
+# benchmarks/bench_link_counts.py
+"""
+Сравнивает сборку признаков "общая группа/общее предложение" для протокола:
+    count_queries — по COUNT запросу на каждую группу и предложение (как работал is_linked раньше);
+    group_by      — один GROUP BY на тип (count_links);
+    link_count    — чтение поддерживаемых триггерами колонок link_count.
+Плюс полное время сборки дерева протокола (без Redis кэша).
+
+База заполняется одним синтетическим протоколом (benchmarks/synthetic.py). Используйте
+ОТДЕЛЬНУЮ пустую базу: по умолчанию это временный SQLite файл, для PostgreSQL передайте --database-url.
+    python benchmarks/bench_link_counts.py --paragraphs 20 --heads 8 --bodies 15 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models.models import (
+    Paragraph, HeadSentence, BodySentence, TailSentence,
+    HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup,
+)
+from app.utils.logger import logger
+from benchmarks.bench_render_path import make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+def collect_ids(report_id):
+    """Собирает ID всех групп и предложений протокола."""
+    paragraphs = Paragraph.query.filter_by(report_id=report_id).all()
+    groups = {
+        HeadSentenceGroup: {p.head_sentence_group_id for p in paragraphs if p.head_sentence_group_id},
+        TailSentenceGroup: {p.tail_sentence_group_id for p in paragraphs if p.tail_sentence_group_id},
+    }
+    sentences = {}
+    for sentence_cls, group_cls in ((HeadSentence, HeadSentenceGroup), (TailSentence, TailSentenceGroup)):
+        link_table, sentence_field, _ = sentence_cls.get_link_columns()
+        sentences[sentence_cls] = {
+            row[0] for row in db.session.query(sentence_field).filter(link_table.c.group_id.in_(groups[group_cls]))
+        }
+    groups[BodySentenceGroup] = {
+        row[0] for row in db.session.query(HeadSentence.body_sentence_group_id)
+        .filter(HeadSentence.id.in_(sentences[HeadSentence]), HeadSentence.body_sentence_group_id.isnot(None))
+    }
+    link_table, sentence_field, _ = BodySentence.get_link_columns()
+    sentences[BodySentence] = {
+        row[0] for row in db.session.query(sentence_field).filter(link_table.c.group_id.in_(groups[BodySentenceGroup]))
+    }
+    return groups, sentences
+
+
+def flags_count_queries(groups, sentences):
+    for group_cls, group_ids in groups.items():
+        parent_field = group_cls.get_parent_field()
+        for group_id in group_ids:
+            db.session.query(func.count()).filter(parent_field == group_id).scalar()
+    for sentence_cls, sentence_ids in sentences.items():
+        link_table, sentence_field, _ = sentence_cls.get_link_columns()
+        for sentence_id in sentence_ids:
+            db.session.query(func.count(link_table.c.group_id)).filter(sentence_field == sentence_id).scalar()
+
+
+def flags_group_by(groups, sentences):
+    for group_cls, group_ids in groups.items():
+        group_cls.count_links(group_ids)
+    for sentence_cls, sentence_ids in sentences.items():
+        sentence_cls.count_links(sentence_ids)
+
+
+def flags_link_count(groups, sentences):
+    for group_cls, group_ids in groups.items():
+        group_cls.get_link_counts(group_ids)
+    for sentence_cls, sentence_ids in sentences.items():
+        if sentence_ids:
+            db.session.query(sentence_cls.id, sentence_cls.link_count).filter(sentence_cls.id.in_(sentence_ids)).all()
+
+
+def build_tree(report_id):
+    paragraphs = Paragraph.query.filter_by(report_id=report_id).order_by(Paragraph.paragraph_index).all()
+    Paragraph.build_paragraphs_data(paragraphs)
+
+
+def measure(func_, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expire_all()
+        started = time.perf_counter()
+        func_()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--paragraphs", type=int, default=SyntheticParams.paragraphs)
+    parser.add_argument("--heads", type=int, default=SyntheticParams.heads, help="head предложений в параграфе")
+    parser.add_argument("--bodies", type=int, default=SyntheticParams.bodies, help="body предложений на head предложение")
+    parser.add_argument("--tails", type=int, default=SyntheticParams.tails, help="tail предложений в параграфе")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    params = SyntheticParams(
+        reports=1, paragraphs=args.paragraphs, heads=args.heads, bodies=args.bodies, tails=args.tails,
+        keyword_groups=0, seed=args.seed,
+    )
+
+    app = make_app(database_url)
+    with app.app_context():
+        db.create_all()
+        report_id = generate(params)["report_ids"][0]
+        groups, sentences = collect_ids(report_id)
+        print(f"report_id={report_id}: групп {sum(map(len, groups.values()))}, предложений {sum(map(len, sentences.values()))}")
+        cases = [
+            ("count_queries", lambda: flags_count_queries(groups, sentences)),
+            ("group_by", lambda: flags_group_by(groups, sentences)),
+            ("link_count", lambda: flags_link_count(groups, sentences)),
+            ("build_tree", lambda: build_tree(report_id)),
+        ]
+        for name, case in cases:
+            median, best = measure(case, args.repeat)
+            print(f"{name:<14} median {median:8.2f} ms   min {best:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
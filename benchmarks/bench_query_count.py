@@ -0,0 +1,97 @@
+# benchmarks/bench_query_count.py
+"""
+Проверяет, что сборка дерева протокола делает одинаковое число SQL запросов для маленького
+и большого протокола: Report.get_report_data (полное и lite дерево) и Paragraph.get_paragraph_data
+загружают связи, body группы и количество связей пачками, а не запросом на предложение.
+
+Дважды заполняет базу синтетическим протоколом (benchmarks/synthetic.py): на --small и на --large
+предложений (head + body + tail), Redis кэш дерева отключен. Печатает число запросов каждого
+замера; если для большого протокола их больше, чем для маленького, код выхода 1.
+По умолчанию временный SQLite:
+    python benchmarks/bench_query_count.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import ExitStack
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models import models
+from app.models.models import BodySentence, HeadSentence, Paragraph, Report, TailSentence
+from app.utils.logger import logger
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+# Размеры протоколов: предложений в параграфе — heads * (1 + bodies) + tails
+SIZES = {
+    10: dict(paragraphs=1, heads=2, bodies=3, tails=2),
+    1000: dict(paragraphs=10, heads=6, bodies=15, tails=4),
+}
+
+
+def count_sentences():
+    return sum(db.session.execute(select(func.count()).select_from(model)).scalar() for model in (HeadSentence, BodySentence, TailSentence))
+
+
+def run(params):
+    """Пересоздает таблицы, заполняет их и возвращает (число предложений, {замер: число запросов})."""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    seeded = generate(params)
+    report_id = seeded["report_ids"][0]
+    paragraph_id = db.session.execute(select(Paragraph.id).where(Paragraph.report_id == report_id).order_by(Paragraph.id)).scalars().first()
+    cases = {
+        "Report.get_report_data": lambda: Report.get_report_data(report_id),
+        "Report.get_report_data[lite]": lambda: Report.get_report_data(report_id, lite=True),
+        "Paragraph.get_paragraph_data": lambda: Paragraph.get_paragraph_data(paragraph_id),
+    }
+    counts = {}
+    for name, case in cases.items():
+        db.session.expire_all()
+        with StatementCounter(db.engine) as counter:
+            case()
+        counts[name] = counter.count
+    return count_sentences(), counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию временный SQLite.")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+
+    app = make_app(database_url)
+    results = {}
+    with app.app_context(), ExitStack() as stack:
+        for name in ("redis_get", "redis_set"):
+            stack.enter_context(mock.patch.object(models, name, return_value=None))
+        for size, shape in SIZES.items():
+            params = SyntheticParams(reports=1, share_ratio=0, keyword_groups=0, seed=args.seed, **shape)
+            results[size] = run(params)
+
+    small, large = results[min(SIZES)], results[max(SIZES)]
+    failed = False
+    for name in small[1]:
+        print(f"{name:<32} {small[0]:5d} предложений: {small[1][name]:3d} запросов, {large[0]:5d} предложений: {large[1][name]:3d} запросов")
+        if large[1][name] != small[1][name]:
+            failed = True
+            print(f"❌ {name}: число запросов зависит от размера протокола")
+    if not failed:
+        print("✅ Число запросов не зависит от числа предложений")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
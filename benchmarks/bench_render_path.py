@@ -0,0 +1,209 @@
+# benchmarks/bench_render_path.py
+"""
+Регрессионный бенчмарк пути отрисовки протокола: время и количество SQL запросов
+для Report.get_report_data, KeyWord.get_keywords_for_report и generate_impression_json.
+
+База заполняется синтетическими протоколами (benchmarks/synthetic.py), таблицы
+создаются через db.create_all(). Используйте ОТДЕЛЬНУЮ пустую базу: по умолчанию
+это временный SQLite файл, для PostgreSQL передайте --database-url.
+
+Redis кэш дерева протокола и загрузка файла в generate_impression_json на время
+замеров отключаются, чтобы измерялась именно работа с базой (--with-cache включает кэш).
+
+Результат пишется в JSON с сортированными ключами — его можно сравнивать между коммитами
+обычным diff или через --compare:
+    python benchmarks/bench_render_path.py --paragraphs 20 --heads 8 --bodies 15 --output before.json
+    python benchmarks/bench_render_path.py --paragraphs 20 --heads 8 --bodies 15 --compare before.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, current_app
+from sqlalchemy import BigInteger, event
+from sqlalchemy.ext.compiler import compiles
+
+from app.extensions import db
+from app.models import models
+from app.models.models import Report, KeyWord
+from app.utils.logger import logger
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+# В SQLite автоинкремент работает только для INTEGER PRIMARY KEY, а модели используют BigInteger
+@compiles(BigInteger, "sqlite")
+def _compile_big_integer_sqlite(type_, compiler, **kw):
+    return "INTEGER"
+
+
+class StatementCounter:
+    """Считает SQL запросы, отправленные в базу, через событие before_cursor_execute."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def make_app(database_url):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+    return app
+
+
+def measure(func_, repeat):
+    """Возвращает статистику по времени (мс) и количество запросов последнего прогона."""
+    timings = []
+    statements = None
+    for _ in range(repeat):
+        db.session.expire_all()
+        with StatementCounter(db.engine) as counter:
+            started = time.perf_counter()
+            func_()
+            timings.append((time.perf_counter() - started) * 1000)
+        statements = counter.count
+    return {
+        "statements": statements,
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def build_cases(seeded, dialect):
+    from app.utils.file_processing import generate_impression_json
+
+    report_id = seeded["report_ids"][0]
+    profile_id = seeded["profile_id"]
+    user_id = seeded["user_id"]
+
+    builders = ["orm", "sql"] if dialect == "postgresql" else ["orm"]
+    cases = []
+    for builder in builders:
+        def get_report_data(builder=builder):
+            with mock.patch.dict(current_app.config, {"REPORT_TREE_BUILDER": builder}):
+                Report.get_report_data(report_id)
+        cases.append((f"Report.get_report_data[{builder}]", get_report_data))
+    cases.append(("Report.get_report_data[lite]", lambda: Report.get_report_data(report_id, lite=True)))
+    cases.append(("KeyWord.get_keywords_for_report", lambda: KeyWord.get_keywords_for_report(profile_id, report_id)))
+    cases.append(("generate_impression_json", lambda: generate_impression_json("CT", profile_id, user_id, "bench@example.com", [])))
+    return cases
+
+
+def _discard_upload(tmp_file_path, *args, **kwargs):
+    os.remove(tmp_file_path)
+    return "File uploaded successfully", tmp_file_path
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(previous, current):
+    print(f"\nСравнение с {previous['meta'].get('git_revision')} ({previous['meta'].get('created_at')}):")
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if not before:
+            print(f"  {name:<36} новый замер")
+            continue
+        delta = result["statements"] - before["statements"]
+        marker = "❌" if delta > 0 else "✅"
+        print(f"  {marker} {name:<36} запросов {before['statements']} → {result['statements']} ({delta:+d}), "
+              f"median {before['median_ms']} → {result['median_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--reports", type=int, default=SyntheticParams.reports)
+    parser.add_argument("--paragraphs", type=int, default=SyntheticParams.paragraphs)
+    parser.add_argument("--heads", type=int, default=SyntheticParams.heads, help="head предложений в параграфе")
+    parser.add_argument("--bodies", type=int, default=SyntheticParams.bodies, help="body предложений на head предложение")
+    parser.add_argument("--tails", type=int, default=SyntheticParams.tails, help="tail предложений в параграфе")
+    parser.add_argument("--share-ratio", type=float, default=SyntheticParams.share_ratio, help="доля переиспользуемых групп (0..1)")
+    parser.add_argument("--keyword-groups", type=int, default=SyntheticParams.keyword_groups)
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--with-cache", action="store_true", help="не отключать Redis кэш дерева протокола")
+    parser.add_argument("--output", help="куда сохранить JSON (по умолчанию — stdout)")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logger.setLevel(args.log_level.upper())
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    params = SyntheticParams(
+        reports=args.reports, paragraphs=args.paragraphs, heads=args.heads, bodies=args.bodies, tails=args.tails,
+        share_ratio=args.share_ratio, keyword_groups=args.keyword_groups, seed=args.seed,
+    )
+
+    app = make_app(database_url)
+    with app.app_context(), ExitStack() as stack:
+        db.create_all()
+        started = time.perf_counter()
+        seeded = generate(params)
+        seed_seconds = time.perf_counter() - started
+        dialect = db.engine.dialect.name
+
+        if not args.with_cache:
+            stack.enter_context(mock.patch.object(models, "redis_get", return_value=None))
+            stack.enter_context(mock.patch.object(models, "redis_set", return_value=None))
+        stack.enter_context(mock.patch("app.utils.file_processing.file_uploader", side_effect=_discard_upload))
+
+        results = {}
+        for name, case in build_cases(seeded, dialect):
+            results[name] = measure(case, args.repeat)
+            print(f"{name:<36} запросов {results[name]['statements']:>5}   median {results[name]['median_ms']:9.2f} ms", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "dialect": dialect,
+            "repeat": args.repeat,
+            "with_cache": args.with_cache,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "params": params.as_dict(),
+        "results": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_reorder.py
+"""
+Сравнивает перестановку N параграфов протокола и N head предложений параграфа:
+    loop  — прежние маршруты: Paragraph.get_by_id на каждый параграф и
+            set_sentence_index_or_weight (UPDATE + touch + commit) на каждое предложение;
+    batch — Paragraph.reorder / SentenceBase.reorder_in_group: проверка принадлежности одним
+            запросом, один UPDATE ... FROM (VALUES ...), touch, чтение нового порядка, один коммит.
+
+Печатает число запросов и коммитов и проверяет, что оба способа дают одинаковый порядок
+(при расхождении код выхода 1). В SQLite вместо VALUES используется CASE — число запросов
+то же, но план запроса показателен только в PostgreSQL:
+    python benchmarks/bench_reorder.py --items 50 --database-url postgresql://.../bench_empty
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models.models import HeadSentence, Paragraph
+from app.utils.logger import logger
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+def loop_paragraphs(positions):
+    for paragraph_id, index in positions.items():
+        paragraph = Paragraph.get_by_id(paragraph_id)
+        if paragraph:
+            paragraph.paragraph_index = index
+    Paragraph.touch_reports(list(positions))
+    db.session.commit()
+
+
+def loop_heads(group_id, positions):
+    for sentence_id, index in positions.items():
+        HeadSentence.set_sentence_index_or_weight(sentence_id, group_id, new_index=index)
+
+
+def paragraph_order(report_id):
+    return db.session.execute(
+        select(Paragraph.id).where(Paragraph.report_id == report_id).order_by(Paragraph.paragraph_index, Paragraph.id)
+    ).scalars().all()
+
+
+def head_order(group_id):
+    link_table, sentence_field, index_field = HeadSentence.get_link_columns()
+    return db.session.execute(
+        select(sentence_field).where(link_table.c.group_id == group_id).order_by(index_field, sentence_field)
+    ).scalars().all()
+
+
+def run(name, func_, *args):
+    commits = []
+    listener = lambda session: commits.append(1)
+    event.listen(db.session, "after_commit", listener)
+    db.session.expire_all()
+    try:
+        with StatementCounter(db.engine) as counter:
+            started = time.perf_counter()
+            func_(*args)
+            elapsed = (time.perf_counter() - started) * 1000
+    finally:
+        event.remove(db.session, "after_commit", listener)
+    print(f"{name:<18} запросов {counter.count:>5}   коммитов {len(commits):>4}   {elapsed:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--items", type=int, default=50, help="сколько параграфов и head предложений переставлять")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+
+    app = make_app(database_url)
+    with app.app_context():
+        db.create_all()
+        # Два одинаковых протокола — по одному на способ
+        seeded = generate(SyntheticParams(reports=2, paragraphs=args.items, heads=args.items, bodies=0, tails=0,
+                                          share_ratio=0, keyword_groups=0, seed=args.seed))
+        profile_id = seeded["profile_id"]
+
+        orders = {}
+        for name, report_id in zip(("loop", "batch"), seeded["report_ids"]):
+            paragraph_ids = paragraph_order(report_id)
+            shuffled = paragraph_ids[:]
+            random.Random(args.seed).shuffle(shuffled)
+            paragraph_positions = {paragraph_id: index for index, paragraph_id in enumerate(shuffled)}
+
+            group_id = db.session.get(Paragraph, paragraph_ids[0]).head_sentence_group_id
+            head_ids = head_order(group_id)
+            random.Random(args.seed).shuffle(head_ids)
+            head_positions = {sentence_id: index for index, sentence_id in enumerate(head_ids)}
+
+            if name == "loop":
+                run("loop paragraphs", loop_paragraphs, paragraph_positions)
+                run("loop heads", loop_heads, group_id, head_positions)
+            else:
+                run("batch paragraphs", Paragraph.reorder, paragraph_positions, profile_id)
+                run("batch heads", HeadSentence.reorder_in_group, group_id, head_positions)
+
+            # id в протоколах разные, поэтому сравниваем позиции относительно исходного порядка
+            paragraph_rank = {paragraph_id: rank for rank, paragraph_id in enumerate(paragraph_ids)}
+            orders[name] = [paragraph_rank[paragraph_id] for paragraph_id in paragraph_order(report_id)]
+            expected_heads = sorted(head_positions, key=head_positions.get)
+            if head_order(group_id) != expected_heads:
+                print(f"❌ {name}: порядок head предложений не совпадает с запрошенным")
+                return 1
+
+    matched = orders["loop"] == orders["batch"]
+    print("✅ Порядок совпадает" if matched else "❌ Порядок параграфов после перестановки различается")
+    return 0 if matched else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
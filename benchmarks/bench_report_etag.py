@@ -0,0 +1,104 @@
+# benchmarks/bench_report_etag.py
+"""
+Проверяет условный GET страницы протокола (decorators.report_etag) через тестовый клиент Flask:
+    1. первый запрос /working_with_reports — 200, strong ETag, Cache-Control: private, no-cache;
+    2. повтор с If-None-Match — 304 без вызова view и с одним SQL запросом (ревизия протокола);
+    3. после Report.touch старый ETag не подходит — страница собирается заново (200, новый ETag);
+    4. то же после смены версии настроек пользователя.
+
+Протокол синтетический (benchmarks/synthetic.py), view working_with_reports вызывается без
+auth_required, шаблон не рендерится, версия настроек пользователя хранится в памяти вместо Redis.
+Если какой-то шаг не выполняется, код выхода 1. По умолчанию временный SQLite:
+    python benchmarks/bench_report_etag.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blueprints import working_with_reports
+from app.extensions import db
+from app.models import models
+from app.models.models import Report
+from app.utils import decorators
+from app.utils.logger import logger
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию временный SQLite.")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+
+    app = make_app(database_url)
+    app.config["SECRET_KEY"] = "bench"
+    # auth_required снимается: пользователь подставляется в модули напрямую
+    app.add_url_rule("/working_with_reports", view_func=working_with_reports.working_with_reports.__wrapped__)
+
+    failed = []
+
+    def check(condition, message):
+        print(f"{'✅' if condition else '❌'} {message}")
+        if not condition:
+            failed.append(message)
+
+    with app.app_context(), ExitStack() as stack:
+        db.create_all()
+        seeded = generate(SyntheticParams(reports=1, paragraphs=5, heads=3, bodies=5, tails=2, keyword_groups=2, seed=args.seed))
+        report_id = seeded["report_ids"][0]
+        user = SimpleNamespace(id=seeded["user_id"], is_authenticated=True)
+        settings_version = {"value": "1"}
+        render = mock.Mock(return_value="<html>протокол</html>")
+
+        for name in ("redis_get", "redis_set"):
+            stack.enter_context(mock.patch.object(models, name, return_value=None))
+        stack.enter_context(mock.patch.object(decorators, "current_user", user))
+        stack.enter_context(mock.patch.object(decorators, "get_user_settings_version", lambda user_id: settings_version["value"]))
+        stack.enter_context(mock.patch.object(working_with_reports, "current_user", user))
+        stack.enter_context(mock.patch.object(working_with_reports, "render_template", render))
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["profile_id"] = seeded["profile_id"]
+            session["lang"] = "ru"
+        url = f"/working_with_reports?reportId={report_id}"
+
+        first = client.get(url)
+        etag, _ = first.get_etag()
+        check(first.status_code == 200 and etag, f"первый запрос: {first.status_code}, ETag {etag}")
+        check(first.cache_control.private and first.cache_control.no_cache, f"Cache-Control: {first.headers.get('Cache-Control')}")
+
+        render.reset_mock()
+        db.session.expire_all()
+        with StatementCounter(db.engine) as counter:
+            cached = client.get(url, headers={"If-None-Match": f'"{etag}"'})
+        check(cached.status_code == 304 and not cached.data, f"повтор с If-None-Match: {cached.status_code}, тело {len(cached.data)} байт")
+        check(not render.called, "view при 304 не вызывался")
+        check(counter.count == 1, f"SQL запросов при 304: {counter.count}")
+
+        Report.touch(report_id)
+        db.session.commit()
+        touched = client.get(url, headers={"If-None-Match": f'"{etag}"'})
+        touched_etag, _ = touched.get_etag()
+        check(touched.status_code == 200 and touched_etag not in (None, etag), f"после изменения протокола: {touched.status_code}, новый ETag {touched_etag}")
+
+        settings_version["value"] = "2"
+        changed_settings = client.get(url, headers={"If-None-Match": f'"{touched_etag}"'})
+        check(changed_settings.status_code == 200 and changed_settings.get_etag()[0] != touched_etag, f"после смены настроек пользователя: {changed_settings.status_code}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# benchmarks/bench_settings_snapshot.py
+"""
+Проверяет, что save_modified_sentences читает настройки профиля (AppConfig) одним запросом
+на весь HTTP запрос: get_setting берет значения из снимка в flask.g, а не запрашивает базу
+на каждый ключ (clean_and_normalize_text вызывается для каждого сохраняемого предложения).
+
+На синтетическом протоколе (benchmarks/synthetic.py) отправляет --sentences новых предложений
+в представление save_modified_sentences, Redis снимок настроек отключен, чтобы снимок собирался
+из базы. Печатает общее число SQL запросов и запросов к app_config, то же для прежнего чтения
+по ключу (каждый прогон на заново заполненной базе). Проверяет (assert_query_counts), что со снимком
+к app_config ровно один запрос, а прежнее чтение делает не меньше запроса на предложение — иначе
+счетчик не видит чтения настроек и проверка ничего не доказывает. При нарушении код выхода 1. По умолчанию временный SQLite:
+    python benchmarks/bench_settings_snapshot.py --sentences 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import ExitStack
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+from flask import session
+
+from app.blueprints import working_with_reports
+from app.extensions import db
+from app.models import models
+from app.models.models import AppConfig, Report
+from app.utils.logger import logger
+from app.utils.spacy_manager import SpacyModel
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+class AppConfigCounter(StatementCounter):
+    """Считает только запросы к таблице app_config."""
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if "app_config" in statement:
+            self.count += 1
+
+
+def legacy_get_setting(profile_id, key, default=None):
+    """Прежний get_setting: отдельный запрос на каждый ключ."""
+    config = AppConfig.query.filter_by(profile_id=profile_id, config_key=key).first()
+    return config.config_value if config else default
+
+
+def build_payload(report_id, count):
+    """Новые предложения в формате фронтенда: поровну body (к первому head параграфа) и tail."""
+    slots = []
+    for paragraph in Report.build_report_paragraphs(report_id):
+        if paragraph["head_sentences"]:
+            slots.append(("body", paragraph["id"], paragraph["head_sentences"][0]["id"]))
+        slots.append(("tail", paragraph["id"], None))
+    sentences = []
+    for index in range(count):
+        sentence_type, paragraph_id, head_sentence_id = slots[index % len(slots)]
+        sentences.append({
+            "type": sentence_type, "paragraph_id": paragraph_id, "head_sentence_id": head_sentence_id,
+            "text": f"новое наблюдение номер {index}: киста до {index % 9 + 1} мм",
+        })
+    return {"report_id": report_id, "sentences": sentences}
+
+
+def load_sentencizer():
+    """Модель SpaCy приложения, а если она не установлена — пустая русская модель с sentencizer."""
+    try:
+        SpacyModel.get_instance("ru")
+    except OSError:
+        print("ru_core_news_sm не установлена — предложения делит spacy.blank('ru') + sentencizer", file=sys.stderr)
+        nlp = spacy.blank("ru")
+        nlp.add_pipe("sentencizer")
+        SpacyModel._instance = nlp
+
+
+def seed(params):
+    """Пересоздает таблицы и заполняет их одинаковыми синтетическими данными."""
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    seeded = generate(params)
+    for key, value in (("SIMILARITY_THRESHOLD_FUZZ", 80), ("EXCEPT_WORDS", "без,справа,слева"), ("EXCEPTIONS_AFTER_PUNCTUATION", "КТ,МРТ")):
+        AppConfig.set_setting(seeded["profile_id"], key, value)
+    return seeded
+
+
+def run(app, payload, user_id, profile_id):
+    """Вызывает save_modified_sentences в отдельном запросе. Возвращает (статус, всего запросов, запросов к app_config)."""
+    view = working_with_reports.save_modified_sentences.__wrapped__
+    with app.test_request_context(json=payload), ExitStack() as stack:
+        session["profile_id"] = profile_id
+        session["lang"] = "ru"
+        stack.enter_context(mock.patch.object(working_with_reports, "current_user", SimpleNamespace(id=user_id, is_authenticated=True)))
+        stack.enter_context(mock.patch.object(working_with_reports, "render_template", return_value=""))
+        db.session.expire_all()
+        total = stack.enter_context(StatementCounter(db.engine))
+        app_config = stack.enter_context(AppConfigCounter(db.engine))
+        response, status = view()
+    return status, response.get_json(), total.count, app_config.count
+
+
+def assert_query_counts(results, sentences):
+    """
+    Проверяет число запросов прогонов run(). Raises AssertionError с описанием нарушения
+    (явный raise, а не assert: проверка не должна отключаться флагом -O).
+    """
+    status, body, total, app_config = results["снимок настроек"]
+    if status != 200:
+        raise AssertionError(f"save_modified_sentences вернул {status}: {body.get('message')}")
+    if app_config != 1:
+        raise AssertionError(f"Ожидался один запрос к app_config, выполнено {app_config}")
+    _, _, legacy_total, legacy_app_config = results["get_setting по ключу"]
+    if legacy_app_config < sentences:
+        raise AssertionError(f"Прежнее чтение сделало {legacy_app_config} запросов к app_config на {sentences} предложений — счетчик не видит чтения настроек")
+    if total >= legacy_total:
+        raise AssertionError(f"Со снимком запросов не меньше, чем без него: {total} против {legacy_total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию временный SQLite.")
+    parser.add_argument("--sentences", type=int, default=200, help="сколько предложений отправить в save_modified_sentences")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    params = SyntheticParams(reports=1, paragraphs=10, heads=3, bodies=5, tails=3, share_ratio=0, keyword_groups=5, seed=args.seed)
+
+    app = make_app(database_url)
+    app.config["SECRET_KEY"] = "bench"
+    with app.app_context(), ExitStack() as stack:
+        for name in ("redis_get", "redis_set", "get_app_config_version", "get_app_config_snapshot", "set_app_config_snapshot"):
+            stack.enter_context(mock.patch.object(models, name, return_value=None))
+        load_sentencizer()
+        results = {}
+        for name, get_setting in (("get_setting по ключу", legacy_get_setting), ("снимок настроек", AppConfig.get_setting)):
+            seeded = seed(params)
+            report_id = seeded["report_ids"][0]
+            with mock.patch.object(AppConfig, "get_setting", staticmethod(get_setting)):
+                results[name] = run(app, build_payload(report_id, args.sentences), seeded["user_id"], seeded["profile_id"])
+
+    print(f"предложений {args.sentences}")
+    for name, (status, body, total, app_config) in results.items():
+        print(f"{name:<22} статус {status}, запросов {total:5d}, к app_config {app_config:4d}")
+    try:
+        assert_query_counts(results, args.sentences)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        return 1
+    print("✅ Настройки профиля прочитаны одним запросом")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# benchmarks/bench_similarity_engine.py
+"""
+Сравнивает движки поиска похожих предложений в compare_sentences_by_paragraph:
+    rapidfuzz — все предложения группы загружаются и сравниваются fuzz.ratio в Python;
+    pg_trgm   — PostgreSQL отбирает кандидатов similarity() >= SENTENCE_TRGM_THRESHOLD, fuzz.ratio проверяет только их.
+
+На синтетическом корпусе (benchmarks/synthetic.py) строятся новые предложения: точные копии
+существующих, копии с небольшими правками и посторонние тексты. Оба движка получают одинаковый
+вход. Скрипт печатает время, число запросов и расхождения в решениях (дубль / уникальное и с каким
+предложением совпало). При расхождениях код выхода 1 — порог SENTENCE_TRGM_THRESHOLD слишком высок.
+
+pg_trgm требует PostgreSQL с расширением pg_trgm (создается вместе с таблицами):
+    python benchmarks/bench_similarity_engine.py --database-url postgresql://.../bench_empty --candidates 500
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models import models
+from app.models.models import Report
+from app.utils.logger import logger
+from app.utils.sentence_processing import compare_sentences_by_paragraph, get_similarity_engine
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+def build_candidates(report_id, count, rnd):
+    """Новые предложения в формате, который фронтенд отправляет в save_modified_sentences."""
+    slots = []
+    for paragraph in Report.build_report_paragraphs(report_id):
+        for head in paragraph["head_sentences"]:
+            for body in head.get("body_sentences", []):
+                slots.append(("body", paragraph["id"], head["id"], body["sentence"]))
+        for tail in paragraph["tail_sentences"]:
+            slots.append(("tail", paragraph["id"], None, tail["sentence"]))
+
+    candidates = []
+    for index in range(count):
+        sentence_type, paragraph_id, head_sentence_id, existing_text = rnd.choice(slots)
+        mode = rnd.random()
+        if mode < 0.3:
+            text = existing_text
+        elif mode < 0.7:
+            text = _mutate(existing_text, rnd)
+        else:
+            text = f"Новое наблюдение {rnd.getrandbits(24)} {rnd.choice(('без особенностей', 'выраженный отек', 'киста до 5 мм'))}"
+        candidates.append({
+            "bench_index": index, "paragraph_id": paragraph_id, "head_sentence_id": head_sentence_id,
+            "sentence_type": sentence_type, "text": text,
+        })
+    return candidates
+
+
+def _mutate(text, rnd):
+    chars = list(text)
+    for _ in range(rnd.randint(1, 3)):
+        position = rnd.randrange(len(chars))
+        if rnd.random() < 0.5:
+            chars[position] = rnd.choice("абвгдежзиклмнопрст ")
+        else:
+            chars.insert(position, rnd.choice("абвгдежзиклмнопрст "))
+    return "".join(chars)
+
+
+def decisions(result):
+    """{bench_index: id совпавшего предложения или None}"""
+    decided = {item["bench_index"]: None for item in result["unique"]}
+    for duplicate in result["duplicates"]:
+        decided[duplicate["new_sentence"]["bench_index"]] = duplicate["matched_with"]["id"]
+    return decided
+
+
+def measure(engine, candidates, report_id, profile_id, repeat):
+    timings = []
+    result = None
+    statements = None
+    for _ in range(repeat):
+        db.session.expire_all()
+        with StatementCounter(db.engine) as counter:
+            started = time.perf_counter()
+            result = compare_sentences_by_paragraph(candidates, report_id, profile_id, engine=engine)
+            timings.append((time.perf_counter() - started) * 1000)
+        statements = counter.count
+    return result, {"statements": statements, "median_ms": round(statistics.median(timings), 3), "min_ms": round(min(timings), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы PostgreSQL. Без него — SQLite и только rapidfuzz.")
+    parser.add_argument("--reports", type=int, default=1)
+    parser.add_argument("--paragraphs", type=int, default=SyntheticParams.paragraphs)
+    parser.add_argument("--heads", type=int, default=SyntheticParams.heads)
+    parser.add_argument("--bodies", type=int, default=50, help="body предложений на head предложение")
+    parser.add_argument("--tails", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=200, help="сколько новых предложений сравнивать")
+    parser.add_argument("--trgm-threshold", type=float, default=0.3)
+    parser.add_argument("--fuzz-threshold", type=int, default=80)
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    params = SyntheticParams(reports=args.reports, paragraphs=args.paragraphs, heads=args.heads, bodies=args.bodies,
+                             tails=args.tails, share_ratio=0, keyword_groups=5, seed=args.seed)
+
+    app = make_app(database_url)
+    app.config["SENTENCE_TRGM_THRESHOLD"] = args.trgm_threshold
+    with app.app_context(), mock.patch.object(models, "redis_get", return_value=None), mock.patch.object(models, "redis_set", return_value=None):
+        db.create_all()
+        seeded = generate(params)
+        report_id, profile_id = seeded["report_ids"][0], seeded["profile_id"]
+        models.AppConfig.set_setting(profile_id, "SIMILARITY_THRESHOLD_FUZZ", args.fuzz_threshold)
+        candidates = build_candidates(report_id, args.candidates, random.Random(args.seed))
+
+        engines = ["rapidfuzz"]
+        if get_similarity_engine("pg_trgm") == "pg_trgm":
+            engines.append("pg_trgm")
+        else:
+            print("pg_trgm недоступен в этой базе — замеряется только rapidfuzz", file=sys.stderr)
+
+        results = {}
+        for engine in engines:
+            result, stats = measure(engine, candidates, report_id, profile_id, args.repeat)
+            results[engine] = decisions(result)
+            print(f"{engine:<10} запросов {stats['statements']:>5}   median {stats['median_ms']:9.2f} ms   min {stats['min_ms']:9.2f} ms   "
+                  f"дублей {len(result['duplicates'])} из {len(candidates)}")
+
+    if len(results) < 2:
+        return 0
+    mismatched = [index for index, matched in results["rapidfuzz"].items() if results["pg_trgm"].get(index) != matched]
+    for index in mismatched[:20]:
+        print(f"❌ #{index} '{candidates[index]['text']}': rapidfuzz → {results['rapidfuzz'][index]}, pg_trgm → {results['pg_trgm'].get(index)}")
+    print(f"Расхождений в решениях: {len(mismatched)} из {len(candidates)} (SENTENCE_TRGM_THRESHOLD={args.trgm_threshold})")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# benchmarks/bench_weight_buffer.py
+"""
+Нагрузочная проверка отложенной записи весов (SENTENCE_WEIGHT_WRITE_BEHIND):
+несколько потоков одновременно вызывают BodySentence/TailSentence.increase_weight
+(HINCRBY в Redis), а основной поток все это время переносит приросты в базу
+flush_buffered_sentence_weights, как это делает Celery beat.
+
+Проверяется, что:
+    - перед последним переносом get_groups_sentences уже видит все клики (база + Redis);
+    - после последнего переноса веса в базе выросли ровно на число кликов, а в Redis ничего не осталось.
+При расхождении код выхода 1. Нужен Redis (REDIS_HOST, REDIS_PORT, REDIS_DB) —
+лучше отдельная база, скрипт переносит в свою БД все накопленные там веса:
+    REDIS_DB=15 python benchmarks/bench_weight_buffer.py --increments 5000 --threads 16
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extensions import db
+from app.models import models
+from app.models.models import BodySentence, BodySentenceGroup, TailSentence, TailSentenceGroup
+from app.utils.db_processing import flush_buffered_sentence_weights
+from app.utils.logger import logger
+from app.utils.redis_client import get_redis, read_all_buffered_weights
+from benchmarks.bench_render_path import StatementCounter, make_app
+from benchmarks.synthetic import SyntheticParams, generate
+
+
+SENTENCE_CLASSES = {"body": (BodySentence, BodySentenceGroup), "tail": (TailSentence, TailSentenceGroup)}
+
+
+def load_weights(slots):
+    """{(sentence_type, group_id, sentence_id): вес в базе}"""
+    weights = {}
+    for sentence_type, (sentence_class, _) in SENTENCE_CLASSES.items():
+        link_table, sentence_field, weight_field = sentence_class.get_link_columns()
+        group_ids = {group_id for slot_type, group_id, _ in slots if slot_type == sentence_type}
+        rows = db.session.query(link_table.c.group_id, sentence_field, weight_field).filter(link_table.c.group_id.in_(group_ids))
+        weights.update({(sentence_type, group_id, sentence_id): weight or 0 for group_id, sentence_id, weight in rows})
+    return weights
+
+
+def read_merged_weights(slots):
+    """Веса так, как их видит чтение групп: база плюс приросты, еще лежащие в Redis."""
+    weights = {}
+    for sentence_type, (_, group_class) in SENTENCE_CLASSES.items():
+        group_ids = {group_id for slot_type, group_id, _ in slots if slot_type == sentence_type}
+        for group_id, sentences in group_class.get_groups_sentences(group_ids).items():
+            weights.update({(sentence_type, group_id, sentence["id"]): sentence["sentence_weight"] or 0 for sentence in sentences})
+    return weights
+
+
+def clicker(app, slots, count, seed, issued, lock):
+    rnd = random.Random(seed)
+    local = Counter()
+    with app.app_context():
+        for _ in range(count):
+            slot = rnd.choice(slots)
+            sentence_type, group_id, sentence_id = slot
+            SENTENCE_CLASSES[sentence_type][0].increase_weight(sentence_id, group_id)
+            local[slot] += 1
+    with lock:
+        issued.update(local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="URL пустой базы. По умолчанию — временный SQLite файл.")
+    parser.add_argument("--increments", type=int, default=5000, help="сколько кликов всего")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--sentences", type=int, default=10, help="body и tail предложений в группе — чем меньше, тем горячее строки")
+    parser.add_argument("--flush-interval", type=float, default=0.05, help="пауза между переносами, сек")
+    parser.add_argument("--seed", type=int, default=SyntheticParams.seed)
+    args = parser.parse_args()
+
+    logger.setLevel("WARNING")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')}"
+    get_redis().ping()
+
+    app = make_app(database_url)
+    app.config["SENTENCE_WEIGHT_WRITE_BEHIND"] = True
+    with app.app_context():
+        db.create_all()
+        generate(SyntheticParams(reports=1, paragraphs=2, heads=2, bodies=args.sentences, tails=args.sentences,
+                                 share_ratio=0, keyword_groups=0, seed=args.seed))
+        slots = [("body", group_id, sentence_id) for group_id, sentence_id in db.session.query(
+            models.body_sentence_group_link.c.group_id, models.body_sentence_group_link.c.body_sentence_id)]
+        slots += [("tail", group_id, sentence_id) for group_id, sentence_id in db.session.query(
+            models.tail_sentence_group_link.c.group_id, models.tail_sentence_group_link.c.tail_sentence_id)]
+        flush_buffered_sentence_weights()  # остатки прошлых запусков не должны попасть в замер
+        before = load_weights(slots)
+
+        issued, lock = Counter(), threading.Lock()
+        per_thread = args.increments // args.threads
+        threads = [
+            threading.Thread(target=clicker, args=(app, slots, per_thread, args.seed + index, issued, lock))
+            for index in range(args.threads)
+        ]
+        flushes = 0
+        started = time.perf_counter()
+        with StatementCounter(db.engine) as counter:
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                flushes += bool(flush_buffered_sentence_weights())
+                time.sleep(args.flush_interval)
+            for thread in threads:
+                thread.join()
+            clicked = (time.perf_counter() - started) * 1000
+
+            db.session.expire_all()
+            merged = read_merged_weights(slots)
+            pending = sum(sum(deltas.values()) for deltas in read_all_buffered_weights().values())
+            flushes += bool(flush_buffered_sentence_weights())
+        after = load_weights(slots)
+
+    total = per_thread * args.threads
+    expected = {slot: before[slot] + issued[slot] for slot in before}
+    print(f"кликов {total} в {args.threads} потоках за {clicked:.0f} ms ({total / clicked * 1000:.0f}/с), "
+          f"переносов {flushes}, запросов к базе {counter.count}, в Redis перед последним переносом {pending}")
+
+    failed = False
+    if merged != expected:
+        failed = True
+        print(f"❌ get_groups_sentences до последнего переноса расходится с числом кликов в {sum(merged.get(slot) != value for slot, value in expected.items())} предложениях")
+    if after != expected:
+        failed = True
+        print(f"❌ Веса в базе расходятся с числом кликов в {sum(after.get(slot) != value for slot, value in expected.items())} предложениях")
+    if read_all_buffered_weights():
+        failed = True
+        print("❌ После последнего переноса в Redis остались приросты")
+    if not failed:
+        print("✅ Все клики учтены: чтение видит их сразу, база — после переноса")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
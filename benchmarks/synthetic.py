@@ -0,0 +1,157 @@
+# benchmarks/synthetic.py
+"""
+Генератор синтетических шаблонов протоколов для бенчмарков.
+
+Создает пользователя, профиль, категории (в том числе CATEGORIES_SETUP в AppConfig,
+чтобы отрабатывал generate_impression_json), ключевые слова и заданное число
+протоколов. Часть групп предложений переиспользуется между протоколами и head
+предложениями (share_ratio), как это бывает у реальных пользователей после
+копирования протоколов и связывания групп.
+"""
+
+import json
+import random
+from dataclasses import dataclass, asdict
+
+from app.extensions import db
+from app.models.models import (
+    User, UserProfile, AppConfig, ReportCategory, Report, Paragraph, KeyWord,
+    HeadSentence, BodySentence, TailSentence,
+    HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup,
+    head_sentence_group_link,
+)
+
+
+@dataclass
+class SyntheticParams:
+    reports: int = 5
+    paragraphs: int = 10
+    heads: int = 5              # head предложений в параграфе
+    bodies: int = 10            # body предложений на head предложение
+    tails: int = 3              # tail предложений в параграфе
+    share_ratio: float = 0.2    # доля групп, взятых из уже созданных вместо новых
+    keyword_groups: int = 20
+    seed: int = 42
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def generate(params):
+    """
+    Заполняет базу синтетическими данными.
+    Args:
+        params (SyntheticParams): Размеры генерируемых данных.
+    Returns:
+        dict: {"user_id", "profile_id", "report_ids"}
+    """
+    rnd = random.Random(params.seed)
+
+    user = User(email=f"bench_{rnd.getrandbits(32)}@example.com", password="bench", fs_uniquifier=f"bench-{rnd.getrandbits(64)}", active=True)
+    db.session.add(user)
+    db.session.flush()
+    profile = UserProfile(user_id=user.id, profile_name="benchmark", default_profile=True)
+    db.session.add(profile)
+    db.session.flush()
+
+    modality = ReportCategory(name="CT", level=1, profile_id=profile.id)
+    db.session.add(modality)
+    db.session.flush()
+    area = ReportCategory(name="Head", level=2, parent_id=modality.id, profile_id=profile.id)
+    db.session.add(area)
+    db.session.flush()
+    # global_id=1 — КТ, как ожидает generate_impression_json
+    categories_setup = [{"id": modality.id, "global_id": 1, "name": modality.name, "children": [{"id": area.id, "name": area.name}]}]
+    db.session.add(AppConfig(profile_id=profile.id, config_key="CATEGORIES_SETUP", config_value=json.dumps(categories_setup), config_type="json"))
+
+    head_group_pool = []
+    body_group_pool = []
+    tail_group_pool = []
+    report_ids = []
+
+    def shared(pool):
+        return rnd.choice(pool) if pool and rnd.random() < params.share_ratio else None
+
+    for report_number in range(params.reports):
+        report = Report(
+            profile_id=profile.id, user_id=user.id, report_name=f"Синтетический протокол {report_number + 1}",
+            category_1_id=modality.id, category_2_id=area.id,
+        )
+        db.session.add(report)
+        db.session.flush()
+        report_ids.append(report.id)
+
+        for paragraph_index in range(params.paragraphs):
+            head_group_id = shared(head_group_pool)
+            if head_group_id is None:
+                head_group_id = _new_group(HeadSentenceGroup)
+                for head_index in range(params.heads):
+                    body_group_id = shared(body_group_pool)
+                    if body_group_id is None:
+                        body_group_id = _new_group(BodySentenceGroup)
+                        _add_sentences(BodySentence, body_group_id, user.id, rnd,
+                                       [f"Body {body_group_id}.{i} {_words(rnd)}" for i in range(params.bodies)])
+                        body_group_pool.append(body_group_id)
+                    head = HeadSentence(sentence=f"Head {head_group_id}.{head_index} {_words(rnd)}", user_id=user.id, body_sentence_group_id=body_group_id)
+                    db.session.add(head)
+                    db.session.flush()
+                    db.session.execute(head_sentence_group_link.insert().values(head_sentence_id=head.id, group_id=head_group_id, sentence_index=head_index + 1))
+                head_group_pool.append(head_group_id)
+
+            tail_group_id = shared(tail_group_pool)
+            if tail_group_id is None:
+                tail_group_id = _new_group(TailSentenceGroup)
+                _add_sentences(TailSentence, tail_group_id, user.id, rnd,
+                               [f"Tail {tail_group_id}.{i} {_words(rnd)}" for i in range(params.tails)])
+                tail_group_pool.append(tail_group_id)
+
+            db.session.add(Paragraph(
+                report_id=report.id, paragraph_index=paragraph_index + 1, paragraph=f"Параграф {paragraph_index + 1}",
+                paragraph_visible=True, str_before=False, str_after=False, is_additional=False,
+                is_impression=paragraph_index == params.paragraphs - 1, paragraph_weight=1,
+                head_sentence_group_id=head_group_id, tail_sentence_group_id=tail_group_id,
+            ))
+        db.session.flush()
+
+    for group_index in range(1, params.keyword_groups + 1):
+        # Половина групп привязана к протоколам, остальные — общие для профиля
+        linked_reports = [db.session.get(Report, rnd.choice(report_ids))] if report_ids and group_index % 2 else []
+        for index in range(1, 4):
+            key_word = KeyWord(profile_id=profile.id, group_index=group_index, index=index, key_word=f"слово{group_index}_{index}")
+            key_word.key_word_reports = linked_reports
+            db.session.add(key_word)
+
+    # Без триггеров (create_all) счетчики связей пересчитываем явно
+    for model in (HeadSentence, BodySentence, TailSentence, HeadSentenceGroup, BodySentenceGroup, TailSentenceGroup):
+        model.repair_link_counts()
+    db.session.commit()
+    return {"user_id": user.id, "profile_id": profile.id, "report_ids": report_ids}
+
+
+def _new_group(group_model):
+    group = group_model()
+    db.session.add(group)
+    db.session.flush()
+    return group.id
+
+
+def _add_sentences(sentence_model, group_id, user_id, rnd, texts):
+    sentences = [sentence_model(sentence=text, user_id=user_id) for text in texts]
+    db.session.add_all(sentences)
+    db.session.flush()
+    link_table, sentence_field, weight_field = sentence_model.get_link_columns()
+    if sentences:
+        db.session.execute(link_table.insert(), [
+            {sentence_field.name: sentence.id, "group_id": group_id, weight_field.name: rnd.randint(0, 5)}
+            for sentence in sentences
+        ])
+
+
+_VOCABULARY = (
+    "без патологических изменений", "умеренно расширен", "контуры четкие ровные", "структура однородная",
+    "очаговых изменений не выявлено", "плотность не изменена", "размеры в пределах нормы", "признаки отека",
+)
+
+
+def _words(rnd):
+    return rnd.choice(_VOCABULARY)
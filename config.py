@@ -34,7 +34,8 @@ class Config:
         "HeadSentenceGroup": HeadSentenceGroup,
         "KeyWord": KeyWord,
         "FileMetadata": FileMetadata,
-        "ReportTextSnapshot": ReportTextSnapshot
+        "ReportTextSnapshot": ReportTextSnapshot,
+        "SentenceDuplicateCluster": SentenceDuplicateCluster
     }
     
     ASSOCIATIVE_TABLES = [
@@ -102,6 +103,34 @@ class Config:
     OCR_PROVIDER = os.getenv("OCR_PROVIDER", "azure")  # Текущий поддерживаемый провайдер: "azure"
     AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT")
     AZURE_VISION_KEY = os.getenv("AZURE_VISION_KEY")
+    
+    # Сборка дерева протокола: "orm" — пачки запросов и сборка в Python, "sql" — один запрос с json_agg в PostgreSQL
+    REPORT_TREE_BUILDER = os.getenv("REPORT_TREE_BUILDER", "orm")
+    
+    # Поиск похожих предложений при сохранении новых: "rapidfuzz" — все предложения группы сравниваются в Python,
+    # "pg_trgm" — PostgreSQL отбирает кандидатов по similarity() не ниже SENTENCE_TRGM_THRESHOLD, rapidfuzz проверяет только их
+    SENTENCE_SIMILARITY_ENGINE = os.getenv("SENTENCE_SIMILARITY_ENGINE", "rapidfuzz")
+    SENTENCE_TRGM_THRESHOLD = float(os.getenv("SENTENCE_TRGM_THRESHOLD", "0.3"))
+    
+    # "true" — прирост веса body/tail предложений при выборе копится в Redis и переносится в базу задачей Celery beat
+    # (интервал — SENTENCE_WEIGHT_FLUSH_INTERVAL в tasks/celeryconfig.py). Включать только вместе с работающими
+    # Redis и Celery beat: без beat веса так и остаются в Redis. По умолчанию вес пишется в базу сразу
+    SENTENCE_WEIGHT_WRITE_BEHIND = os.getenv("SENTENCE_WEIGHT_WRITE_BEHIND", "false").lower() == "true"
+    
+    # Сборка мусора: осиротевшие предложения и группы удаляются задачей Celery beat пачками по ORPHAN_GC_BATCH_SIZE строк
+    # (интервал — ORPHAN_GC_INTERVAL в tasks/celeryconfig.py). "true" — только считать, ничего не удаляя
+    ORPHAN_GC_BATCH_SIZE = int(os.getenv("ORPHAN_GC_BATCH_SIZE", "5000"))
+    ORPHAN_GC_DRY_RUN = os.getenv("ORPHAN_GC_DRY_RUN", "false").lower() == "true"
+    
+    # Пересчет сохраненных normalized_text предложений после изменения правил очистки, ключевых слов или EXCEPT_WORDS:
+    # задача Celery beat (интервал — RENORMALIZE_INTERVAL в tasks/celeryconfig.py), пачками по RENORMALIZE_BATCH_SIZE строк
+    RENORMALIZE_BATCH_SIZE = int(os.getenv("RENORMALIZE_BATCH_SIZE", "2000"))
+    
+    # Кластеры почти одинаковых предложений (MinHash + LSH) собирает задача Celery beat (интервал — DUPLICATE_CLUSTERS_INTERVAL
+    # в tasks/celeryconfig.py). Хэшируются только новые предложения, пачками по DUPLICATE_CLUSTERS_BATCH_SIZE строк;
+    # в кластер попадают предложения с коэффициентом Жаккара n-грамм с представителем не ниже DUPLICATE_CLUSTERS_THRESHOLD
+    DUPLICATE_CLUSTERS_BATCH_SIZE = int(os.getenv("DUPLICATE_CLUSTERS_BATCH_SIZE", "2000"))
+    DUPLICATE_CLUSTERS_THRESHOLD = float(os.getenv("DUPLICATE_CLUSTERS_THRESHOLD", "0.8"))
 
     # OpenAI API configuration
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
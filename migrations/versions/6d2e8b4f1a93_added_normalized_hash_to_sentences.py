@@ -0,0 +1,68 @@
+"""added normalized_hash to sentences
+
+Revision ID: 6d2e8b4f1a93
+Revises: a51d0e6c8f27
+Create Date: 2025-10-10 12:15:03.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# Хэш должен совпадать с тем, что считает приложение при сохранении предложения
+from app.utils.common import sentence_normalized_hash
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2e8b4f1a93'
+down_revision = 'a51d0e6c8f27'
+branch_labels = None
+depends_on = None
+
+
+SENTENCE_TABLES = ['head_sentences', 'body_sentences', 'tail_sentences']
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade():
+    for table_name in SENTENCE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('normalized_hash', sa.String(length=64), nullable=True))
+
+    # Заполняем хэши пачками по возрастанию id, чтобы не держать всю таблицу в памяти
+    connection = op.get_bind()
+    for table_name in SENTENCE_TABLES:
+        table = sa.table(
+            table_name,
+            sa.column('id', sa.BigInteger),
+            sa.column('sentence', sa.String),
+            sa.column('tags', sa.String),
+            sa.column('comment', sa.String),
+            sa.column('normalized_hash', sa.String),
+        )
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                sa.select(table.c.id, table.c.sentence, table.c.tags, table.c.comment)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            connection.execute(
+                table.update().where(table.c.id == sa.bindparam('row_id')).values(normalized_hash=sa.bindparam('row_hash')),
+                [{'row_id': row.id, 'row_hash': sentence_normalized_hash(row.sentence, row.tags, row.comment)} for row in rows],
+            )
+            last_id = rows[-1].id
+
+    for table_name in SENTENCE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table_name}_user_modality_hash', ['user_id', 'report_global_modality_id', 'normalized_hash'], unique=False)
+
+
+def downgrade():
+    for table_name in SENTENCE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table_name}_user_modality_hash')
+            batch_op.drop_column('normalized_hash')
@@ -0,0 +1,106 @@
+"""added link_count fields and triggers
+
+Revision ID: a51d0e6c8f27
+Revises: 3c9a1f7e2b40
+Create Date: 2025-10-03 10:41:52.118306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a51d0e6c8f27'
+down_revision = '3c9a1f7e2b40'
+branch_labels = None
+depends_on = None
+
+
+COUNTED_TABLES = [
+    'head_sentences', 'body_sentences', 'tail_sentences',
+    'head_sentence_groups', 'body_sentence_groups', 'tail_sentence_groups',
+]
+
+# (имя триггера, таблица со ссылкой, таблица со счетчиком, колонка ссылки)
+LINK_COUNT_TRIGGERS = [
+    ('trg_head_sentence_link_count', 'head_sentence_group_link', 'head_sentences', 'head_sentence_id'),
+    ('trg_body_sentence_link_count', 'body_sentence_group_link', 'body_sentences', 'body_sentence_id'),
+    ('trg_tail_sentence_link_count', 'tail_sentence_group_link', 'tail_sentences', 'tail_sentence_id'),
+    ('trg_head_group_link_count', 'report_paragraphs', 'head_sentence_groups', 'head_sentence_group_id'),
+    ('trg_tail_group_link_count', 'report_paragraphs', 'tail_sentence_groups', 'tail_sentence_group_id'),
+    ('trg_body_group_link_count', 'head_sentences', 'body_sentence_groups', 'body_sentence_group_id'),
+]
+
+# (таблица со счетчиком, таблица со ссылкой, колонка ссылки)
+BACKFILL = [
+    ('head_sentences', 'head_sentence_group_link', 'head_sentence_id'),
+    ('body_sentences', 'body_sentence_group_link', 'body_sentence_id'),
+    ('tail_sentences', 'tail_sentence_group_link', 'tail_sentence_id'),
+    ('head_sentence_groups', 'report_paragraphs', 'head_sentence_group_id'),
+    ('tail_sentence_groups', 'report_paragraphs', 'tail_sentence_group_id'),
+    ('body_sentence_groups', 'head_sentences', 'body_sentence_group_id'),
+]
+
+
+def upgrade():
+    for table_name in COUNTED_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('link_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Одна функция на все счетчики: TG_ARGV[0] — таблица со счетчиком, TG_ARGV[1] — колонка ссылки
+    op.execute("""
+        CREATE OR REPLACE FUNCTION maintain_link_count() RETURNS trigger AS $$
+        DECLARE
+            new_id bigint;
+            old_id bigint;
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                EXECUTE format('SELECT ($1).%I', TG_ARGV[1]) INTO new_id USING NEW;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                EXECUTE format('SELECT ($1).%I', TG_ARGV[1]) INTO old_id USING OLD;
+            END IF;
+            IF new_id IS NOT DISTINCT FROM old_id THEN
+                RETURN NULL;
+            END IF;
+            IF new_id IS NOT NULL THEN
+                EXECUTE format('UPDATE %I SET link_count = link_count + 1 WHERE id = $1', TG_ARGV[0]) USING new_id;
+            END IF;
+            IF old_id IS NOT NULL THEN
+                EXECUTE format('UPDATE %I SET link_count = link_count - 1 WHERE id = $1', TG_ARGV[0]) USING old_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    for trigger_name, source_table, target_table, column_name in LINK_COUNT_TRIGGERS:
+        op.execute(f"""
+            CREATE TRIGGER {trigger_name}
+            AFTER INSERT OR DELETE OR UPDATE OF {column_name} ON {source_table}
+            FOR EACH ROW EXECUTE FUNCTION maintain_link_count('{target_table}', '{column_name}');
+        """)
+
+    # Заполняем счетчики для уже существующих данных
+    for target_table, source_table, column_name in BACKFILL:
+        op.execute(f"""
+            UPDATE {target_table} AS t
+            SET link_count = c.link_count
+            FROM (
+                SELECT {column_name} AS id, count(*) AS link_count
+                FROM {source_table}
+                WHERE {column_name} IS NOT NULL
+                GROUP BY {column_name}
+            ) AS c
+            WHERE t.id = c.id
+        """)
+
+
+def downgrade():
+    for trigger_name, source_table, _, _ in LINK_COUNT_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger_name} ON {source_table}")
+    op.execute("DROP FUNCTION IF EXISTS maintain_link_count()")
+
+    for table_name in reversed(COUNTED_TABLES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('link_count')
@@ -0,0 +1,76 @@
+"""added search_text and pg_trgm indexes
+
+Revision ID: b7c3f19e5d24
+Revises: 6d2e8b4f1a93
+Create Date: 2025-10-13 16:02:47.815230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# Текст должен совпадать с тем, что считает приложение при сохранении предложения
+from app.utils.common import sentence_search_text
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c3f19e5d24'
+down_revision = '6d2e8b4f1a93'
+branch_labels = None
+depends_on = None
+
+
+SENTENCE_TABLES = ['head_sentences', 'body_sentences', 'tail_sentences']
+
+# Похожие предложения ищутся только внутри body и tail групп
+TRGM_TABLES = ['body_sentences', 'tail_sentences']
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade():
+    # pg_trgm — доверенное расширение (PostgreSQL 13+), владелец базы может установить его без суперпользователя
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    for table_name in SENTENCE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('search_text', sa.String(length=600), nullable=True))
+
+    connection = op.get_bind()
+    for table_name in SENTENCE_TABLES:
+        table = sa.table(
+            table_name,
+            sa.column('id', sa.BigInteger),
+            sa.column('sentence', sa.String),
+            sa.column('search_text', sa.String),
+        )
+        last_id = 0
+        while True:
+            rows = connection.execute(
+                sa.select(table.c.id, table.c.sentence)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            connection.execute(
+                table.update().where(table.c.id == sa.bindparam('row_id')).values(search_text=sa.bindparam('row_text')),
+                [{'row_id': row.id, 'row_text': sentence_search_text(row.sentence)} for row in rows],
+            )
+            last_id = rows[-1].id
+
+    for table_name in TRGM_TABLES:
+        op.create_index(
+            f'ix_{table_name}_search_text_trgm', table_name, ['search_text'], unique=False,
+            postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    for table_name in TRGM_TABLES:
+        op.drop_index(f'ix_{table_name}_search_text_trgm', table_name=table_name)
+
+    for table_name in SENTENCE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('search_text')
+    # Расширение pg_trgm не удаляем: им могут пользоваться другие объекты базы
@@ -0,0 +1,55 @@
+"""added sentence_minhash_bands and sentence_duplicate_clusters
+
+Revision ID: c5d1e8a4b273
+Revises: e4a8c2d91f36
+Create Date: 2025-10-27 10:42:31.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d1e8a4b273'
+down_revision = 'e4a8c2d91f36'
+branch_labels = None
+depends_on = None
+
+
+# Таблицы заполняет задача cluster_near_duplicates: первый запуск хэширует все существующие предложения
+
+
+def upgrade():
+    op.create_table('sentence_minhash_bands',
+    sa.Column('sentence_type', sa.String(length=10), nullable=False),
+    sa.Column('sentence_id', sa.BigInteger(), nullable=False),
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=True),
+    sa.Column('report_global_modality_id', sa.BigInteger(), nullable=True),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('sentence_type', 'sentence_id', 'band')
+    )
+    op.create_index(
+        'ix_sentence_minhash_bands_bucket', 'sentence_minhash_bands',
+        ['sentence_type', 'user_id', 'report_global_modality_id', 'band', 'bucket'], unique=False,
+    )
+    op.create_table('sentence_duplicate_clusters',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('user_id', sa.BigInteger(), nullable=True),
+    sa.Column('sentence_type', sa.String(length=10), nullable=False),
+    sa.Column('report_global_modality_id', sa.BigInteger(), nullable=True),
+    sa.Column('sentence_ids', sa.JSON(), nullable=False),
+    sa.Column('similarity', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sentence_duplicate_clusters_user', 'sentence_duplicate_clusters', ['user_id', 'sentence_type'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_sentence_duplicate_clusters_user', table_name='sentence_duplicate_clusters')
+    op.drop_table('sentence_duplicate_clusters')
+    op.drop_index('ix_sentence_minhash_bands_bucket', table_name='sentence_minhash_bands')
+    op.drop_table('sentence_minhash_bands')
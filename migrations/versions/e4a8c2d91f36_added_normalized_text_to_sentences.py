@@ -0,0 +1,42 @@
+"""added normalized_text and normalization_version to sentences
+
+Revision ID: e4a8c2d91f36
+Revises: b7c3f19e5d24
+Create Date: 2025-10-20 11:18:05.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a8c2d91f36'
+down_revision = 'b7c3f19e5d24'
+branch_labels = None
+depends_on = None
+
+
+SENTENCE_TABLES = ['head_sentences', 'body_sentences', 'tail_sentences']
+
+# Колонки заполняет задача renormalize_sentences: нормализованный текст зависит от ключевых слов
+# протокола, поэтому в миграции его не посчитать. Пока колонки пусты, сравнения очищают текст на месте
+
+
+def upgrade():
+    for table_name in SENTENCE_TABLES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('normalized_text', sa.String(length=600), nullable=True))
+            batch_op.add_column(sa.Column('normalization_version', sa.String(length=64), nullable=True))
+        op.create_index(
+            f'ix_{table_name}_pending_normalization', table_name, ['user_id'], unique=False,
+            postgresql_where=sa.text('normalization_version IS NULL'),
+            sqlite_where=sa.text('normalization_version IS NULL'),
+        )
+
+
+def downgrade():
+    for table_name in SENTENCE_TABLES:
+        op.drop_index(f'ix_{table_name}_pending_normalization', table_name=table_name)
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('normalization_version')
+            batch_op.drop_column('normalized_text')
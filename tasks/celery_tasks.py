@@ -5,6 +5,7 @@ from tasks.extensions import celery
 from app.utils.file_processing import prepare_impression_snippets
 from app.utils.ai_processing import clean_raw_text, run_first_look_assistant, structure_report_text, ai_template_generator, ai_report_check, ai_impression_generation, reversed_structure_report_text
 from tasks.celery_task_processing import cancel_stale_polled_tasks, cancel_stuck_tasks
+from app.utils.db_processing import cluster_near_duplicates, collect_orphans, flush_buffered_sentence_weights, renormalize_sentences
 from app.utils.logger import logger
 from app.utils.ocr_processing import get_ocr_provider
 from app.utils.pdf_processing import has_text_layer, extract_text_from_pdf_textlayer
@@ -21,6 +22,26 @@ def celery_cancel_stale_polled_tasks():
 def celery_cancel_stuck_tasks():
     return cancel_stuck_tasks()
 
+# Таск для переноса накопленных в Redis весов предложений в базу одним UPDATE
+@celery.task
+def celery_flush_sentence_weights():
+    return flush_buffered_sentence_weights()
+
+# Таск для удаления осиротевших предложений и групп пачками (dry_run=None — режим из ORPHAN_GC_DRY_RUN)
+@celery.task(time_limit=3600, soft_time_limit=3500)
+def celery_collect_orphans(dry_run=None):
+    return collect_orphans(dry_run=dry_run)
+
+# Таск для пересчета сохраненных нормализованных текстов предложений (profile_id=None — все профили)
+@celery.task(time_limit=3600, soft_time_limit=3500)
+def celery_renormalize_sentences(profile_id=None):
+    return renormalize_sentences(profile_id=profile_id)
+
+# Таск для поиска кластеров почти одинаковых предложений (хэшируются только новые предложения)
+@celery.task(time_limit=3600, soft_time_limit=3500)
+def celery_cluster_near_duplicates():
+    return cluster_near_duplicates()
+
 # Таск для подготовки файлов с заключениями и загрузки их в OpenAI
 # Этот таск вызывается при каждом новом входе пользователя в систему (после очистки сессии)
 @celery.task(name='async_prepare_impression_snippets', time_limit=120, soft_time_limit=110)
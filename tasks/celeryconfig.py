@@ -1,5 +1,6 @@
 # celeryconfig.py
 
+import os
 from celery.schedules import crontab
 
 beat_schedule = {
@@ -11,5 +12,21 @@ beat_schedule = {
         'task': 'tasks.celery_tasks.celery_cancel_stale_polled_tasks',
         'schedule': 15.0,
     },
+    'flush-sentence-weights': {
+        'task': 'tasks.celery_tasks.celery_flush_sentence_weights',
+        'schedule': float(os.getenv("SENTENCE_WEIGHT_FLUSH_INTERVAL", "30")),
+    },
+    'collect-orphans': {
+        'task': 'tasks.celery_tasks.celery_collect_orphans',
+        'schedule': float(os.getenv("ORPHAN_GC_INTERVAL", "3600")),
+    },
+    'renormalize-sentences': {
+        'task': 'tasks.celery_tasks.celery_renormalize_sentences',
+        'schedule': float(os.getenv("RENORMALIZE_INTERVAL", "600")),
+    },
+    'cluster-near-duplicates': {
+        'task': 'tasks.celery_tasks.celery_cluster_near_duplicates',
+        'schedule': float(os.getenv("DUPLICATE_CLUSTERS_INTERVAL", "3600")),
+    },
 }
 